@@ -0,0 +1,15 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmarks for Booleano.
+
+They are not part of the test suite; run each module from the root of the
+repository, e.g.::
+
+    PYTHONPATH=src python -m benchmarks.memory
+
+The whole suite, whose results can be stored and compared between runs, is
+in :mod:`benchmarks.suite`::
+
+    PYTHONPATH=src python -m benchmarks.suite run --output results.json
+
+"""
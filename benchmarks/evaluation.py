@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+Speed of the evaluation of parse trees, compared with their flat programs.
+
+Each expression is evaluated against a batch of contexts, by calling the tree
+(``tree(context)``) and by calling its compiled program
+(``tree.compile()(context)``)::
+
+    PYTHONPATH=src python -m benchmarks.evaluation [--contexts 1000] [--repeat 5] [--json]
+
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import argparse
+import json
+import random
+import timeit
+
+from booleano.operations.variables import NumberVariable, SetVariable, StringVariable
+from booleano.parser import Grammar
+from booleano.parser.core import EvaluableParseManager
+from booleano.parser.scope import Bind, SymbolTable
+
+EXPRESSIONS = (
+    ("comparison", 'age > 18'),
+    ("conjunction", 'age >= 18 & age <= 65 & name != "zuko"'),
+    ("membership", 'name ∈ {"aang", "katara", "sokka", "toph", "zuko", "iroh"}'),
+    ("mixed", 'age > 18 & (name == "katara" | name ∈ {"aang", "sokka", "zuko"}) & ~ "fire" ∈ elements'),
+    ("deep", " | ".join('(age == %s & name != "zuko")' % age for age in range(20))),
+)
+
+
+def make_contexts(count, seed=0):
+    """Build ``count`` random contexts."""
+    generator = random.Random(seed)
+    names = ("aang", "katara", "sokka", "toph", "zuko", "iroh", "azula")
+    elements = ("air", "water", "earth", "fire")
+    return [{
+        "age": generator.randint(0, 100),
+        "name": generator.choice(names),
+        "elements": set(generator.sample(elements, generator.randint(0, 4))),
+    } for _ in range(count)]
+
+
+def make_manager():
+    symbol_table = SymbolTable("root", (
+        Bind("age", NumberVariable("age")),
+        Bind("name", StringVariable("name")),
+        Bind("elements", SetVariable("elements")),
+    ))
+    return EvaluableParseManager(symbol_table, Grammar())
+
+
+def measure(function, contexts, repeat):
+    """Return the best time, in microseconds, to evaluate each context."""
+    timer = timeit.Timer(lambda: [function(context) for context in contexts])
+    return min(timer.repeat(repeat, 1)) / len(contexts) * 1e6
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--contexts", type=int, default=1000, help="amount of contexts per run")
+    parser.add_argument("--repeat", type=int, default=5, help="amount of runs, keeping the best one")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    options = parser.parse_args(argv)
+
+    manager = make_manager()
+    contexts = make_contexts(options.contexts)
+    results = {}
+    for name, expression in EXPRESSIONS:
+        tree = manager.parse(expression)
+        program = tree.compile()
+        results[name] = {
+            "tree": measure(tree, contexts, options.repeat),
+            "program": measure(program, contexts, options.repeat),
+            "instructions": len(program),
+        }
+
+    if options.json:
+        print(json.dumps(results, indent=2, sort_keys=True))
+    else:
+        print("%-15s %12s %12s %8s" % ("expression", "tree (us)", "program (us)", "speedup"))
+        for name, _ in EXPRESSIONS:
+            result = results[name]
+            print("%-15s %12.2f %12.2f %7.2fx" % (
+                name, result["tree"], result["program"], result["tree"] / result["program"]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,443 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark suite covering parsing, evaluation, conversion and scope
+construction.
+
+Each benchmark is a function which prepares its workload and returns the
+callable to be timed, so only the operation itself is measured. The results
+are stored as JSON and can be compared with those of an earlier run::
+
+    PYTHONPATH=src python -m benchmarks.suite run --output before.json
+    # ... change something ...
+    PYTHONPATH=src python -m benchmarks.suite run --output after.json
+    PYTHONPATH=src python -m benchmarks.suite compare before.json after.json
+
+``run --filter parse`` only runs the benchmarks whose names contain
+``parse``, and ``run --quick`` takes fewer samples, for smoke tests.
+
+The import benchmarks measure the cumulative time reported by
+``python -X importtime`` (Python 3.7+) for each module in a new interpreter.
+
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+import timeit
+
+from booleano.operations import And, Equal, GreaterThan, Number, Or, PlaceholderVariable, Set, String
+from booleano.operations.bdd import compile_bdd
+from booleano.operations.program import compile_node
+from booleano.operations.rete import RuleNetwork
+from booleano.operations.sql import SQLConverter
+from booleano.operations.variables import NumberVariable, SetVariable, StringVariable
+from booleano.parser import Grammar, corpus
+from booleano.parser.core import ConvertibleParseManager, EvaluableParseManager
+from booleano.parser.scope import Bind, SymbolTable
+
+from benchmarks.evaluation import make_contexts  # isort:skip
+
+#: The benchmarks, as (name, function, measured) tuples, in the order they're
+#: run.
+BENCHMARKS = []
+
+EXPRESSION = 'age > 18 & (name == "katara" | name ∈ {"aang", "sokka", "zuko"}) & ~ "fire" ∈ elements'
+
+# The conversions into SQL don't support the membership in variables:
+CONVERTIBLE_EXPRESSION = 'age > 18 & (name == "katara" | name ∈ {"aang", "sokka", "zuko"}) & ~ nation == "fire"'
+
+WIDE_EXPRESSION = " | ".join('age == %s' % age for age in range(100))
+
+LARGE_SET_EXPRESSION = "name ∈ {%s}" % ", ".join('"name %s"' % i for i in range(500))
+
+
+def benchmark(name, measured=False):
+    """
+    Register the decorated function as the benchmark ``name``.
+
+    The functions of the ``measured`` benchmarks return a callable which
+    measures the operation itself and returns its duration in seconds,
+    instead of the callable to be timed.
+
+    """
+    def register(function):
+        BENCHMARKS.append((name, function, measured))
+        return function
+    return register
+
+
+def make_symbol_table():
+    return SymbolTable("root", (
+        Bind("age", NumberVariable("age")),
+        Bind("name", StringVariable("name")),
+        Bind("elements", SetVariable("elements")),
+    ))
+
+
+def make_manager(cache_limit=0):
+    return EvaluableParseManager(make_symbol_table(), Grammar(), cache_limit=cache_limit)
+
+
+def make_rules(count):
+    """Build ``count`` conjunctions of an equality and an inequality, by name."""
+    (age, name) = (NumberVariable("age"), StringVariable("name"))
+    names = ("aang", "katara", "sokka", "toph", "zuko", "iroh", "azula")
+    return dict(
+        (index, And(Equal(name, String(names[index % 7])), GreaterThan(age, Number(index % 100))))
+        for index in range(count)
+    )
+
+
+def make_deep_tree(depth, variable=None):
+    """Build a right-nested conjunction of ``depth`` comparisons with ``variable``."""
+    variable = NumberVariable("age") if variable is None else variable
+    node = Equal(variable, Number(0))
+    for level in range(1, depth):
+        node = And(Or(Equal(variable, Number(level)), Equal(variable, Number(-level))), node)
+    return node
+
+
+def measure_import(module):
+    """Return a function measuring the time it takes to import ``module``."""
+    command = [sys.executable, "-X", "importtime", "-c", "import %s" % module]
+
+    def measure():
+        output = subprocess.check_output(command, stderr=subprocess.STDOUT).decode()
+        for line in reversed(output.splitlines()):
+            fields = line.split("|")
+            if line.startswith("import time:") and fields[-1].strip() == module:
+                # The cumulative time, in microseconds:
+                return int(fields[1]) / 1e6
+        raise ValueError("No import time reported for %s" % module)
+    return measure
+
+
+# Imports
+
+
+@benchmark("import.operations", measured=True)
+def import_operations():
+    return measure_import("booleano.operations")
+
+
+@benchmark("import.sql", measured=True)
+def import_sql():
+    return measure_import("booleano.operations.sql")
+
+
+@benchmark("import.parser", measured=True)
+def import_parser():
+    return measure_import("booleano.parser.core")
+
+
+# Parsing
+
+
+@benchmark("parse.cold_parser_build")
+def parse_cold():
+    return lambda: make_manager().parse("age > 18")
+
+
+@benchmark("parse.uncached")
+def parse_uncached():
+    manager = make_manager()
+    manager.parse(EXPRESSION)
+    return lambda: manager.parse(EXPRESSION)
+
+
+@benchmark("parse.cached")
+def parse_cached():
+    manager = make_manager(cache_limit=None)
+    manager.parse(EXPRESSION)
+    return lambda: manager.parse(EXPRESSION)
+
+
+@benchmark("parse.wide")
+def parse_wide():
+    manager = make_manager()
+    manager.parse("age > 1")
+    return lambda: manager.parse(WIDE_EXPRESSION)
+
+
+@benchmark("parse.large_set")
+def parse_large_set():
+    manager = make_manager()
+    manager.parse("age > 1")
+    return lambda: manager.parse(LARGE_SET_EXPRESSION)
+
+
+@benchmark("parse.corpus")
+def parse_corpus():
+    symbol_table = corpus.make_symbol_table(20, namespace_depth=2)
+    manager = EvaluableParseManager(symbol_table, Grammar(), cache_limit=0)
+    expressions = list(corpus.CorpusGenerator(symbol_table, seed=0, max_depth=2).expressions(10))
+    return lambda: [manager.parse(expression) for expression in expressions]
+
+
+# Evaluation
+
+
+@benchmark("evaluate.single")
+def evaluate_single():
+    tree = make_manager().parse(EXPRESSION)
+    context = make_contexts(1)[0]
+    return lambda: tree(context)
+
+
+@benchmark("evaluate.batch_tree")
+def evaluate_batch_tree():
+    tree = make_manager().parse(EXPRESSION)
+    contexts = make_contexts(1000)
+    return lambda: [tree(context) for context in contexts]
+
+
+@benchmark("evaluate.batch_program")
+def evaluate_batch_program():
+    program = make_manager().parse(EXPRESSION).compile()
+    contexts = make_contexts(1000)
+    return lambda: [program(context) for context in contexts]
+
+
+@benchmark("evaluate.batch_bdd")
+def evaluate_batch_bdd():
+    function = compile_bdd(make_manager().parse(EXPRESSION))
+    contexts = make_contexts(1000)
+    return lambda: [function(context) for context in contexts]
+
+
+@benchmark("evaluate.corpus")
+def evaluate_corpus():
+    symbol_table = corpus.make_symbol_table(20, namespace_depth=2)
+    manager = EvaluableParseManager(symbol_table, Grammar())
+    generator = corpus.CorpusGenerator(symbol_table, seed=0)
+    programs = [manager.parse(expression).compile() for expression in generator.expressions(20)]
+    contexts = list(generator.contexts(100))
+    return lambda: [program(context) for program in programs for context in contexts]
+
+
+@benchmark("evaluate.deep")
+def evaluate_deep():
+    tree = make_deep_tree(200)
+    context = {"age": 0}
+    return lambda: tree(context)
+
+
+@benchmark("evaluate.deep_bdd")
+def evaluate_deep_bdd():
+    function = compile_bdd(make_deep_tree(200))
+    context = {"age": 0}
+    return lambda: function(context)
+
+
+@benchmark("evaluate.rules_program")
+def evaluate_rules_program():
+    programs = [compile_node(node) for node in make_rules(2000).values()]
+    contexts = make_contexts(20)
+    return lambda: [[program(context) for program in programs] for context in contexts]
+
+
+@benchmark("evaluate.rules_network")
+def evaluate_rules_network():
+    network = RuleNetwork()
+    for (name, node) in make_rules(2000).items():
+        network.add_rule(name, node)
+    contexts = make_contexts(20)
+    return lambda: [network.match(context) for context in contexts]
+
+
+@benchmark("evaluate.wide")
+def evaluate_wide():
+    tree = make_manager().parse(WIDE_EXPRESSION)
+    context = {"age": 99}
+    return lambda: tree(context)
+
+
+@benchmark("evaluate.large_set")
+def evaluate_large_set():
+    tree = make_manager().parse(LARGE_SET_EXPRESSION)
+    context = {"name": "name 499"}
+    return lambda: tree(context)
+
+
+@benchmark("operations.large_set_literal")
+def build_large_set():
+    items = [String("item %s" % i) for i in range(5000)]
+    return lambda: Set(*items)
+
+
+# Conversion
+
+
+@benchmark("convert.sql")
+def convert_sql():
+    tree = ConvertibleParseManager(Grammar()).parse(CONVERTIBLE_EXPRESSION)
+    converter = SQLConverter(cache_size=0)
+    return lambda: converter(tree.root_node)
+
+
+@benchmark("convert.sql_cached")
+def convert_sql_cached():
+    tree = ConvertibleParseManager(Grammar()).parse(CONVERTIBLE_EXPRESSION)
+    converter = SQLConverter()
+    return lambda: converter(tree.root_node)
+
+
+@benchmark("convert.deep")
+def convert_deep():
+    root_node = make_deep_tree(200, PlaceholderVariable("age"))
+    converter = SQLConverter(cache_size=0)
+    return lambda: converter(root_node)
+
+
+# Scope
+
+
+@benchmark("scope.build_10k_bindings")
+def build_symbol_table():
+    names = ["field_%s" % i for i in range(10000)]
+    return lambda: SymbolTable("root", [Bind(name, NumberVariable(name)) for name in names])
+
+
+@benchmark("scope.validate_10k_bindings")
+def validate_symbol_table():
+    names = ["field_%s" % i for i in range(10000)]
+    symbol_table = SymbolTable("root", [Bind(name, NumberVariable(name)) for name in names])
+    return symbol_table.validate_scope
+
+
+# Runner
+
+
+def run(pattern=None, quick=False, output=sys.stdout):
+    """
+    Run the benchmarks whose names contain ``pattern``.
+
+    :return: The results: the metadata of the run and the times of each
+        benchmark, in seconds per call.
+    :rtype: dict
+
+    """
+    (repeat, minimum_time) = (3, 0.02) if quick else (7, 0.2)
+    results = {}
+    for name, prepare, measured in BENCHMARKS:
+        if pattern and pattern not in name:
+            continue
+        if measured:
+            measure = prepare()
+            number = 1
+            times = sorted(measure() for _ in range(repeat))
+        else:
+            timer = timeit.Timer(prepare())
+            number = _get_number(timer, minimum_time)
+            times = sorted(duration / number for duration in timer.repeat(repeat, number))
+        results[name] = {
+            "min": times[0],
+            "median": times[len(times) // 2],
+            "number": number,
+            "repeat": repeat,
+        }
+        print("%-35s %12s  (%s x %s)" % (name, _format_time(results[name]["median"]), repeat, number), file=output)
+    return {"metadata": _get_metadata(), "benchmarks": results}
+
+
+def compare(old_results, new_results, threshold=1.1, output=sys.stdout):
+    """
+    Compare the median times of the benchmarks in both results.
+
+    :param threshold: The ratio of the new time to the old one above which
+        a benchmark is regarded as a regression.
+    :type threshold: float
+    :return: The names of the benchmarks which regressed.
+    :rtype: list
+
+    """
+    old_benchmarks = old_results["benchmarks"]
+    new_benchmarks = new_results["benchmarks"]
+    regressions = []
+    print("%-35s %12s %12s %8s" % ("benchmark", "old", "new", "ratio"), file=output)
+    for name in sorted(set(old_benchmarks) & set(new_benchmarks)):
+        old_time = old_benchmarks[name]["median"]
+        new_time = new_benchmarks[name]["median"]
+        ratio = new_time / old_time
+        if ratio > threshold:
+            regressions.append(name)
+            status = "  slower"
+        elif ratio < 1 / threshold:
+            status = "  faster"
+        else:
+            status = ""
+        print("%-35s %12s %12s %7.2fx%s" % (name, _format_time(old_time), _format_time(new_time), ratio, status),
+              file=output)
+    for name in sorted(set(old_benchmarks) ^ set(new_benchmarks)):
+        print("%-35s only in the %s results" % (name, "old" if name in old_benchmarks else "new"), file=output)
+    return regressions
+
+
+def _get_number(timer, minimum_time):
+    """Return the amount of calls per sample so that each sample lasts ``minimum_time``."""
+    number = 1
+    while True:
+        if timer.timeit(number) >= minimum_time:
+            return number
+        number *= 10
+
+
+def _get_metadata():
+    try:
+        commit = subprocess.check_output(["git", "rev-parse", "HEAD"], stderr=subprocess.STDOUT).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "commit": commit,
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def _format_time(seconds):
+    for (unit, factor) in (("s", 1), ("ms", 1e3), ("us", 1e6)):
+        if seconds * factor >= 1:
+            return "%.3f %s" % (seconds * factor, unit)
+    return "%.1f ns" % (seconds * 1e9)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest="command")
+    run_parser = commands.add_parser("run", help="run the benchmarks")
+    run_parser.add_argument("--filter", help="only run the benchmarks whose names contain this text")
+    run_parser.add_argument("--quick", action="store_true", help="take fewer and shorter samples")
+    run_parser.add_argument("--output", help="the file where the results are stored as JSON")
+    compare_parser = commands.add_parser("compare", help="compare the results of two runs")
+    compare_parser.add_argument("old", help="the file with the results of the reference run")
+    compare_parser.add_argument("new", help="the file with the results of the new run")
+    compare_parser.add_argument("--threshold", type=float, default=1.1,
+                                help="the slowdown regarded as a regression (default: %(default)s)")
+    commands.add_parser("list", help="list the benchmarks")
+    options = parser.parse_args(argv)
+
+    if options.command == "run":
+        results = run(options.filter, options.quick)
+        if options.output:
+            with open(options.output, "w") as output:
+                json.dump(results, output, indent=2, sort_keys=True)
+    elif options.command == "compare":
+        with open(options.old) as old_file, open(options.new) as new_file:
+            regressions = compare(json.load(old_file), json.load(new_file), options.threshold)
+        return 1 if regressions else 0
+    elif options.command == "list":
+        for name, _, _ in BENCHMARKS:
+            print(name)
+    else:
+        parser.print_help()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -85,6 +85,8 @@ setup(name="booleano",
       zip_safe=False,
       tests_require=["coverage >= 3.0", "nose >= 0.11.0", "tox"],
       install_requires=["pyparsing >= 1.5.2", "six"],
+      extras_require={"pandas": ["pandas"], "arrow": ["pyarrow"]},
+      entry_points={"console_scripts": ["booleano = booleano.cli:main"]},
       test_suite="nose.collector",
       )
 
@@ -0,0 +1,461 @@
+# -*- coding: utf-8 -*-
+"""
+The ``booleano`` command: filter or label streams of records with boolean
+expressions.
+
+The records are read from JSON Lines or CSV files (or the standard input) in
+chunks, evaluated with one expression or with the rules in a rules file and
+written to the standard output::
+
+    booleano -e 'status >= 500 & path ∈ {"/login", "/logout"}' access.jsonl
+    zcat access.csv.gz | booleano --format csv --rules alerts.rules --labels --workers 4 --stats
+
+The variables are inferred from the first records with the
+:data:`~booleano.operations.variables.variable_symbol_table_builder` (so a
+field holding integers and floats is a number), and the
+values of the CSV fields which look like numbers are turned into numbers.
+
+In a rules file, each rule takes a line made up of its label, a tab and its
+expression. Empty lines and those starting with ``#`` are ignored.
+
+By default, the records satisfying the expression (or any of the rules) are
+written as they were read. With ``--labels``, all the records are written
+along with the labels of the rules they satisfy. Records which make a rule
+fail (e.g., because they lack a field) don't satisfy it.
+
+The exit status is 0 if some record was written, 1 if none was and 2 on
+errors, like :command:`grep`.
+
+"""
+from __future__ import absolute_import, print_function, unicode_literals
+
+import argparse
+import csv
+import io
+import json
+import logging
+import multiprocessing
+import sys
+import time
+from collections import deque
+from itertools import chain
+
+from pyparsing import ParseException
+
+from booleano.exc import BooleanoException
+from booleano.operations.variables import variable_symbol_table_builder
+from booleano.parser.core import EvaluableParseManager
+from booleano.parser.grammar import Grammar
+from booleano.parser.symbol_table_builder import SchemaInference
+
+logger = logging.getLogger(__name__)
+
+__all__ = ("main", )
+
+#: The formats of the records, by the extensions of the files.
+FORMATS = {
+    ".jsonl": "jsonl",
+    ".ndjson": "jsonl",
+    ".json": "jsonl",
+    ".csv": "csv",
+}
+
+# The current record filter of the worker process:
+_worker_filter = None
+
+
+def main(argv=None, stdin=None, stdout=None, stderr=None):
+    """
+    Run the ``booleano`` command.
+
+    :param argv: The command line arguments (defaults to ``sys.argv[1:]``).
+    :type argv: list
+    :param stdin: The binary stream to read the records from when no file is
+        given (defaults to the standard input).
+    :param stdout: The binary stream to write the records to (defaults to the
+        standard output).
+    :param stderr: The text stream to write the errors and statistics to
+        (defaults to the standard error).
+    :return: The exit status.
+    :rtype: int
+
+    """
+    stdin = stdin or getattr(sys.stdin, "buffer", sys.stdin)
+    stdout = stdout or getattr(sys.stdout, "buffer", sys.stdout)
+    stderr = stderr or sys.stderr
+    options = _make_argument_parser().parse_args(argv)
+
+    start = time.time()
+    try:
+        rules = _load_rules(options)
+        record_format = options.format or FORMATS.get(_get_extension(options.files), "jsonl")
+        grammar_tokens = dict(token.split("=", 1) for token in options.tokens)
+        chunks = _read_chunks(options.files, stdin, record_format, options.chunk_size)
+        (samples, chunks) = _peek_records(chunks, record_format, options.infer)
+        spec = (record_format, rules, _infer_types(samples), grammar_tokens, options.labels, options.label_field)
+        record_filter = RecordFilter(*spec)
+    except (IOError, OSError, ValueError, ParseException, BooleanoException) as exc:
+        print("booleano: %s" % exc, file=stderr)
+        return 2
+
+    totals = Counts()
+    try:
+        if options.workers == 1:
+            results = (record_filter(chunk) for chunk in chunks)
+        else:
+            results = _filter_in_parallel(spec, chunks, options.workers or multiprocessing.cpu_count())
+        for (output, counts) in results:
+            stdout.write(output)
+            totals.add(counts)
+        stdout.flush()
+    except (IOError, OSError) as exc:
+        print("booleano: %s" % exc, file=stderr)
+        return 2
+
+    if options.stats:
+        print(totals.report(time.time() - start), file=stderr)
+    return 0 if totals.written else 1
+
+
+def _make_argument_parser():
+    parser = argparse.ArgumentParser(
+        prog="booleano",
+        description="Filter or label JSON Lines or CSV records with boolean expressions.",
+    )
+    rules = parser.add_mutually_exclusive_group(required=True)
+    rules.add_argument("-e", "--expression", help="the expression the records must satisfy")
+    rules.add_argument("-r", "--rules", metavar="FILE",
+                       help="the file with the rules: one label and expression per line, separated by a tab")
+    parser.add_argument("files", nargs="*", metavar="FILE",
+                        help="the files with the records (defaults to the standard input)")
+    parser.add_argument("-f", "--format", choices=("jsonl", "csv"),
+                        help="the format of the records (guessed from the extension of the files, or jsonl)")
+    parser.add_argument("-l", "--labels", action="store_true",
+                        help="write all the records along with the labels of the rules they satisfy")
+    parser.add_argument("--label-field", default="labels",
+                        help="the field where the labels are written (default: %(default)s)")
+    parser.add_argument("-i", "--infer", type=int, default=100, metavar="N",
+                        help="the amount of records to infer the variables from (default: %(default)s)")
+    parser.add_argument("-w", "--workers", type=int, default=1, metavar="N",
+                        help="the amount of worker processes, 0 for one per CPU (default: %(default)s)")
+    parser.add_argument("-c", "--chunk-size", type=int, default=1 << 20, metavar="BYTES",
+                        help="the approximate size of the chunks of records (default: %(default)s)")
+    parser.add_argument("-t", "--token", dest="tokens", action="append", default=[], metavar="NAME=VALUE",
+                        help="replace a token of the grammar (e.g., belongs_to=in)")
+    parser.add_argument("-s", "--stats", action="store_true",
+                        help="report the throughput on the standard error")
+    return parser
+
+
+def _load_rules(options):
+    """Return the label and the expression of each rule."""
+    if options.expression is not None:
+        return [("match", options.expression)]
+    rules = []
+    with io.open(options.rules, encoding="utf-8") as rules_file:
+        for (line_number, line) in enumerate(rules_file, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if "\t" not in line:
+                raise ValueError("%s:%s: the label and the expression must be separated by a tab" %
+                                 (options.rules, line_number))
+            (label, expression) = line.split("\t", 1)
+            rules.append((label.strip(), expression.strip()))
+    if not rules:
+        raise ValueError("%s: there are no rules" % options.rules)
+    return rules
+
+
+def _get_extension(paths):
+    """Return the extension shared by the ``paths``, if any."""
+    extensions = set("." + path.rsplit(".", 1)[-1].lower() for path in paths if "." in path)
+    return extensions.pop() if len(extensions) == 1 else None
+
+
+def _read_chunks(paths, stdin, record_format, chunk_size):
+    """
+    Read the records in the files at ``paths`` (or in ``stdin``) in chunks of
+    about ``chunk_size`` bytes.
+
+    :return: An iterator of chunks, made up of the CSV header of their
+        records (if any), the raw records and their size in bytes.
+
+    """
+    for path in paths or ["-"]:
+        stream = stdin if path == "-" else io.open(path, "rb")
+        try:
+            if record_format == "csv":
+                chunks = _read_csv_chunks(stream, chunk_size)
+            else:
+                chunks = _read_jsonl_chunks(stream, chunk_size)
+            for chunk in chunks:
+                yield chunk
+        finally:
+            if stream is not stdin:
+                stream.close()
+
+
+def _read_jsonl_chunks(stream, chunk_size):
+    while True:
+        lines = stream.readlines(chunk_size)
+        if not lines:
+            return
+        yield (None, lines, sum(len(line) for line in lines))
+
+
+def _read_csv_chunks(stream, chunk_size):
+    sizes = [0]
+
+    def decode_lines():
+        for line in stream:
+            sizes[0] += len(line)
+            yield line.decode("utf-8")
+
+    reader = csv.reader(decode_lines())
+    header = next(reader, None)
+    if header is None:
+        return
+    rows = []
+    for row in reader:
+        rows.append(row)
+        if sizes[0] >= chunk_size:
+            yield (header, rows, sizes[0])
+            rows = []
+            sizes[0] = 0
+    if rows:
+        yield (header, rows, sizes[0])
+
+
+def _peek_records(chunks, record_format, amount):
+    """
+    Return up to ``amount`` records from the first ``chunks``, along with
+    all the chunks.
+
+    """
+    records = []
+    peeked = []
+    for chunk in chunks:
+        peeked.append(chunk)
+        for raw_record in chunk[1]:
+            record = _parse_record(record_format, chunk[0], raw_record)
+            if record is not None:
+                records.append(record)
+        if len(records) >= amount:
+            break
+    return (records[:amount], chain(peeked, chunks))
+
+
+def _infer_types(records):
+    """
+    Return the type of each field in the ``records``, widened if they
+    disagree.
+
+    Fields whose values cannot be bound to variables are left out, and the
+    JSON objects are bound to sub-tables.
+
+    """
+    schema = variable_symbol_table_builder.infer(records, len(records))
+    supported_types = {}
+    for (name, value_type) in schema.types.items():
+        if isinstance(value_type, SchemaInference):
+            supported_types[name] = value_type
+            continue
+        try:
+            variable_symbol_table_builder.find_for_type(value_type)
+        except Exception:
+            logger.debug("Field %s ignored: there's no variable for %s", name, value_type)
+        else:
+            supported_types[name] = value_type
+    return supported_types
+
+
+def _parse_record(record_format, header, raw_record):
+    """
+    Turn ``raw_record`` into a dictionary, or return ``None`` if it's not a
+    valid record.
+
+    """
+    if record_format == "csv":
+        return dict(zip(header, [_convert_csv_value(value) for value in raw_record]))
+    if not raw_record.strip():
+        return None
+    try:
+        record = json.loads(raw_record.decode("utf-8"))
+    except ValueError:
+        return None
+    return record if isinstance(record, dict) else None
+
+
+def _convert_csv_value(value):
+    """Turn the CSV ``value`` into a number if it looks like one."""
+    if not value:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        pass
+    try:
+        return float(value)
+    except ValueError:
+        return value
+
+
+class Counts(object):
+    """Counters of the records processed."""
+
+    __slots__ = ("records", "written", "invalid", "errors", "size")
+
+    def __init__(self, records=0, written=0, invalid=0, errors=0, size=0):
+        self.records = records
+        self.written = written
+        self.invalid = invalid
+        self.errors = errors
+        self.size = size
+
+    def add(self, counts):
+        for name in self.__slots__:
+            setattr(self, name, getattr(self, name) + getattr(counts, name))
+
+    def report(self, duration):
+        """Return the report of the throughput after ``duration`` seconds."""
+        duration = max(duration, 1e-9)
+        return ("%s records (%s written, %s invalid, %s evaluation errors), %.1f MB in %.2f s: "
+                "%.0f records/s, %.1f MB/s" % (
+                    self.records, self.written, self.invalid, self.errors, self.size / 1e6, duration,
+                    self.records / duration, self.size / 1e6 / duration))
+
+    def __getstate__(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __setstate__(self, state):
+        self.__init__(*state)
+
+
+class RecordFilter(object):
+    """Evaluate the rules with the records of each chunk and format the output."""
+
+    def __init__(self, record_format, rules, types, grammar_tokens, labels, label_field):
+        """
+
+        :param record_format: ``"jsonl"`` or ``"csv"``.
+        :param rules: The label and the expression of each rule.
+        :type rules: list
+        :param types: The type of each field bound to a variable.
+        :type types: dict
+        :param grammar_tokens: The tokens replaced in the grammar.
+        :type grammar_tokens: dict
+        :param labels: Whether all the records are written along with their
+            labels, rather than only those satisfying some rule.
+        :type labels: bool
+        :param label_field: The name of the field holding the labels.
+        :raises ParseException: If an expression is not valid.
+        :raises booleano.exc.BooleanoException: If an expression uses unknown
+            identifiers.
+
+        """
+        symbol_table = variable_symbol_table_builder("root", types, raise_missing=False)
+        manager = EvaluableParseManager(symbol_table, Grammar(**grammar_tokens))
+        self.record_format = record_format
+        self.programs = [(label, manager.parse(expression).compile()) for (label, expression) in rules]
+        self.labels = labels
+        self.label_field = label_field
+        self._header = None
+
+    def __call__(self, chunk):
+        """
+        Evaluate the rules with the records in ``chunk``.
+
+        :return: The output for the chunk, encoded, and the counts of its
+            records.
+        :rtype: tuple
+
+        """
+        (header, raw_records, size) = chunk
+        counts = Counts(size=size)
+        output = []
+        if header is not None and header != self._header:
+            self._header = header
+            output.append(_format_csv_row(header + [self.label_field] if self.labels else header))
+        for raw_record in raw_records:
+            counts.records += 1
+            record = _parse_record(self.record_format, header, raw_record)
+            if record is None:
+                counts.invalid += 1
+                continue
+            labels = []
+            for (label, program) in self.programs:
+                try:
+                    if program(_Context(record)):
+                        labels.append(label)
+                except Exception:
+                    counts.errors += 1
+            if self.labels:
+                output.append(self._format_labelled_record(raw_record, record, labels))
+            elif labels:
+                output.append(_format_csv_row(raw_record) if header is not None else _terminate(raw_record))
+            else:
+                continue
+            counts.written += 1
+        return (b"".join(output), counts)
+
+    def _format_labelled_record(self, raw_record, record, labels):
+        if self.record_format == "csv":
+            return _format_csv_row(raw_record + ["|".join(labels)])
+        record[self.label_field] = labels
+        return json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n"
+
+
+class _Context(dict):
+    """Record used as context, where the missing fields are ``None``."""
+
+    __slots__ = ()
+
+    def __missing__(self, key):
+        return None
+
+
+def _format_csv_row(row):
+    output = io.StringIO()
+    csv.writer(output, lineterminator="\n").writerow(row)
+    return output.getvalue().encode("utf-8")
+
+
+def _terminate(line):
+    return line if line.endswith(b"\n") else line + b"\n"
+
+
+def _init_worker(spec):
+    global _worker_filter
+    _worker_filter = RecordFilter(*spec)
+
+
+def _filter_chunk(chunk):
+    return _worker_filter(chunk)
+
+
+def _filter_in_parallel(spec, chunks, processes):
+    """
+    Filter the ``chunks`` in a pool of worker processes, keeping the order of
+    the chunks.
+
+    At most two chunks per process are sent to the workers but not yet
+    collected, so the input is read as fast as it's processed.
+
+    """
+    pool = multiprocessing.Pool(processes, initializer=_init_worker, initargs=(spec, ))
+    try:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.apply_async(_filter_chunk, (chunk, )))
+            if len(pending) >= 2 * processes:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+Asynchronous evaluation of operation nodes.
+
+This lets developer-defined :class:`~booleano.operations.Variable` and
+:class:`~booleano.operations.Function` subclasses return awaitables (e.g., when
+their values come from a remote service) instead of plain values. This
+includes :class:`~booleano.operations.variables.NativeVariable` instances
+whose ``context_name`` is a coroutine function.
+
+The logical connectives keep their short-circuit semantics, while the
+operands of the other operations (and the items of a set) are resolved
+concurrently.
+
+This module requires Python 3.5+ and is only imported when an asynchronous
+evaluation is requested.
+
+"""
+from __future__ import absolute_import, print_function, unicode_literals
+
+import asyncio
+import copy
+import inspect
+import logging
+
+from booleano.operations.operands.constants import Set
+from booleano.operations.operators import (And, BelongsTo, Equal, GreaterEqual, IsSubset, LessEqual, Not, NotEqual, Or,
+                                           Xor, _InequalityOperator)
+from booleano.operations.variables import NativeVariable
+
+logger = logging.getLogger(__name__)
+
+__all__ = ("evaluate_async", )
+
+
+async def evaluate_async(node, context):
+    """
+    Evaluate ``node`` with ``context``, awaiting the values of its operands
+    where necessary.
+
+    :param node: The node to be evaluated.
+    :type node: :class:`booleano.operations.core.OperationNode`
+    :param context: The evaluation context.
+    :type context: object
+    :return: The logical value of ``node``.
+    :rtype: bool
+
+    """
+    if isinstance(node, And):
+        return (await evaluate_async(node.master_operand, context) and
+                await evaluate_async(node.slave_operand, context))
+    if isinstance(node, Or):
+        return (await evaluate_async(node.master_operand, context) or
+                await evaluate_async(node.slave_operand, context))
+    if isinstance(node, Xor):
+        master_value, slave_value = await asyncio.gather(
+            evaluate_async(node.master_operand, context),
+            evaluate_async(node.slave_operand, context),
+        )
+        return master_value ^ slave_value
+    if isinstance(node, Not):
+        return not await evaluate_async(node.operand, context)
+    operation = _get_operation(node)
+    if operation is not None:
+        return await _compare(node, operation, context)
+    # It's an operand or an operator we know nothing about:
+    node = await _resolve_operand(node, context)
+    return await _await_if_needed(node(context))
+
+
+def _get_operation(node):
+    """
+    Find the operand method behind the binary operator ``node``.
+
+    :return: A pair with the name of the method to be called on the master
+        operand and whether its result must be negated, or ``None`` if
+        ``node`` is not a known binary operator.
+
+    """
+    if isinstance(node, Equal):
+        return "equals", isinstance(node, NotEqual)
+    if isinstance(node, _InequalityOperator):
+        # The comparison may have been switched when the operands were
+        # rearranged:
+        method = node.comparison.__name__.lstrip("_")
+        return method, isinstance(node, (LessEqual, GreaterEqual))
+    if isinstance(node, BelongsTo):
+        return "belongs_to", False
+    if isinstance(node, IsSubset):
+        return "is_subset", False
+    return None
+
+
+async def _compare(node, operation, context):
+    """Evaluate the binary operator ``node`` by fetching both operands at once."""
+    method_name, negate = operation
+    master_operand, value = await asyncio.gather(
+        _resolve_operand(node.master_operand, context),
+        _to_python(node.slave_operand, context),
+    )
+    result = await _await_if_needed(getattr(master_operand, method_name)(value, context))
+    return not result if negate else result
+
+
+async def _to_python(operand, context):
+    """Return the Python value of ``operand``, awaiting it if necessary."""
+    if isinstance(operand, Set):
+        values = await asyncio.gather(*[_to_python(item, context) for item in operand.constant_value])
+        return set(values)
+    return await _await_if_needed(operand.to_python(context))
+
+
+async def _resolve_operand(operand, context):
+    """
+    Return an operand equivalent to ``operand`` whose value is already
+    available.
+
+    Native variables whose ``context_name`` is a callable are replaced by
+    copies bound to its (awaited) value, so their synchronous methods can be
+    used as usual without calling it again. Sets are rebuilt with their items
+    resolved. Any other operand is returned as is.
+
+    """
+    if isinstance(operand, Set):
+        items = list(operand.constant_value)
+        resolved_items = await asyncio.gather(*[_resolve_operand(item, context) for item in items])
+        if all(resolved is item for (resolved, item) in zip(resolved_items, items)):
+            return operand
+        return Set(*resolved_items)
+    if isinstance(operand, NativeVariable) and callable(operand.context_name):
+        value = await _await_if_needed(operand.context_name(context))
+        resolved_operand = copy.copy(operand)
+        resolved_operand.context_name = _ResolvedValue(value)
+        return resolved_operand
+    return operand
+
+
+async def _await_if_needed(value):
+    """Await ``value`` if it's awaitable, or return it unchanged otherwise."""
+    if inspect.isawaitable(value):
+        return await value
+    return value
+
+
+class _ResolvedValue(object):
+    """Callable returning a value which was fetched beforehand."""
+
+    def __init__(self, value):
+        self.value = value
+
+    def __call__(self, context):
+        return self.value
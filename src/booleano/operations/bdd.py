@@ -0,0 +1,407 @@
+# -*- coding: utf-8 -*-
+"""
+Reduced ordered binary decision diagrams (BDDs) of evaluable trees.
+
+:func:`compile_bdd` turns the logical skeleton of a tree (its
+:class:`~booleano.operations.And`, :class:`~booleano.operations.Or`,
+:class:`~booleano.operations.Xor` and :class:`~booleano.operations.Not`
+nodes) into a BDD whose variables are the atomic predicates of the tree: its
+comparisons and the truth values of its other operands. The equivalent atoms
+are only one variable, even if they appear many times, and the negated
+comparisons share the variable of their positive counterpart (e.g.,
+``age <= 18`` is the negation of ``age > 18``, and ``name != "aang"`` that
+of ``name == "aang"``).
+
+Evaluating a :class:`BDDFunction` follows a single path in the diagram, so
+each atom is evaluated at most once per context, whereas a heavily nested
+tree may evaluate the same atom many times. On the other hand, the atoms are
+evaluated in the order of the diagram instead of that of the tree, so they
+must not have side effects, and atoms which the tree would short-circuit may
+be evaluated (e.g., ``age > 18`` in ``~ banned & age > 18`` may be evaluated
+before ``banned``).
+
+The functions built by the same :class:`BDDManager` share their nodes, and two
+of them are equivalent if and only if they are the same node. This decides
+the equivalence, the satisfiability and the subsumption of rules, as far as
+their atoms are independent from each other (e.g., ``age > 18`` and
+``age > 21`` are two unrelated variables)::
+
+    manager = BDDManager()
+    rule1 = compile_bdd(parse_manager.parse("a & (b | c)"), manager)
+    rule2 = compile_bdd(parse_manager.parse("a & b | a & c"), manager)
+    assert rule1.is_equivalent(rule2)
+
+The size of the diagram depends on the order of its variables, which is that
+of the first appearance of each atom. Diagrams may grow exponentially with the
+amount of atoms in some rules, so this is meant for rules over a bounded set
+of atoms.
+
+"""
+from __future__ import absolute_import, print_function, unicode_literals
+
+import logging
+
+from booleano.operations.operators import And, Not, Or, Xor
+from booleano.operations.program import _METHOD_NAMES, _NEGATED, _get_comparison_opcode, _is_constant
+
+logger = logging.getLogger(__name__)
+
+__all__ = ("BDDManager", "BDDFunction", "compile_bdd")
+
+#: The terminal nodes.
+FALSE = 0
+TRUE = 1
+
+# The level of the terminal nodes, below all the variables:
+_TERMINAL_LEVEL = float("inf")
+
+
+class BDDManager(object):
+    """
+    Store of the atoms and the nodes shared by several BDDs.
+
+    .. attribute:: atoms
+
+        The first node found for each atom, in the order of the variables.
+        The variable of a negated comparison is its positive counterpart.
+
+    """
+
+    def __init__(self):
+        self.atoms = []
+        # The function evaluating each atom, and the index of each atom by
+        # its key:
+        self._evaluators = []
+        self._atom_indexes = {}
+        # Whether the first node of each atom is a negated comparison:
+        self._negated_atoms = []
+        # The variable and the children of each node, the terminals first:
+        self._levels = [_TERMINAL_LEVEL, _TERMINAL_LEVEL]
+        self._lows = [FALSE, TRUE]
+        self._highs = [FALSE, TRUE]
+        self._unique_nodes = {}
+        self._ite_cache = {}
+
+    def __len__(self):
+        """Return the amount of nodes, including the terminals."""
+        return len(self._levels)
+
+    def compile(self, node):
+        """
+        Return the BDD of the tree whose root is ``node``.
+
+        :rtype: BDDFunction
+
+        """
+        return BDDFunction(self, self._build(node))
+
+    def evaluate(self, root, context):
+        """
+        Evaluate the BDD whose root is the node ``root`` with ``context``.
+
+        :rtype: bool
+
+        """
+        (levels, lows, highs, evaluators) = (self._levels, self._lows, self._highs, self._evaluators)
+        while root > TRUE:
+            root = highs[root] if evaluators[levels[root]](context) else lows[root]
+        return root == TRUE
+
+    # Operations on the nodes
+
+    def ite(self, condition, then_node, else_node):
+        """
+        Return the node of ``if condition then then_node else else_node``.
+
+        """
+        if condition == TRUE or then_node == else_node:
+            return then_node
+        if condition == FALSE:
+            return else_node
+        if then_node == TRUE and else_node == FALSE:
+            return condition
+        key = (condition, then_node, else_node)
+        result = self._ite_cache.get(key)
+        if result is None:
+            levels = self._levels
+            level = min(levels[condition], levels[then_node], levels[else_node])
+            (condition_low, condition_high) = self._get_cofactors(condition, level)
+            (then_low, then_high) = self._get_cofactors(then_node, level)
+            (else_low, else_high) = self._get_cofactors(else_node, level)
+            low = self.ite(condition_low, then_low, else_low)
+            high = self.ite(condition_high, then_high, else_high)
+            result = self._ite_cache[key] = self._make_node(level, low, high)
+        return result
+
+    def negate(self, node):
+        return self.ite(node, FALSE, TRUE)
+
+    def conjoin(self, node1, node2):
+        return self.ite(node1, node2, FALSE)
+
+    def disjoin(self, node1, node2):
+        return self.ite(node1, TRUE, node2)
+
+    def exclusive_disjoin(self, node1, node2):
+        return self.ite(node1, self.negate(node2), node2)
+
+    def count_nodes(self, root):
+        """Return the amount of nodes reachable from ``root``."""
+        seen = set()
+        nodes = [root]
+        while nodes:
+            node = nodes.pop()
+            if node not in seen:
+                seen.add(node)
+                if node > TRUE:
+                    nodes.append(self._lows[node])
+                    nodes.append(self._highs[node])
+        return len(seen)
+
+    def get_support(self, root):
+        """Return the indexes of the atoms tested in the BDD whose root is ``root``."""
+        levels = self._levels
+        seen = set()
+        support = set()
+        nodes = [root]
+        while nodes:
+            node = nodes.pop()
+            if node > TRUE and node not in seen:
+                seen.add(node)
+                support.add(levels[node])
+                nodes.append(self._lows[node])
+                nodes.append(self._highs[node])
+        return support
+
+    def get_model(self, root):
+        """
+        Return the values of the atoms in one of the paths from ``root`` to
+        the true terminal, or ``None`` if there's no such path.
+
+        :return: The value of each atom in the path, by atom.
+        :rtype: dict
+
+        """
+        if root == FALSE:
+            return None
+        model = {}
+        while root > TRUE:
+            level = self._levels[root]
+            value = self._highs[root] != FALSE
+            model[self.atoms[level]] = value != self._negated_atoms[level]
+            root = self._highs[root] if value else self._lows[root]
+        return model
+
+    def _get_cofactors(self, node, level):
+        if self._levels[node] == level:
+            return (self._lows[node], self._highs[node])
+        return (node, node)
+
+    def _make_node(self, level, low, high):
+        if low == high:
+            return low
+        key = (level, low, high)
+        node = self._unique_nodes.get(key)
+        if node is None:
+            node = self._unique_nodes[key] = len(self._levels)
+            self._levels.append(level)
+            self._lows.append(low)
+            self._highs.append(high)
+        return node
+
+    # Construction out of the trees
+
+    def _build(self, root):
+        """
+        Return the BDD node equivalent to the tree whose root is ``root``.
+
+        The tree is traversed iteratively, so deeply nested trees don't hit
+        the recursion limit.
+
+        """
+        results = []
+        pending = [(root, False)]
+        while pending:
+            (node, visited) = pending.pop()
+            if isinstance(node, Not):
+                if visited:
+                    results.append(self.negate(results.pop()))
+                else:
+                    pending.append((node, True))
+                    pending.append((node.operand, False))
+            elif isinstance(node, (And, Or, Xor)):
+                if visited:
+                    slave = results.pop()
+                    master = results.pop()
+                    if isinstance(node, And):
+                        results.append(self.conjoin(master, slave))
+                    elif isinstance(node, Or):
+                        results.append(self.disjoin(master, slave))
+                    else:
+                        results.append(self.exclusive_disjoin(master, slave))
+                else:
+                    pending.append((node, True))
+                    pending.append((node.slave_operand, False))
+                    pending.append((node.master_operand, False))
+            else:
+                results.append(self._get_atom_node(node))
+        return results.pop()
+
+    def _get_atom_node(self, node):
+        """Return the BDD node testing the atom ``node``."""
+        opcode = _get_comparison_opcode(node)
+        (key, negated) = self._get_atom_key(node, opcode)
+        index = self._atom_indexes.get(key)
+        if index is None:
+            index = self._atom_indexes[key] = len(self.atoms)
+            self.atoms.append(node)
+            self._negated_atoms.append(negated)
+            self._evaluators.append(_make_evaluator(node, opcode, negated))
+        atom_node = self._make_node(index, FALSE, TRUE)
+        return self.negate(atom_node) if negated else atom_node
+
+    def _get_atom_key(self, node, opcode):
+        """
+        Return the key of the variable of the atom ``node``, and whether the
+        atom is its negation.
+
+        """
+        if opcode is None:
+            return (node, False)
+        # The negated comparisons use the method of the positive ones:
+        key = (_METHOD_NAMES[opcode], node.master_operand, node.slave_operand)
+        return (key, _NEGATED[opcode])
+
+
+class BDDFunction(object):
+    """
+    Boolean function represented by a node in a :class:`BDDManager`.
+
+    The functions support the ``&``, ``|``, ``^`` and ``~`` operators to
+    build new ones, and they are equal if they are equivalent.
+
+    """
+
+    __slots__ = ("manager", "root")
+
+    def __init__(self, manager, root):
+        """
+
+        :param manager: The manager of the node.
+        :type manager: BDDManager
+        :param root: The node.
+        :type root: int
+
+        """
+        self.manager = manager
+        self.root = root
+
+    def __call__(self, context):
+        """
+        Evaluate the function with ``context``.
+
+        :rtype: bool
+
+        """
+        return self.manager.evaluate(self.root, context)
+
+    def __len__(self):
+        """Return the amount of nodes in the diagram, including the terminals."""
+        return self.manager.count_nodes(self.root)
+
+    def is_satisfiable(self):
+        """Check if the function is true for some values of its atoms."""
+        return self.root != FALSE
+
+    def is_tautology(self):
+        """Check if the function is true for all the values of its atoms."""
+        return self.root == TRUE
+
+    def is_equivalent(self, other):
+        """Check that ``other`` is true for the same values of the atoms."""
+        return self.root == self._get_root(other)
+
+    def implies(self, other):
+        """
+        Check that ``other`` is true whenever this function is true, i.e.,
+        that this function is subsumed by ``other``.
+
+        """
+        other_root = self._get_root(other)
+        return self.manager.ite(self.root, other_root, TRUE) == TRUE
+
+    def get_model(self):
+        """
+        Return the values of the atoms which make this function true, or
+        ``None`` if it's not satisfiable.
+
+        :return: The value of each atom (not all of them may be needed), by
+            the representative node of the atom.
+        :rtype: dict
+
+        """
+        return self.manager.get_model(self.root)
+
+    def __and__(self, other):
+        return BDDFunction(self.manager, self.manager.conjoin(self.root, self._get_root(other)))
+
+    def __or__(self, other):
+        return BDDFunction(self.manager, self.manager.disjoin(self.root, self._get_root(other)))
+
+    def __xor__(self, other):
+        return BDDFunction(self.manager, self.manager.exclusive_disjoin(self.root, self._get_root(other)))
+
+    def __invert__(self):
+        return BDDFunction(self.manager, self.manager.negate(self.root))
+
+    def __eq__(self, other):
+        return isinstance(other, BDDFunction) and other.manager is self.manager and other.root == self.root
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        return hash((id(self.manager), self.root))
+
+    def __repr__(self):
+        return "<BDDFunction with %s nodes>" % len(self)
+
+    def _get_root(self, other):
+        if other.manager is not self.manager:
+            raise ValueError("Functions from different BDD managers cannot be combined")
+        return other.root
+
+
+def compile_bdd(node, manager=None):
+    """
+    Return the BDD of the evaluable tree whose root is ``node``.
+
+    :param node: The root of the tree, or the parse tree itself.
+    :type node: :class:`booleano.operations.core.OperationNode`
+    :param manager: The manager storing the diagram, to compare it with
+        other diagrams (a new one is used by default).
+    :type manager: BDDManager
+    :rtype: BDDFunction
+
+    """
+    if manager is None:
+        manager = BDDManager()
+    return manager.compile(getattr(node, "root_node", node))
+
+
+def _make_evaluator(node, opcode, negated):
+    """
+    Return the function evaluating the variable of the atom ``node`` with a
+    context: the positive comparison if ``node`` is a negated one, unless
+    the atom is not ``negated`` in the diagram.
+
+    """
+    if opcode is None:
+        return lambda context: bool(node(context))
+    method = getattr(node.master_operand, _METHOD_NAMES[opcode])
+    slave_operand = node.slave_operand
+    inverted = _NEGATED[opcode] and not negated
+    if _is_constant(slave_operand):
+        value = slave_operand.to_python(None)
+        return lambda context: bool(method(value, context)) != inverted
+    return lambda context: bool(method(slave_operand.to_python(context), context)) != inverted
@@ -0,0 +1,415 @@
+# -*- coding: utf-8 -*-
+"""
+Vectorized evaluation of evaluable trees over columnar batches of contexts.
+
+A :class:`ColumnarEvaluator` evaluates a tree over whole batches of contexts
+stored by columns: Apache Arrow record batches or tables, or mappings whose
+values are Arrow arrays or 1-dimensional buffers of numbers (e.g., from
+:mod:`array` or NumPy). No Python dictionary is built per context: the
+operations are computed on the columns with :mod:`pyarrow.compute`, and the
+result of each batch is its selection bitmap, a :class:`pyarrow.BooleanArray`
+without nulls telling which contexts satisfy the tree::
+
+    evaluator = ColumnarEvaluator(parse_manager.parse('age > 18 & name ∈ {"aang", "toph"}'))
+    for (batch, selection) in evaluator.evaluate_file("people.arrow"):
+        adults = batch.filter(selection)
+
+The columns are bound to the native variables (see
+:mod:`booleano.operations.variables`) through their
+:meth:`~booleano.operations.variables.NativeVariable.to_column` method, which
+by default takes the column named after their context item. Arrow columns are
+used as they are, and buffers of numbers are wrapped without copying them.
+
+Operations which cannot be vectorized (e.g., those involving developer-defined
+variables or functions) are evaluated context by context, so the result is
+always the same as the one of the tree, except that missing values (nulls)
+never satisfy comparisons (e.g., neither ``age > 18`` nor ``age != 18``).
+The lists in the columns are turned into sets for these operations, like
+the values of :class:`~booleano.operations.variables.SetVariable`. The
+``evaluated`` flag of the native variables is not set.
+
+Files in the Arrow IPC formats are memory-mapped and read batch by batch, so
+they may be larger than the available memory.
+
+This module requires :mod:`pyarrow`, which is not a dependency of Booleano.
+
+"""
+from __future__ import absolute_import, print_function, unicode_literals
+
+import logging
+import sys
+
+import pyarrow
+import pyarrow.compute as compute
+import pyarrow.ipc
+
+from booleano.operations.operands.constants import Number, String
+from booleano.operations.operators import (And, BelongsTo, Equal, GreaterEqual, IsSubset, LessEqual, Not, NotEqual, Or,
+                                           Xor, _InequalityOperator)
+from booleano.operations.program import _is_constant
+from booleano.operations.variables import NativeVariable
+
+logger = logging.getLogger(__name__)
+
+__all__ = ("ColumnarEvaluator", "ColumnBinding")
+
+# The Arrow types of the buffers of numbers, by their struct format codes
+# (for integers, along with their sizes):
+_BUFFER_TYPES = {
+    ("b", 1): pyarrow.int8(),
+    ("h", 2): pyarrow.int16(),
+    ("i", 4): pyarrow.int32(),
+    ("l", 4): pyarrow.int32(),
+    ("l", 8): pyarrow.int64(),
+    ("q", 8): pyarrow.int64(),
+    ("B", 1): pyarrow.uint8(),
+    ("H", 2): pyarrow.uint16(),
+    ("I", 4): pyarrow.uint32(),
+    ("L", 4): pyarrow.uint32(),
+    ("L", 8): pyarrow.uint64(),
+    ("Q", 8): pyarrow.uint64(),
+    ("e", 2): pyarrow.float16(),
+    ("f", 4): pyarrow.float32(),
+    ("d", 8): pyarrow.float64(),
+}
+
+# The prefixes of the struct format codes for the native byte order:
+_NATIVE_ORDERS = ("", "@", "=", "<") if sys.byteorder == "little" else ("", "@", "=", ">", "!")
+
+# The connectives computed on the selections of their operands:
+_CONNECTIVES = ((And, compute.and_), (Or, compute.or_), (Xor, compute.xor))
+
+# The exceptions raised by Arrow when an operation isn't supported on the
+# columns at hand:
+_ARROW_ERRORS = (pyarrow.ArrowNotImplementedError, pyarrow.ArrowInvalid, pyarrow.ArrowTypeError)
+
+
+class ColumnBinding(object):
+    """
+    The columns of a batch of contexts, by the names of the context items
+    they hold.
+
+    """
+
+    def __init__(self, batch, columns=None):
+        """
+
+        :param batch: The contexts, as an Arrow record batch or table, or as
+            a mapping from the names of the columns to the columns.
+        :param columns: The names of the columns, by the names of the context
+            items they hold. By default, they have the same names.
+        :type columns: dict
+
+        """
+        self.batch = batch
+        self.columns = columns or {}
+        self._arrays = {}
+
+    def get(self, name, default=None):
+        """
+        Return the column holding the context item ``name``, as an Arrow
+        array, or ``default`` if there's none.
+
+        """
+        try:
+            return self._arrays[name]
+        except KeyError:
+            pass
+        column_name = self.columns.get(name, name)
+        if isinstance(self.batch, (pyarrow.RecordBatch, pyarrow.Table)):
+            if column_name not in self.batch.schema.names:
+                return default
+            array = self.batch.column(column_name)
+        elif column_name in self.batch:
+            array = _to_array(self.batch[column_name])
+        else:
+            return default
+        self._arrays[name] = array
+        return array
+
+    def get_contexts(self):
+        """Return the contexts of the batch as dictionaries."""
+        context_names = dict((column, name) for (name, column) in self.columns.items())
+        if isinstance(self.batch, (pyarrow.RecordBatch, pyarrow.Table)):
+            names = self.batch.schema.names
+            values = [_to_python_values(column) for column in self.batch.columns]
+        else:
+            names = list(self.batch)
+            values = [_to_python_values(_to_array(self.batch[name])) for name in names]
+        names = [context_names.get(name, name) for name in names]
+        return [dict(zip(names, row)) for row in zip(*values)]
+
+
+class ColumnarEvaluator(object):
+    """
+    Evaluate an evaluable tree over batches of contexts stored by columns.
+
+    """
+
+    def __init__(self, tree, columns=None):
+        """
+
+        :param tree: The parse tree or the root of the tree.
+        :param columns: The names of the columns, by the names of the context
+            items they hold. By default, they have the same names.
+        :type columns: dict
+
+        """
+        self.root_node = getattr(tree, "root_node", tree)
+        self.columns = columns
+
+    def __call__(self, batch):
+        """
+        Evaluate the tree with each context in ``batch``.
+
+        :param batch: The contexts, as an Arrow record batch or table, or as
+            a mapping from the names of the columns to the columns.
+        :return: The selection bitmap of the batch: whether the tree evaluates
+            to True with each context.
+        :rtype: :class:`pyarrow.BooleanArray`
+
+        """
+        binding = batch if isinstance(batch, ColumnBinding) else ColumnBinding(batch, self.columns)
+        selection = _BatchEvaluation(binding).evaluate(self.root_node)
+        if isinstance(selection, pyarrow.ChunkedArray):
+            selection = selection.combine_chunks()
+        return selection
+
+    def filter(self, batch):
+        """
+        Return the contexts in the Arrow record batch or table ``batch``
+        which satisfy the tree.
+
+        """
+        return batch.filter(self(batch))
+
+    def evaluate_file(self, path):
+        """
+        Evaluate the tree with the contexts stored in the Arrow IPC file at
+        ``path``, batch by batch.
+
+        :param path: The path to the file, in the Arrow IPC file or stream
+            format.
+        :type path: basestring
+        :return: An iterator of pairs made up of each record batch and its
+            selection bitmap.
+
+        The file is memory-mapped, so the columns are not copied into memory
+        and only the batches being evaluated need to fit in it.
+
+        """
+        with pyarrow.memory_map(path) as source:
+            try:
+                reader = pyarrow.ipc.open_file(source)
+            except pyarrow.ArrowInvalid:
+                source.seek(0)
+                batches = pyarrow.ipc.open_stream(source)
+            else:
+                batches = (reader.get_batch(index) for index in range(reader.num_record_batches))
+            for batch in batches:
+                yield (batch, self(batch))
+
+
+class _BatchEvaluation(object):
+    """The evaluation of a tree with the contexts of a batch."""
+
+    def __init__(self, binding):
+        self.binding = binding
+        self._contexts = None
+
+    def evaluate(self, node):
+        """Return whether ``node`` evaluates to True with each context."""
+        for (connective_class, connect) in _CONNECTIVES:
+            if isinstance(node, connective_class):
+                return connect(self.evaluate(node.master_operand), self.evaluate(node.slave_operand))
+        if isinstance(node, Not):
+            return compute.invert(self.evaluate(node.operand))
+
+        try:
+            selection = self._evaluate_operation(node)
+        except _ARROW_ERRORS:
+            selection = None
+        if selection is None:
+            selection = self._evaluate_contexts(node)
+        return selection
+
+    def _evaluate_operation(self, node):
+        """
+        Return the vectorized evaluation of the comparison or the operand
+        ``node``, or ``None`` if it can't be vectorized.
+
+        """
+        if isinstance(node, Equal):
+            return self._evaluate_equality(node)
+        if isinstance(node, _InequalityOperator):
+            return self._evaluate_inequality(node)
+        if isinstance(node, (BelongsTo, IsSubset)):
+            return self._evaluate_membership(node)
+        return self._evaluate_truth(node)
+
+    def _evaluate_equality(self, node):
+        column = self._get_column(node.master_operand, "equals")
+        if column is None:
+            return None
+        value = self._get_value(node.master_operand, node.slave_operand)
+        if value is None:
+            return None
+        selection = compute.equal(column, value)
+        if isinstance(node, NotEqual):
+            selection = compute.invert(selection)
+        return selection.fill_null(False)
+
+    def _evaluate_inequality(self, node):
+        column = self._get_column(node.master_operand, "greater_than", "less_than")
+        if column is None:
+            return None
+        value = self._get_value(node.master_operand, node.slave_operand)
+        if value is None:
+            return None
+        # The comparison may have been switched when the operands were
+        # rearranged, so it's taken from the operator itself:
+        if node._is_greater_than:
+            selection = compute.greater(column, value)
+        else:
+            selection = compute.less(column, value)
+        if isinstance(node, (LessEqual, GreaterEqual)):
+            selection = compute.invert(selection)
+        return selection.fill_null(False)
+
+    def _evaluate_membership(self, node):
+        master_operand = node.master_operand
+        if isinstance(node, BelongsTo) and _is_constant(master_operand):
+            return self._evaluate_set_membership(master_operand, node.slave_operand)
+
+        # The values of the column are passed as contexts, so they must be
+        # read as is:
+        column = self._get_column(master_operand, "to_python")
+        if column is None or not _is_constant(node.slave_operand):
+            return None
+        # The method is called on each value of the column, with a context made
+        # up of that value alone; the missing values never satisfy it:
+        method = master_operand.belongs_to if isinstance(node, BelongsTo) else master_operand.is_subset
+        value = node.slave_operand.to_python(None)
+        name = master_operand.context_name
+        selection = [item is not None and method(value, {name: item}) for item in _to_python_values(column)]
+        return pyarrow.array(selection, pyarrow.bool_())
+
+    def _evaluate_set_membership(self, constant_set, operand):
+        """
+        Check if the value of ``operand`` belongs to ``constant_set``, if the
+        items of the set are all strings or all numbers, like the column.
+
+        """
+        column = self._get_column(operand)
+        if column is None:
+            return None
+        items = constant_set.constant_value
+        if pyarrow.types.is_string(column.type) or pyarrow.types.is_large_string(column.type):
+            if not all(isinstance(item, String) for item in items):
+                return None
+            value_set = pyarrow.array([item.constant_value for item in items], column.type)
+        elif _is_numeric(column.type):
+            if not all(isinstance(item, Number) for item in items):
+                return None
+            column = compute.cast(column, pyarrow.float64())
+            value_set = pyarrow.array([item.constant_value for item in items], pyarrow.float64())
+        else:
+            return None
+        return compute.is_in(column, value_set=value_set)
+
+    def _evaluate_truth(self, node):
+        column = self._get_column(node, "__call__")
+        if column is None:
+            return None
+        if pyarrow.types.is_boolean(column.type):
+            selection = column
+        elif _is_numeric(column.type):
+            selection = compute.not_equal(column, 0)
+        elif pyarrow.types.is_string(column.type) or pyarrow.types.is_large_string(column.type):
+            selection = compute.greater(compute.utf8_length(column), 0)
+        else:
+            return None
+        return selection.fill_null(False)
+
+    def _evaluate_contexts(self, node):
+        """Evaluate ``node`` with each context, one at a time."""
+        if self._contexts is None:
+            self._contexts = self.binding.get_contexts()
+        return pyarrow.array([bool(node(context)) for context in self._contexts], pyarrow.bool_())
+
+    def _get_column(self, operand, *methods):
+        """
+        Return the column bound to ``operand``, if it's a native variable
+        whose ``methods`` can be vectorized.
+
+        """
+        if not isinstance(operand, NativeVariable):
+            return None
+        cls = operand.__class__
+        if any(getattr(cls, method) != getattr(NativeVariable, method) for method in methods):
+            return None
+        return operand.to_column(self.binding)
+
+    def _get_value(self, master_operand, slave_operand):
+        """
+        Return the value of the constant ``slave_operand`` to be compared with
+        the column of ``master_operand``, or ``None`` if it's not a scalar
+        constant.
+
+        """
+        if not isinstance(slave_operand, (String, Number)) or not _is_constant(slave_operand):
+            return None
+        value = slave_operand.to_python(None)
+        if isinstance(slave_operand, String):
+            value = master_operand._from_native_string(value)
+        return value
+
+
+def _to_python_values(column):
+    """
+    Return the values of ``column`` as Python objects, the lists being
+    turned into sets, like those of the set variables.
+
+    """
+    values = column.to_pylist()
+    if not _is_list(column.type):
+        return values
+    return [_to_set(value) for value in values]
+
+
+def _to_set(value):
+    if value is None:
+        return None
+    try:
+        return set(value)
+    except TypeError:
+        # The items can't be put in a set (e.g., they are lists too):
+        return value
+
+
+def _is_list(arrow_type):
+    types = pyarrow.types
+    return types.is_list(arrow_type) or types.is_large_list(arrow_type) or types.is_fixed_size_list(arrow_type)
+
+
+def _is_numeric(arrow_type):
+    return pyarrow.types.is_integer(arrow_type) or pyarrow.types.is_floating(arrow_type)
+
+
+def _to_array(column):
+    """
+    Return ``column`` as an Arrow array, without copying it if it's a
+    1-dimensional buffer of numbers.
+
+    """
+    if isinstance(column, (pyarrow.Array, pyarrow.ChunkedArray)):
+        return column
+    try:
+        view = memoryview(column)
+    except TypeError:
+        return pyarrow.array(column)
+    (order, code) = (view.format[:-1], view.format[-1:])
+    arrow_type = _BUFFER_TYPES.get((code, view.itemsize))
+    if arrow_type is None or order not in _NATIVE_ORDERS or view.ndim != 1 or not view.c_contiguous:
+        return pyarrow.array(view.tolist())
+    return pyarrow.Array.from_buffers(arrow_type, len(view), [None, pyarrow.py_buffer(view)])
@@ -32,21 +32,236 @@ evaluable ones).
 """
 from __future__ import unicode_literals
 
+from collections import OrderedDict
+from itertools import count
+
 from booleano.exc import ConversionError
 from booleano.operations.operands.constants import Number, Set, String
 from booleano.operations.operands.placeholders import PlaceholderFunction, PlaceholderVariable
 from booleano.operations.operators import (And, BelongsTo, Equal, GreaterEqual, GreaterThan, IsSubset, LessEqual,
                                            LessThan, Not, NotEqual, Or, UnaryOperator, Xor)
 
-__all__ = ("BaseConverter", )
+__all__ = ("BaseConverter", "ConversionCache", "ConversionTemplate", "ConversionParameter")
+
+# The kinds of nodes, which tell how to take them apart before conversion.
+(_VARIABLE, _CONSTANT, _SET, _FUNCTION, _UNARY, _BINARY) = range(6)
+
+# The marker of the conversions not found in a cache:
+_MISSING = object()
+
+
+class ConversionCache(object):
+    """
+    Bounded cache of conversions, keyed by the structure of the trees.
+
+    Identical sub-trees are converted once: the result is reused while it's
+    in the cache, even within the same tree. The entries used least recently
+    are discarded once ``max_size`` is reached.
+
+    Each node is identified by an integer derived from its type, its own
+    attributes and the identifiers of its children, so looking up a tree
+    doesn't involve comparing it with the cached ones node by node.
+
+    A cache must only be used by one converter, and cleared whenever the
+    output of the converter may change (e.g., if it's reconfigured).
+
+    """
+
+    #: The amount of conversions kept in the cache by default.
+    default_max_size = 1024
+
+    def __init__(self, max_size=None):
+        """
+
+        :param max_size: The maximum amount of conversions kept in the cache.
+        :type max_size: int
+
+        """
+        self.max_size = self.default_max_size if max_size is None else max_size
+        self.hits = 0
+        self.misses = 0
+        self._conversions = OrderedDict()
+        self._identifiers = {}
+        self._identifier_counter = count()
+
+    def __getitem__(self, key):
+        """
+        Return the conversion stored under ``key``.
+
+        :raises KeyError: If there's no such conversion.
+
+        """
+        try:
+            conversion = self._conversions.pop(key)
+        except KeyError:
+            self.misses += 1
+            raise
+        self._conversions[key] = conversion
+        self.hits += 1
+        return conversion
+
+    def __setitem__(self, key, conversion):
+        """Store the ``conversion`` under ``key``, discarding the oldest ones."""
+        if self.max_size <= 0:
+            return
+        self._conversions.pop(key, None)
+        self._conversions[key] = conversion
+        if len(self._conversions) > self.max_size:
+            self._conversions.popitem(last=False)
+
+    def __contains__(self, key):
+        return key in self._conversions
+
+    def identify(self, structure):
+        """
+        Return the integer identifying ``structure``.
+
+        :param structure: The type of a node, its attributes and the
+            identifiers of its children.
+        :type structure: tuple
+        :rtype: int
+
+        Identifiers are never reused, so the table of identifiers can be
+        emptied once it gets too big: the conversions of the forgotten
+        structures just won't be found again.
+
+        """
+        try:
+            return self._identifiers[structure]
+        except KeyError:
+            if len(self._identifiers) >= self.max_size * 8:
+                self._identifiers.clear()
+            identifier = self._identifiers[structure] = next(self._identifier_counter)
+            return identifier
+
+    def __len__(self):
+        return len(self._conversions)
+
+    def clear(self):
+        """Remove all the conversions and reset the counters."""
+        self._conversions.clear()
+        self._identifiers.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+class ConversionParameter(object):
+    """
+    Placeholder for a constant in a converted template.
+
+    It is what :meth:`BaseConverter.convert_parameter` returns by default.
+
+    """
+
+    __slots__ = ("position", "constant_type")
+
+    def __init__(self, position, constant_type):
+        """
+
+        :param position: The position of the value of the constant in the
+            parameters of the template (starting at 0).
+        :type position: int
+        :param constant_type: The class of the constant replaced
+            (:class:`String` or :class:`Number`).
+        :type constant_type: type
+
+        """
+        self.position = position
+        self.constant_type = constant_type
+
+    def __eq__(self, other):
+        if not isinstance(other, ConversionParameter):
+            return False
+        return self.position == other.position and self.constant_type is other.constant_type
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        return hash((self.position, self.constant_type))
+
+    def __repr__(self):
+        return "<Parameter #%s (%s)>" % (self.position, self.constant_type.__name__)
+
+
+def _get_cached(cache, identifier):
+    """Return the conversion in ``cache`` under ``identifier``, if any."""
+    try:
+        return cache[identifier]
+    except KeyError:
+        return _MISSING
+
+
+def _push_children(node, kind, pending):
+    """Push the children of the branch ``node`` to ``pending``, the first last."""
+    if kind == _BINARY:
+        pending.append((node.slave_operand, None))
+        pending.append((node.master_operand, None))
+    elif kind == _UNARY:
+        pending.append((node.operand, None))
+    else:
+        children = node.constant_value if kind == _SET else node.arguments
+        pending.extend([(child, None) for child in reversed(list(children))])
+
+
+class ConversionTemplate(object):
+    """
+    The conversion of a tree with its string and number constants replaced
+    by parameters, along with the values of such constants.
+
+    Trees which only differ in the values of those constants share the same
+    ``template`` object. It can be unpacked::
+
+        template, parameters = converter.convert_template(tree)
+
+    """
+
+    __slots__ = ("template", "parameters")
+
+    def __init__(self, template, parameters):
+        """
+
+        :param template: The tree converted, with the constants converted by
+            :meth:`BaseConverter.convert_parameter`.
+        :param parameters: The values of the constants, in the order of their
+            positions.
+        :type parameters: tuple
+
+        """
+        self.template = template
+        self.parameters = parameters
+
+    def __iter__(self):
+        yield self.template
+        yield self.parameters
+
+    def __eq__(self, other):
+        return isinstance(other, ConversionTemplate) and tuple(self) == tuple(other)
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return "<Template %r with parameters %r>" % (self.template, self.parameters)
 
 
 class BaseConverter(object):
     """
     The base class for converters.
 
-    All the methods of this class are abstract, except for :meth:`__call__`
-    and :meth:`convert`.
+    All the methods of this class are abstract, except for :meth:`__call__`,
+    :meth:`convert`, :meth:`convert_template` and :meth:`convert_parameter`.
+
+    Conversions are memoized when :attr:`conversion_cache` is set, so that
+    the branches of the tree which were converted before (in this tree or in
+    previous ones) are not converted again::
+
+        converter.conversion_cache = ConversionCache(max_size=512)
+
+    The conversion methods then must not alter the conversions they receive,
+    because they may be shared.
 
     """
 
@@ -72,6 +287,12 @@ class BaseConverter(object):
         PlaceholderFunction: "convert_function",
     }
 
+    #: The :class:`ConversionCache` used to memoize the conversions of the
+    #: branches, if any.
+    conversion_cache = None
+
+    _dispatch_table = None
+
     def __call__(self, root_node):
         """
         Convert ``root_node``.
@@ -79,15 +300,13 @@ class BaseConverter(object):
         :param root_node: The root of the tree to be converted.
         :type root_node: :class:`booleano.operations.core.OperationNode`
         :return: The tree converted.
-        :raises booleano.exc.ConversionError: If the type of ``root_node`` is
-            unknown.
+        :raises booleano.exc.ConversionError: If the type of ``root_node`` (or
+            any of its descendants) is unknown.
 
         If ``node`` is a branch, its children will be converted first.
 
         """
-        root_node_type = root_node.__class__
-        if root_node_type not in self.__converters__:
-            raise ConversionError("Unknown tree node type: %s" % root_node_type)
+        self._get_dispatch(root_node)
         return self.convert(root_node)
 
     def convert(self, node):
@@ -104,34 +323,229 @@ class BaseConverter(object):
         the type of ``node`` and **it should not be called directly** (use
         :meth:`__call__` instead).
 
+        The tree is traversed with an explicit stack instead of recursion, so
+        the depth of the tree is not limited by the recursion limit of Python.
+
         """
-        convert = getattr(self, self.__converters__[node.__class__])
+        cache = self.conversion_cache
+        if cache is None or cache.max_size <= 0:
+            return self._convert(node, None, None, False)
+        return self._convert(node, cache, self._identify_nodes(node, cache), False)
 
-        if node.is_leaf():
-            if isinstance(node, PlaceholderVariable):
-                return convert(node.name, node.namespace_parts)
-            # It's a string or a number
-            return convert(node.constant_value)
+    def convert_template(self, root_node):
+        """
+        Convert ``root_node`` into a template shared by all the trees which
+        only differ in the values of their string and number constants.
 
-        if isinstance(node, Set):
-            elements = [self.convert(element) for element
-                        in node.constant_value]
-            return convert(*elements)
+        :param root_node: The root of the tree to be converted.
+        :type root_node: :class:`booleano.operations.core.OperationNode`
+        :rtype: ConversionTemplate
+        :raises booleano.exc.ConversionError: If the type of ``root_node`` (or
+            any of its descendants) is unknown.
+
+        The constants are converted by :meth:`convert_parameter` and their
+        values are returned apart. If :attr:`conversion_cache` is set, the
+        templates are cached there by the shape of the trees.
+
+        """
+        (shape, parameters) = self._get_shape(root_node)
+        cache = self.conversion_cache
+        try:
+            if cache is None:
+                raise KeyError(shape)
+            template = cache[shape]
+        except KeyError:
+            template = self._convert(root_node, None, None, True)
+            if cache is not None:
+                cache[shape] = template
+        return ConversionTemplate(template, parameters)
+
+    def _convert(self, node, cache, identifiers, as_template):
+        """
+        Convert ``node``, using the conversions in ``cache`` (if any) and
+        replacing the string and number constants with parameters if
+        ``as_template`` is set.
+
+        ``identifiers`` maps the ids of the nodes to their identifiers in the
+        ``cache``.
+
+        """
+        dispatch_table = self._dispatch_table
+        if dispatch_table is None:
+            dispatch_table = self._dispatch_table = {}
+        get_dispatch = self._get_dispatch
+        parameter_indexes = count()
+
+        # The nodes still to be visited are paired with None; once their
+        # children have been pushed, they are pushed again along with their
+        # dispatch so that they get converted after their children.
+        converted = []
+        pending = [(node, None)]
+        while pending:
+            (node, dispatch) = pending.pop()
+            if dispatch is not None:
+                self._convert_branch(node, dispatch, converted)
+                if cache is not None:
+                    cache[identifiers[id(node)]] = converted[-1]
+                continue
+
+            dispatch = dispatch_table.get(node.__class__) or get_dispatch(node)
+            if dispatch[1] in (_VARIABLE, _CONSTANT):
+                converted.append(self._convert_leaf(node, dispatch, as_template, parameter_indexes))
+                continue
+            conversion = _MISSING if cache is None else _get_cached(cache, identifiers[id(node)])
+            if conversion is _MISSING:
+                pending.append((node, dispatch))
+                _push_children(node, dispatch[1], pending)
+            else:
+                converted.append(conversion)
+
+        return converted[0]
+
+    def _convert_leaf(self, node, dispatch, as_template, parameter_indexes):
+        """
+        Return the conversion of the variable or constant ``node``, or its
+        parameter if ``as_template`` is set.
+
+        """
+        (convert, kind) = dispatch
+        if kind == _VARIABLE:
+            return convert(node.name, node.namespace_parts)
+        if as_template:
+            return self.convert_parameter(next(parameter_indexes), node.__class__)
+        return convert(node.constant_value)
+
+    def _convert_branch(self, node, dispatch, converted):
+        """
+        Replace the conversions of the children of ``node``, at the end of
+        ``converted``, with that of ``node``.
+
+        """
+        (convert, kind) = dispatch
+        if kind == _BINARY:
+            slave_operand = converted.pop()
+            converted[-1] = convert(converted[-1], slave_operand)
+        elif kind == _UNARY:
+            converted[-1] = convert(converted[-1])
+        else:
+            children_count = len(node.constant_value if kind == _SET else node.arguments)
+            first_child = len(converted) - children_count
+            children = converted[first_child:]
+            del converted[first_child:]
+            if kind == _SET:
+                converted.append(convert(*children))
+            else:
+                converted.append(convert(node.name, node.namespace_parts, *children))
+
+    def _iter_nodes(self, root_node):
+        """
+        Yield the nodes of the tree under ``root_node`` (included) in the
+        order they are converted, along with their kind.
+
+        """
+        get_dispatch = self._get_dispatch
+        pending = [root_node]
+        while pending:
+            node = pending.pop()
+            kind = get_dispatch(node)[1]
+            yield (node, kind)
+            if kind == _BINARY:
+                pending.append(node.slave_operand)
+                pending.append(node.master_operand)
+            elif kind == _UNARY:
+                pending.append(node.operand)
+            elif kind == _SET or kind == _FUNCTION:
+                children = node.constant_value if kind == _SET else node.arguments
+                pending.extend(reversed(list(children)))
+
+    def _identify_nodes(self, root_node, cache):
+        """
+        Return the identifiers in ``cache`` of the nodes under ``root_node``
+        (included), by their ids.
+
+        The identifiers are calculated from the bottom up, so that the
+        identifiers of the children are available for their parents.
+
+        """
+        identify = cache.identify
+        identifiers = {}
+        nodes = list(self._iter_nodes(root_node))
+        for (node, kind) in reversed(nodes):
+            node_type = node.__class__
+            if kind == _VARIABLE:
+                structure = (node_type, node.name, tuple(node.namespace_parts))
+            elif kind == _CONSTANT:
+                structure = (node_type, node.constant_value)
+            elif kind == _BINARY:
+                structure = (node_type, identifiers[id(node.master_operand)], identifiers[id(node.slave_operand)])
+            elif kind == _UNARY:
+                structure = (node_type, identifiers[id(node.operand)])
+            elif kind == _SET:
+                structure = (node_type, frozenset([identifiers[id(item)] for item in node.constant_value]))
+            else:
+                structure = (node_type, node.name, tuple(node.namespace_parts),
+                             tuple([identifiers[id(argument)] for argument in node.arguments]))
+            identifiers[id(node)] = identify(structure)
+        return identifiers
+
+    def _get_shape(self, root_node):
+        """
+        Return the shape of the tree under ``root_node``, where the values of
+        the string and number constants are ignored, and the values of such
+        constants.
+
+        """
+        shape = []
+        parameters = []
+        for (node, kind) in self._iter_nodes(root_node):
+            shape.append(node.__class__)
+            if kind == _VARIABLE or kind == _FUNCTION:
+                shape.append((node.name, tuple(node.namespace_parts)))
+            if kind == _SET or kind == _FUNCTION:
+                shape.append(len(node.constant_value if kind == _SET else node.arguments))
+            elif kind == _CONSTANT:
+                parameters.append(node.constant_value)
+        return (tuple(shape), tuple(parameters))
+
+    def _get_dispatch(self, node):
+        """
+        Return the conversion method for ``node`` and the kind of node it is.
+
+        :raises booleano.exc.ConversionError: If the type of ``node`` is
+            unknown.
 
-        if isinstance(node, PlaceholderFunction):
-            arguments = [self.convert(arg) for arg in node.arguments]
-            return convert(node.name, node.namespace_parts, *arguments)
+        The conversion method is searched along the MRO of the type of
+        ``node``, so subclasses of the built-in nodes are converted like their
+        parents, and the result is cached for the type in this converter.
 
-        # At this point, node must be an operator.
+        """
+        node_type = node.__class__
+        dispatch_table = self._dispatch_table
+        if dispatch_table is None:
+            dispatch_table = self._dispatch_table = {}
+        elif node_type in dispatch_table:
+            return dispatch_table[node_type]
 
-        if isinstance(node, UnaryOperator):
-            operand = self.convert(node.operand)
-            return convert(operand)
+        for node_class in node_type.__mro__:
+            if node_class in self.__converters__:
+                convert = getattr(self, self.__converters__[node_class])
+                break
+        else:
+            raise ConversionError("Unknown tree node type: %s" % node_type)
 
-        # It's a binary operator!
-        master_operand = self.convert(node.master_operand)
-        slave_operand = self.convert(node.slave_operand)
-        return convert(master_operand, slave_operand)
+        if node.is_leaf():
+            kind = _VARIABLE if isinstance(node, PlaceholderVariable) else _CONSTANT
+        elif isinstance(node, Set):
+            kind = _SET
+        elif isinstance(node, PlaceholderFunction):
+            kind = _FUNCTION
+        elif isinstance(node, UnaryOperator):
+            kind = _UNARY
+        else:
+            kind = _BINARY
+
+        dispatch = dispatch_table[node_type] = (convert, kind)
+        return dispatch
 
     # Operation converters
 
@@ -347,6 +761,23 @@ class BaseConverter(object):
         """
         raise NotImplementedError
 
+    def convert_parameter(self, position, constant_type):
+        """
+        Convert the string or number constant whose value is the parameter
+        at ``position`` of a template (see :meth:`convert_template`).
+
+        :param position: The position of the parameter, starting at 0.
+        :type position: int
+        :param constant_type: The class of the constant (:class:`String` or
+            :class:`Number`).
+        :type constant_type: type
+        :rtype: :class:`object`
+
+        By default, a :class:`ConversionParameter` is returned.
+
+        """
+        return ConversionParameter(position, constant_type)
+
     def convert_function(self, name, namespace_parts, *arguments):
         """
         Convert the function call to ``name`` using the additional positional
@@ -24,6 +24,10 @@ class OperationNode(object):
     It can also be seen as the base class for each node in the parse trees.
 
     """
+    # Parse trees may contain lots of nodes, so they don't get a ``__dict__``.
+    # ``_hash`` holds the structural hash of the node once it's computed.
+    __slots__ = ("_hash", )
+
     _is_leaf = None
 
     def __call__(self, context):
@@ -113,8 +117,94 @@ class OperationNode(object):
         assert isinstance(node, self.__class__), error_msg % (repr(node),
                                                               repr(self))
 
+    def is_equivalent(self, node):
+        """
+        Check if ``node`` and this node are equivalent.
+
+        :param node: The other node which may be equivalent to this one.
+        :type node: :class:`OperationNode`
+        :rtype: bool
+
+        This is the boolean counterpart of :meth:`check_equivalence`, used to
+        compare nodes. It must not raise exceptions.
+
+        By default, it relies on :meth:`check_equivalence`. Built-in nodes
+        override it to check their attributes directly, and so must
+        descendants that override :meth:`_calculate_hash`.
+
+        """
+        if node.__class__ is not self.__class__:
+            return False
+        try:
+            self.check_equivalence(node)
+            return True
+        except AssertionError:
+            return False
+
+    def _calculate_hash(self):
+        """
+        Return the structural hash of this node.
+
+        Equivalent nodes must have the same hash. By default, it's that of
+        the class of the node, like :meth:`check_equivalence`; nodes which
+        are told apart by their attributes override both.
+
+        The hashes of the nodes returned by :meth:`_get_hashed_nodes` are
+        calculated beforehand.
+
+        """
+        return hash(self.__class__)
+
+    def _get_hashed_nodes(self):
+        """Return the nodes whose hashes are part of the hash of this node."""
+        return ()
+
     def __hash__(self):
-        return id(self)
+        """
+        Return the structural hash of this node.
+
+        It's calculated the first time it's requested and then cached, so nodes
+        must not be altered once they are used in hash-based containers.
+
+        """
+        try:
+            return self._hash
+        except AttributeError:
+            pass
+        # The descendants are hashed first, from the bottom up, so hashing deep
+        # trees doesn't hit the recursion limit:
+        pending = [self]
+        while pending:
+            node = pending[-1]
+            unhashed_nodes = [child for child in node._get_hashed_nodes()
+                              if isinstance(child, OperationNode) and not hasattr(child, "_hash")]
+            if unhashed_nodes:
+                pending.extend(unhashed_nodes)
+            else:
+                pending.pop()
+                node._hash = node._calculate_hash()
+        return self._hash
+
+    def __getstate__(self):
+        """
+        Return the attributes of this node, except its cached hash, which
+        may depend on the process (e.g., that of its class).
+
+        """
+        state = dict(getattr(self, "__dict__", {}))
+        for cls in self.__class__.__mro__:
+            slots = cls.__dict__.get("__slots__", ())
+            if isinstance(slots, six.string_types):
+                slots = (slots, )
+            for slot in slots:
+                if slot not in ("__dict__", "__weakref__") and hasattr(self, slot):
+                    state[slot] = getattr(self, slot)
+        state.pop("_hash", None)
+        return state
+
+    def __setstate__(self, state):
+        for (name, value) in state.items():
+            object.__setattr__(self, name, value)
 
     def __bool__(self):
         """
@@ -142,11 +232,11 @@ class OperationNode(object):
         :rtype: bool
 
         """
-        try:
-            self.check_equivalence(other)
+        if self is other:
             return True
-        except AssertionError:
+        if not isinstance(other, OperationNode):
             return False
+        return self.is_equivalent(other)
 
     def __ne__(self, other):
         """
@@ -156,11 +246,7 @@ class OperationNode(object):
         :rtype: bool
 
         """
-        try:
-            self.check_equivalence(other)
-            return False
-        except AssertionError:
-            return True
+        return not self.__eq__(other)
 
     def __str__(self):
         """
@@ -180,3 +266,48 @@ class OperationNode(object):
         """
         raise NotImplementedError("Node %s doesn't have an "
                                   "representation" % type(self))
+
+
+class InternTable(object):
+    """
+    Table of unique operation nodes, to share equivalent nodes (aka
+    "hash-consing").
+
+    Interning a node returns the equivalent node registered first, so that
+    identical sub-trees are represented by a single object. This saves memory
+    and makes comparisons of shared sub-trees immediate.
+
+    Only nodes whose state is fully described by their structure (operators,
+    constants and placeholders) should be interned, not the operators on
+    bound variables or functions.
+
+    """
+
+    def __init__(self):
+        self._nodes = {}
+
+    def intern(self, node):
+        """
+        Return the registered node equivalent to ``node``, registering
+        ``node`` if there's none.
+
+        :param node: The node to be interned.
+        :type node: :class:`OperationNode`
+        :rtype: :class:`OperationNode`
+
+        """
+        return self._nodes.setdefault(node, node)
+
+    def is_interned(self, node):
+        """Check that ``node`` itself is the registered node."""
+        return self._nodes.get(node) is node
+
+    def clear(self):
+        """Forget all the registered nodes."""
+        self._nodes.clear()
+
+    def __contains__(self, node):
+        return node in self._nodes
+
+    def __len__(self):
+        return len(self._nodes)
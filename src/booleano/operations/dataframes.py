@@ -0,0 +1,418 @@
+# -*- coding: utf-8 -*-
+"""
+Vectorized evaluation of parse trees over :mod:`pandas` data frames.
+
+Instead of evaluating a tree once per row, the operations are applied to whole
+columns at once and the result is a boolean :class:`pandas.Series` aligned
+with the rows of the frame, which can be used to select them::
+
+    mask = evaluate_frame(parse_manager.parse('age > 18 & name ∈ {"aang", "toph"}'), frame)
+    adults = frame[mask]
+
+Variables are mapped to the columns, the comparisons become vectorized
+comparisons of the columns, the memberships in literal sets become calls to
+:meth:`pandas.Series.isin` and the logical connectives are computed on the
+resulting masks.
+
+Both kinds of parse trees are supported:
+
+* Convertible trees are converted with a :class:`DataFrameConverter`, where
+  the placeholder variables are the columns of the frame.
+* Evaluable trees are evaluated with a :class:`DataFrameEvaluator`, where the
+  native variables (see :mod:`booleano.operations.variables`) are bound to
+  the columns named after their context items. The operations which cannot
+  be vectorized (e.g., those involving developer-defined variables or
+  functions) are evaluated row by row, so the result is always the same as
+  the one of the tree. The ``evaluated`` flag of the native variables is not
+  set, though.
+
+This module requires :mod:`pandas`, which is not a dependency of Booleano.
+
+"""
+from __future__ import absolute_import, print_function, unicode_literals
+
+import logging
+import operator
+
+import pandas
+import six
+
+from booleano.exc import ConversionError
+from booleano.operations.converters import BaseConverter
+from booleano.operations.operands.constants import Number, String
+from booleano.operations.operators import (And, BelongsTo, Equal, GreaterEqual, IsSubset, LessEqual, Not, NotEqual, Or,
+                                           Xor, _InequalityOperator)
+from booleano.operations.program import _is_constant
+from booleano.operations.variables import NativeVariable
+
+logger = logging.getLogger(__name__)
+
+__all__ = ("DataFrameConverter", "DataFrameEvaluator", "evaluate_frame")
+
+
+def evaluate_frame(tree, frame, columns=None, functions=None):
+    """
+    Evaluate ``tree`` over each row of ``frame``.
+
+    :param tree: The parse tree (convertible or evaluable) or the root of an
+        evaluable tree.
+    :param frame: The rows to be evaluated.
+    :type frame: :class:`pandas.DataFrame`
+    :param columns: The names of the columns bound to the variables, by the
+        names of the variables (for convertible trees) or the names of the
+        context items (for evaluable trees). By default, they have the same
+        names.
+    :type columns: dict
+    :param functions: The functions available in convertible trees (see
+        :class:`DataFrameConverter`).
+    :type functions: dict
+    :return: Whether each row satisfies the tree.
+    :rtype: :class:`pandas.Series`
+    :raises booleano.exc.ConversionError: If a convertible tree cannot be
+        evaluated over data frames.
+
+    """
+    # Imported here because the parser imports the operations:
+    from booleano.parser.trees import ConvertibleParseTree, ParseTree  # isort:skip
+    if isinstance(tree, ConvertibleParseTree):
+        return tree(DataFrameConverter(frame, columns, functions))
+    if isinstance(tree, ParseTree):
+        tree = tree.root_node
+    return DataFrameEvaluator(frame, columns)(tree)
+
+
+class DataFrameConverter(BaseConverter):
+    """
+    Convert parse trees into boolean masks over the rows of a data frame.
+
+    The result of each conversion is a boolean :class:`pandas.Series`.
+
+    Variables become columns and functions must be declared explicitly in
+    ``functions``, where each name is mapped to a callable receiving the
+    converter and the arguments already converted (columns as
+    :class:`pandas.Series`, constants as Python values and literal sets as
+    :class:`frozenset`), and returning a :class:`pandas.Series` with a value
+    per row.
+
+    """
+
+    def __init__(self, frame, columns=None, functions=None):
+        """
+
+        :param frame: The rows to be evaluated.
+        :type frame: :class:`pandas.DataFrame`
+        :param columns: The names of the columns, by the names of the
+            variables (namespace included, with its parts separated by colons).
+            By default, the columns are named after the variables.
+        :type columns: dict
+        :param functions: The functions available.
+        :type functions: dict
+
+        """
+        self.frame = frame
+        self.columns = columns or {}
+        self.functions = functions or {}
+
+    def __call__(self, root_node):
+        """
+        Convert ``root_node`` into a mask over the rows of the frame.
+
+        :param root_node: The root of the tree to be converted.
+        :type root_node: :class:`booleano.operations.core.OperationNode`
+        :rtype: :class:`pandas.Series`
+        :raises booleano.exc.ConversionError: If the tree cannot be evaluated
+            over data frames.
+
+        """
+        return self._to_mask(super(DataFrameConverter, self).__call__(root_node))
+
+    # Operation converters
+
+    def convert_not(self, operand):
+        return ~self._to_mask(operand)
+
+    def convert_and(self, master_operand, slave_operand):
+        return self._to_mask(master_operand) & self._to_mask(slave_operand)
+
+    def convert_or(self, master_operand, slave_operand):
+        return self._to_mask(master_operand) | self._to_mask(slave_operand)
+
+    def convert_xor(self, master_operand, slave_operand):
+        return self._to_mask(master_operand) ^ self._to_mask(slave_operand)
+
+    def convert_equal(self, master_operand, slave_operand):
+        return self._compare(operator.eq, master_operand, slave_operand)
+
+    def convert_not_equal(self, master_operand, slave_operand):
+        return self._compare(operator.ne, master_operand, slave_operand)
+
+    def convert_less_than(self, master_operand, slave_operand):
+        return self._compare(operator.lt, master_operand, slave_operand)
+
+    def convert_greater_than(self, master_operand, slave_operand):
+        return self._compare(operator.gt, master_operand, slave_operand)
+
+    def convert_less_equal(self, master_operand, slave_operand):
+        return self._compare(operator.le, master_operand, slave_operand)
+
+    def convert_greater_equal(self, master_operand, slave_operand):
+        return self._compare(operator.ge, master_operand, slave_operand)
+
+    def convert_belongs_to(self, master_operand, slave_operand):
+        if isinstance(slave_operand, frozenset):
+            raise ConversionError("Sets cannot be items of other sets in data frames")
+        if isinstance(master_operand, frozenset) and isinstance(slave_operand, pandas.Series):
+            return slave_operand.isin(master_operand)
+        return self._map_rows(operator.contains, master_operand, slave_operand)
+
+    def convert_is_subset(self, master_operand, slave_operand):
+        return self._map_rows(lambda superset, subset: set(subset) <= set(superset), master_operand, slave_operand)
+
+    # Operand converters
+
+    def convert_string(self, text):
+        return text
+
+    def convert_number(self, number):
+        return number
+
+    def convert_set(self, *elements):
+        if any(isinstance(element, (pandas.Series, frozenset)) for element in elements):
+            raise ConversionError("Only constants can be items of sets in data frames")
+        return frozenset(elements)
+
+    def convert_variable(self, name, namespace_parts):
+        full_name = ":".join(tuple(namespace_parts) + (name, ))
+        column = self.columns.get(full_name, full_name)
+        try:
+            return self.frame[column]
+        except KeyError:
+            raise ConversionError("Unknown column for variable %s" % full_name)
+
+    def convert_function(self, name, namespace_parts, *arguments):
+        full_name = ":".join(tuple(namespace_parts) + (name, ))
+        try:
+            function = self.functions[full_name]
+        except KeyError:
+            raise ConversionError("Unknown data frame function %s" % full_name)
+        return function(self, *arguments)
+
+    # Utilities
+
+    def _compare(self, comparison, master_operand, slave_operand):
+        if isinstance(master_operand, frozenset) or isinstance(slave_operand, frozenset):
+            raise ConversionError("Sets cannot be compared in data frames")
+        return self._to_mask(comparison(master_operand, slave_operand))
+
+    def _map_rows(self, function, *operands):
+        """
+        Apply ``function`` to the values of the ``operands`` in each row.
+
+        Used for the operations which pandas cannot vectorize.
+
+        """
+        rows = zip(*[operand if isinstance(operand, pandas.Series) else _repeat(operand, len(self.frame))
+                     for operand in operands])
+        return pandas.Series([function(*values) for values in rows], index=self.frame.index, dtype=bool)
+
+    def _to_mask(self, operand):
+        if isinstance(operand, frozenset):
+            raise ConversionError("Sets don't have truth values in data frames")
+        return _to_mask(operand, self.frame.index)
+
+
+class DataFrameEvaluator(object):
+    """
+    Evaluate evaluable trees over each row of a data frame.
+
+    The native variables are bound to the column named after their context
+    item (unless another name is given in ``columns``) through their
+    :meth:`~booleano.operations.variables.NativeVariable.to_column` method,
+    and the operations on them are vectorized. The
+    rest of the operations are evaluated row by row, using the rows as
+    contexts.
+
+    """
+
+    def __init__(self, frame, columns=None):
+        """
+
+        :param frame: The rows to be evaluated.
+        :type frame: :class:`pandas.DataFrame`
+        :param columns: The names of the columns, by the names of the context
+            items they hold.
+        :type columns: dict
+
+        """
+        self.frame = frame
+        self.columns = columns or {}
+        self._columns = _FrameColumns(frame, self.columns)
+        self._contexts = None
+
+    def __call__(self, node):
+        """
+        Evaluate the tree whose root is ``node`` over each row of the frame.
+
+        :param node: The root of the tree.
+        :type node: :class:`booleano.operations.core.OperationNode`
+        :return: Whether each row satisfies the tree.
+        :rtype: :class:`pandas.Series`
+
+        """
+        if isinstance(node, And):
+            return self(node.master_operand) & self(node.slave_operand)
+        if isinstance(node, Or):
+            return self(node.master_operand) | self(node.slave_operand)
+        if isinstance(node, Xor):
+            return self(node.master_operand) ^ self(node.slave_operand)
+        if isinstance(node, Not):
+            return ~self(node.operand)
+
+        mask = None
+        if isinstance(node, Equal):
+            mask = self._evaluate_equality(node)
+        elif isinstance(node, _InequalityOperator):
+            mask = self._evaluate_inequality(node)
+        elif isinstance(node, (BelongsTo, IsSubset)):
+            mask = self._evaluate_membership(node)
+        else:
+            column = self._get_column(node, "__call__")
+            if column is not None:
+                mask = _to_mask(column, self.frame.index)
+        if mask is None:
+            mask = self._evaluate_rows(node)
+        return mask
+
+    def _evaluate_equality(self, node):
+        column = self._get_column(node.master_operand, "equals")
+        if column is None:
+            return None
+        value = self._get_value(node.master_operand, node.slave_operand)
+        if value is None:
+            return None
+        mask = _to_mask(column == value, self.frame.index)
+        return ~mask if isinstance(node, NotEqual) else mask
+
+    def _evaluate_inequality(self, node):
+        column = self._get_column(node.master_operand, "greater_than", "less_than")
+        if column is None:
+            return None
+        value = self._get_value(node.master_operand, node.slave_operand)
+        if value is None:
+            return None
+        # The comparison may have been switched when the operands were
+        # rearranged, so it's taken from the operator itself:
+        mask = _to_mask(column > value if node._is_greater_than else column < value, self.frame.index)
+        return ~mask if isinstance(node, (LessEqual, GreaterEqual)) else mask
+
+    def _evaluate_membership(self, node):
+        master_operand = node.master_operand
+        if isinstance(node, BelongsTo) and _is_constant(master_operand):
+            return self._evaluate_set_membership(master_operand, node.slave_operand)
+
+        # The values of the column are passed as contexts, so they must be
+        # read as is:
+        column = self._get_column(master_operand, "to_python")
+        if column is None or not _is_constant(node.slave_operand):
+            return None
+        # The method is called on each value of the column, with a context made
+        # up of that value alone:
+        method = master_operand.belongs_to if isinstance(node, BelongsTo) else master_operand.is_subset
+        value = node.slave_operand.to_python(None)
+        name = master_operand.context_name
+        return pandas.Series([method(value, {name: item}) for item in column], index=self.frame.index, dtype=bool)
+
+    def _evaluate_set_membership(self, constant_set, operand):
+        """
+        Check if the value of ``operand`` belongs to ``constant_set``, if its
+        items are strings and numbers.
+
+        """
+        column = self._get_column(operand)
+        items = constant_set.constant_value
+        if column is None or not all(isinstance(item, (String, Number)) for item in items):
+            return None
+        # Mimicking the way the items of sets compare themselves with the
+        # value (see Set.belongs_to):
+        texts = [item.constant_value for item in items if isinstance(item, String)]
+        numbers = [item.constant_value for item in items if isinstance(item, Number)]
+        mask = pandas.Series(False, index=self.frame.index)
+        if texts:
+            mask |= column.astype(six.text_type).isin(texts)
+        if numbers:
+            mask |= pandas.to_numeric(column, errors="coerce").isin(numbers)
+        return mask
+
+    def _evaluate_rows(self, node):
+        """Evaluate ``node`` once per row, using the rows as contexts."""
+        if self._contexts is None:
+            columns = dict((column, name) for (name, column) in self.columns.items())
+            self._contexts = self.frame.rename(columns=columns).to_dict("records")
+        return pandas.Series([bool(node(context)) for context in self._contexts], index=self.frame.index,
+                             dtype=bool)
+
+    def _get_column(self, operand, *methods):
+        """
+        Return the column bound to ``operand``, if it's a native variable
+        whose ``methods`` can be vectorized.
+
+        """
+        if not isinstance(operand, NativeVariable):
+            return None
+        cls = operand.__class__
+        if any(getattr(cls, method) != getattr(NativeVariable, method) for method in methods):
+            return None
+        return operand.to_column(self._columns)
+
+    def _get_value(self, master_operand, slave_operand):
+        """
+        Return the value of the constant ``slave_operand`` to be compared with
+        the column of ``master_operand``, or ``None`` if it's not a scalar
+        constant.
+
+        """
+        if not isinstance(slave_operand, (String, Number)) or not _is_constant(slave_operand):
+            return None
+        value = slave_operand.to_python(None)
+        if isinstance(slave_operand, String):
+            value = master_operand._from_native_string(value)
+        return value
+
+
+class _FrameColumns(object):
+    """The columns of a frame, by the names of the context items they hold."""
+
+    def __init__(self, frame, columns):
+        self.frame = frame
+        self.columns = columns
+
+    def get(self, name, default=None):
+        column = self.columns.get(name, name)
+        if column not in self.frame.columns:
+            return default
+        return self.frame[column]
+
+
+def _to_mask(operand, index):
+    """
+    Return the truth value of ``operand`` for each row in ``index``, as
+    Python would compute it (missing values are false, except for NaN).
+
+    """
+    if not isinstance(operand, pandas.Series):
+        return pandas.Series(bool(operand), index=index)
+    if operand.dtype == bool:
+        return operand
+    if getattr(operand.dtype, "kind", None) in ("i", "u", "f", "c"):
+        return operand.astype(bool)
+    return operand.map(_get_truth_value).astype(bool)
+
+
+def _get_truth_value(value):
+    """Return the truth value of ``value``, where ``pandas.NA`` is false."""
+    return value is not pandas.NA and bool(value)
+
+
+def _repeat(value, times):
+    """Return an iterator yielding ``value`` ``times`` times."""
+    return (value for _ in range(times))
@@ -37,6 +37,7 @@ There are two types of Booleano classes:
 """
 from __future__ import unicode_literals
 
+import sys
 from collections import OrderedDict
 
 import six
@@ -46,6 +47,10 @@ from booleano.operations.operands.core import Operand, _OperandMeta
 
 __all__ = ["Variable", "Function"]
 
+# Plain dictionaries are lighter than OrderedDict and keep the insertion order
+# since Python 3.7.
+_ArgumentsDict = dict if sys.version_info >= (3, 7) else OrderedDict
+
 
 class Class(Operand):
     """
@@ -60,6 +65,7 @@ class Class(Operand):
         anonymous functions).
 
     """
+    __slots__ = ()
 
     # Only actual classes should be checked.
     bypass_operation_check = True
@@ -71,6 +77,7 @@ class Variable(Class):
     Developer-defined variable.
 
     """
+    __slots__ = ()
 
     # Only actual variables should be checked.
     bypass_operation_check = True
@@ -138,6 +145,7 @@ class Function(six.with_metaclass(_FunctionMeta, Class)):
     define :attr:`required_arguments` and :attr:`optional_arguments`.
 
     """
+    __slots__ = ("arguments", )
 
     # Only actual functions should be checked.
     bypass_operation_check = True
@@ -238,7 +246,7 @@ class Function(six.with_metaclass(_FunctionMeta, Class)):
                 raise BadCallError('Argument "%s" is not an operand' %
                                    argument)
         # Storing their values:
-        self.arguments = OrderedDict()
+        self.arguments = _ArgumentsDict()
 
         for arg_pos in range(len(arguments)):
             arg_name = self.all_args[arg_pos]
@@ -282,6 +290,24 @@ class Function(six.with_metaclass(_FunctionMeta, Class)):
             self
         )
 
+    def is_equivalent(self, node):
+        """
+        Check if function ``node`` and this function are equivalent.
+
+        :param node: The other function which may be equivalent to this one.
+        :type node: Function
+        :rtype: bool
+
+        """
+        return node.__class__ is self.__class__ and node.arguments == self.arguments
+
+    def _calculate_hash(self):
+        """Return the structural hash of this function call and its arguments."""
+        return hash((self.__class__, tuple(self.arguments.items())))
+
+    def _get_hashed_nodes(self):
+        return self.arguments.values()
+
     def __str__(self):
         """Return the Unicode representation of this function."""
         args = [u'%s=%s' % (k, v) for (k, v) in self.arguments.items()]
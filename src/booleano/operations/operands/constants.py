@@ -55,6 +55,7 @@ class Constant(Operand):
 
     if the value given to a Constant is None, all operation will resolve to False
     """
+    __slots__ = ("constant_value", )
 
     operations = {'equality', 'inequality', 'boolean'}
 
@@ -104,6 +105,26 @@ class Constant(Operand):
             node
         )
 
+    def is_equivalent(self, node):
+        """
+        Check if constant ``node`` and this constant are equivalent.
+
+        :param node: The other constant which may be equivalent to this one.
+        :type node: Constant
+        :rtype: bool
+
+        """
+        return node.__class__ is self.__class__ and node.constant_value == self.constant_value
+
+    def _calculate_hash(self):
+        """Return the structural hash of this constant and its value."""
+        try:
+            value_hash = hash(self.constant_value)
+        except TypeError:
+            # Unhashable values can only be told apart by their type here:
+            value_hash = hash(self.constant_value.__class__)
+        return hash((self.__class__, value_hash))
+
     def __call__(self, context):
         """Does this variable evaluate to True?"""
         return bool(self.constant_value)
@@ -124,6 +145,7 @@ class String(Constant):
     Constant string.
     this support native python resulution for membership, equiality and inequality
     """
+    __slots__ = ()
     operations = {
         "equality",  # ==, !=
         "inequality",  # >, <, >=, <=
@@ -189,6 +211,7 @@ class Number(Constant):
     and :meth:`less_than`.
 
     """
+    __slots__ = ()
 
     operations = Constant.operations | set(['inequality'])
 
@@ -279,6 +302,7 @@ class Set(Constant):
     :meth:`is_subset`.
 
     """
+    __slots__ = ()
     _is_leaf = False
 
     operations = Constant.operations | set(["inequality", "membership"])
@@ -368,22 +392,33 @@ class Set(Constant):
         """
         Operand.check_equivalence(self, node)
 
-        unmatched_elements = list(self.constant_value)
-        assert len(unmatched_elements) == len(node.constant_value), 'Sets %s and %s do not have ' \
-                                                                    'the same cardinality' % (
-            unmatched_elements,
+        assert len(self.constant_value) == len(node.constant_value), 'Sets %s and %s do not have ' \
+                                                                     'the same cardinality' % (
+            self,
             node
         )
 
-        # Checking that each element is represented by a mock operand:
-        for element in node.constant_value:
-            for key in range(len(unmatched_elements)):
-                if unmatched_elements[key] == element:
-                    del unmatched_elements[key]
-                    break
+        # The elements are hashed by their structure, so most of them are
+        # matched without comparing them against all the others:
+        unmatched_elements = list(self.constant_value - node.constant_value)
+        if unmatched_elements:
+            # The elements whose equivalence isn't fully described by their
+            # hash are compared one by one:
+            for element in node.constant_value - self.constant_value:
+                for key in range(len(unmatched_elements)):
+                    if unmatched_elements[key] == element:
+                        del unmatched_elements[key]
+                        break
 
         assert 0 == len(unmatched_elements), 'No match for the following elements: %s' % unmatched_elements
 
+    def _calculate_hash(self):
+        """Return the structural hash of this set, regardless of the order of its items."""
+        return hash((self.__class__, frozenset(self.constant_value)))
+
+    def _get_hashed_nodes(self):
+        return self.constant_value
+
     def __str__(self):
         """Return the Unicode representation of this constant set."""
         elements = [six.text_type(element) for element in self.constant_value]
@@ -84,6 +84,7 @@ class Operand(six.with_metaclass(_OperandMeta, OperationNode)):
     Base class for operands.
 
     """
+    __slots__ = ()
 
     #: Whether it should be checked that the operand really supports the
     #: operations it claims to support.
@@ -52,6 +52,7 @@ class PlaceholderInstance(Operand):
     converter to verify if the instance is used correctly.
 
     """
+    __slots__ = ("name", "namespace_parts")
 
     operations = OPERATIONS
 
@@ -82,6 +83,23 @@ class PlaceholderInstance(Operand):
             self.namespace_parts == node.namespace_parts), \
             'Placeholders "%s" and "%s" are not equivalent' % (self, node)
 
+    def is_equivalent(self, node):
+        """
+        Check if placeholder ``node`` is equivalent to this one.
+
+        :rtype: bool
+
+        """
+        return (
+            node.__class__ is self.__class__ and
+            self.name == node.name and
+            self.namespace_parts == node.namespace_parts
+        )
+
+    def _calculate_hash(self):
+        """Return the structural hash of this placeholder and its name."""
+        return hash((self.__class__, self.name, self.namespace_parts))
+
     def no_evaluation(self, *args, **kwargs):
         """
         Raise an InvalidOperationError exception.
@@ -106,6 +124,7 @@ class PlaceholderVariable(PlaceholderInstance):
     Placeholder variable.
 
     """
+    __slots__ = ()
 
     def __str__(self):
         """Return the Unicode representation for this placeholder variable."""
@@ -130,6 +149,7 @@ class PlaceholderFunction(PlaceholderInstance):
     Placeholder for a function call.
 
     """
+    __slots__ = ("arguments", )
     _is_leaf = False
 
     def __init__(self, function_name, namespace_parts=None, *arguments):
@@ -167,6 +187,26 @@ class PlaceholderFunction(PlaceholderInstance):
             'Placeholder functions "%s" and "%s" were called with ' \
             'different arguments' % (self, node)
 
+    def is_equivalent(self, node):
+        """
+        Check if placeholder function ``node`` is equivalent to the current
+        placeholder function.
+
+        :rtype: bool
+
+        """
+        return (
+            super(PlaceholderFunction, self).is_equivalent(node) and
+            self.arguments == node.arguments
+        )
+
+    def _calculate_hash(self):
+        """Return the structural hash of this function call and its arguments."""
+        return hash((super(PlaceholderFunction, self)._calculate_hash(), self.arguments))
+
+    def _get_hashed_nodes(self):
+        return self.arguments
+
     def __str__(self):
         """Return the Unicode representation for this placeholder function."""
         args = [six.text_type(arg) for arg in self.arguments]
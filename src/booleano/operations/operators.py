@@ -47,6 +47,8 @@ class Operator(OperationNode):
     The operands to be used by the operator must be passed in the constructor.
 
     """
+    __slots__ = ()
+
     _is_leaf = False
 
     def is_operator(self):
@@ -65,6 +67,7 @@ class UnaryOperator(Operator):
     Base class for unary logical operators.
 
     """
+    __slots__ = ("operand", )
 
     def __init__(self, operand):
         """
@@ -94,8 +97,24 @@ class UnaryOperator(Operator):
             self
         )
 
-    def __hash__(self):
-        return id(self)
+    def is_equivalent(self, node):
+        """
+        Check if unary operator ``node`` and this unary operator are
+        equivalent.
+
+        :param node: The other operator which may be equivalent to this one.
+        :type node: UnaryOperator
+        :rtype: bool
+
+        """
+        return node.__class__ is self.__class__ and node.operand == self.operand
+
+    def _calculate_hash(self):
+        """Return the structural hash of this operator and its operand."""
+        return hash((self.__class__, self.operand))
+
+    def _get_hashed_nodes(self):
+        return (self.operand, )
 
     def __str__(self):
         """
@@ -130,6 +149,10 @@ class BinaryOperator(Operator):
         The instance attribute that represents the slave operand.
 
     """
+    __slots__ = ("master_operand", "slave_operand")
+
+    #: Whether the operation is equivalent when its operands are swapped.
+    commutative = True
 
     def __init__(self, left_operand, right_operand):
         """
@@ -191,20 +214,47 @@ class BinaryOperator(Operator):
 
         """
         super(BinaryOperator, self).check_equivalence(node)
-        same_operands = (
-            (
-                node.master_operand == self.master_operand and
-                node.slave_operand == self.slave_operand
-            ) or (
-                node.master_operand == self.slave_operand and
-                self.master_operand == node.slave_operand
-            )
-        )
-        assert same_operands, 'Operands of binary operations %s and %s are not equivalent' % (
+        assert self._have_same_operands(node), 'Operands of binary operations %s and %s are not equivalent' % (
             node,
             self
         )
 
+    def is_equivalent(self, node):
+        """
+        Check if binary operator ``node`` and this binary operator are
+        equivalent.
+
+        :param node: The other operator which may be equivalent to this one.
+        :type node: BinaryOperator
+        :rtype: bool
+
+        """
+        return node.__class__ is self.__class__ and self._have_same_operands(node)
+
+    def _have_same_operands(self, node):
+        """
+        Check that binary operator ``node`` has the same operands as this one,
+        in any order if the operation is :attr:`commutative`.
+
+        """
+        if node.master_operand == self.master_operand and node.slave_operand == self.slave_operand:
+            return True
+        return (
+            self.commutative and
+            node.master_operand == self.slave_operand and
+            node.slave_operand == self.master_operand
+        )
+
+    def _calculate_hash(self):
+        """Return the structural hash of this operator and its operands."""
+        operands = (hash(self.master_operand), hash(self.slave_operand))
+        if self.commutative:
+            operands = frozenset(operands)
+        return hash((self.__class__, operands))
+
+    def _get_hashed_nodes(self):
+        return (self.master_operand, self.slave_operand)
+
     def __str__(self):
         """
         Return the Unicode representation for this binary operator, including
@@ -235,6 +285,7 @@ class Not(UnaryOperator):
     Negate the boolean representation of an operand.
 
     """
+    __slots__ = ()
 
     def __init__(self, operand):
         """
@@ -266,6 +317,7 @@ class _ConnectiveOperator(BinaryOperator):
     boolean operations, so we can manipulate their truth value easily.
 
     """
+    __slots__ = ()
 
     def __init__(self, left_operand, right_operand):
         """
@@ -289,6 +341,7 @@ class And(_ConnectiveOperator):
     operations.
 
     """
+    __slots__ = ()
 
     def __call__(self, context):
         """
@@ -312,6 +365,7 @@ class Or(_ConnectiveOperator):
     operations.
 
     """
+    __slots__ = ()
 
     def __call__(self, context):
         """
@@ -335,6 +389,7 @@ class Xor(_ConnectiveOperator):
     operations.
 
     """
+    __slots__ = ()
 
     def __call__(self, context):
         """
@@ -356,6 +411,7 @@ class Equal(BinaryOperator):
     For example: ``3 == 3``.
 
     """
+    __slots__ = ()
 
     def __init__(self, left_operand, right_operand):
         """
@@ -387,6 +443,7 @@ class NotEqual(Equal):
     For example: ``3 != 2``.
 
     """
+    __slots__ = ()
 
     def __call__(self, context):
         return not super(NotEqual, self).__call__(context)
@@ -398,6 +455,9 @@ class _InequalityOperator(BinaryOperator):
     are rearranged.
 
     """
+    # The comparison is stored as a flag rather than as a bound method, which
+    # would make each inequality part of a reference cycle.
+    __slots__ = ("_is_greater_than", )
 
     def __init__(self, left_operand, right_operand, comparison):
         """
@@ -422,7 +482,7 @@ class _InequalityOperator(BinaryOperator):
 
         self.master_operand.check_operation("inequality")
 
-        if left_operand != self.master_operand:
+        if left_operand is not self.master_operand:
             # The operands have been rearranged! Let's invert the comparison:
             if comparison == "<":
                 comparison = ">"
@@ -430,13 +490,45 @@ class _InequalityOperator(BinaryOperator):
                 comparison = "<"
 
         # "Compiling" the comparison:
-        if comparison == ">":
-            self.comparison = self._greater_than
-        else:
-            self.comparison = self._less_than
+        self._is_greater_than = comparison == ">"
+
+    @property
+    def comparison(self):
+        """The method performing the comparison, once the operands are arranged."""
+        if self._is_greater_than:
+            return self._greater_than
+        return self._less_than
 
     def __call__(self, context):
-        return self.comparison(context)
+        if self._is_greater_than:
+            return self._greater_than(context)
+        return self._less_than(context)
+
+    def _have_same_operands(self, node):
+        """
+        Check that inequality ``node`` has the same operands as this one.
+
+        The operands may be swapped as long as the comparison is switched as
+        well (i.e., ``x < y`` is equivalent to ``y > x``).
+
+        """
+        if node._is_greater_than == self._is_greater_than:
+            return node.master_operand == self.master_operand and node.slave_operand == self.slave_operand
+        return node.master_operand == self.slave_operand and node.slave_operand == self.master_operand
+
+    def _calculate_hash(self):
+        """
+        Return the structural hash of this inequality, which doesn't change if
+        the operands are swapped along with the comparison.
+
+        """
+        comparison = self.comparison.__name__
+        switched_comparison = "_less_than" if comparison == "_greater_than" else "_greater_than"
+        operands = frozenset([
+            (hash(self.master_operand), comparison),
+            (hash(self.slave_operand), switched_comparison),
+        ])
+        return hash((self.__class__, operands))
 
     def _greater_than(self, context):
         """Check if the master operand is greater than the slave"""
@@ -456,6 +548,7 @@ class LessThan(_InequalityOperator):
     For example: ``2 < 3``.
 
     """
+    __slots__ = ()
 
     def __init__(self, left_operand, right_operand):
         super(LessThan, self).__init__(left_operand, right_operand, "<")
@@ -468,6 +561,7 @@ class GreaterThan(_InequalityOperator):
     For example: ``3 > 2``.
 
     """
+    __slots__ = ()
 
     def __init__(self, left_operand, right_operand):
         super(GreaterThan, self).__init__(left_operand, right_operand, ">")
@@ -481,6 +575,7 @@ class LessEqual(GreaterThan):
     For example: ``2 <= 3``.
 
     """
+    __slots__ = ()
 
     def __call__(self, context):
         return not super(LessEqual, self).__call__(context)
@@ -494,6 +589,7 @@ class GreaterEqual(LessThan):
     For example: ``2 >= 2``.
 
     """
+    __slots__ = ()
 
     def __call__(self, context):
         return not super(GreaterEqual, self).__call__(context)
@@ -504,6 +600,9 @@ class _SetOperator(BinaryOperator):
     Base class for set-related operators.
 
     """
+    __slots__ = ()
+
+    commutative = False
 
     def __init__(self, left_operand, right_operand):
         """
@@ -527,6 +626,7 @@ class BelongsTo(_SetOperator):
     For example: ``"valencia" ∈ {"caracas", "maracay", "valencia"}``.
 
     """
+    __slots__ = ()
 
     def __call__(self, context):
         value = self.slave_operand.to_python(context)
@@ -540,6 +640,7 @@ class IsSubset(_SetOperator):
     For example: ``{"valencia", "aragua"} ⊂ {"caracas", "aragua", "valencia"}``.
 
     """
+    __slots__ = ()
 
     def __call__(self, context):
         value = self.slave_operand.to_python(context)
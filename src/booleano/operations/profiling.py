@@ -0,0 +1,292 @@
+# -*- coding: utf-8 -*-
+"""
+Instrumented evaluation of operation nodes.
+
+A :class:`TreeProfiler` evaluates a tree the same way the tree does it, while
+recording for each node in it (operations and operands evaluated as logical
+values) how many times it was evaluated, how many times it was true and false,
+how many times it was skipped because a connective short-circuited it and
+the cumulative time spent on it.
+
+The instrumentation lives entirely in the profiler, so the trees themselves
+never pay for it: profiling is enabled by evaluating the profiler instead of
+the tree (see :meth:`booleano.parser.trees.EvaluableParseTree.profile`).
+
+The report maps each node back to the expression it stands for, rebuilt out
+of the tree with the tokens of a grammar, which helps finding the rules or
+sub-expressions which burn the most time, and the connectives whose operands
+would be better evaluated in the other order.
+
+The operands of the comparisons are not profiled on their own: they're part
+of the time of the comparison.
+
+"""
+from __future__ import absolute_import, print_function, unicode_literals
+
+import logging
+import timeit
+
+import six
+
+from booleano.operations.operands.classes import Function
+from booleano.operations.operands.constants import Constant
+from booleano.operations.operators import (And, BelongsTo, Equal, GreaterEqual, IsSubset, LessEqual, Not, NotEqual, Or,
+                                           Xor, _InequalityOperator)
+from booleano.operations.variables import NativeVariable
+from booleano.parser.grammar import Grammar
+
+logger = logging.getLogger(__name__)
+
+__all__ = ("TreeProfiler", "NodeProfile")
+
+# The kinds of nodes, by how the profiler evaluates them:
+_AND, _OR, _XOR, _NOT, _LEAF = range(5)
+
+# The binding powers of the connectives, to know when parentheses are needed:
+_PRECEDENCES = ((Or, 1), (Xor, 2), (And, 3), (Not, 4))
+
+
+class NodeProfile(object):
+    """
+    The figures of one node of a profiled tree.
+
+    .. attribute:: node
+
+        The operation node.
+
+    .. attribute:: expression
+
+        The expression represented by the node.
+
+    .. attribute:: depth
+
+        The depth of the node in the tree (``0`` for the root node).
+
+    """
+
+    __slots__ = ("node", "expression", "depth", "evaluations", "true", "false", "skips", "time")
+
+    def __init__(self, node, expression, depth):
+        self.node = node
+        self.expression = expression
+        self.depth = depth
+        self.reset()
+
+    def reset(self):
+        """Forget the evaluations recorded so far."""
+        #: The amount of times the node was evaluated.
+        self.evaluations = 0
+        #: The amount of times the node evaluated to True.
+        self.true = 0
+        #: The amount of times the node evaluated to False.
+        self.false = 0
+        #: The amount of times the node was not evaluated because the
+        #: connective it belongs to short-circuited.
+        self.skips = 0
+        #: The cumulative time spent evaluating the node, in seconds,
+        #: including the time spent in its operands.
+        self.time = 0.0
+
+    @property
+    def mean_time(self):
+        """The mean time spent in each evaluation, in seconds."""
+        return self.time / self.evaluations if self.evaluations else 0.0
+
+    @property
+    def true_ratio(self):
+        """The ratio of the evaluations where the node was true."""
+        return float(self.true) / self.evaluations if self.evaluations else 0.0
+
+    def __repr__(self):
+        return "<NodeProfile %s: %s evaluations, %s true, %s false, %s skips, %.6f s>" % (
+            self.expression, self.evaluations, self.true, self.false, self.skips, self.time)
+
+
+class TreeProfiler(object):
+    """
+    Evaluate a tree with contexts, recording the figures of each node.
+
+    Evaluation errors are propagated, and the nodes which raised them are
+    only counted as evaluated.
+
+    """
+
+    def __init__(self, root_node, grammar=None, clock=timeit.default_timer):
+        """
+
+        :param root_node: The root node of the tree to be profiled.
+        :type root_node: :class:`booleano.operations.core.OperationNode`
+        :param grammar: The grammar used to rebuild the expressions in the
+            report (defaults to the generic grammar).
+        :type grammar: :class:`booleano.parser.Grammar`
+        :param clock: The function returning the current time in seconds.
+
+        """
+        self.root_node = root_node
+        self.clock = clock
+        self._grammar = grammar or Grammar()
+        #: The figures of each node, in the order the nodes appear in the
+        #: tree (i.e., the root node first).
+        self.profiles = []
+        self._root = self._instrument(root_node, 0)
+
+    def __call__(self, context):
+        """
+        Check if the tree evaluates to True with the ``context``.
+
+        :return: Whether the tree evaluates to True.
+        :rtype: bool
+
+        """
+        return self._evaluate(self._root, context)
+
+    def reset(self):
+        """Forget the evaluations recorded so far."""
+        for profile in self.profiles:
+            profile.reset()
+
+    def get_hot_nodes(self, limit=None):
+        """
+        Return the figures of the nodes where the most time was spent
+        exclusively (i.e., not in their operands).
+
+        :param limit: The maximum amount of nodes to be returned.
+        :type limit: int
+        :return: Pairs made up of the figures of each node and the time spent
+            exclusively in it, by decreasing exclusive time.
+        :rtype: list
+
+        """
+        exclusive_times = self._get_exclusive_times()
+        hot_nodes = sorted(zip(self.profiles, exclusive_times), key=lambda pair: pair[1], reverse=True)
+        return hot_nodes[:limit]
+
+    def report(self):
+        """
+        Return a text report with the figures of each node, indented after
+        the structure of the tree.
+
+        :rtype: basestring
+
+        """
+        lines = ["%10s %10s %10s %10s %12s %12s  %s" % (
+            "evals", "true", "false", "skips", "total ms", "mean us", "expression")]
+        for profile in self.profiles:
+            lines.append("%10d %10d %10d %10d %12.3f %12.3f  %s%s" % (
+                profile.evaluations, profile.true, profile.false, profile.skips, profile.time * 1e3,
+                profile.mean_time * 1e6, "  " * profile.depth, profile.expression))
+        return "\n".join(lines)
+
+    def _get_exclusive_times(self):
+        """Return the time spent in each node minus the time spent in its operands."""
+        exclusive_times = [profile.time for profile in self.profiles]
+        for (index, profile) in enumerate(self.profiles):
+            for child_index in range(index + 1, len(self.profiles)):
+                child = self.profiles[child_index]
+                if child.depth <= profile.depth:
+                    break
+                if child.depth == profile.depth + 1:
+                    exclusive_times[index] -= child.time
+        return exclusive_times
+
+    def _instrument(self, node, depth):
+        """
+        Return the instrumented version of ``node``: its kind, the node, its
+        figures and its instrumented operands.
+
+        """
+        profile = NodeProfile(node, self._render(node), depth)
+        self.profiles.append(profile)
+        if isinstance(node, (And, Or, Xor)):
+            kind = _AND if isinstance(node, And) else _OR if isinstance(node, Or) else _XOR
+            operands = (self._instrument(node.master_operand, depth + 1),
+                        self._instrument(node.slave_operand, depth + 1))
+        elif isinstance(node, Not):
+            kind = _NOT
+            operands = (self._instrument(node.operand, depth + 1), )
+        else:
+            kind = _LEAF
+            operands = ()
+        return (kind, node, profile, operands)
+
+    def _evaluate(self, instrumented_node, context):
+        (kind, node, profile, operands) = instrumented_node
+        clock = self.clock
+        profile.evaluations += 1
+        start = clock()
+        try:
+            if kind == _LEAF:
+                result = bool(node(context))
+            elif kind == _NOT:
+                result = not self._evaluate(operands[0], context)
+            elif kind == _XOR:
+                result = self._evaluate(operands[0], context) ^ self._evaluate(operands[1], context)
+            else:
+                result = self._evaluate(operands[0], context)
+                if result == (kind == _AND):
+                    result = self._evaluate(operands[1], context)
+                else:
+                    operands[1][2].skips += 1
+        finally:
+            profile.time += clock() - start
+        if result:
+            profile.true += 1
+        else:
+            profile.false += 1
+        return result
+
+    def _render(self, node, parent_precedence=0):
+        """Return the expression represented by ``node``."""
+        token = self._grammar.get_token
+        precedence = _get_precedence(node)
+        if isinstance(node, Not):
+            expression = "%s %s" % (token("not"), self._render(node.operand, precedence))
+        elif isinstance(node, (And, Or, Xor)):
+            token_name = "and" if isinstance(node, And) else "or" if isinstance(node, Or) else "xor"
+            expression = "%s %s %s" % (self._render(node.master_operand, precedence), token(token_name),
+                                       self._render(node.slave_operand, precedence))
+        elif isinstance(node, (BelongsTo, IsSubset)):
+            # The set is the master operand:
+            token_name = "belongs_to" if isinstance(node, BelongsTo) else "is_subset"
+            expression = "%s %s %s" % (self._render(node.slave_operand, 5), token(token_name),
+                                       self._render(node.master_operand, 5))
+        elif isinstance(node, Equal):
+            token_name = "ne" if isinstance(node, NotEqual) else "eq"
+            expression = "%s %s %s" % (self._render(node.master_operand, 5), token(token_name),
+                                       self._render(node.slave_operand, 5))
+        elif isinstance(node, _InequalityOperator):
+            # The comparison may have been switched when the operands were
+            # rearranged:
+            negated = isinstance(node, (LessEqual, GreaterEqual))
+            if node.comparison.__name__.lstrip("_") == "greater_than":
+                token_name = "le" if negated else "gt"
+            else:
+                token_name = "ge" if negated else "lt"
+            expression = "%s %s %s" % (self._render(node.master_operand, 5), token(token_name),
+                                       self._render(node.slave_operand, 5))
+        else:
+            expression = _render_operand(node)
+        if precedence < parent_precedence:
+            return "%s%s%s" % (token("group_start"), expression, token("group_end"))
+        return expression
+
+
+def _get_precedence(node):
+    """Return the binding power of ``node``, the highest one for operands."""
+    for (node_class, precedence) in _PRECEDENCES:
+        if isinstance(node, node_class):
+            return precedence
+    return 6
+
+
+def _render_operand(operand):
+    """Return a representation of ``operand`` as written in expressions."""
+    if isinstance(operand, Constant):
+        return six.text_type(operand)
+    if isinstance(operand, NativeVariable) and not callable(operand.context_name):
+        return six.text_type(operand.context_name)
+    if isinstance(operand, NativeVariable):
+        return six.text_type(getattr(operand.context_name, "path", operand.context_name))
+    if isinstance(operand, Function):
+        return "%s(...)" % operand.__class__.__name__
+    return operand.__class__.__name__
@@ -0,0 +1,440 @@
+# -*- coding: utf-8 -*-
+"""
+Flat, array-backed representation of evaluable operation nodes.
+
+:func:`compile_node` lowers a tree of operation nodes into a
+:class:`Program`: a linear sequence of instructions stored in two
+:mod:`array` buffers (one for the opcodes and one for their arguments), plus
+a table with the operands whose methods have to be called at evaluation time,
+a table with the context items read directly by the program, and a pool with
+the Python values of the constants.
+
+Evaluating a program is a simple loop over the instructions, instead of a
+recursive traversal of the object graph. Each instruction leaves its result
+in a single register, and the logical connectives are short-circuited with
+jumps, the same way CPython does it for ``and`` and ``or``. The values of the
+constants are computed only once, when the program is built, and the
+comparisons between :class:`~booleano.operations.variables.NativeVariable`
+instances and constants are performed by the program itself, without any
+method call.
+
+The results are exactly those of the original tree: the other operands are
+asked to perform the operations with the same methods, in the same order.
+Operands must not alter the values they receive, since the values of the
+constants are shared by all the evaluations. The only difference is that the
+``evaluated`` flag of the native variables handled by the program is not set.
+
+Programs are picklable as long as their operands are, so they can be cached or
+sent to other processes (see :class:`booleano.parser.executors.ParallelEvaluator`).
+
+"""
+from __future__ import absolute_import, print_function, unicode_literals
+
+import logging
+from array import array
+
+from booleano.operations.operands.constants import Constant, Set
+from booleano.operations.operators import (And, BelongsTo, Equal, GreaterEqual, IsSubset, LessEqual, Not, NotEqual, Or,
+                                           Xor, _InequalityOperator)
+from booleano.operations.variables import NativeVariable
+
+logger = logging.getLogger(__name__)
+
+__all__ = ("Program", "compile_node")
+
+# The opcodes. Each instruction has two arguments, even when it doesn't use
+# them.
+
+#: Call the operand ``#first`` with the context. It handles the truth value
+#: of the operands, as well as the nodes that cannot be lowered.
+CALL = 0
+#: Compare the operand ``#first`` with the value ``#second``. A negative
+#: ``second`` refers to the operand ``#~second``, whose value must be computed
+#: with the context.
+EQUAL = 1
+NOT_EQUAL = 2
+GREATER_THAN = 3
+LESS_THAN = 4
+#: Not greater than.
+LESS_EQUAL = 5
+#: Not less than.
+GREATER_EQUAL = 6
+BELONGS_TO = 7
+IS_SUBSET = 8
+#: Compare the context item ``#first`` with the constant ``#second``.
+ITEM_EQUAL = 9
+ITEM_NOT_EQUAL = 10
+ITEM_GREATER_THAN = 11
+ITEM_LESS_THAN = 12
+ITEM_LESS_EQUAL = 13
+ITEM_GREATER_EQUAL = 14
+#: Get the truth value of the context item ``#first``.
+ITEM_TRUTH = 15
+#: Negate the current value.
+NOT = 16
+#: Save the current value for the next ``XOR``.
+PUSH = 17
+#: Compute the exclusive or of the value saved by ``PUSH`` and the current
+#: one.
+XOR = 18
+#: Jump to the instruction ``#first`` if the current value is false.
+JUMP_IF_FALSE = 19
+#: Jump to the instruction ``#first`` if the current value is true.
+JUMP_IF_TRUE = 20
+
+OPCODE_NAMES = (
+    "CALL",
+    "EQUAL",
+    "NOT_EQUAL",
+    "GREATER_THAN",
+    "LESS_THAN",
+    "LESS_EQUAL",
+    "GREATER_EQUAL",
+    "BELONGS_TO",
+    "IS_SUBSET",
+    "ITEM_EQUAL",
+    "ITEM_NOT_EQUAL",
+    "ITEM_GREATER_THAN",
+    "ITEM_LESS_THAN",
+    "ITEM_LESS_EQUAL",
+    "ITEM_GREATER_EQUAL",
+    "ITEM_TRUTH",
+    "NOT",
+    "PUSH",
+    "XOR",
+    "JUMP_IF_FALSE",
+    "JUMP_IF_TRUE",
+)
+
+#: The operand method called by each comparison opcode.
+_METHOD_NAMES = (None, "equals", "equals", "greater_than", "less_than", "greater_than", "less_than", "belongs_to",
+                 "is_subset")
+
+#: Whether the result of the operand method must be negated, per opcode.
+_NEGATED = (False, False, True, False, False, True, True, False, False)
+
+#: The opcodes of the comparisons performed by the native variables, and
+#: those of the equivalent instructions reading the context directly.
+_ITEM_OPCODES = {
+    EQUAL: ITEM_EQUAL,
+    NOT_EQUAL: ITEM_NOT_EQUAL,
+    GREATER_THAN: ITEM_GREATER_THAN,
+    LESS_THAN: ITEM_LESS_THAN,
+    LESS_EQUAL: ITEM_LESS_EQUAL,
+    GREATER_EQUAL: ITEM_GREATER_EQUAL,
+}
+
+
+class Program(object):
+    """
+    Linear program equivalent to an evaluable tree of operation nodes.
+
+    .. attribute:: opcodes
+
+        The opcode of each instruction, as an ``array("B")``.
+
+    .. attribute:: arguments
+
+        The two arguments of each instruction, as an ``array("l")`` twice as
+        long as :attr:`opcodes`.
+
+    .. attribute:: operands
+
+        The operands whose methods are called by the instructions.
+
+    .. attribute:: items
+
+        The names of the context items read by the instructions.
+
+    .. attribute:: constants
+
+        The Python values of the constants compared with the operands.
+
+    """
+
+    # All the parts are kept in a single tuple, which is cheaper to unpack
+    # on each evaluation than separate attributes.
+    __slots__ = ("_code", )
+
+    def __init__(self, opcodes, arguments, operands, items, constants):
+        """
+
+        :param opcodes: The opcodes of the instructions.
+        :type opcodes: array
+        :param arguments: The arguments of the instructions, two per
+            instruction.
+        :type arguments: array
+        :param operands: The operands used by the instructions.
+        :type operands: tuple
+        :param items: The context items used by the instructions.
+        :type items: tuple
+        :param constants: The values used by the instructions.
+        :type constants: tuple
+
+        """
+        self._code = (opcodes, arguments, operands, items, constants)
+
+    opcodes = property(lambda self: self._code[0])
+    arguments = property(lambda self: self._code[1])
+    operands = property(lambda self: self._code[2])
+    items = property(lambda self: self._code[3])
+    constants = property(lambda self: self._code[4])
+
+    def __call__(self, context):
+        """
+        Run the program with ``context``.
+
+        :param context: The evaluation context.
+        :type context: object
+        :return: The logical value of the original tree.
+        :rtype: bool
+
+        """
+        opcodes, arguments, operands, items, constants = self._code
+        value = None
+        saved_values = []
+        counter = 0
+        end = len(opcodes)
+        while counter < end:
+            opcode = opcodes[counter]
+            index = counter << 1
+            counter += 1
+            if opcode >= JUMP_IF_FALSE:
+                if bool(value) == (opcode == JUMP_IF_TRUE):
+                    counter = arguments[index]
+            elif opcode > ITEM_TRUTH:
+                value = _STACK_OPERATIONS[opcode](value, saved_values)
+            elif opcode > IS_SUBSET:
+                item = context[items[arguments[index]]]
+                if opcode == ITEM_TRUTH:
+                    value = bool(item)
+                else:
+                    value = _ITEM_COMPARISONS[opcode](item, constants[arguments[index + 1]])
+            elif opcode == CALL:
+                value = operands[arguments[index]](context)
+            else:
+                value = _call_method(opcode, operands[arguments[index]], arguments[index + 1], operands,
+                                     constants, context)
+        return value
+
+    def __len__(self):
+        """Return the amount of instructions in the program."""
+        return len(self._code[0])
+
+    def __eq__(self, other):
+        return isinstance(other, Program) and self._code == other._code
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    __hash__ = None
+
+    def disassemble(self):
+        """
+        Return a human-readable listing of the instructions.
+
+        :rtype: list
+
+        """
+        opcodes, arguments, operands, items, constants = self._code
+        listing = []
+        for (counter, opcode) in enumerate(opcodes):
+            first = arguments[2 * counter]
+            second = arguments[2 * counter + 1]
+            if opcode == CALL:
+                details = repr(operands[first])
+            elif opcode <= IS_SUBSET:
+                if second >= 0:
+                    slave = repr(constants[second])
+                else:
+                    slave = repr(operands[~second])
+                details = "%r, %s" % (operands[first], slave)
+            elif opcode == ITEM_TRUTH:
+                details = repr(items[first])
+            elif opcode < ITEM_TRUTH:
+                details = "%r, %r" % (items[first], constants[second])
+            elif opcode in (JUMP_IF_FALSE, JUMP_IF_TRUE):
+                details = "to %s" % first
+            else:
+                details = ""
+            listing.append(("%s %s %s" % (counter, OPCODE_NAMES[opcode], details)).strip())
+        return listing
+
+    def __repr__(self):
+        return "<Program with %s instructions>" % len(self)
+
+
+def _call_method(opcode, operand, second, operands, constants, context):
+    """
+    Return the result of the comparison ``opcode`` between ``operand`` and
+    the value whose argument is ``second``.
+
+    """
+    if second >= 0:
+        slave_value = constants[second]
+    else:
+        slave_value = operands[~second].to_python(context)
+    value = getattr(operand, _METHOD_NAMES[opcode])(slave_value, context)
+    return not value if _NEGATED[opcode] else value
+
+
+def _push(value, saved_values):
+    saved_values.append(value)
+    return value
+
+
+# The functions running the instructions which use the saved values, and
+# those comparing a context item with a constant, by opcode:
+_STACK_OPERATIONS = {
+    NOT: lambda value, saved_values: not value,
+    PUSH: _push,
+    XOR: lambda value, saved_values: saved_values.pop() ^ value,
+}
+
+_ITEM_COMPARISONS = {
+    ITEM_EQUAL: lambda item, constant: item == constant,
+    ITEM_NOT_EQUAL: lambda item, constant: not item == constant,
+    ITEM_GREATER_THAN: lambda item, constant: item > constant,
+    ITEM_LESS_THAN: lambda item, constant: item < constant,
+    ITEM_LESS_EQUAL: lambda item, constant: not item > constant,
+    ITEM_GREATER_EQUAL: lambda item, constant: not item < constant,
+}
+
+
+def compile_node(node):
+    """
+    Lower the evaluable tree whose root is ``node`` into a :class:`Program`.
+
+    :param node: The root of the tree.
+    :type node: :class:`booleano.operations.core.OperationNode`
+    :rtype: Program
+
+    """
+    builder = _ProgramBuilder()
+    builder.add(node)
+    return builder.build()
+
+
+class _ProgramBuilder(object):
+    """Accumulate the instructions, operands, items and constants of a program."""
+
+    def __init__(self):
+        self.opcodes = array(str("B"))
+        self.arguments = array(str("l"))
+        self.operands = []
+        self.items = []
+        self.constants = []
+        # The indexes of the operands, by identity:
+        self._operand_indexes = {}
+
+    def build(self):
+        return Program(self.opcodes, self.arguments, tuple(self.operands), tuple(self.items),
+                       tuple(self.constants))
+
+    def add(self, node):
+        """Add the instructions evaluating ``node``."""
+        if isinstance(node, (And, Or)):
+            self.add(node.master_operand)
+            position = self.emit(JUMP_IF_FALSE if isinstance(node, And) else JUMP_IF_TRUE)
+            self.add(node.slave_operand)
+            # The jump lands right after the slave operand:
+            self.arguments[2 * position] = len(self.opcodes)
+        elif isinstance(node, Xor):
+            self.add(node.master_operand)
+            self.emit(PUSH)
+            self.add(node.slave_operand)
+            self.emit(XOR)
+        elif isinstance(node, Not):
+            self.add(node.operand)
+            self.emit(NOT)
+        else:
+            opcode = _get_comparison_opcode(node)
+            if opcode is None:
+                if _reads_context_item(node, "__call__"):
+                    self.emit(ITEM_TRUTH, self.add_item(node.context_name))
+                else:
+                    # It's an operand or an operator we know nothing about:
+                    self.emit(CALL, self.add_operand(node))
+            elif (opcode in _ITEM_OPCODES and _is_constant(node.slave_operand) and
+                    _reads_context_item(node.master_operand, "equals", "greater_than", "less_than")):
+                self.emit(_ITEM_OPCODES[opcode], self.add_item(node.master_operand.context_name),
+                          self.add_value(node.slave_operand))
+            else:
+                self.emit(opcode, self.add_operand(node.master_operand), self.add_value(node.slave_operand))
+
+    def emit(self, opcode, first=0, second=0):
+        """Add an instruction and return its position."""
+        self.opcodes.append(opcode)
+        self.arguments.append(first)
+        self.arguments.append(second)
+        return len(self.opcodes) - 1
+
+    def add_operand(self, operand):
+        """Return the index of ``operand`` in the operand table."""
+        index = self._operand_indexes.get(id(operand))
+        if index is None:
+            index = self._operand_indexes[id(operand)] = len(self.operands)
+            self.operands.append(operand)
+        return index
+
+    def add_item(self, name):
+        """Return the index of the context item ``name`` in the item table."""
+        if name not in self.items:
+            self.items.append(name)
+        return self.items.index(name)
+
+    def add_value(self, operand):
+        """
+        Return the argument to access the value of ``operand``: its index in
+        the constant pool if it doesn't depend on the context, or the
+        complement of its index in the operand table otherwise.
+
+        """
+        if _is_constant(operand):
+            self.constants.append(operand.to_python(None))
+            return len(self.constants) - 1
+        return ~self.add_operand(operand)
+
+
+def _get_comparison_opcode(node):
+    """Return the opcode for the binary operator ``node``, if any."""
+    if isinstance(node, Equal):
+        return NOT_EQUAL if isinstance(node, NotEqual) else EQUAL
+    if isinstance(node, _InequalityOperator):
+        # The comparison may have been switched when the operands were
+        # rearranged, so it's taken from the operator itself:
+        if isinstance(node, (LessEqual, GreaterEqual)):
+            return LESS_EQUAL if node._is_greater_than else GREATER_EQUAL
+        return GREATER_THAN if node._is_greater_than else LESS_THAN
+    if isinstance(node, BelongsTo):
+        return BELONGS_TO
+    if isinstance(node, IsSubset):
+        return IS_SUBSET
+    return None
+
+
+def _reads_context_item(operand, *methods):
+    """
+    Check that ``operand`` is a native variable whose ``methods`` simply read
+    its context item, so the program can read the item by itself.
+
+    """
+    if not isinstance(operand, NativeVariable) or callable(operand.context_name):
+        return False
+    cls = operand.__class__
+    methods += ("to_python", "_from_native_string")
+    return all(getattr(cls, method) == getattr(NativeVariable, method) for method in methods)
+
+
+def _is_constant(operand):
+    """
+    Check that the value of ``operand`` doesn't depend on the context.
+
+    Constants which compute their value differently are handled like any
+    other operand.
+
+    """
+    to_python = getattr(operand.__class__, "to_python", None)
+    if isinstance(operand, Set) and to_python == Set.to_python:
+        return all(_is_constant(item) for item in operand.constant_value)
+    return isinstance(operand, Constant) and to_python == Constant.to_python
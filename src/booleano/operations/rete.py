@@ -0,0 +1,580 @@
+# -*- coding: utf-8 -*-
+"""
+Discrimination network matching a context against many rules at once.
+
+Evaluating thousands of rules one by one repeats the same work for each of
+them: the same context items are read and compared to constants over and
+over, and most rules are evaluated only to find out that they are false.
+:class:`RuleNetwork` compiles the rules into a network in the spirit of Rete:
+
+- The *alpha nodes* are the distinct atoms of all the rules (their
+  comparisons and the truth values of their other operands), each of them
+  shared by all the rules where it appears. The atoms which compare a context
+  item to a constant (``==``, ``>``, ``<``, ``>=``, ``<=`` and ``∈`` a
+  constant set), or which take its truth value, are indexed by context item:
+  the item is read once per context, and a hash table or a binary search over
+  the sorted constants finds the atoms which are true, however many there
+  are. The other atoms are evaluated once per context.
+- The *beta nodes* combine the alpha memories (the true atoms) in the logical
+  skeleton of each rule, which is a binary decision diagram shared by all the
+  rules (see :mod:`booleano.operations.bdd`). The rules are only visited when
+  they may be true: a rule with an atom that must be true for the rule to be
+  true (e.g., any comparison in a conjunction) is activated by that atom
+  alone, preferably an equality; the other rules which can only be true if
+  one of their atoms is (e.g., disjunctions of comparisons) are activated by
+  any of them, and those which are true when all their atoms are false
+  (e.g., ``~ banned``) are always visited.
+
+So a context flows through the network once, and its cost depends on the
+amount of true atoms and of rules activated by them, not on the amount of
+rules (e.g., matching 20,000 conjunctions like ``service == "api" &
+latency > 300`` takes about as long as evaluating a hundred of them one by
+one)::
+
+    network = RuleNetwork()
+    for (name, expression) in rules.items():
+        network.add_rule(name, parse_manager.parse(expression))
+    matches = network.match(context)
+
+The rules can be added and removed at any time. The nodes of the diagrams
+are shared by the rules, so those of the removed rules are only released
+when the network is rebuilt out of the remaining rules, which happens once
+as many rules have been removed as there are left.
+
+The contexts are single facts, so there are no joins between them as in a
+production system: it only matches each context on its own. The atoms are
+evaluated before the rules, so they must not have side effects, and the
+errors they raise are only raised again by :meth:`RuleNetwork.match` when
+a rule needs the result of the atom, unless they're ignored.
+
+"""
+from __future__ import absolute_import, print_function, unicode_literals
+
+import logging
+from bisect import bisect_left, bisect_right
+
+import six
+
+from booleano.operations.bdd import FALSE, TRUE, BDDManager
+from booleano.operations.operands.constants import Number, Set, String
+from booleano.operations.program import (BELONGS_TO, EQUAL, GREATER_EQUAL, GREATER_THAN, LESS_EQUAL, LESS_THAN,
+                                         NOT_EQUAL, _get_comparison_opcode, _is_constant, _reads_context_item)
+
+logger = logging.getLogger(__name__)
+
+__all__ = ("RuleNetwork", )
+
+_NUMBER_TYPES = six.integer_types + (float, )
+
+_ACTIVATION_RANKS = {EQUAL: 0, BELONGS_TO: 1, None: 2}
+
+
+class RuleNetwork(object):
+    """
+    Network matching contexts against a set of rules, by name.
+
+    """
+
+    def __init__(self, ignore_errors=False):
+        """
+
+        :param ignore_errors: Whether the rules which need an atom that
+            raised an exception are considered false, instead of raising it
+            again.
+        :type ignore_errors: bool
+
+        """
+        self.ignore_errors = ignore_errors
+        self._reset()
+
+    def __len__(self):
+        """Return the amount of rules."""
+        return len(self._rules)
+
+    def __contains__(self, name):
+        return name in self._rules
+
+    @property
+    def atom_count(self):
+        """The amount of distinct atoms in the rules, i.e., of alpha nodes."""
+        return len(self._atom_references)
+
+    def add_rule(self, name, tree):
+        """
+        Add the rule ``name``, replacing the rule with the same name if any.
+
+        :param tree: The rule, as an evaluable parse tree or its root node.
+        :type tree: :class:`booleano.parser.trees.EvaluableParseTree`
+
+        """
+        if name in self._rules:
+            self.remove_rule(name)
+        node = getattr(tree, "root_node", tree)
+        diagrams = self._diagrams
+        root = diagrams.add(node)
+        atoms = frozenset(diagrams.get_support(root))
+        for atom in atoms:
+            if atom in self._atom_references:
+                self._atom_references[atom] += 1
+            else:
+                self._atom_references[atom] = 1
+                self._activated_rules[atom] = set()
+                self._add_atom(atom)
+        if diagrams.is_false_by_default(root):
+            required_atoms = diagrams.get_required_atoms(root)
+            if required_atoms:
+                # The rule is false unless this atom is true, so it's the only
+                # one activating the rule:
+                activating_atoms = (min(required_atoms, key=self._get_activation_rank), )
+            else:
+                activating_atoms = atoms
+        else:
+            activating_atoms = ()
+            self._unconditional_rules.add(name)
+        for atom in activating_atoms:
+            self._activated_rules[atom].add(name)
+        self._rules[name] = (node, root, atoms, activating_atoms)
+
+    def remove_rule(self, name):
+        """
+        Remove the rule ``name``.
+
+        :raises KeyError: If there's no such rule.
+
+        """
+        (_, _, atoms, activating_atoms) = self._rules.pop(name)
+        self._unconditional_rules.discard(name)
+        for atom in activating_atoms:
+            self._activated_rules[atom].remove(name)
+        for atom in atoms:
+            self._atom_references[atom] -= 1
+            if not self._atom_references[atom]:
+                del self._atom_references[atom]
+                del self._activated_rules[atom]
+                self._remove_atom(atom)
+        self._removed_rules += 1
+        if self._removed_rules > len(self._rules):
+            self._rebuild()
+
+    def match(self, context):
+        """
+        Return the names of the rules which are true with ``context``.
+
+        :rtype: set
+        :raises Exception: The exception raised by an atom needed by a rule,
+            unless the errors are ignored.
+
+        """
+        (true_atoms, errors) = self._find_true_atoms(context)
+        candidates = set(self._unconditional_rules)
+        activated_rules = self._activated_rules
+        for atom in true_atoms:
+            candidates.update(activated_rules[atom])
+        for atom in errors:
+            candidates.update(activated_rules[atom])
+
+        matches = set()
+        (rules, diagrams) = (self._rules, self._diagrams)
+        for name in candidates:
+            result = diagrams.find_result(rules[name][1], true_atoms, errors)
+            if result > TRUE:
+                # The rule needs an atom which raised an error:
+                if not self.ignore_errors:
+                    raise errors[diagrams.get_atom_index(result)]
+            elif result == TRUE:
+                matches.add(name)
+        return matches
+
+    def _find_true_atoms(self, context):
+        """
+        Return the atoms which are true with ``context``, and the errors
+        raised by the atoms which couldn't be evaluated.
+
+        """
+        true_atoms = set()
+        pending_atoms = list(self._evaluated_atoms)
+        for (item_name, index) in self._item_indexes.items():
+            try:
+                value = context[item_name]
+            except Exception:
+                # Each atom will raise the error again:
+                pending_atoms.extend(index.atoms)
+                continue
+            index.find_true_atoms(value, true_atoms, pending_atoms)
+        errors = {}
+        evaluators = self._diagrams.evaluators
+        for atom in pending_atoms:
+            try:
+                if evaluators[atom](context):
+                    true_atoms.add(atom)
+            except Exception as error:
+                errors[atom] = error
+        return (true_atoms, errors)
+
+    def _reset(self):
+        """Remove all the rules, and the nodes of their diagrams."""
+        self._diagrams = _NetworkDiagrams()
+        # The root node of the tree, the diagram root, the atoms and the atoms
+        # activating the rule, of each rule by name:
+        self._rules = {}
+        # The amount of rules removed since the diagrams were built, whose
+        # nodes are still in them:
+        self._removed_rules = 0
+        # The amount of rules using each atom, and the names of the rules it
+        # activates:
+        self._atom_references = {}
+        self._activated_rules = {}
+        # The names of the rules visited for every context:
+        self._unconditional_rules = set()
+        # The indexes of the atoms on the context items, by item name, and
+        # the kind of each indexed atom:
+        self._item_indexes = {}
+        self._atom_kinds = {}
+        self._evaluated_atoms = set()
+
+    def _rebuild(self):
+        """Build the diagrams of the rules again, without the removed rules."""
+        trees = [(name, rule[0]) for (name, rule) in self._rules.items()]
+        self._reset()
+        for (name, node) in trees:
+            self.add_rule(name, node)
+
+    def _get_activation_rank(self, atom):
+        """
+        Return the rank of ``atom`` to activate the rules, the atoms which
+        are seldom true first: equalities, memberships, truth values, those
+        which are evaluated and inequalities.
+
+        """
+        if atom in self._evaluated_atoms:
+            return 3
+        kind = self._atom_kinds[atom]
+        return _ACTIVATION_RANKS.get(kind, 4)
+
+    def _add_atom(self, atom):
+        """Add the alpha node of ``atom`` to the index of its context item."""
+        location = _get_index_location(self._diagrams.atoms[atom])
+        if location is None:
+            self._evaluated_atoms.add(atom)
+            return
+        (item_name, kind, value) = location
+        self._atom_kinds[atom] = kind
+        index = self._item_indexes.get(item_name)
+        if index is None:
+            index = self._item_indexes[item_name] = _ItemIndex()
+        index.add(atom, kind, value)
+
+    def _remove_atom(self, atom):
+        if atom in self._evaluated_atoms:
+            self._evaluated_atoms.remove(atom)
+            return
+        del self._atom_kinds[atom]
+        (item_name, kind, value) = _get_index_location(self._diagrams.atoms[atom])
+        index = self._item_indexes[item_name]
+        index.remove(atom, kind, value)
+        if not index.atoms:
+            del self._item_indexes[item_name]
+
+
+class _NetworkDiagrams(BDDManager):
+    """
+    BDD manager whose ``>=`` and ``<=`` comparisons are atoms of their own,
+    so they can be found in the indexes like the other inequalities.
+
+    """
+
+    @property
+    def evaluators(self):
+        return self._evaluators
+
+    def add(self, node):
+        """Return the root of the diagram of the tree whose root is ``node``."""
+        root = self._build(node)
+        # The operations are seldom repeated across rules, so their results
+        # are not kept:
+        self._ite_cache.clear()
+        return root
+
+    def is_false_by_default(self, root):
+        """Check that the diagram of ``root`` is false when all its atoms are."""
+        lows = self._lows
+        while root > TRUE:
+            root = lows[root]
+        return root == FALSE
+
+    def get_required_atoms(self, root):
+        """
+        Return the atoms which are true in all the paths from ``root`` to the
+        true terminal.
+
+        """
+        (levels, lows, highs) = (self._levels, self._lows, self._highs)
+        # The required atoms below each node, or None if it's always false:
+        required_atoms = {FALSE: None, TRUE: frozenset()}
+        pending = [root]
+        while pending:
+            node = pending[-1]
+            if node in required_atoms:
+                pending.pop()
+                continue
+            (low, high) = (lows[node], highs[node])
+            if low not in required_atoms or high not in required_atoms:
+                pending.extend((low, high))
+                continue
+            pending.pop()
+            (low_atoms, high_atoms) = (required_atoms[low], required_atoms[high])
+            if high_atoms is not None:
+                high_atoms = high_atoms | {levels[node]}
+            if low_atoms is None:
+                required_atoms[node] = high_atoms
+            elif high_atoms is None:
+                required_atoms[node] = low_atoms
+            else:
+                required_atoms[node] = low_atoms & high_atoms
+        return required_atoms[root] or frozenset()
+
+    def find_result(self, root, true_atoms, errors):
+        """
+        Return the terminal reached from ``root`` with the ``true_atoms``, or
+        the node testing the first atom with one of the ``errors``.
+
+        """
+        (levels, lows, highs) = (self._levels, self._lows, self._highs)
+        while root > TRUE:
+            atom = levels[root]
+            if atom in true_atoms:
+                root = highs[root]
+            elif atom in errors:
+                break
+            else:
+                root = lows[root]
+        return root
+
+    def get_atom_index(self, node):
+        """Return the index of the atom tested by ``node``."""
+        return self._levels[node]
+
+    def _get_atom_key(self, node, opcode):
+        if opcode in (LESS_EQUAL, GREATER_EQUAL):
+            return ((opcode, node.master_operand, node.slave_operand), False)
+        return super(_NetworkDiagrams, self)._get_atom_key(node, opcode)
+
+
+class _ItemIndex(object):
+    """The atoms on a context item, indexed by the constants they compare it to."""
+
+    def __init__(self):
+        self.atoms = set()
+        self.truth_atoms = set()
+        # The equality atoms, by constant:
+        self.equal_atoms = {}
+        # The membership atoms, by the strings and numbers in their sets:
+        self.string_atoms = {}
+        self.number_atoms = {}
+        self.thresholds = {
+            GREATER_THAN: _Thresholds(),
+            LESS_THAN: _Thresholds(),
+            LESS_EQUAL: _Thresholds(),
+            GREATER_EQUAL: _Thresholds(),
+        }
+
+    def add(self, atom, kind, value):
+        self.atoms.add(atom)
+        if kind is None:
+            self.truth_atoms.add(atom)
+        elif kind == EQUAL:
+            self.equal_atoms.setdefault(value, set()).add(atom)
+        elif kind == BELONGS_TO:
+            (strings, numbers) = value
+            for string in strings:
+                self.string_atoms.setdefault(string, set()).add(atom)
+            for number in numbers:
+                self.number_atoms.setdefault(number, set()).add(atom)
+        else:
+            self.thresholds[kind].add(value, atom)
+
+    def remove(self, atom, kind, value):
+        self.atoms.remove(atom)
+        if kind is None:
+            self.truth_atoms.remove(atom)
+        elif kind == EQUAL:
+            _discard_atom(self.equal_atoms, value, atom)
+        elif kind == BELONGS_TO:
+            (strings, numbers) = value
+            for string in strings:
+                _discard_atom(self.string_atoms, string, atom)
+            for number in numbers:
+                _discard_atom(self.number_atoms, number, atom)
+        else:
+            self.thresholds[kind].remove(value, atom)
+
+    def find_true_atoms(self, value, true_atoms, pending_atoms):
+        """
+        Add the atoms which are true with the ``value`` of the item to
+        ``true_atoms``.
+
+        The atoms which can't be found with ``value`` (e.g., if it's not
+        hashable, or not a number) are added to ``pending_atoms``, to be
+        evaluated like any other atom.
+
+        """
+        if self.truth_atoms:
+            self._find_truth_atoms(value, true_atoms, pending_atoms)
+        if self.equal_atoms:
+            self._find_equal_atoms(value, true_atoms, pending_atoms)
+        if self.string_atoms or self.number_atoms:
+            self._find_members(value, true_atoms, pending_atoms)
+        self._find_thresholds(value, true_atoms, pending_atoms)
+
+    def _find_truth_atoms(self, value, true_atoms, pending_atoms):
+        try:
+            if value:
+                true_atoms.update(self.truth_atoms)
+        except Exception:
+            pending_atoms.extend(self.truth_atoms)
+
+    def _find_equal_atoms(self, value, true_atoms, pending_atoms):
+        try:
+            true_atoms.update(self.equal_atoms.get(value, ()))
+        except TypeError:
+            for atoms in self.equal_atoms.values():
+                pending_atoms.extend(atoms)
+
+    def _find_thresholds(self, value, true_atoms, pending_atoms):
+        """Find the inequalities which are true with ``value``, if it's a number."""
+        if isinstance(value, _NUMBER_TYPES) and value == value:
+            for (kind, thresholds) in self.thresholds.items():
+                if thresholds.values:
+                    true_atoms.update(thresholds.find_true_atoms(kind, value))
+        else:
+            for thresholds in self.thresholds.values():
+                pending_atoms.extend(thresholds.atoms)
+
+    def _find_members(self, value, true_atoms, pending_atoms):
+        """Find the sets which contain ``value``, like ``Set.belongs_to``."""
+        try:
+            members = set(self.string_atoms.get(six.text_type(value), ()))
+            if self.number_atoms:
+                try:
+                    members.update(self.number_atoms.get(float(value), ()))
+                except ValueError:
+                    pass
+        except Exception:
+            members = set()
+            for atoms in self.string_atoms.values():
+                members.update(atoms)
+            for atoms in self.number_atoms.values():
+                members.update(atoms)
+            pending_atoms.extend(members)
+        else:
+            true_atoms.update(members)
+
+
+class _Thresholds(object):
+    """The inequality atoms on an item, sorted by the constant of each one."""
+
+    def __init__(self):
+        self.values = []
+        self.atoms = []
+
+    def add(self, value, atom):
+        position = bisect_right(self.values, value)
+        self.values.insert(position, value)
+        self.atoms.insert(position, atom)
+
+    def remove(self, value, atom):
+        position = bisect_left(self.values, value)
+        while self.atoms[position] != atom:
+            position += 1
+        del self.values[position]
+        del self.atoms[position]
+
+    def find_true_atoms(self, kind, value):
+        """
+        Return the atoms comparing the item to a constant which are true
+        when the item is ``value``.
+
+        """
+        if kind == GREATER_THAN:
+            # value > constant:
+            return self.atoms[:bisect_left(self.values, value)]
+        if kind == GREATER_EQUAL:
+            return self.atoms[:bisect_right(self.values, value)]
+        if kind == LESS_THAN:
+            return self.atoms[bisect_right(self.values, value):]
+        return self.atoms[bisect_left(self.values, value):]
+
+
+def _get_index_location(node):
+    """
+    Return the name of the context item the atom ``node`` is indexed by, the
+    kind of atom and its constant, or ``None`` if it must be evaluated.
+
+    The kind is ``None`` for the truth value of the item, and the opcode of
+    the comparison otherwise; a negated equality is the atom of the
+    equality.
+
+    """
+    opcode = _get_comparison_opcode(node)
+    if opcode is None:
+        if _reads_context_item(node, "__call__"):
+            return (node.context_name, None, None)
+        return None
+    if opcode == BELONGS_TO:
+        items = _get_set_items(node.master_operand)
+        if items is not None and _reads_context_item(node.slave_operand):
+            return (node.slave_operand.context_name, BELONGS_TO, items)
+        return None
+    if (_is_constant(node.slave_operand) and
+            _reads_context_item(node.master_operand, "equals", "greater_than", "less_than")):
+        return _get_comparison_location(node, opcode)
+    return None
+
+
+def _get_comparison_location(node, opcode):
+    """
+    Return the index location of the comparison ``node`` of a context item
+    to a constant, or ``None`` if the constant can't be indexed.
+
+    """
+    item_name = node.master_operand.context_name
+    value = node.slave_operand.to_python(None)
+    if opcode in (EQUAL, NOT_EQUAL):
+        try:
+            hash(value)
+        except TypeError:
+            return None
+        return (item_name, EQUAL, value)
+    if opcode in (GREATER_THAN, LESS_THAN, LESS_EQUAL, GREATER_EQUAL):
+        if isinstance(value, _NUMBER_TYPES) and value == value:
+            return (item_name, opcode, value)
+    return None
+
+
+def _get_set_items(operand):
+    """
+    Return the strings and the numbers in the constant set ``operand``, or
+    ``None`` if it has other items.
+
+    """
+    if operand.__class__ is not Set:
+        return None
+    strings = []
+    numbers = []
+    for item in operand.constant_value:
+        if item.__class__ is String:
+            strings.append(item.constant_value)
+        elif item.__class__ is Number:
+            # NaN never equals anything:
+            if item.constant_value == item.constant_value:
+                numbers.append(item.constant_value)
+        else:
+            return None
+    return (tuple(strings), tuple(numbers))
+
+
+def _discard_atom(atoms_by_value, value, atom):
+    atoms = atoms_by_value[value]
+    atoms.discard(atom)
+    if not atoms:
+        del atoms_by_value[value]
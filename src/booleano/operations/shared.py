@@ -0,0 +1,406 @@
+# -*- coding: utf-8 -*-
+"""
+Compiled programs shared by several processes through a memory-mapped file.
+
+When many worker processes evaluate the same rules, each of them usually
+holds its own copy of the parse trees or programs, and the large constant
+sets are the bulk of them: every item of a :class:`~booleano.operations.Set`
+is an object of its own. :func:`write_programs` lets a master process write
+the programs once, with their large sets laid out as sorted tables, and
+:class:`SharedPrograms` lets each worker attach to that file read-only::
+
+    # In the master process, before forking the workers:
+    write_programs("/dev/shm/rules.bin", {name: manager.parse(rule) for (name, rule) in rules})
+
+    # In each worker:
+    programs = SharedPrograms("/dev/shm/rules.bin")
+    matches = [name for (name, program) in programs.items() if program(context)]
+
+The tables are read straight from the mapped pages, which the operating system
+shares among all the processes, so only the small remainder of the programs
+(their instructions and the other operands) is copied into each worker. Files
+under ``/dev/shm`` are kept in memory on Linux; any other file works too, and
+its pages are shared through the page cache. The contents can also be built in
+memory with :func:`dump_programs` and attached with ``SharedPrograms(buffer=...)``,
+e.g., from a :class:`multiprocessing.shared_memory.SharedMemory` block.
+
+Only the sets made up of strings and numbers are laid out as tables. Their
+membership tests (``∈`` and ``⊂``) are binary searches and return the same
+results as :class:`~booleano.operations.Set`; the other operations build the
+regular set on each call.
+
+"""
+from __future__ import absolute_import, print_function, unicode_literals
+
+import logging
+import mmap
+import pickle
+import struct
+from io import BytesIO
+
+import six
+
+from booleano.operations.operands.constants import Number, Set, String
+from booleano.operations.program import Program
+
+logger = logging.getLogger(__name__)
+
+__all__ = ("SharedPrograms", "SharedSet", "dump_programs", "write_programs")
+
+_MAGIC = b"BOOLPRG1"
+
+# The magic string, then the offset and the length of the pickled programs:
+_HEADER = struct.Struct(str("<8sQQ"))
+
+# The amount of items of a set table, then those of its numbers and strings:
+_TABLE_HEADER = struct.Struct(str("<QQQ"))
+
+_DOUBLE = struct.Struct(str("<d"))
+
+_OFFSET = struct.Struct(str("<Q"))
+
+# The offsets where a string starts and ends:
+_BOUNDS = struct.Struct(str("<QQ"))
+
+#: The minimum amount of items of the sets laid out as tables by default.
+DEFAULT_MIN_SET_SIZE = 64
+
+
+def dump_programs(programs, min_set_size=DEFAULT_MIN_SET_SIZE):
+    """
+    Return the contents of the file with the ``programs``, as written by
+    :func:`write_programs`.
+
+    :rtype: bytes
+
+    """
+    output = BytesIO()
+    output.write(_HEADER.pack(_MAGIC, 0, 0))
+    pickler = _ProgramPickler(output, min_set_size)
+    programs = dict((name, _get_program(program)) for (name, program) in programs.items())
+    pickled_programs = pickler.dump_programs(programs)
+    offset = output.tell()
+    output.write(pickled_programs)
+    output.seek(0)
+    output.write(_HEADER.pack(_MAGIC, offset, len(pickled_programs)))
+    logger.debug("Dumped %s programs with %s set tables", len(programs), pickler.table_count)
+    return output.getvalue()
+
+
+def write_programs(path, programs, min_set_size=DEFAULT_MIN_SET_SIZE):
+    """
+    Write the ``programs`` to the file in ``path``, so they can be loaded
+    by :class:`SharedPrograms`.
+
+    :param path: The path to the file, which is replaced if it exists.
+    :type path: basestring
+    :param programs: The programs, or the evaluable parse trees to be
+        compiled, by name.
+    :type programs: dict
+    :param min_set_size: The minimum amount of items of the constant sets
+        laid out as tables; the smaller sets are kept in the programs.
+    :type min_set_size: int
+
+    """
+    contents = dump_programs(programs, min_set_size)
+    with open(path, "wb") as output:
+        output.write(contents)
+
+
+class SharedPrograms(object):
+    """
+    Read-only mapping of the programs written by :func:`write_programs`, by
+    name.
+
+    """
+
+    def __init__(self, path=None, buffer=None):
+        """
+
+        :param path: The path to the file with the programs.
+        :type path: basestring
+        :param buffer: The contents of the file, if ``path`` is not given.
+            It's read in place, so it must not change while the programs
+            are in use.
+        :raises ValueError: If the contents are not those of a file written
+            by :func:`write_programs`.
+
+        """
+        self._mmap = None
+        if path is not None:
+            with open(path, "rb") as input_file:
+                self._mmap = mmap.mmap(input_file.fileno(), 0, access=mmap.ACCESS_READ)
+            buffer = self._mmap
+        (magic, offset, length) = _HEADER.unpack_from(buffer, 0)
+        if magic != _MAGIC:
+            raise ValueError("The contents are not those of a file with programs")
+        unpickler = _ProgramUnpickler(BytesIO(buffer[offset:offset + length]), buffer)
+        self._programs = unpickler.load()
+
+    def __getitem__(self, name):
+        return self._programs[name]
+
+    def __contains__(self, name):
+        return name in self._programs
+
+    def __iter__(self):
+        return iter(self._programs)
+
+    def __len__(self):
+        return len(self._programs)
+
+    def keys(self):
+        return self._programs.keys()
+
+    def items(self):
+        return self._programs.items()
+
+    def close(self):
+        """
+        Release the memory-mapped file.
+
+        The programs must not be used afterwards.
+
+        """
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class SharedSet(Set):
+    """
+    Constant set whose items are read from a table in a shared buffer.
+
+    """
+
+    __slots__ = ("_table", )
+
+    def __init__(self, table):
+        """
+
+        :param table: The table with the items of the set.
+        :type table: _SetTable
+
+        """
+        self._table = table
+
+    @property
+    def constant_value(self):
+        """The items of the set, as regular constants built on each access."""
+        items = set(String(string) for string in self._table.strings)
+        items.update(Number(number) for number in self._table.numbers)
+        if self._table.has_nan:
+            items.add(Number("nan"))
+        return items
+
+    def belongs_to(self, value, context):
+        """
+        Check that this constant set contains the ``value`` item.
+
+        """
+        table = self._table
+        if table.strings and table.strings.contains(six.text_type(value)):
+            return True
+        if not table.numbers:
+            return False
+        try:
+            number = float(value)
+        except ValueError:
+            return False
+        return table.numbers.contains(number)
+
+    def less_than(self, value, context):
+        return len(self._table) < self._to_int(value)
+
+    def greater_than(self, value, context):
+        return len(self._table) > self._to_int(value)
+
+    def __call__(self, context):
+        return bool(len(self._table))
+
+    def __reduce__(self):
+        # Copies sent elsewhere don't depend on the buffer:
+        return (Set, tuple(self.constant_value))
+
+
+class _NumberTable(object):
+    """Sorted numbers in a buffer."""
+
+    def __init__(self, buffer, offset, count):
+        self.buffer = buffer
+        self.offset = offset
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        for index in range(self.count):
+            yield _DOUBLE.unpack_from(self.buffer, self.offset + index * 8)[0]
+
+    def contains(self, number):
+        if number != number:
+            # NaN:
+            return False
+        (buffer, offset, unpack) = (self.buffer, self.offset, _DOUBLE.unpack_from)
+        (low, high) = (0, self.count)
+        while low < high:
+            middle = (low + high) >> 1
+            (item, ) = unpack(buffer, offset + middle * 8)
+            if item < number:
+                low = middle + 1
+            elif item > number:
+                high = middle
+            else:
+                return True
+        return False
+
+
+class _StringTable(object):
+    """Sorted UTF-8 strings in a buffer, after the offset where each starts."""
+
+    def __init__(self, buffer, offset, count):
+        self.buffer = buffer
+        self.offset = offset
+        self.count = count
+        self.data_offset = offset + (count + 1) * 8
+        # Slices of memory views are views too, which can't be compared:
+        self.is_view = isinstance(buffer, memoryview)
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        for index in range(self.count):
+            yield self._get(index).decode("utf-8")
+
+    def contains(self, string):
+        try:
+            string = string.encode("utf-8")
+        except UnicodeError:
+            return False
+        (low, high) = (0, self.count)
+        while low < high:
+            middle = (low + high) >> 1
+            item = self._get(middle)
+            if item < string:
+                low = middle + 1
+            elif item > string:
+                high = middle
+            else:
+                return True
+        return False
+
+    def _get(self, index):
+        (start, end) = _BOUNDS.unpack_from(self.buffer, self.offset + index * 8)
+        item = self.buffer[self.data_offset + start:self.data_offset + end]
+        return item.tobytes() if self.is_view else item
+
+
+class _SetTable(object):
+    """The numbers and the strings of a set, in a buffer."""
+
+    def __init__(self, buffer, offset):
+        (self.count, number_count, string_count) = _TABLE_HEADER.unpack_from(buffer, offset)
+        offset += _TABLE_HEADER.size
+        self.numbers = _NumberTable(buffer, offset, number_count)
+        self.strings = _StringTable(buffer, offset + number_count * 8, string_count)
+        # NaN never equals anything, so it's only counted:
+        self.has_nan = self.count > number_count + string_count
+
+    def __len__(self):
+        return self.count
+
+
+def _pack_set(items):
+    """
+    Return the table with the ``items`` of a set, or ``None`` if they are
+    not all strings or numbers.
+
+    """
+    numbers = []
+    strings = []
+    for item in items:
+        if item.__class__ is Number:
+            if item.constant_value == item.constant_value:
+                numbers.append(item.constant_value)
+        elif item.__class__ is String:
+            try:
+                strings.append(item.constant_value.encode("utf-8"))
+            except UnicodeError:
+                return None
+        else:
+            return None
+    numbers.sort()
+    strings.sort()
+    parts = [_TABLE_HEADER.pack(len(items), len(numbers), len(strings))]
+    parts.extend(_DOUBLE.pack(number) for number in numbers)
+    position = 0
+    for string in strings:
+        parts.append(_OFFSET.pack(position))
+        position += len(string)
+    parts.append(_OFFSET.pack(position))
+    parts.extend(strings)
+    return b"".join(parts)
+
+
+class _ProgramPickler(pickle.Pickler):
+    """
+    Pickler writing the large constant sets as tables in the ``output``,
+    and only their offsets in the pickle.
+
+    """
+
+    def __init__(self, output, min_set_size):
+        self.output = output
+        self.min_set_size = min_set_size
+        self.table_count = 0
+        self._pickle = BytesIO()
+        # The offsets of the tables already written, by set identity:
+        self._offsets = {}
+        pickle.Pickler.__init__(self, self._pickle, pickle.HIGHEST_PROTOCOL)
+
+    def dump_programs(self, programs):
+        self.dump(programs)
+        return self._pickle.getvalue()
+
+    def persistent_id(self, obj):
+        if obj.__class__ is not Set or len(obj.constant_value) < self.min_set_size:
+            return None
+        if id(obj) not in self._offsets:
+            table = _pack_set(obj.constant_value)
+            if table is None:
+                return None
+            # The tables are aligned, to read their numbers faster:
+            self.output.write(b"\0" * (-self.output.tell() % 8))
+            self._offsets[id(obj)] = (self.output.tell(), obj)
+            self.output.write(table)
+            self.table_count += 1
+        return self._offsets[id(obj)][0]
+
+
+class _ProgramUnpickler(pickle.Unpickler):
+    """Unpickler reading the large constant sets from ``buffer``."""
+
+    def __init__(self, input_file, buffer):
+        pickle.Unpickler.__init__(self, input_file)
+        self.buffer = buffer
+        self._sets = {}
+
+    def persistent_load(self, offset):
+        if offset not in self._sets:
+            self._sets[offset] = SharedSet(_SetTable(self.buffer, offset))
+        return self._sets[offset]
+
+
+def _get_program(program):
+    """Return ``program``, compiling it if it's a parse tree."""
+    if isinstance(program, Program):
+        return program
+    return program.compile()
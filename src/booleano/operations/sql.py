@@ -0,0 +1,474 @@
+# -*- coding: utf-8 -*-
+"""
+Conversion of convertible parse trees into SQL ``WHERE`` clauses.
+
+The values of the constants are never inlined in the SQL: they are replaced
+with placeholders in the paramstyle of the DB-API driver (see :pep:`249`) and
+returned apart, so the database can reuse the plans of the statements::
+
+    converter = SQLConverter(PostgreSQLDialect())
+    clause = parse_manager.parse('age > 18 & name ∈ {"aang", "katara", "sokka"}')(converter)
+    # clause.sql == '("age" > %s AND "name" IN (%s, %s, %s, %s))'
+    # clause.parameters == (18.0, 'aang', 'katara', 'sokka', 'sokka')
+
+The items of the literal sets are sorted, and the amount of placeholders in
+``IN`` lists is rounded up to the next power of two (by repeating the last
+item, which doesn't change the result), so sets of similar size produce the
+same statement.
+
+The SQL for each tree is cached by the converter, so converting equivalent
+trees again is cheap.
+
+"""
+from __future__ import absolute_import, print_function, unicode_literals
+
+import logging
+
+from booleano.exc import ConversionError
+from booleano.operations.converters import BaseConverter, ConversionCache
+
+logger = logging.getLogger(__name__)
+
+__all__ = ("SQLConverter", "SQLClause", "SQLFragment", "SQLParameter", "SQLDialect", "SQLiteDialect",
+           "PostgreSQLDialect", "MySQLDialect")
+
+
+class SQLFragment(object):
+    """
+    Piece of SQL, made up of SQL code, parameters and other fragments.
+
+    The parameters are kept apart from the SQL code until the whole clause is
+    built, when they are replaced by the placeholders of the dialect.
+
+    """
+
+    __slots__ = ("parts", )
+
+    def __init__(self, *parts):
+        """
+
+        :param parts: The SQL code (as strings), parameters (as
+            :class:`SQLParameter` instances) and fragments making up this
+            fragment, in order.
+
+        """
+        self.parts = parts
+
+    def __repr__(self):
+        return "<SQL fragment %r>" % (self.parts, )
+
+
+class SQLParameter(object):
+    """Value to be passed to the database apart from the SQL code."""
+
+    __slots__ = ("value", )
+
+    def __init__(self, value):
+        self.value = value
+
+    def __repr__(self):
+        return "<SQL parameter %r>" % (self.value, )
+
+
+class _SetFragment(SQLFragment):
+    """Fragment representing a literal set, whose items are its parts."""
+
+    __slots__ = ()
+
+
+class SQLClause(object):
+    """
+    The SQL code of a clause, along with the values of its parameters.
+
+    It can be unpacked, so it can be passed to the DB-API cursors directly::
+
+        sql, parameters = clause
+        cursor.execute("SELECT * FROM users WHERE " + sql, parameters)
+
+    """
+
+    __slots__ = ("sql", "parameters")
+
+    def __init__(self, sql, parameters):
+        """
+
+        :param sql: The SQL code, with placeholders for the parameters.
+        :type sql: basestring
+        :param parameters: The values of the parameters: a tuple in positional
+            paramstyles, or a dictionary in named paramstyles.
+
+        """
+        self.sql = sql
+        self.parameters = parameters
+
+    def __iter__(self):
+        yield self.sql
+        yield self.parameters
+
+    def __eq__(self, other):
+        return isinstance(other, SQLClause) and tuple(self) == tuple(other)
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return "<SQL clause %r with parameters %r>" % (self.sql, self.parameters)
+
+
+class SQLDialect(object):
+    """
+    Standard SQL dialect.
+
+    Subclasses may override these attributes and methods to support the
+    particularities of each database.
+
+    """
+
+    #: The default paramstyle of the placeholders (see :pep:`249`): "qmark",
+    #: "numeric", "named", "format" or "pyformat".
+    paramstyle = "qmark"
+
+    #: The character used to quote identifiers.
+    identifier_quote = '"'
+
+    #: The SQL code for a condition which is always false.
+    false = "1 = 0"
+
+    def quote_identifier(self, identifier):
+        """Return the quoted form of ``identifier``."""
+        quote = self.identifier_quote
+        return quote + identifier.replace(quote, quote * 2) + quote
+
+    def column(self, name, namespace_parts):
+        """
+        Return the SQL code for the column bound to the variable ``name``.
+
+        By default, the namespace is used to qualify the column (e.g.,
+        ``users:name`` becomes ``"users"."name"``).
+
+        """
+        return ".".join(self.quote_identifier(part) for part in tuple(namespace_parts) + (name, ))
+
+    def placeholder(self, position, paramstyle):
+        """
+        Return the placeholder of the parameter at ``position`` (starting at
+        1) in ``paramstyle``.
+
+        """
+        if paramstyle == "qmark":
+            return "?"
+        if paramstyle == "format":
+            return "%s"
+        if paramstyle == "numeric":
+            return ":%s" % position
+        if paramstyle == "named":
+            return ":%s" % parameter_name(position)
+        if paramstyle == "pyformat":
+            return "%%(%s)s" % parameter_name(position)
+        raise ConversionError("Unknown paramstyle: %s" % paramstyle)
+
+    def xor(self, master_operand, slave_operand):
+        """Return the exclusive disjunction of both conditions."""
+        return SQLFragment("((", master_operand, ") <> (", slave_operand, "))")
+
+    def belongs_to(self, collection, item):
+        """
+        Return the condition checking that ``item`` belongs to the
+        ``collection`` column.
+
+        :raises ConversionError: Unless the dialect supports collections.
+
+        """
+        raise ConversionError("Membership in collections is not supported by %s" % self.__class__.__name__)
+
+    def is_subset(self, superset, subset):
+        """
+        Return the condition checking that ``subset`` is a subset of
+        ``superset``, when one of them is not a literal set.
+
+        :raises ConversionError: Unless the dialect supports collections.
+
+        """
+        raise ConversionError("Subsets are not supported by %s" % self.__class__.__name__)
+
+
+class SQLiteDialect(SQLDialect):
+    """SQLite dialect, as used by the :mod:`sqlite3` module."""
+
+
+class PostgreSQLDialect(SQLDialect):
+    """PostgreSQL dialect, as used by psycopg, where collections are arrays."""
+
+    paramstyle = "format"
+
+    def belongs_to(self, collection, item):
+        return SQLFragment(item, " = ANY(", collection, ")")
+
+    def is_subset(self, superset, subset):
+        return SQLFragment("(", self._to_array(subset), " <@ ", self._to_array(superset), ")")
+
+    def _to_array(self, operand):
+        if isinstance(operand, _SetFragment):
+            return SQLFragment("ARRAY[", _join(operand.parts, ", "), "]")
+        return operand
+
+
+class MySQLDialect(SQLDialect):
+    """MySQL dialect, as used by MySQLdb and PyMySQL."""
+
+    paramstyle = "format"
+
+    identifier_quote = "`"
+
+    def xor(self, master_operand, slave_operand):
+        return SQLFragment("(", master_operand, " XOR ", slave_operand, ")")
+
+
+def parameter_name(position):
+    """Return the name of the parameter at ``position`` in named paramstyles."""
+    return "p%s" % position
+
+
+class SQLConverter(BaseConverter):
+    """
+    Convert parse trees into SQL ``WHERE`` clauses with bound parameters.
+
+    The result of each conversion is a :class:`SQLClause`.
+
+    Variables become columns (see :meth:`SQLDialect.column`) and functions
+    must be declared explicitly in ``functions``, where each name is mapped
+    to the name of an SQL function or to a callable receiving the converter
+    and the arguments already converted (as :class:`SQLFragment` instances)
+    and returning an :class:`SQLFragment`.
+
+    """
+
+    #: The amount of clauses kept in the cache by default.
+    default_cache_size = 1024
+
+    def __init__(self, dialect=None, paramstyle=None, columns=None, functions=None, bucket_in_lists=True,
+                 cache_size=None):
+        """
+
+        :param dialect: The SQL dialect (defaults to standard SQL).
+        :type dialect: :class:`SQLDialect`
+        :param paramstyle: The paramstyle of the placeholders (defaults to
+            the one of the ``dialect``).
+        :type paramstyle: basestring
+        :param columns: If set, only these variables can be used. It maps
+            their names (namespace included, with its parts separated by
+            colons) to their SQL code.
+        :type columns: dict
+        :param functions: The SQL functions available.
+        :type functions: dict
+        :param bucket_in_lists: Whether to round up the amount of items in
+            ``IN`` lists to the next power of two.
+        :type bucket_in_lists: bool
+        :param cache_size: The maximum amount of clauses kept in the cache;
+            ``0`` disables it.
+        :type cache_size: int
+
+        """
+        self.dialect = dialect or SQLDialect()
+        self.paramstyle = paramstyle or self.dialect.paramstyle
+        # Making sure the paramstyle is supported:
+        self.dialect.placeholder(1, self.paramstyle)
+        self.columns = columns
+        self.functions = functions or {}
+        self.bucket_in_lists = bucket_in_lists
+        self.cache_size = self.default_cache_size if cache_size is None else cache_size
+        # The clauses, by the identifier of the structure of their trees:
+        self._cache = ConversionCache(self.cache_size)
+
+    def __call__(self, root_node):
+        """
+        Convert ``root_node`` into an SQL clause.
+
+        :param root_node: The root of the tree to be converted.
+        :type root_node: :class:`booleano.operations.core.OperationNode`
+        :rtype: SQLClause
+        :raises booleano.exc.ConversionError: If the tree cannot be
+            represented in SQL.
+
+        """
+        if self.cache_size <= 0:
+            return self._convert_clause(root_node)
+        # The trees are identified without recursion, so deep trees don't hit
+        # the recursion limit:
+        identifier = self._identify_nodes(root_node, self._cache)[id(root_node)]
+        try:
+            clause = self._cache[identifier]
+        except KeyError:
+            clause = self._cache[identifier] = self._convert_clause(root_node)
+        return self._copy_clause(clause)
+
+    def build_clause(self, fragment):
+        """
+        Turn ``fragment`` into a clause, replacing the parameters with
+        placeholders.
+
+        :rtype: SQLClause
+
+        """
+        sql = []
+        values = []
+        pending = [fragment]
+        while pending:
+            part = pending.pop()
+            if isinstance(part, SQLFragment):
+                pending.extend(reversed(part.parts))
+            elif isinstance(part, SQLParameter):
+                values.append(part.value)
+                sql.append(self.dialect.placeholder(len(values), self.paramstyle))
+            else:
+                sql.append(part)
+        if self.paramstyle in ("named", "pyformat"):
+            parameters = dict((parameter_name(position), value) for (position, value) in enumerate(values, 1))
+        else:
+            parameters = tuple(values)
+        return SQLClause("".join(sql), parameters)
+
+    def clear_cache(self):
+        """Remove all the clauses from the cache."""
+        self._cache.clear()
+
+    def _convert_clause(self, root_node):
+        fragment = super(SQLConverter, self).__call__(root_node)
+        if isinstance(fragment, _SetFragment):
+            raise ConversionError("Sets don't have truth values in SQL")
+        return self.build_clause(fragment)
+
+    def _copy_clause(self, clause):
+        """Return a copy of ``clause`` which can be altered safely."""
+        if isinstance(clause.parameters, dict):
+            return SQLClause(clause.sql, dict(clause.parameters))
+        # The tuples of parameters can be shared, but not the clause itself:
+        return SQLClause(clause.sql, clause.parameters)
+
+    # Operation converters
+
+    def convert_not(self, operand):
+        return SQLFragment("NOT (", self._to_condition(operand), ")")
+
+    def convert_and(self, master_operand, slave_operand):
+        return self._connect("AND", master_operand, slave_operand)
+
+    def convert_or(self, master_operand, slave_operand):
+        return self._connect("OR", master_operand, slave_operand)
+
+    def convert_xor(self, master_operand, slave_operand):
+        return self.dialect.xor(self._to_condition(master_operand), self._to_condition(slave_operand))
+
+    def convert_equal(self, master_operand, slave_operand):
+        return self._compare("=", master_operand, slave_operand)
+
+    def convert_not_equal(self, master_operand, slave_operand):
+        return self._compare("<>", master_operand, slave_operand)
+
+    def convert_less_than(self, master_operand, slave_operand):
+        return self._compare("<", master_operand, slave_operand)
+
+    def convert_greater_than(self, master_operand, slave_operand):
+        return self._compare(">", master_operand, slave_operand)
+
+    def convert_less_equal(self, master_operand, slave_operand):
+        return self._compare("<=", master_operand, slave_operand)
+
+    def convert_greater_equal(self, master_operand, slave_operand):
+        return self._compare(">=", master_operand, slave_operand)
+
+    def convert_belongs_to(self, master_operand, slave_operand):
+        if isinstance(slave_operand, _SetFragment):
+            raise ConversionError("Sets cannot be items of other sets in SQL")
+        if not isinstance(master_operand, _SetFragment):
+            return self.dialect.belongs_to(master_operand, slave_operand)
+        items = list(master_operand.parts)
+        if not items:
+            return SQLFragment(self.dialect.false)
+        if self.bucket_in_lists and all(isinstance(item, SQLParameter) for item in items):
+            items.extend(items[-1:] * (_get_bucket_size(len(items)) - len(items)))
+        return SQLFragment(slave_operand, " IN (", _join(items, ", "), ")")
+
+    def convert_is_subset(self, master_operand, slave_operand):
+        return self.dialect.is_subset(master_operand, slave_operand)
+
+    # Operand converters
+
+    def convert_string(self, text):
+        return SQLParameter(text)
+
+    def convert_number(self, number):
+        return SQLParameter(number)
+
+    def convert_set(self, *elements):
+        return _SetFragment(*_sort_items(elements))
+
+    def convert_variable(self, name, namespace_parts):
+        if self.columns is None:
+            return SQLFragment(self.dialect.column(name, namespace_parts))
+        full_name = ":".join(tuple(namespace_parts) + (name, ))
+        try:
+            return SQLFragment(self.columns[full_name])
+        except KeyError:
+            raise ConversionError("Unknown column for variable %s" % full_name)
+
+    def convert_function(self, name, namespace_parts, *arguments):
+        full_name = ":".join(tuple(namespace_parts) + (name, ))
+        try:
+            function = self.functions[full_name]
+        except KeyError:
+            raise ConversionError("Unknown SQL function %s" % full_name)
+        if callable(function):
+            return function(self, *arguments)
+        return SQLFragment(function, "(", _join(arguments, ", "), ")")
+
+    # Utilities
+
+    def _connect(self, connective, master_operand, slave_operand):
+        return SQLFragment("(", self._to_condition(master_operand), " %s " % connective,
+                           self._to_condition(slave_operand), ")")
+
+    def _compare(self, operator, master_operand, slave_operand):
+        if isinstance(master_operand, _SetFragment) or isinstance(slave_operand, _SetFragment):
+            raise ConversionError("Sets cannot be compared in SQL")
+        return SQLFragment(master_operand, " %s " % operator, slave_operand)
+
+    def _to_condition(self, operand):
+        if isinstance(operand, _SetFragment):
+            raise ConversionError("Sets don't have truth values in SQL")
+        return operand
+
+
+def _join(parts, separator):
+    """Return a fragment with the ``parts`` separated by ``separator``."""
+    joined = []
+    for part in parts:
+        if joined:
+            joined.append(separator)
+        joined.append(part)
+    return SQLFragment(*joined)
+
+
+def _sort_items(items):
+    """
+    Sort the ``items`` of a set, whose order is arbitrary, with the parameters
+    first.
+
+    """
+    parameters = [item for item in items if isinstance(item, SQLParameter)]
+    others = [item for item in items if not isinstance(item, SQLParameter)]
+    try:
+        parameters.sort(key=lambda parameter: (parameter.value.__class__.__name__, parameter.value))
+    except TypeError:
+        pass
+    return parameters + others
+
+
+def _get_bucket_size(length):
+    """Return the smallest power of two greater than or equal to ``length``."""
+    size = 1
+    while size < length:
+        size <<= 1
+    return size
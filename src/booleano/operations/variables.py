@@ -4,6 +4,7 @@ this module contains all usable variables for native python type.
 """
 import datetime
 import re
+from operator import attrgetter, itemgetter
 
 import six
 
@@ -13,6 +14,147 @@ from booleano.parser.symbol_table_builder import SymbolTableBuilder
 
 variable_symbol_table_builder = SymbolTableBuilder()
 
+_PATH_STEP = re.compile(
+    r"""(?P<dot>\.)?(?P<name>[^.\[\]]+)|\[(?:(?P<index>-?\d+)|"(?P<double>[^"]*)"|'(?P<single>[^']*)')\]"""
+)
+
+
+class ContextPath(object):
+    """
+    a path to an item nested in the context, like ``user.address.country`` or
+    ``items[0].sku``, to be used as the ``context_name`` of a variable.
+
+    each name in the path reads the item of a mapping, or the attribute of an
+    object which doesn't support items (like ORM objects), and each bracket
+    reads the item at an index (``[0]``) or with a key (``["a.b"]``).
+
+    the path is compiled once into a single function made up of item accesses,
+    :func:`operator.itemgetter` and :func:`operator.attrgetter`.
+    """
+    __slots__ = ("path", "steps", "default", "raise_missing", "_access")
+
+    def __init__(self, path, default=None, raise_missing=True, steps=None):
+        """
+        :param str path: the path to the item
+        :param default: the value of missing items, if they don't raise
+        :param bool raise_missing: whether missing items raise a
+            :class:`LookupError`, :class:`AttributeError` or
+            :class:`TypeError`, rather than evaluating to ``default``
+        :param tuple steps: the steps of the path, if it's not parsed:
+            pairs made up of whether the step only reads items and the key
+        :raises ValueError: if the path is not valid
+        """
+        self.path = path
+        self.steps = _parse_path(path) if steps is None else tuple(steps)
+        self.default = default
+        self.raise_missing = raise_missing
+        self._access = _compile_path(self.steps, default, raise_missing)
+
+    @classmethod
+    def from_keys(cls, keys, default=None, raise_missing=True):
+        """
+        create the path to an item in nested mappings.
+        :param keys: the key of the item in each mapping
+        """
+        return cls(".".join(six.text_type(key) for key in keys), default, raise_missing,
+                   [(True, key) for key in keys])
+
+    def __eq__(self, other):
+        return (
+            isinstance(other, ContextPath) and self.steps == other.steps and
+            self.raise_missing == other.raise_missing and (self.raise_missing or self.default == other.default)
+        )
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __call__(self, context):
+        """return the item at this path in the ``context``"""
+        return self._access(context)
+
+    def __hash__(self):
+        return hash((ContextPath, self.steps, self.raise_missing))
+
+    def __getstate__(self):
+        return (self.path, self.default, self.raise_missing, self.steps)
+
+    def __setstate__(self, state):
+        self.__init__(*state)
+
+    def __str__(self):
+        return self.path
+
+    def __repr__(self):
+        return '<ContextPath %s>' % self.path
+
+
+def _parse_path(path):
+    """Return the steps of ``path``."""
+    steps = []
+    position = 0
+    while position < len(path):
+        match = _PATH_STEP.match(path, position)
+        if not match or (match.group("name") is not None and bool(position) != bool(match.group("dot"))):
+            raise ValueError("Invalid path %r at position %s" % (path, position))
+        if match.group("name") is not None:
+            steps.append((False, match.group("name")))
+        elif match.group("index") is not None:
+            steps.append((True, int(match.group("index"))))
+        else:
+            key = match.group("double")
+            steps.append((True, match.group("single") if key is None else key))
+        position = match.end()
+    if not steps:
+        raise ValueError("Empty path")
+    return tuple(steps)
+
+
+def _compile_path(steps, default, raise_missing):
+    """
+    Return the function reading the item at the end of the ``steps``.
+
+    The function is generated as a single expression, so reading nested
+    items costs no more than a hand-written lambda.
+
+    """
+    if raise_missing and len(steps) == 1:
+        (items_only, key) = steps[0]
+        return itemgetter(key) if items_only else _get_item_or_attribute(key)
+    namespace = {"default": default}
+    expression = "context"
+    for (position, (items_only, key)) in enumerate(steps):
+        if items_only:
+            namespace["k%s" % position] = key
+            expression = "%s[k%s]" % (expression, position)
+        else:
+            namespace["g%s" % position] = _get_item_or_attribute(key)
+            expression = "g%s(%s)" % (position, expression)
+    if raise_missing:
+        return eval("lambda context: " + expression, namespace)
+    source = (
+        "def access(context):\n"
+        "    try:\n"
+        "        return %s\n"
+        "    except (LookupError, AttributeError, TypeError):\n"
+        "        return default\n" % expression
+    )
+    exec(source, namespace)
+    return namespace["access"]
+
+
+def _get_item_or_attribute(name):
+    get_item = itemgetter(name)
+    get_attribute = attrgetter(name)
+
+    def getter(value):
+        try:
+            return get_item(value)
+        except TypeError:
+            # It doesn't support items:
+            return get_attribute(value)
+
+    return getter
+
 
 @variable_symbol_table_builder.register(type(None))
 @six.python_2_unicode_compatible
@@ -23,8 +165,10 @@ class NativeVariable(Variable):
     it work as is using the python type operations.
 
     it can be lazy if the given context_name is a callable, in this case, the callable
-    will be called with the current context
+    will be called with the current context. a :class:`ContextPath` reads an item
+    nested in the context.
     """
+    __slots__ = ("evaluated", "context_name")
     operations = {
         "equality",           # ==, !=
         "inequality",         # >, <, >=, <=
@@ -43,6 +187,26 @@ class NativeVariable(Variable):
             return self.context_name(context)
         return context[self.context_name]
 
+    def to_column(self, columns):
+        """
+        Return the column holding the values of this variable in a batch of
+        contexts, for vectorized evaluations.
+
+        :param columns: The columns of the batch, by the names of the context
+            items they hold. Its ``get`` method returns ``None`` for unknown
+            items.
+        :return: The column, or ``None`` if the values of this variable
+            cannot be taken from the ``columns``.
+
+        By default, it's the column of the context item, unless the variable
+        computes its value differently. Variables may override it to compute
+        their column out of the ``columns``.
+
+        """
+        if callable(self.context_name) or self.__class__.to_python != NativeVariable.to_python:
+            return None
+        return columns.get(self.context_name)
+
     def equals(self, value, context):
         """Does ``value`` equal this variable?"""
         self.evaluated = True
@@ -69,6 +233,25 @@ class NativeVariable(Variable):
         self.evaluated = True
         return bool(self.to_python(context))
 
+    def check_equivalence(self, node):
+        """
+        make sure ``node`` is a variable of the same class bound to the same context item.
+
+        :raises AssertionError: if they are not equivalent
+        """
+        super(NativeVariable, self).check_equivalence(node)
+        assert self.is_equivalent(node), 'Variables %s and %s are not equivalent' % (self, node)
+
+    def is_equivalent(self, node):
+        """
+        two native variables are equivalent if they share the same class and are
+        bound to the same context item.
+        """
+        return node.__class__ is self.__class__ and node.context_name == self.context_name
+
+    def _calculate_hash(self):
+        return hash((self.__class__, self.context_name))
+
     def _from_native_string(self, value):
         """
         special case where a variable can interperete
@@ -90,6 +273,8 @@ class NativeVariable(Variable):
 @variable_symbol_table_builder.register(list)
 @variable_symbol_table_builder.register(tuple)
 class NativeCollectionVariable(NativeVariable):
+    __slots__ = ()
+
     operations = {
         "equality",  # ==, !=
         "inequality",  # >, <, >=, <=
@@ -121,6 +306,7 @@ class NumberVariable(NativeVariable):
     """
     a variable that allow to compare **number** from the context
     """
+    __slots__ = ()
 
 
 @variable_symbol_table_builder.register(bool)
@@ -128,6 +314,7 @@ class BooleanVariable(NativeVariable):
     """
     a variable that allow to compare **boolean** from the context
     """
+    __slots__ = ()
 
 
 @variable_symbol_table_builder.register(six.text_type)
@@ -135,6 +322,7 @@ class StringVariable(NativeCollectionVariable):
     """
     a variable that allow to compare **string** from the context
     """
+    __slots__ = ()
 
 
 @variable_symbol_table_builder.register(set)
@@ -143,6 +331,7 @@ class SetVariable(NativeCollectionVariable):
     """
     a variable that allow to compare **set** from the context
     """
+    __slots__ = ()
 
     def cast_val(self, value):
         if not isinstance(value, set):
@@ -186,6 +375,18 @@ class FormatableVariable(NativeVariable):
             self.formats = formats
         super(FormatableVariable, self).__init__(context_name)
 
+    def is_equivalent(self, node):
+        """
+        formatable variables must also use the same formats to be equivalent.
+        """
+        return (
+            super(FormatableVariable, self).is_equivalent(node) and
+            tuple(node.formats) == tuple(self.formats)
+        )
+
+    def _calculate_hash(self):
+        return hash((super(FormatableVariable, self)._calculate_hash(), tuple(self.formats)))
+
 
 @variable_symbol_table_builder.register(datetime.timedelta)
 class DurationVariable(FormatableVariable):
@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+"""
+Canonical spelling of expressions.
+
+Expressions which only differ in the whitespace between their tokens or in
+the case of their identifiers are spelled the same way by an
+:class:`ExpressionCanonicalizer`: their identifiers are lower-cased and their
+tokens are separated by single spaces, e.g., ``A&(b|C)`` and
+``a & ( b | c )`` are both spelled ``a & ( b | c )``. The operators made up
+of words are spelled as in the grammar if they are case-insensitive (the
+relational and membership operators), and left as they are otherwise.
+
+Pyparsing reads the operators made up of words even where they are followed
+or preceded by other word characters (e.g., ``notice`` is ``not ice`` if
+``not`` is an operator), so the expressions where an operator is part of a
+longer word are left as they are: lower-casing or spacing them could change
+the way they are parsed.
+
+The parse managers can parse the canonical spelling of the expressions
+instead of the expressions themselves, so the equivalent spellings share the
+same entry in their cache. The identifiers in symbol tables are lower-cased,
+so the upper-case identifiers in the expressions are then found too.
+
+"""
+from __future__ import absolute_import, unicode_literals
+
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+__all__ = ("ExpressionCanonicalizer", )
+
+# The tokens which are part of other elements, not operators on their own:
+_NON_OPERATOR_TOKENS = frozenset((
+    "string_start",
+    "string_end",
+    "positive_sign",
+    "negative_sign",
+    "decimal_separator",
+    "thousands_separator",
+    "identifier_spacing",
+    "namespace_separator",
+))
+
+# The operators which are matched regardless of their case:
+_CASELESS_TOKENS = frozenset(("eq", "ne", "lt", "gt", "le", "ge", "belongs_to", "is_subset"))
+
+# The strings, as defined by Pyparsing's quotedString:
+_STRING = (r'"(?:[^"\n\r\\]+|""|\\(?:[^x]|x[0-9a-fA-F]+))*"|'
+           r"'(?:[^'\n\r\\]+|''|\\(?:[^x]|x[0-9a-fA-F]+))*'")
+
+
+class ExpressionCanonicalizer(object):
+    """
+    Spell expressions written in a grammar in the canonical way.
+
+    Grammars with custom generators, or with operators made up of words and
+    other characters (or spaces), are not supported: the expressions written
+    in them are left as they are.
+
+    """
+
+    def __init__(self, grammar, memo_size=10000):
+        """
+
+        :param grammar: The grammar of the expressions.
+        :type grammar: :class:`booleano.parser.Grammar`
+        :param memo_size: The amount of spellings remembered, so the
+            expressions seen recently are not canonicalized again (``0`` to
+            disable the memo). It's emptied when it gets full.
+        :type memo_size: int
+
+        """
+        self._pattern = _make_pattern(grammar)
+        (self._word_operators, self._caseless_operators) = _get_word_operators(grammar)
+        self._word_operator_pattern = _make_word_operator_pattern(self._word_operators, self._caseless_operators)
+        self.memo_size = memo_size
+        self._memo = {}
+
+    @property
+    def is_supported(self):
+        """Whether the expressions of the grammar can be canonicalized."""
+        return self._pattern is not None
+
+    def __call__(self, expression):
+        """
+        Return the canonical spelling of ``expression``.
+
+        :param expression: The expression to be canonicalized.
+        :type expression: basestring
+        :return: The canonical spelling, or ``expression`` itself if it has
+            characters which are not part of any token of the grammar (so
+            its parser reports the error).
+        :rtype: basestring
+
+        """
+        try:
+            return self._memo[expression]
+        except KeyError:
+            pass
+        canonical_expression = self._canonicalize(expression)
+        if self.memo_size:
+            if len(self._memo) >= self.memo_size:
+                self._memo.clear()
+            self._memo[expression] = canonical_expression
+        return canonical_expression
+
+    def _canonicalize(self, expression):
+        if self._pattern is None:
+            return expression
+        tokens = []
+        for (string, token, other) in self._pattern.findall(expression):
+            if other:
+                return expression
+            spelling = string or self._spell(token)
+            if spelling is None:
+                return expression
+            tokens.append(spelling)
+        return " ".join(tokens)
+
+    def _spell(self, token):
+        """
+        Return the canonical spelling of ``token``, or ``None`` if it contains
+        an operator made up of words along with other word characters.
+
+        """
+        if token in self._word_operators:
+            return token
+        lower_case_token = token.lower()
+        if lower_case_token in self._caseless_operators:
+            return self._caseless_operators[lower_case_token]
+        pattern = self._word_operator_pattern
+        if pattern and (pattern.search(token) or pattern.search(lower_case_token)):
+            return None
+        return lower_case_token
+
+
+def _get_word_operators(grammar):
+    """
+    Return the operators of ``grammar`` made up of words which are
+    case-sensitive, and the ones which are not (by their lower-case spelling).
+
+    """
+    word = r"[\w%s]+$" % re.escape(grammar.get_token("identifier_spacing"))
+    word_operators = set()
+    caseless_operators = {}
+    for (name, value) in grammar.get_all_tokens().items():
+        if name in _NON_OPERATOR_TOKENS or not re.match(word, value, re.UNICODE):
+            continue
+        if name in _CASELESS_TOKENS:
+            caseless_operators[value.lower()] = value
+        else:
+            word_operators.add(value)
+    return (frozenset(word_operators), caseless_operators)
+
+
+def _make_word_operator_pattern(word_operators, caseless_operators):
+    """
+    Return the regular expression finding the operators made up of words
+    within other words, or ``None`` if there are no such operators.
+
+    """
+    operators = sorted(word_operators | frozenset(caseless_operators), key=len, reverse=True)
+    if not operators:
+        return None
+    return re.compile("|".join(re.escape(operator) for operator in operators), re.UNICODE)
+
+
+def _make_pattern(grammar):
+    """
+    Return the regular expression matching the tokens of the expressions
+    written in ``grammar``, or ``None`` if they can't be canonicalized.
+
+    """
+    if any(grammar.get_custom_generator(name) for name in grammar.known_generators):
+        return None
+    token = grammar.get_token
+    word = r"[\w%s]" % re.escape(token("identifier_spacing"))
+    operators = []
+    for (name, value) in grammar.get_all_tokens().items():
+        if name in _NON_OPERATOR_TOKENS:
+            continue
+        is_word = re.match(r"%s+$" % word, value, re.UNICODE)
+        if not is_word and (re.search(r"\s", value, re.UNICODE) or re.search(word, value, re.UNICODE)):
+            logger.debug("Expressions with token %r cannot be canonicalized", value)
+            return None
+        if not is_word:
+            operators.append(value)
+    # The longest operators go first, so "<=" is not read as "<" and "=":
+    operators.sort(key=len, reverse=True)
+    # The numbers and the identifiers are read at once, as Pyparsing does, and
+    # they must end where a word ends:
+    number = r"[%s]?(?:[0-9]{1,3}(?:%s[0-9]{3})+|[0-9]+)(?:%s[0-9]+)?(?!%s)" % (
+        re.escape(token("positive_sign") + token("negative_sign")), re.escape(token("thousands_separator")),
+        re.escape(token("decimal_separator")), word)
+    identifier = r"%s+(?:%s%s+)*" % (word, re.escape(token("namespace_separator")), word)
+    alternatives = [number, identifier] + [re.escape(operator) for operator in operators]
+    # Any other character makes the expression invalid:
+    return re.compile(r"\s*(?:(%s)|(%s)|(\S))" % (_STRING, "|".join(alternatives)), re.UNICODE)
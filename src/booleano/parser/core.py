@@ -2,13 +2,16 @@
 from __future__ import absolute_import, print_function, unicode_literals
 
 import logging
-from logging import getLogger
+import sys
+import timeit
+from collections import OrderedDict
 
-from booleano.exc import GrammarError
+from booleano.exc import GrammarError, InvalidOperationError, ParsingException
+from booleano.parser.canonical import ExpressionCanonicalizer
+from booleano.parser.metrics import ParseMetrics, get_tree_size
 from booleano.parser.parsers import ConvertibleParser, EvaluableParser
 
 logger = logging.getLogger(__name__)
-LOGGER = getLogger(__name__)
 
 
 class ParseManager(object):
@@ -20,7 +23,9 @@ class ParseManager(object):
 
     """
 
-    def __init__(self, generic_grammar, cache_limit=0, **localized_grammars):
+    def __init__(self, generic_grammar, cache_limit=0, intern_table=None, metrics=None, negative_cache_limit=0,
+                 negative_cache_ttl=None, canonicalize=False, cache_memory_limit=None, cache_ttl=None,
+                 **localized_grammars):
         """
 
         :param generic_grammar: The default grammar.
@@ -28,13 +33,46 @@ class ParseManager(object):
         :param cache_limit: The maximum amount of expressions to be cached
             internally (use ``None`` for no limit or ``0`` to disable caching).
         :type cache_limit: int
+        :param intern_table: The table used by the parsers to share equivalent
+            sub-trees, if any.
+        :type intern_table: :class:`booleano.operations.core.InternTable`
+        :param metrics: The object recording the metrics of this manager
+            (a new one is created by default).
+        :type metrics: :class:`booleano.parser.metrics.ParseMetrics`
+        :param negative_cache_limit: The maximum amount of invalid expressions
+            whose errors are cached (use ``None`` for no limit or ``0`` to
+            disable this cache).
+        :type negative_cache_limit: int
+        :param negative_cache_ttl: The amount of seconds the errors are
+            cached for (``None`` to keep them until they're evicted).
+        :type negative_cache_ttl: float
+        :param canonicalize: Whether to parse and cache the canonical spelling
+            of the expressions (see :mod:`booleano.parser.canonical`), so the
+            expressions which only differ in whitespace or in the case of
+            their operators and identifiers share their parse tree.
+        :type canonicalize: bool
+        :param cache_memory_limit: The approximate amount of bytes the cached
+            expressions and their parse trees can take, estimated from their
+            nodes and constant values (``None`` for no limit).
+        :type cache_memory_limit: int
+        :param cache_ttl: The amount of seconds the parse trees are cached
+            for (``None`` to keep them until they're evicted).
+        :type cache_ttl: float
 
         Additional keyword arguments, if any, will be used as custom grammars
         where each key represents the locale of the grammar in the value.
 
         """
-        self._cache = _Cache(cache_limit)
+        #: The metrics of this manager.
+        self.metrics = metrics or ParseMetrics()
+        self._cache = _Cache(cache_limit, self.metrics, cache_memory_limit, cache_ttl, self.metrics.clock)
+        self._negative_cache = _NegativeCache(negative_cache_limit, negative_cache_ttl, self.metrics.clock)
+        self.metrics.get_cache_usage = self._cache.get_usage
+        self._intern_table = intern_table
         self._generic_grammar = generic_grammar
+        self._canonicalizers = {}
+        if canonicalize:
+            self._canonicalizers[None] = ExpressionCanonicalizer(generic_grammar)
         self._parsers = {}
         for (locale, grammar) in localized_grammars.items():
             self.add_parser(locale, grammar)
@@ -65,15 +103,60 @@ class ParseManager(object):
         be parsed and the resulting parse tree will be cached and finally
         returned.
 
+        Likewise, if the negative cache is enabled, the errors raised because
+        ``expression`` is not valid are cached, and raised again right away
+        the next times it's parsed.
+
+        If the expressions are canonicalized, the canonical spelling of
+        ``expression`` is parsed and cached instead.
+
         """
+        metrics = self.metrics
+        start = metrics.clock()
+        if self._canonicalizers:
+            canonicalizer = self._canonicalizers.get(locale, self._canonicalizers[None])
+            expression = canonicalizer(expression)
         if self._cache.is_stored(locale, expression):
+            metrics.cache_hits[locale] += 1
             parse_tree = self._cache.get_tree(locale, expression)
         else:
+            error = self._negative_cache.get_error(locale, expression)
+            if error is not None:
+                metrics.negative_cache_hits[locale] += 1
+                raise error
+            metrics.cache_misses[locale] += 1
             parser = self._get_parser(locale)
-            parse_tree = parser(expression)
+            try:
+                parse_tree = parser(expression)
+            except Exception as exc:
+                if _is_expression_error(exc):
+                    self._negative_cache.store_error(locale, expression, exc)
+                raise
             self._cache.store_tree(locale, expression, parse_tree)
+        metrics.parse_latency.observe(metrics.clock() - start)
         return parse_tree
 
+    def invalidate(self, locale=None, predicate=None):
+        """
+        Remove cached parse trees and errors, so their expressions are parsed
+        again the next time.
+
+        :param locale: The locale of the expressions to be removed (``None``
+            for all the locales).
+        :type locale: basestring
+        :param predicate: The function which, given a cached expression,
+            returns whether it must be removed (``None`` to remove all the
+            expressions in ``locale``).
+        :return: The amount of parse trees removed.
+        :rtype: int
+
+        If the expressions are canonicalized, ``predicate`` receives their
+        canonical spelling.
+
+        """
+        self._negative_cache.invalidate(locale, predicate)
+        return self._cache.invalidate(locale, predicate)
+
     # Parser management
 
     def add_parser(self, locale, grammar):
@@ -91,6 +174,8 @@ class ParseManager(object):
                                locale)
         parser = self._define_parser(locale, grammar)
         self._parsers[locale] = parser
+        if self._canonicalizers:
+            self._canonicalizers[locale] = ExpressionCanonicalizer(grammar)
 
     def _get_parser(self, locale):
         """
@@ -102,13 +187,20 @@ class ParseManager(object):
         :rtype: Parser
 
         If there's no parser for grammar ``locale``, it will be created based
-        on the generic grammar.
+        on the generic grammar. The parser is built the first time it's
+        requested.
 
         """
         if locale not in self._parsers:
             self.add_parser(locale, self._generic_grammar)
-            LOGGER.info("Generated parser for unknown grammar %s", repr(locale))
-        return self._parsers[locale]
+            logger.info("Generated parser for unknown grammar %s", repr(locale))
+        parser = self._parsers[locale]
+        if not parser.is_built:
+            start = self.metrics.clock()
+            parser.build_parser()
+            self.metrics.parser_builds[locale] += 1
+            self.metrics.parser_build_time[locale] += self.metrics.clock() - start
+        return parser
 
     def _define_parser(self, locale, grammar):
         """
@@ -137,6 +229,9 @@ class EvaluableParseManager(ParseManager):
     """
 
     def __init__(self, symbol_table, generic_grammar, cache_limit=0,
+                 intern_table=None, metrics=None, negative_cache_limit=0,
+                 negative_cache_ttl=None, canonicalize=False,
+                 cache_memory_limit=None, cache_ttl=None,
                  **localized_grammars):
         """
 
@@ -147,6 +242,31 @@ class EvaluableParseManager(ParseManager):
         :param cache_limit: The maximum amount of expressions to be cached
             internally (use ``None`` for no limit or ``0`` to disable caching).
         :type cache_limit: int
+        :param intern_table: The table used by the parsers to share equivalent
+            sub-trees, if any.
+        :type intern_table: :class:`booleano.operations.core.InternTable`
+        :param metrics: The object recording the metrics of this manager
+            (a new one is created by default).
+        :type metrics: :class:`booleano.parser.metrics.ParseMetrics`
+        :param negative_cache_limit: The maximum amount of invalid expressions
+            whose errors are cached (use ``None`` for no limit or ``0`` to
+            disable this cache).
+        :type negative_cache_limit: int
+        :param negative_cache_ttl: The amount of seconds the errors are
+            cached for (``None`` to keep them until they're evicted).
+        :type negative_cache_ttl: float
+        :param canonicalize: Whether to parse and cache the canonical spelling
+            of the expressions (see :mod:`booleano.parser.canonical`), so the
+            expressions which only differ in whitespace or in the case of
+            their operators and identifiers share their parse tree.
+        :type canonicalize: bool
+        :param cache_memory_limit: The approximate amount of bytes the cached
+            expressions and their parse trees can take, estimated from their
+            nodes and constant values (``None`` for no limit).
+        :type cache_memory_limit: int
+        :param cache_ttl: The amount of seconds the parse trees are cached
+            for (``None`` to keep them until they're evicted).
+        :type cache_ttl: float
 
         Additional keyword arguments, if any, will be used as custom grammars
         where each key represents the locale of the grammar in the value.
@@ -155,6 +275,13 @@ class EvaluableParseManager(ParseManager):
         self._symbol_table = symbol_table
         super(EvaluableParseManager, self).__init__(generic_grammar,
                                                     cache_limit,
+                                                    intern_table,
+                                                    metrics,
+                                                    negative_cache_limit,
+                                                    negative_cache_ttl,
+                                                    canonicalize,
+                                                    cache_memory_limit,
+                                                    cache_ttl,
                                                     **localized_grammars)
 
     def evaluate(self, expression, locale, context):
@@ -179,7 +306,30 @@ class EvaluableParseManager(ParseManager):
 
         """
         tree = self.parse(expression, locale)
-        return tree(context)
+        metrics = self.metrics
+        start = metrics.clock()
+        result = tree(context)
+        metrics.evaluation_latency.observe(metrics.clock() - start)
+        return result
+
+    def evaluate_async(self, expression, locale, context):
+        """
+        Parse ``expression`` and return an awaitable resolving to its
+        evaluation result with ``context``.
+
+        This is the asynchronous version of :meth:`evaluate`, for the operands
+        whose values are awaitable (see
+        :meth:`booleano.parser.trees.EvaluableParseTree.evaluate_async`).
+
+        :raises BadExpressionError: If ``expression`` is bad-formed
+            according to the ``locale`` grammar.
+        :raises InvalidOperationError: If ``expression`` has an invalid
+            operation.
+        :raises ScopeError: If ``expression`` contains unknown identifiers.
+
+        """
+        tree = self.parse(expression, locale)
+        return tree.evaluate_async(context)
 
     def _define_parser(self, locale, grammar):
         """
@@ -194,7 +344,7 @@ class EvaluableParseManager(ParseManager):
 
         """
         namespace = self._symbol_table.get_namespace(locale)
-        parser = EvaluableParser(grammar, namespace)
+        parser = EvaluableParser(grammar, namespace, self._intern_table)
         return parser
 
 
@@ -220,7 +370,7 @@ class ConvertibleParseManager(ParseManager):
         Here the ``locale`` is not used.
 
         """
-        parser = ConvertibleParser(grammar)
+        parser = ConvertibleParser(grammar, self._intern_table)
         return parser
 
 
@@ -228,21 +378,48 @@ class _Cache(object):
     """
     Cache handling for a parse manager.
 
+    The parse trees are evicted in least-recently-used order when there are
+    too many of them or they take too much memory, and they are discarded
+    when they expire.
+
     """
 
-    def __init__(self, limit):
+    def __init__(self, limit, metrics=None, memory_limit=None, ttl=None, clock=timeit.default_timer):
         """
         Set up the cache with ``limit``.
 
         :param limit: The maximum amount of expressions that can be cached
             (``None`` for no limit, ``0`` to disable caching).
         :type limit: int
+        :param metrics: The metrics where the evictions are counted, if any.
+        :type metrics: :class:`booleano.parser.metrics.ParseMetrics`
+        :param memory_limit: The approximate amount of bytes the cached
+            expressions and their parse trees can take (``None`` for no
+            limit).
+        :type memory_limit: int
+        :param ttl: The amount of seconds the parse trees are kept for
+            (``None`` for no expiry).
+        :type ttl: float
+        :param clock: The function returning the current time in seconds.
 
         """
         self.limit = limit
+        self.metrics = metrics
+        self.memory_limit = memory_limit
+        self.ttl = ttl
+        self.clock = clock
         self.counter = 0
+        #: The approximate amount of bytes taken by the cached items (only
+        #: measured when there's a ``memory_limit``).
+        self.size = 0
         self.cache_by_locale = {}
-        self.latest_expressions = []
+        # The size and expiry of each item, the least recently used first:
+        self._entries = OrderedDict()
+
+    @property
+    def latest_expressions(self):
+        """The ``(locale, expression)`` pairs cached, the latest used first."""
+        return list(reversed(self._entries))
 
     def is_stored(self, locale, expression):
         """
@@ -255,13 +432,19 @@ class _Cache(object):
         :return: Whether ``expression`` is included in the cache or not.
         :rtype: bool
 
+        If ``expression`` has expired, it's removed from the cache.
+
         """
-        stored = False
         try:
-            stored = expression in self.cache_by_locale[locale]
+            (_, expiry) = self._entries[(locale, expression)]
         except KeyError:
-            pass
-        return stored
+            return False
+        if expiry is not None and expiry <= self.clock():
+            self.remove_tree(locale, expression)
+            if self.metrics is not None:
+                self.metrics.cache_expirations[locale] += 1
+            return False
+        return True
 
     def get_tree(self, locale, expression):
         """
@@ -292,19 +475,30 @@ class _Cache(object):
         :param parse_tree: The parse tree of ``expression`` in ``locale``.
         :type parse_tree: ParseTree
 
-        If caching is disabled, it won't do anything.
+        If caching is disabled, or the ``parse_tree`` alone would take more
+        memory than allowed, it won't do anything.
 
         """
         if self.limit == 0:
             # Cache is disabled.
             return
+        if self.memory_limit is None:
+            # The size of the items is only needed to enforce the limit:
+            size = 0
+        else:
+            size = sys.getsizeof(expression) + get_tree_size(parse_tree, values=True)
+            if size > self.memory_limit:
+                return
+        if (locale, expression) in self._entries:
+            self.remove_tree(locale, expression)
         # Cache is enabled, let's store it:
-        self.remove_oldest()
-        if locale not in self.cache_by_locale:
-            self.cache_by_locale[locale] = {}
-        self.cache_by_locale[locale][expression] = parse_tree
+        expiry = None if self.ttl is None else self.clock() + self.ttl
+        self.cache_by_locale.setdefault(locale, {})[expression] = parse_tree
+        self._entries[(locale, expression)] = (size, expiry)
         self.counter += 1
-        self.touch_tree(locale, expression)
+        self.size += size
+        while self._is_full():
+            self.remove_oldest()
 
     def touch_tree(self, locale, expression):
         """
@@ -317,22 +511,142 @@ class _Cache(object):
 
         """
         tree_indexes = (locale, expression)
-        if tree_indexes in self.latest_expressions:
-            # Removing the existing occurence:
-            self.latest_expressions.remove(tree_indexes)
-        self.latest_expressions.insert(0, tree_indexes)
+        self._entries[tree_indexes] = self._entries.pop(tree_indexes)
 
     def remove_oldest(self):
         """
-        Remove the oldest item in the cache.
-
-        It won't do anything if there's no caching limit, the limit has not
-        been reached or there's nothing cached.
+        Remove the least recently used item in the cache, if any.
 
         """
-        if (self.limit is None or self.counter < self.limit or
-                not self.latest_expressions):
+        if not self._entries:
             return
-        (locale, expression) = self.latest_expressions.pop(-1)
-        del self.cache_by_locale[locale][expression]
+        (locale, expression) = next(iter(self._entries))
+        self.remove_tree(locale, expression)
+        if self.metrics is not None:
+            self.metrics.cache_evictions[locale] += 1
+
+    def remove_tree(self, locale, expression):
+        """
+        Remove the parse tree of ``expression`` in ``locale`` from the cache.
+
+        :raises KeyError: If the ``expression`` isn't cached.
+
+        """
+        (size, _) = self._entries.pop((locale, expression))
+        trees = self.cache_by_locale[locale]
+        del trees[expression]
+        if not trees:
+            del self.cache_by_locale[locale]
         self.counter -= 1
+        self.size -= size
+
+    def invalidate(self, locale=None, predicate=None):
+        """
+        Remove the parse trees of the expressions in ``locale`` (or in all the
+        locales if it's ``None``) for which ``predicate`` returns ``True``
+        (or all of them if it's ``None``).
+
+        :return: The amount of parse trees removed.
+        :rtype: int
+
+        """
+        removed = 0
+        for (tree_locale, expression) in list(self._entries):
+            if locale is not None and tree_locale != locale:
+                continue
+            if predicate is None or predicate(expression):
+                self.remove_tree(tree_locale, expression)
+                removed += 1
+        return removed
+
+    def get_usage(self):
+        """
+        Return the amount of parse trees in the cache and the approximate
+        amount of bytes they take (``None`` if there's no ``memory_limit``).
+
+        :rtype: tuple
+
+        """
+        return (self.counter, None if self.memory_limit is None else self.size)
+
+    def _is_full(self):
+        if self.limit is not None and self.counter > self.limit:
+            return True
+        return self.memory_limit is not None and self.size > self.memory_limit
+
+
+class _NegativeCache(object):
+    """
+    Cache of the errors raised by invalid expressions in a parse manager.
+
+    Only the class and the arguments of each error are kept, so the
+    tracebacks and the objects they refer to are not retained.
+
+    """
+
+    def __init__(self, limit, ttl=None, clock=timeit.default_timer):
+        """
+
+        :param limit: The maximum amount of expressions whose errors are
+            cached (``None`` for no limit, ``0`` to disable caching).
+        :type limit: int
+        :param ttl: The amount of seconds the errors are kept for (``None``
+            for no expiry).
+        :type ttl: float
+        :param clock: The function returning the current time in seconds.
+
+        """
+        self.limit = limit
+        self.ttl = ttl
+        self.clock = clock
+        self.errors = OrderedDict()
+
+    def get_error(self, locale, expression):
+        """
+        Return a new instance of the error raised by ``expression`` in
+        ``locale``, or ``None`` if it's not cached or it expired.
+
+        """
+        try:
+            (error_class, error_arguments, expiry) = self.errors[(locale, expression)]
+        except KeyError:
+            return None
+        if expiry is not None and expiry <= self.clock():
+            del self.errors[(locale, expression)]
+            return None
+        return error_class(*error_arguments)
+
+    def store_error(self, locale, expression, error):
+        """
+        Cache the ``error`` raised by ``expression`` in ``locale``, evicting
+        the oldest error if the limit has been reached.
+
+        If caching is disabled, it won't do anything.
+
+        """
+        if self.limit == 0:
+            return
+        expiry = None if self.ttl is None else self.clock() + self.ttl
+        self.errors[(locale, expression)] = (error.__class__, error.args, expiry)
+        if self.limit is not None and len(self.errors) > self.limit:
+            self.errors.popitem(last=False)
+
+    def invalidate(self, locale=None, predicate=None):
+        """
+        Remove the errors of the expressions in ``locale`` (or in all the
+        locales if it's ``None``) for which ``predicate`` returns ``True``
+        (or all of them if it's ``None``).
+
+        """
+        for (error_locale, expression) in list(self.errors):
+            if locale is not None and error_locale != locale:
+                continue
+            if predicate is None or predicate(expression):
+                del self.errors[(error_locale, expression)]
+
+
+def _is_expression_error(exception):
+    """Check if ``exception`` was raised because an expression is not valid."""
+    from pyparsing import ParseBaseException
+
+    return isinstance(exception, (ParsingException, InvalidOperationError, ParseBaseException))
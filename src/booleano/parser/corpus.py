@@ -0,0 +1,457 @@
+# -*- coding: utf-8 -*-
+"""
+Synthetic corpora of expressions and contexts, for load tests and fuzzing.
+
+A :class:`CorpusGenerator` writes random expressions which are valid in a
+grammar and use the variables of a symbol table, along with contexts holding
+values for those variables. The constants in the expressions are drawn from
+the same distributions as the values in the contexts, so the comparisons
+are true or false in realistic proportions.
+
+The corpora are produced lazily and can be streamed into files, so millions
+of rules or records can be written without holding them in memory::
+
+    generator = CorpusGenerator(make_symbol_table(20, namespace_depth=2), seed=1)
+    generator.write_rules("rules.tsv", 1000000)
+    generator.write_contexts("records.jsonl", 1000000)
+
+Only the native variables (:class:`booleano.operations.variables.NativeVariable`)
+bound to a context item, by name or through a
+:class:`booleano.operations.variables.ContextPath`, are used.
+
+"""
+from __future__ import absolute_import, division, unicode_literals
+
+import datetime
+import io
+import json
+import logging
+import random
+from bisect import bisect
+
+import six
+
+from booleano.operations.variables import (BooleanVariable, ContextPath, DateTimeVariable, DateVariable,
+                                           DurationVariable, NativeVariable, NumberVariable, SetVariable,
+                                           StringVariable)
+from booleano.parser.grammar import Grammar
+from booleano.parser.scope import Bind, SymbolTable
+
+logger = logging.getLogger(__name__)
+
+__all__ = ("CorpusGenerator", "make_symbol_table")
+
+#: The relative weights of the connectives and the comparisons, by the names
+#: of their tokens.
+DEFAULT_WEIGHTS = {
+    "and": 4,
+    "or": 3,
+    "xor": 1,
+    "eq": 4,
+    "ne": 2,
+    "lt": 2,
+    "gt": 2,
+    "le": 1,
+    "ge": 1,
+    "belongs_to": 2,
+    "is_subset": 1,
+}
+
+_CONNECTIVES = ("and", "or", "xor")
+
+_INEQUALITIES = ("eq", "ne", "lt", "gt", "le", "ge")
+
+# The kinds of variables, with their classes (subclasses first) and the
+# comparisons they support:
+_KINDS = (
+    ("boolean", BooleanVariable, ()),
+    ("number", NumberVariable, _INEQUALITIES + ("belongs_to", )),
+    ("set", SetVariable, ("belongs_to", "is_subset")),
+    ("string", StringVariable, ("eq", "ne", "belongs_to")),
+    ("date", DateVariable, _INEQUALITIES),
+    ("datetime", DateTimeVariable, _INEQUALITIES),
+    ("duration", DurationVariable, _INEQUALITIES),
+)
+
+_COMPARISONS = {kind: comparisons for (kind, _, comparisons) in _KINDS}
+
+# Variables of other classes are only compared for equality, with values
+# from the distributions they're given:
+_COMPARISONS["generic"] = ("eq", "ne")
+
+_EPOCH = datetime.datetime(2000, 1, 1)
+
+
+class CorpusGenerator(object):
+    """
+    Generator of random expressions and contexts for the variables of a
+    symbol table.
+
+    The same ``seed`` always produces the same expressions and contexts,
+    whichever is produced first.
+
+    """
+
+    def __init__(self, symbol_table, grammar=None, seed=None, max_depth=3, max_width=3, branching=0.5,
+                 negation=0.1, weights=None, set_size=(1, 5), vocabulary=1000, skew=1.0, distributions=None):
+        """
+
+        :param symbol_table: The symbol table with the variables to be used.
+        :type symbol_table: :class:`booleano.parser.scope.SymbolTable`
+        :param grammar: The grammar of the expressions (defaults to the
+            generic grammar).
+        :type grammar: :class:`booleano.parser.Grammar`
+        :param seed: The seed of the random generators.
+        :param max_depth: The maximum nesting of the connectives (``0``
+            makes each expression a single comparison).
+        :type max_depth: int
+        :param max_width: The maximum amount of operands joined by each
+            connective.
+        :type max_width: int
+        :param branching: The probability that a nested operand is a
+            connective instead of a comparison.
+        :type branching: float
+        :param negation: The probability that an operand is negated.
+        :type negation: float
+        :param weights: The relative weights of the connectives and the
+            comparisons, by token name, overriding :data:`DEFAULT_WEIGHTS`.
+        :type weights: dict
+        :param set_size: The minimum and maximum amount of items in the sets,
+            in the expressions and in the contexts.
+        :type set_size: tuple
+        :param vocabulary: The amount of different words in strings and sets.
+        :type vocabulary: int
+        :param skew: How much the first words of the vocabulary are favored
+            (``1`` draws them uniformly).
+        :type skew: float
+        :param distributions: The functions drawing the values of some
+            variables, by their full names in the expressions. Each one
+            receives a :class:`random.Random` instance.
+        :type distributions: dict
+        :raises ValueError: If the symbol table has no usable variables.
+
+        """
+        self.grammar = grammar or Grammar()
+        self.max_depth = max_depth
+        self.max_width = max(max_width, 2)
+        self.branching = branching
+        self.negation = negation
+        self.weights = dict(DEFAULT_WEIGHTS, **(weights or {}))
+        self.set_size = set_size
+        self.skew = skew
+        self.words = ["w%d" % index for index in range(vocabulary)]
+        distributions = distributions or {}
+        #: The variables used, as (name, kind, keys, distribution) tuples.
+        self.variables = []
+        for (name, variable) in self._get_bindings(symbol_table):
+            kind = _get_kind(variable)
+            keys = _get_keys(variable)
+            distribution = distributions.get(name)
+            if distribution is None and kind != "generic":
+                distribution = getattr(self, "_draw_%s" % kind)
+            if keys is None or distribution is None:
+                logger.debug("Variable %s cannot be used in the corpus", name)
+                continue
+            self.variables.append((name, kind, keys, distribution))
+        if not self.variables:
+            raise ValueError("Symbol table %s has no variables to be used in the corpus" % symbol_table)
+        self._connectives = _WeightedChoice([(name, self.weights[name]) for name in _CONNECTIVES])
+        self._comparisons = {
+            kind: _WeightedChoice([(name, self.weights[name]) for name in comparisons])
+            for (kind, comparisons) in _COMPARISONS.items()
+        }
+        master_random = random.Random(seed)
+        self._expression_random = random.Random(master_random.getrandbits(64))
+        self._context_random = random.Random(master_random.getrandbits(64))
+
+    # Expressions
+
+    def expression(self):
+        """
+        Return a random expression.
+
+        :rtype: basestring
+
+        """
+        return self._make_expression(self._expression_random, 0)
+
+    def expressions(self, count):
+        """
+        Iterate over ``count`` random expressions.
+
+        """
+        for _ in six.moves.range(count):
+            yield self.expression()
+
+    def _make_expression(self, random_, depth):
+        token = self.grammar.get_token
+        negated = random_.random() < self.negation
+        if depth < self.max_depth and (depth == 0 or random_.random() < self.branching):
+            connective = self._connectives(random_)
+            width = random_.randint(2, self.max_width)
+            operands = [self._make_expression(random_, depth + 1) for _ in six.moves.range(width)]
+            expression = (" %s " % token(connective)).join(operands)
+            if depth or negated:
+                expression = "%s%s%s" % (token("group_start"), expression, token("group_end"))
+        else:
+            expression = self._make_comparison(random_)
+        if negated:
+            expression = "%s %s" % (token("not"), expression)
+        return expression
+
+    def _make_comparison(self, random_):
+        (name, kind, _, distribution) = random_.choice(self.variables)
+        comparisons = self._comparisons[kind]
+        if not comparisons:
+            return name
+        comparison = comparisons(random_)
+        token = self.grammar.get_token(comparison)
+        if comparison == "is_subset":
+            items = sorted(distribution(random_))
+            items = random_.sample(items, random_.randint(1, len(items))) if items else [random_.choice(self.words)]
+            return "%s %s %s" % (self._format_set(items, "string"), token, name)
+        if comparison == "belongs_to" and kind == "set":
+            items = sorted(distribution(random_)) or self.words
+            return "%s %s %s" % (self._format(random_.choice(items), "string"), token, name)
+        if comparison == "belongs_to" and kind == "string":
+            return "%s %s %s" % (self._format(distribution(random_), kind), token, name)
+        if comparison == "belongs_to":
+            items = [distribution(random_) for _ in six.moves.range(random_.randint(*self.set_size))]
+            return "%s %s %s" % (name, token, self._format_set(items, kind))
+        return "%s %s %s" % (name, token, self._format(distribution(random_), kind))
+
+    def _format(self, value, kind):
+        """Return the constant ``value`` as written in the expressions."""
+        if kind == "date":
+            value = value.strftime("%Y-%m-%d")
+        elif kind == "datetime":
+            value = value.strftime("%Y-%m-%d %H:%M:%S")
+        elif kind == "duration":
+            value = "%dd %ds" % (value.days, value.seconds)
+        elif isinstance(value, bool):
+            value = int(value)
+        if isinstance(value, six.integer_types):
+            return six.text_type(value)
+        if isinstance(value, float):
+            number = "%.6f" % abs(value)
+            number = number.rstrip("0").rstrip(".").replace(".", self.grammar.get_token("decimal_separator"))
+            return "%s%s" % (self.grammar.get_token("negative_sign") if value < 0 else "", number)
+        return '"%s"' % value
+
+    def _format_set(self, items, kind):
+        token = self.grammar.get_token
+        separator = "%s " % token("element_separator")
+        return "%s%s%s" % (token("set_start"), separator.join(self._format(item, kind) for item in items),
+                           token("set_end"))
+
+    # Contexts
+
+    def context(self):
+        """
+        Return a random context, with nested dictionaries for the variables
+        which read nested items.
+
+        :rtype: dict
+
+        """
+        random_ = self._context_random
+        context = {}
+        for (_, _, keys, distribution) in self.variables:
+            items = context
+            for key in keys[:-1]:
+                items = items.setdefault(key, {})
+            items[keys[-1]] = distribution(random_)
+        return context
+
+    def contexts(self, count):
+        """
+        Iterate over ``count`` random contexts.
+
+        """
+        for _ in six.moves.range(count):
+            yield self.context()
+
+    # Files
+
+    def write_expressions(self, output, count):
+        """
+        Write ``count`` random expressions to ``output``, one per line.
+
+        :param output: The path to the file or a file open in text mode.
+        :return: The amount of expressions written.
+        :rtype: int
+
+        """
+        return _write_lines(output, self.expressions(count))
+
+    def write_rules(self, output, count, label="rule_%d"):
+        """
+        Write ``count`` random rules to ``output``, as read by the
+        :mod:`booleano.cli` tool: a label and an expression per line,
+        separated by a tab.
+
+        :param output: The path to the file or a file open in text mode.
+        :param label: The format of the labels, with the index of each rule.
+        :type label: basestring
+        :return: The amount of rules written.
+        :rtype: int
+
+        """
+        rules = ("%s\t%s" % (label % index, expression) for (index, expression) in enumerate(self.expressions(count)))
+        return _write_lines(output, rules)
+
+    def write_contexts(self, output, count):
+        """
+        Write ``count`` random contexts to ``output`` as JSON lines.
+
+        Sets are written as sorted lists, dates and datetimes in the ISO
+        format and durations in seconds.
+
+        :param output: The path to the file or a file open in text mode.
+        :return: The amount of contexts written.
+        :rtype: int
+
+        """
+        records = (six.text_type(json.dumps(context, default=_to_json, sort_keys=True))
+                   for context in self.contexts(count))
+        return _write_lines(output, records)
+
+    # Distributions
+
+    def _draw_word(self, random_):
+        return self.words[int(len(self.words) * random_.random() ** self.skew)]
+
+    def _draw_boolean(self, random_):
+        return random_.random() < 0.5
+
+    def _draw_number(self, random_):
+        return random_.randint(0, 100)
+
+    def _draw_string(self, random_):
+        return self._draw_word(random_)
+
+    def _draw_set(self, random_):
+        return {self._draw_word(random_) for _ in six.moves.range(random_.randint(*self.set_size))}
+
+    def _draw_date(self, random_):
+        return (_EPOCH + datetime.timedelta(days=random_.randint(0, 9131))).date()
+
+    def _draw_datetime(self, random_):
+        return _EPOCH + datetime.timedelta(seconds=random_.randint(0, 9131 * 86400))
+
+    def _draw_duration(self, random_):
+        return datetime.timedelta(days=random_.randint(0, 30), seconds=random_.randint(0, 86399))
+
+    def _get_bindings(self, symbol_table, namespace=()):
+        """Iterate over the bindings of the variables and their full names."""
+        separator = self.grammar.get_token("namespace_separator")
+        for obj in sorted(symbol_table.objects, key=lambda obj: obj.global_name):
+            if isinstance(obj, Bind) and isinstance(obj.operand, NativeVariable):
+                yield (separator.join(namespace + (obj.global_name, )), obj.operand)
+        for subtable in sorted(symbol_table.subtables, key=lambda table: table.global_name):
+            for binding in self._get_bindings(subtable, namespace + (subtable.global_name, )):
+                yield binding
+
+
+class _WeightedChoice(object):
+    """Choice of an item by weight."""
+
+    def __init__(self, weighted_items):
+        self.items = []
+        self.cumulative_weights = []
+        total = 0
+        for (item, weight) in weighted_items:
+            if weight > 0:
+                total += weight
+                self.items.append(item)
+                self.cumulative_weights.append(total)
+
+    def __call__(self, random_):
+        if not self.items:
+            raise ValueError("All the operators have a weight of zero")
+        return self.items[bisect(self.cumulative_weights, random_.random() * self.cumulative_weights[-1])]
+
+    def __bool__(self):
+        return bool(self.items)
+
+    __nonzero__ = __bool__
+
+
+def make_symbol_table(variables, namespace_depth=0, namespace_width=2,
+                      kinds=("number", "string", "set", "boolean")):
+    """
+    Return a symbol table with synthetic variables, spread over nested
+    namespaces.
+
+    :param variables: The amount of variables.
+    :type variables: int
+    :param namespace_depth: The depth of the nested namespaces.
+    :type namespace_depth: int
+    :param namespace_width: The amount of namespaces in each namespace.
+    :type namespace_width: int
+    :param kinds: The kinds of variables, assigned in turns: ``"boolean"``,
+        ``"number"``, ``"string"``, ``"set"``, ``"date"``, ``"datetime"``
+        or ``"duration"``.
+    :type kinds: tuple
+    :rtype: :class:`booleano.parser.scope.SymbolTable`
+
+    The variables in the namespaces read the items of nested dictionaries,
+    as the contexts of :class:`CorpusGenerator` hold them.
+
+    """
+    classes = {kind: variable_class for (kind, variable_class, _) in _KINDS}
+    root = SymbolTable("root", [])
+    tables = [((), root)]
+    for (namespace, table) in tables:
+        if len(namespace) < namespace_depth:
+            for index in six.moves.range(namespace_width):
+                name = "ns%d" % index
+                subtable = SymbolTable(name, [])
+                table.add_subtable(subtable)
+                tables.append((namespace + (name, ), subtable))
+    for index in six.moves.range(variables):
+        kind = kinds[index % len(kinds)]
+        (namespace, table) = tables[index % len(tables)]
+        name = "%s_%d" % (kind, index)
+        context_name = ContextPath.from_keys(namespace + (name, )) if namespace else name
+        table.add_object(Bind(name, classes[kind](context_name)))
+    return root
+
+
+def _get_kind(variable):
+    for (kind, variable_class, _) in _KINDS:
+        if isinstance(variable, variable_class):
+            return kind
+    return "generic"
+
+
+def _get_keys(variable):
+    """Return the keys of the context item read by ``variable``, if known."""
+    context_name = variable.context_name
+    if isinstance(context_name, ContextPath):
+        return tuple(key for (_, key) in context_name.steps)
+    if callable(context_name):
+        return None
+    return (context_name, )
+
+
+def _to_json(value):
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    if isinstance(value, datetime.timedelta):
+        return value.total_seconds()
+    raise TypeError("%r is not JSON serializable" % value)
+
+
+def _write_lines(output, lines):
+    if isinstance(output, six.string_types):
+        with io.open(output, "w", encoding="utf-8") as output_file:
+            return _write_lines(output_file, lines)
+    count = 0
+    for line in lines:
+        output.write(line)
+        output.write("\n")
+        count += 1
+    return count
@@ -0,0 +1,254 @@
+# -*- coding: utf-8 -*-
+"""
+Evaluation of many parse trees over large batches of contexts, spread over
+several worker processes.
+
+Evaluating an :class:`~booleano.parser.trees.EvaluableParseTree` is pure
+Python work, so a single process can only use one core. The executor in this
+module ships the trees to a pool of worker processes **once**, as flat
+:class:`~booleano.operations.program.Program` objects, then streams the
+contexts to them in chunks and collects the results in the original order.
+
+"""
+from __future__ import absolute_import, print_function, unicode_literals
+
+import logging
+import multiprocessing
+import pickle
+import time
+from collections import deque
+
+from booleano.parser.core import EvaluableParseManager
+
+logger = logging.getLogger(__name__)
+
+__all__ = ("ParallelEvaluator", )
+
+#: The programs of the parse trees available in the current worker process.
+_worker_programs = ()
+
+#: The exception raised while setting up the current worker process, if any.
+_worker_error = None
+
+
+def _init_worker(payload):
+    """
+    Set up the parse trees of the current worker process from ``payload``.
+
+    :param payload: A pair whose first item tells how the trees were sent
+        (``"programs"`` or ``"source"``) and whose second item contains them.
+    :type payload: tuple
+
+    An exception raised here would make the pool start new workers over and
+    over, so it's kept and raised again by each chunk instead.
+
+    """
+    global _worker_programs, _worker_error
+    try:
+        _worker_programs = _load_programs(payload)
+    except Exception as error:
+        logger.exception("Could not set up the parse trees of the worker")
+        _worker_error = error
+
+
+def _load_programs(payload):
+    """Return the programs of the parse trees in ``payload``."""
+    kind, data = payload
+    if kind == "programs":
+        return tuple(pickle.loads(data))
+    symbol_table_factory, grammar, localized_grammars, expressions, locale = data
+    manager = EvaluableParseManager(symbol_table_factory(), grammar, **localized_grammars)
+    return tuple(manager.parse(expression, locale).compile() for expression in expressions)
+
+
+def _evaluate_chunk(contexts):
+    """
+    Evaluate all the trees of the current worker against each of the
+    ``contexts``.
+
+    :return: A pair with the results (one tuple of booleans per context) and
+        the time it took to compute them.
+    :rtype: tuple
+
+    """
+    if _worker_error is not None:
+        raise _worker_error
+    start = time.time()
+    programs = _worker_programs
+    results = [tuple(bool(program(context)) for program in programs) for context in contexts]
+    return results, time.time() - start
+
+
+class ParallelEvaluator(object):
+    """
+    Evaluate a fixed set of parse trees over a stream of contexts using a pool
+    of worker processes.
+
+    The trees are sent to each worker only once, when the pool is started,
+    either:
+
+    * as their serialized (pickled) programs, when ``trees`` is passed, or
+    * as their source ``expressions`` plus a ``symbol_table_factory``, so each
+      worker parses them with its own :class:`EvaluableParseManager`. This is
+      required when the bound operands cannot be pickled.
+
+    Then :meth:`evaluate` streams the contexts to the workers in chunks,
+    keeping at most ``max_pending`` chunks in flight so huge (or endless)
+    inputs never pile up in memory.
+
+    It can be used as a context manager, in which case the pool is closed
+    on exit::
+
+        with ParallelEvaluator(expressions=rules, symbol_table_factory=make_table,
+                               grammar=Grammar()) as executor:
+            for results in executor.evaluate(records):
+                ...
+
+    """
+
+    #: The amount of contexts in the first chunk when the chunk size is
+    #: computed automatically.
+    initial_chunk_size = 64
+
+    def __init__(self, trees=None, expressions=None, symbol_table_factory=None, grammar=None,
+                 locale=None, processes=None, chunk_size=None, max_pending=None,
+                 target_chunk_duration=0.1, max_chunk_size=10000, localized_grammars=None):
+        """
+
+        :param trees: The parse trees to be evaluated, whose operands must be
+            picklable.
+        :type trees: list
+        :param expressions: The expressions to be parsed by the workers, if
+            ``trees`` is not set.
+        :type expressions: list
+        :param symbol_table_factory: A picklable callable returning the symbol
+            table to parse ``expressions`` with.
+        :param grammar: The generic grammar to parse ``expressions`` with.
+        :type grammar: :class:`booleano.parser.Grammar`
+        :param locale: The locale of ``expressions``.
+        :type locale: basestring
+        :param processes: The amount of worker processes (defaults to the
+            number of CPUs).
+        :type processes: int
+        :param chunk_size: The amount of contexts sent to a worker at once;
+            if ``None``, it's adjusted on the fly so that each chunk takes
+            about ``target_chunk_duration`` seconds.
+        :type chunk_size: int
+        :param max_pending: The maximum amount of chunks sent to the workers
+            but not yet collected (defaults to twice the number of processes).
+        :type max_pending: int
+        :param target_chunk_duration: The time, in seconds, a chunk should
+            take to be evaluated when ``chunk_size`` is ``None``.
+        :type target_chunk_duration: float
+        :param max_chunk_size: The upper bound for chunks sized automatically.
+        :type max_chunk_size: int
+        :param localized_grammars: The grammars for other locales, if any.
+        :type localized_grammars: dict
+        :raises ValueError: If neither ``trees`` nor ``expressions`` and
+            ``symbol_table_factory`` are set.
+
+        The ``expressions`` are parsed here too, so the errors in them or in
+        the symbol table are raised before the workers are started.
+
+        """
+        if trees is not None:
+            trees = list(trees)
+            programs = [tree.compile() for tree in trees]
+            payload = ("programs", pickle.dumps(programs, pickle.HIGHEST_PROTOCOL))
+            self.size = len(trees)
+        elif expressions is not None and symbol_table_factory is not None:
+            expressions = list(expressions)
+            payload = ("source", (symbol_table_factory, grammar, localized_grammars or {},
+                                  expressions, locale))
+            _load_programs(payload)
+            self.size = len(expressions)
+        else:
+            raise ValueError("Either the trees or the expressions along with a "
+                             "symbol table factory must be set")
+        self.processes = processes or multiprocessing.cpu_count()
+        self.chunk_size = chunk_size
+        self.max_pending = max_pending or 2 * self.processes
+        self.target_chunk_duration = target_chunk_duration
+        self.max_chunk_size = max_chunk_size
+        self._seconds_per_context = None
+        self._pool = multiprocessing.Pool(self.processes, initializer=_init_worker,
+                                          initargs=(payload, ))
+
+    def evaluate(self, contexts):
+        """
+        Evaluate all the trees against each of the ``contexts``.
+
+        :param contexts: The contexts to be evaluated, which must be
+            picklable. They are consumed lazily.
+        :type contexts: iterable
+        :return: One tuple per context, in the same order as ``contexts``,
+            with the truth value of each tree.
+        :rtype: generator
+
+        Exceptions raised by a tree are re-raised here, when the chunk that
+        contains the faulty context is collected.
+
+        """
+        contexts = iter(contexts)
+        pending = deque()
+        exhausted = False
+        while True:
+            while not exhausted and len(pending) < self.max_pending:
+                chunk = self._next_chunk(contexts)
+                if not chunk:
+                    exhausted = True
+                    break
+                pending.append((len(chunk), self._pool.apply_async(_evaluate_chunk, (chunk, ))))
+            if not pending:
+                return
+            chunk_length, async_result = pending.popleft()
+            results, duration = async_result.get()
+            self._record_duration(chunk_length, duration)
+            for result in results:
+                yield result
+
+    def close(self):
+        """Stop the worker processes."""
+        self._pool.terminate()
+        self._pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _next_chunk(self, contexts):
+        """Take the next chunk of contexts out of the ``contexts`` iterator."""
+        chunk = []
+        size = self._get_chunk_size()
+        for context in contexts:
+            chunk.append(context)
+            if len(chunk) >= size:
+                break
+        return chunk
+
+    def _get_chunk_size(self):
+        """
+        Return the amount of contexts to be included in the next chunk.
+
+        When it's not fixed, it's derived from the time the previous chunks
+        took per context.
+
+        """
+        if self.chunk_size:
+            return self.chunk_size
+        if not self._seconds_per_context:
+            return self.initial_chunk_size
+        size = int(self.target_chunk_duration / self._seconds_per_context)
+        return max(1, min(size, self.max_chunk_size))
+
+    def _record_duration(self, chunk_length, duration):
+        """Update the moving average of the time spent per context."""
+        if not chunk_length or duration <= 0:
+            return
+        seconds_per_context = duration / chunk_length
+        if self._seconds_per_context is None:
+            self._seconds_per_context = seconds_per_context
+        else:
+            self._seconds_per_context = 0.7 * self._seconds_per_context + 0.3 * seconds_per_context
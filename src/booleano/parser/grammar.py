@@ -89,6 +89,13 @@ class Grammar(object):
         'superset_right_in_is_subset': True,
         'set_right_in_contains': True,
         'optional_positive_sign': True,
+        # Packrat parsing (memoization of the results of the elements of the
+        # grammar while parsing one expression) and the maximum amount of
+        # results memoized (``None`` for no limit), which Pyparsing takes
+        # from the first parser enabling it. The memo takes some 2 KB per
+        # result, and it grows with the length of the expressions:
+        'packrat': True,
+        'packrat_cache_size': 10000,
     }
     """The default settings for the grammar."""
 
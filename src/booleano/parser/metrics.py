@@ -0,0 +1,334 @@
+# -*- coding: utf-8 -*-
+"""
+Metrics of the parse managers.
+
+Each parse manager keeps a :class:`ParseMetrics` object with the hits, misses
+and evictions of its cache (per locale), the latencies of the parses and
+evaluations, the amount of parsers built and the time it took, and the size
+of its cache.
+
+The metrics can be exported as a plain dictionary or, through a sink such as
+:class:`PrometheusSink`, in any other format.
+
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import logging
+import sys
+import timeit
+from bisect import bisect_left
+from collections import defaultdict
+
+import six
+
+logger = logging.getLogger(__name__)
+
+__all__ = ("ParseMetrics", "Histogram", "PrometheusSink", "format_prometheus")
+
+#: The upper bounds of the buckets of the latency histograms, in seconds.
+DEFAULT_BUCKETS = (1e-6, 5e-6, 1e-5, 5e-5, 1e-4, 5e-4, 1e-3, 5e-3, 1e-2, 5e-2, 0.1, 0.5, 1.0, 5.0)
+
+# The attributes of the operation nodes which hold other nodes:
+_NODE_ATTRIBUTES = ("master_operand", "slave_operand", "operand")
+
+
+class Histogram(object):
+    """Distribution of observed values, in buckets."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        """
+
+        :param buckets: The upper bounds of the buckets, in increasing order.
+            Values above the last one are only counted in the total.
+        :type buckets: tuple
+
+        """
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        """Record ``value``."""
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def as_dict(self):
+        """
+        Return the cumulative count of values at or below each bound, along
+        with the total count and sum.
+
+        :rtype: dict
+
+        """
+        cumulative_counts = []
+        total = 0
+        for count in self.counts[:-1]:
+            total += count
+            cumulative_counts.append(total)
+        return {
+            "buckets": list(zip(self.buckets, cumulative_counts)),
+            "count": self.count,
+            "sum": self.sum,
+        }
+
+
+class ParseMetrics(object):
+    """
+    The metrics of one parse manager.
+
+    .. attribute:: cache_hits
+    .. attribute:: cache_misses
+    .. attribute:: cache_evictions
+    .. attribute:: cache_expirations
+
+        The counters of the cache, by locale.
+
+    .. attribute:: negative_cache_hits
+
+        The amount of errors raised again out of the negative cache, by
+        locale.
+
+    .. attribute:: parser_builds
+
+        The amount of parsers built, by locale.
+
+    .. attribute:: parser_build_time
+
+        The time spent building parsers, in seconds, by locale.
+
+    .. attribute:: parse_latency
+    .. attribute:: evaluation_latency
+
+        The :class:`Histogram` of the latencies of the parses (whether the
+        trees were cached or not) and of the evaluations.
+
+    """
+
+    def __init__(self, sink=None, buckets=DEFAULT_BUCKETS, clock=timeit.default_timer):
+        """
+
+        :param sink: The callable receiving the metrics, as returned by
+            :meth:`as_dict`, when they're exported.
+        :param buckets: The upper bounds of the buckets of the histograms.
+        :type buckets: tuple
+        :param clock: The function returning the current time in seconds.
+
+        """
+        self.sink = sink
+        self.clock = clock
+        self._buckets = buckets
+        #: The function returning the amount of parse trees in the cache and
+        #: their approximate size in bytes; set by the parse manager.
+        self.get_cache_usage = lambda: (0, None)
+        self.reset()
+
+    def reset(self):
+        """Reset all the metrics."""
+        self.cache_hits = defaultdict(int)
+        self.cache_misses = defaultdict(int)
+        self.cache_evictions = defaultdict(int)
+        self.cache_expirations = defaultdict(int)
+        self.negative_cache_hits = defaultdict(int)
+        self.parser_builds = defaultdict(int)
+        self.parser_build_time = defaultdict(float)
+        self.parse_latency = Histogram(self._buckets)
+        self.evaluation_latency = Histogram(self._buckets)
+
+    @property
+    def hit_ratio(self):
+        """The ratio of the parses whose tree was cached, in all the locales."""
+        hits = sum(self.cache_hits.values())
+        total = hits + sum(self.cache_misses.values())
+        return hits / total if total else 0.0
+
+    def get_cache_size(self):
+        """
+        Return the amount of trees in the cache and their approximate size in
+        bytes (that of the expressions and the trees, with the values they
+        refer to).
+
+        :rtype: tuple
+
+        The size is only measured when the cache has a memory limit; it's
+        ``None`` otherwise.
+
+        """
+        return self.get_cache_usage()
+
+    def as_dict(self):
+        """
+        Return the metrics as a plain dictionary.
+
+        :rtype: dict
+
+        """
+        (entries, size) = self.get_cache_size()
+        return {
+            "cache": {
+                "hits": dict(self.cache_hits),
+                "misses": dict(self.cache_misses),
+                "evictions": dict(self.cache_evictions),
+                "expirations": dict(self.cache_expirations),
+                "negative_hits": dict(self.negative_cache_hits),
+                "hit_ratio": self.hit_ratio,
+                "entries": entries,
+                "bytes": size,
+            },
+            "parsers": {
+                "builds": dict(self.parser_builds),
+                "build_seconds": dict(self.parser_build_time),
+            },
+            "parse_seconds": self.parse_latency.as_dict(),
+            "evaluation_seconds": self.evaluation_latency.as_dict(),
+        }
+
+    def export(self):
+        """
+        Pass the metrics to the sink, if any.
+
+        :return: What the sink returned.
+
+        """
+        if self.sink is None:
+            return None
+        return self.sink(self.as_dict())
+
+
+class PrometheusSink(object):
+    """
+    Sink writing the metrics in the text format of Prometheus.
+
+    """
+
+    def __init__(self, write=None, prefix="booleano", labels=None):
+        """
+
+        :param write: The function receiving the text (e.g., the ``write``
+            method of a file), if any.
+        :param prefix: The prefix of the names of the metrics.
+        :type prefix: basestring
+        :param labels: Labels added to all the metrics.
+        :type labels: dict
+
+        """
+        self.write = write
+        self.prefix = prefix
+        self.labels = labels or {}
+
+    def __call__(self, metrics):
+        """
+        Format the ``metrics`` and write them.
+
+        :return: The text.
+        :rtype: basestring
+
+        """
+        text = format_prometheus(metrics, self.prefix, self.labels)
+        if self.write is not None:
+            self.write(text)
+        return text
+
+
+def format_prometheus(metrics, prefix="booleano", labels=None):
+    """
+    Return the ``metrics`` (as returned by :meth:`ParseMetrics.as_dict`) in
+    the text format of Prometheus.
+
+    :rtype: basestring
+
+    """
+    labels = labels or {}
+    lines = []
+
+    def add(name, metric_type, samples):
+        name = "%s_%s" % (prefix, name)
+        lines.append("# TYPE %s %s" % (name, metric_type))
+        for (suffix, sample_labels, value) in samples:
+            lines.append("%s%s%s %s" % (name, suffix, _format_labels(labels, sample_labels), _format_value(value)))
+
+    def by_locale(values):
+        return [("", {"locale": locale}, value) for (locale, value) in sorted(values.items(), key=_sort_key)]
+
+    cache = metrics["cache"]
+    add("cache_hits_total", "counter", by_locale(cache["hits"]))
+    add("cache_misses_total", "counter", by_locale(cache["misses"]))
+    add("cache_evictions_total", "counter", by_locale(cache["evictions"]))
+    add("cache_expirations_total", "counter", by_locale(cache["expirations"]))
+    add("negative_cache_hits_total", "counter", by_locale(cache["negative_hits"]))
+    add("cache_entries", "gauge", [("", {}, cache["entries"])])
+    if cache["bytes"] is not None:
+        add("cache_bytes", "gauge", [("", {}, cache["bytes"])])
+    add("parser_builds_total", "counter", by_locale(metrics["parsers"]["builds"]))
+    add("parser_build_seconds_total", "counter", by_locale(metrics["parsers"]["build_seconds"]))
+    for name in ("parse_seconds", "evaluation_seconds"):
+        histogram = metrics[name]
+        samples = [("_bucket", {"le": bound}, count) for (bound, count) in histogram["buckets"]]
+        samples.append(("_bucket", {"le": "+Inf"}, histogram["count"]))
+        samples.append(("_sum", {}, histogram["sum"]))
+        samples.append(("_count", {}, histogram["count"]))
+        add(name, "histogram", samples)
+    return "\n".join(lines) + "\n"
+
+
+def get_tree_size(tree, values=False):
+    """
+    Return the approximate size of ``tree`` in bytes: that of the tree and its
+    nodes, without the Python values they refer to.
+
+    :param values: Whether to include the values of the constants (and the
+        items of the sets).
+    :type values: bool
+    :rtype: int
+
+    """
+    size = sys.getsizeof(tree)
+    nodes = [tree.root_node]
+    seen = set()
+    while nodes:
+        node = nodes.pop()
+        if id(node) in seen:
+            continue
+        seen.add(id(node))
+        size += sys.getsizeof(node)
+        for name in _NODE_ATTRIBUTES:
+            operand = getattr(node, name, None)
+            if operand is not None:
+                nodes.append(operand)
+        arguments = getattr(node, "arguments", None)
+        if arguments:
+            size += sys.getsizeof(arguments)
+            nodes.extend(arguments.values() if isinstance(arguments, dict) else arguments)
+        value = getattr(node, "constant_value", None)
+        if values and value is not None:
+            size += sys.getsizeof(value)
+            if isinstance(value, (set, frozenset)):
+                nodes.extend(value)
+    return size
+
+
+def _format_labels(common_labels, labels):
+    labels = dict(common_labels, **labels)
+    if not labels:
+        return ""
+    pairs = ['%s="%s"' % (name, _escape(_format_value(value) if not isinstance(value, six.string_types) else value))
+             for (name, value) in sorted(labels.items())]
+    return "{%s}" % ",".join(pairs)
+
+
+def _format_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        return repr(value)
+    return six.text_type(value)
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _sort_key(item):
+    # The generic locale (None) goes first:
+    return (item[0] is not None, item[0] or "")
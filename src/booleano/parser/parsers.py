@@ -36,22 +36,19 @@ import re
 
 import six
 import six.moves
-from pyparsing import (CaselessLiteral, Combine, Forward, Group, Literal, OneOrMore, Optional, ParserElement, Regex,
-                       StringEnd, StringStart, Suppress, Word, ZeroOrMore, delimitedList, nums, opAssoc,
-                       operatorPrecedence, quotedString, removeQuotes)
 
 from booleano.exc import BadExpressionError
-from booleano.operations.operands.classes import Function
+from booleano.operations.operands.classes import Class, Function
 from booleano.operations.operands.constants import Number, Set, String
 from booleano.operations.operands.placeholders import PlaceholderFunction, PlaceholderVariable
-from booleano.operations.operators import (And, BelongsTo, Equal, GreaterEqual, GreaterThan, IsSubset, LessEqual,
-                                           LessThan, Not, NotEqual, Or, Xor)
+from booleano.operations.operators import (And, BelongsTo, BinaryOperator, Equal, GreaterEqual, GreaterThan, IsSubset,
+                                           LessEqual, LessThan, Not, NotEqual, Or, Xor)
 from booleano.parser.trees import ConvertibleParseTree, EvaluableParseTree
 
 __all__ = ("EvaluableParser", "ConvertibleParser")
 
-# Let's enable packrat. It could make parsing even 33810x faster!
-ParserElement.enablePackrat()
+# Pyparsing is only imported when the first parser is built, so it's not
+# loaded by the programs which only use the operations or the converters.
 
 
 class Parser(object):
@@ -62,15 +59,32 @@ class Parser(object):
 
     parse_tree_class = None
 
-    def __init__(self, grammar):
+    def __init__(self, grammar, intern_table=None, packrat=None):
         """
 
         :param grammar: The grammar used by the parser.
         :type grammar: :class:`booleano.parser.Grammar`
+        :param intern_table: The table used to share the equivalent nodes
+            built by the parser, if any.
+        :type intern_table: :class:`booleano.operations.core.InternTable`
+        :param packrat: Whether to enable packrat parsing when the parser is
+            built (defaults to the ``packrat`` setting of the ``grammar``).
+        :type packrat: bool
+
+        Packrat parsing (the memoization of Pyparsing) could make parsing
+        even 33810x faster! Pyparsing enables it for all its parsers at once,
+        so it's enabled when the first parser using it is built, with the
+        ``packrat_cache_size`` setting of its ``grammar`` as the limit on the
+        results memoized (discarding the oldest results first). Then the
+        parsers which don't enable it use it too, and the memo is cleared
+        after each expression parsed.
 
         """
         self._parser = None
         self._grammar = grammar
+        self._intern_table = intern_table
+        #: Whether packrat parsing is enabled when the parser is built.
+        self.packrat = grammar.get_setting("packrat") if packrat is None else packrat
 
     def __call__(self, expression):
         """
@@ -84,19 +98,36 @@ class Parser(object):
         The parser will be built if it's not been built yet.
 
         """
+        from pyparsing import ParserElement
+
         if not self._parser:
             self.build_parser()
 
-        result = self._parser.parseString(expression, parseAll=True)
+        try:
+            result = self._parser.parseString(expression, parseAll=True)
+        finally:
+            ParserElement.resetCache()
         root_node = result[0]
         return self.parse_tree_class(root_node)
 
+    @property
+    def is_built(self):
+        """Whether the Pyparsing parser has been built."""
+        return self._parser is not None
+
     def build_parser(self):
+        from pyparsing import ParserElement, StringEnd, StringStart
+
+        if self.packrat:
+            # It's a no-op if another parser has enabled it already:
+            ParserElement.enablePackrat(self._grammar.get_setting("packrat_cache_size"))
         self._parser = (StringStart() + self.define_operation() + StringEnd())
 
     # Operand generators; used to create the grammar
 
     def define_operation(self):
+        from pyparsing import CaselessLiteral, Suppress, opAssoc, operatorPrecedence
+
         Suppress(self._grammar.get_token("group_start"))
         Suppress(self._grammar.get_token("group_end"))
 
@@ -176,6 +207,8 @@ class Parser(object):
         :meth:`T_SET_END` and :meth:`T_ELEMENT_SEPARATOR`.
 
         """
+        from pyparsing import Forward, Group, Optional, Suppress, delimitedList
+
         identifier = self.define_identifier()
         operand = Forward()
 
@@ -221,6 +254,8 @@ class Parser(object):
         check :attr:`T_QUOTES`.
 
         """
+        from pyparsing import quotedString, removeQuotes
+
         string = quotedString.setParseAction(removeQuotes, self.make_string)
         string.setName("string")
         return string
@@ -237,6 +272,8 @@ class Parser(object):
         and :attr:`T_DECIMAL_SEPARATOR`, respectively.
 
         """
+        from pyparsing import Combine, Literal, OneOrMore, Optional, Suppress, Word, nums
+
         # Defining the basic tokens:
 
         def to_dot(t):
@@ -272,6 +309,8 @@ class Parser(object):
         Return the syntax definition for an identifier.
 
         """
+        from pyparsing import Combine, Group, Regex, Suppress, ZeroOrMore
+
         # --- Defining the individual identifiers:
         # Getting all the Unicode numbers in a single string:
         unicode_numbers = "".join([six.unichr(n) for n in six.moves.range(0x10000)
@@ -297,13 +336,44 @@ class Parser(object):
 
     # Pyparsing post-parse actions
 
+    def intern(self, node):
+        """
+        Return the shared node equivalent to ``node`` if nodes are interned,
+        or ``node`` itself otherwise.
+
+        """
+        if self._intern_table is None or not self._is_internable(node):
+            return node
+        return self._intern_table.intern(node)
+
+    def _is_internable(self, node):
+        """
+        Check that ``node`` is only made of constants, placeholders and
+        operators on them, which are interned: the nodes with bound variables
+        or functions are never shared.
+
+        """
+        if isinstance(node, Class):
+            return False
+        if isinstance(node, BinaryOperator):
+            operands = (node.master_operand, node.slave_operand)
+        elif isinstance(node, Not):
+            operands = (node.operand, )
+        elif isinstance(node, Set):
+            operands = node.constant_value
+        elif isinstance(node, PlaceholderFunction):
+            operands = node.arguments
+        else:
+            operands = ()
+        return all(self._intern_table.is_interned(operand) for operand in operands)
+
     def make_string(self, tokens):
         """Make a String constant using the token passed."""
-        return String(tokens[0])
+        return self.intern(String(tokens[0]))
 
     def make_number(self, tokens):
         """Make a Number constant using the token passed."""
-        return Number(tokens[0])
+        return self.intern(Number(tokens[0]))
 
     def make_variable(self, tokens):
         """Make a variable using the tokens passed."""
@@ -317,7 +387,7 @@ class Parser(object):
 
     def make_set(self, tokens):
         """Make a Set using the token passed."""
-        return Set(*tokens[0])
+        return self.intern(Set(*tokens[0]))
 
     def make_relational(self, tokens):
         """Make a relational operation using the tokens passed."""
@@ -327,7 +397,7 @@ class Parser(object):
 
         operation = self.__relationals__[operator]
 
-        return operation(left_op, right_op)
+        return self.intern(operation(left_op, right_op))
 
     def make_membership(self, tokens):
         """
@@ -339,11 +409,11 @@ class Parser(object):
         set_ = tokens[0][2]
         operation = self.__membership_operators__[operator]
 
-        return operation(element, set_)
+        return self.intern(operation(element, set_))
 
     def make_not(self, tokens):
         """Make an *Not* connective using the token passed."""
-        return Not(tokens[0][0])
+        return self.intern(Not(tokens[0][0]))
 
     def make_and(self, tokens):
         """Make an *And* connective using the tokens passed."""
@@ -364,15 +434,15 @@ class Parser(object):
 
         """
         if len(operands) == 2:
-            operation = operation_class(operands[0], operands[1])
+            operation = self.intern(operation_class(operands[0], operands[1]))
         else:
             # We're going to build the operation from right to left, so it
             # can be evaluated from left to right (a LIFO approach).
-            operation = operation_class(operands[-2], operands[-1])
+            operation = self.intern(operation_class(operands[-2], operands[-1]))
             operands = operands[:-2]
             operands.reverse()
             for operand in operands:
-                operation = operation_class(operand, operation)
+                operation = self.intern(operation_class(operand, operation))
 
         return operation
 
@@ -387,7 +457,7 @@ class EvaluableParser(Parser):
 
     parse_tree_class = EvaluableParseTree
 
-    def __init__(self, grammar, namespace):
+    def __init__(self, grammar, namespace, intern_table=None, packrat=None):
         """
 
         :param grammar: The grammar used by the parser.
@@ -395,10 +465,17 @@ class EvaluableParser(Parser):
         :param namespace: The namespace that contains the objects used by the
             expressions to be parsed.
         :type namespace: :class:`booleano.parser.scope.Namespace`
+        :param intern_table: The table used to share the equivalent nodes
+            built by the parser, if any. Bound variables and function calls
+            are never interned.
+        :type intern_table: :class:`booleano.operations.core.InternTable`
+        :param packrat: Whether to enable packrat parsing when the parser is
+            built.
+        :type packrat: bool
 
         """
         self._namespace = namespace
-        super(EvaluableParser, self).__init__(grammar)
+        super(EvaluableParser, self).__init__(grammar, intern_table, packrat)
 
     def make_variable(self, tokens):
         """
@@ -459,11 +536,11 @@ class ConvertibleParser(Parser):
 
     def make_variable(self, tokens):
         """Make a Placeholder variable using the token passed."""
-        return PlaceholderVariable(tokens.identifier, tokens.namespace_parts)
+        return self.intern(PlaceholderVariable(tokens.identifier, tokens.namespace_parts))
 
     def make_function(self, tokens):
         """Make a Placeholder function using the token passed."""
         function = tokens.function_name
-        return PlaceholderFunction(function.identifier,
-                                   function.namespace_parts,
-                                   *tokens.arguments)
+        return self.intern(PlaceholderFunction(function.identifier,
+                                               function.namespace_parts,
+                                               *tokens.arguments))
@@ -2,11 +2,19 @@
 from __future__ import absolute_import, print_function, unicode_literals
 
 import logging
+import numbers
+from collections import OrderedDict
+from itertools import islice
 
 import six
+from six.moves.collections_abc import Mapping
 
 logger = logging.getLogger(__name__)
 
+#: The type of the fields whose values have no type in common (or are always
+#: ``None``); it resolves to the generic variable.
+ANY_TYPE = type(None)
+
 
 class SymbolTableBuilder(object):
     """
@@ -25,6 +33,10 @@ class SymbolTableBuilder(object):
         the mapping from a python type to a Variable subclass
         """
         self.use_key = use_key
+        self._resolutions = {}
+        """
+        the cache of the variable resolved for each concrete type
+        """
 
     def register(self, type_, variable_class=None):
         if type_ in self.registered_variables:
@@ -32,6 +44,7 @@ class SymbolTableBuilder(object):
 
         if variable_class is not None:
             self.registered_variables[type_] = variable_class
+            self._resolutions.clear()
             return variable_class
         else:
             # work as a decorator of class
@@ -48,6 +61,13 @@ class SymbolTableBuilder(object):
         :return: the best match
         :rtype: NativeVariable
         """
+        try:
+            return self._resolutions[type_]
+        except KeyError:
+            variable_class = self._resolutions[type_] = self._resolve(type_)
+            return variable_class
+
+    def _resolve(self, type_):
         found = None
         for registered_type in self.registered_variables.keys():
             if issubclass(type_, registered_type):
@@ -59,23 +79,191 @@ class SymbolTableBuilder(object):
                             "try to use @symbol_table_builder.register(%(type)s)" % dict(type=type_))
         return self.registered_variables[found]
 
-    def __call__(self, name, sample):
+    def __call__(self, name, sample, raise_missing=True):
         """
-        create a SymbolTalbe from the sample data
+        create a SymbolTalbe from the sample data.
+        nested mappings (or schemas) create sub-tables, whose variables read
+        the nested items with a :class:`~booleano.operations.variables.ContextPath`.
         :param string name: the name of the symbolTable
         :param dict sample: the sample of data
+        :param bool raise_missing: whether the variables of the sub-tables
+            raise an error when a nested item is missing, rather than
+            evaluating to ``None``
         :return: the SymbolTable
         :rtype: SymbolTable
         """
+        return self._build_table(name, sample, (), raise_missing)
+
+    def _build_table(self, name, sample, keys, raise_missing):
         from booleano.parser import Bind, SymbolTable  # isort:skip
+        from booleano.operations.variables import ContextPath  # isort:skip
 
         binds = []
+        subtables = []
         for k, v in sample.items():
+            if isinstance(v, SchemaInference):
+                v = v.types
+            if isinstance(v, Mapping):
+                subtables.append(self._build_table(k, v, keys + (k, ), raise_missing))
+                continue
             var_type = v if isinstance(v, six.class_types) else type(v)
 
             var = self.find_for_type(var_type)
 
+            context_name = ContextPath.from_keys(keys + (k, ), raise_missing=raise_missing) if keys else k
             binds.append(
-                Bind(k, var(k if self.use_key else v))
+                Bind(k, var(context_name if self.use_key else v))
             )
-        return SymbolTable(name, binds)
+        return SymbolTable(name, binds, *subtables)
+
+    def infer(self, samples, max_samples=None):
+        """
+        infer the schema of a stream of samples.
+        :param samples: the samples of data (dicts)
+        :param int max_samples: the maximum amount of samples to scan
+            (defaults to :attr:`SchemaInference.default_max_samples`)
+        :return: the schema of the samples
+        :rtype: SchemaInference
+        """
+        schema = SchemaInference(max_samples)
+        schema.update_all(samples)
+        return schema
+
+    def from_samples(self, name, samples, max_samples=None, raise_missing=True):
+        """
+        create a SymbolTable from the schema inferred from many samples, so
+        that a missing field or an int in the first sample doesn't pick the
+        wrong variable.
+        :param string name: the name of the symbolTable
+        :param samples: the samples of data (dicts)
+        :param int max_samples: the maximum amount of samples to scan
+        :param bool raise_missing: whether missing nested items raise an error
+        :return: the SymbolTable
+        :rtype: SymbolTable
+        """
+        return self(name, self.infer(samples, max_samples).types, raise_missing)
+
+
+class SchemaInference(object):
+    """
+    the types of the fields of a stream of samples, inferred incrementally.
+
+    the type of a field is widened when the samples disagree: to the type of
+    which the others are subclasses (bool and int give int), to float for
+    real numbers (int and float give float), or else to :data:`ANY_TYPE`.
+    the fields which are ``None`` or missing in some sample are nullable.
+    """
+
+    default_max_samples = 1000
+
+    def __init__(self, max_samples=None):
+        """
+        :param int max_samples: the maximum amount of samples to scan
+        """
+        self.max_samples = self.default_max_samples if max_samples is None else max_samples
+        self.samples = 0
+        """
+        the amount of samples scanned
+        """
+        self.types = OrderedDict()
+        """
+        the mapping from the name of each field to its type (or the schema of
+        the mappings it holds), in the order the fields were seen
+        """
+        self.nullable = set()
+        """
+        the names of the fields which were ``None`` or missing in some sample
+        """
+        self._mixed = set()
+
+    @property
+    def complete(self):
+        """
+        tell if the maximum amount of samples was scanned
+        """
+        return self.samples >= self.max_samples
+
+    def update(self, sample):
+        """
+        scan one more sample, unless the maximum amount was reached.
+        :param dict sample: the sample of data
+        :return: whether more samples can be scanned
+        :rtype: bool
+        """
+        if self.complete:
+            return False
+        types = self.types
+        fields = len(types)
+        known = 0
+        for name, value in sample.items():
+            if value is None:
+                self.nullable.add(name)
+            if name in types:
+                known += 1
+            else:
+                if self.samples:
+                    self.nullable.add(name)
+                types[name] = ANY_TYPE
+            if value is not None and name not in self._mixed:
+                self._update_field(name, value)
+        if known < fields:
+            self.nullable.update(name for name in types if name not in sample)
+        self.samples += 1
+        return not self.complete
+
+    def _update_field(self, name, value):
+        """
+        widen the type of the field ``name`` to hold ``value``, or scan it if
+        it's a mapping.
+        :param string name: the name of the field
+        :param value: the value of the field in the sample, other than ``None``
+        """
+        types = self.types
+        current = types[name]
+        if isinstance(value, Mapping):
+            if current is ANY_TYPE:
+                current = types[name] = SchemaInference(self.max_samples)
+            if isinstance(current, SchemaInference):
+                current.update(value)
+                return
+            widened = ANY_TYPE
+        elif isinstance(current, SchemaInference):
+            widened = ANY_TYPE
+        elif current is type(value):
+            return
+        else:
+            widened = widen_type(current, type(value))
+        types[name] = widened
+        if widened is ANY_TYPE:
+            self._mixed.add(name)
+
+    def update_all(self, samples):
+        """
+        scan the samples up to the maximum amount, without consuming more of
+        the iterable than needed.
+        :param samples: the samples of data (dicts)
+        """
+        for sample in islice(samples, max(self.max_samples - self.samples, 0)):
+            self.update(sample)
+
+
+def widen_type(type_a, type_b):
+    """
+    return the narrowest type able to hold the values of both types.
+    :param type type_a: the first type
+    :param type type_b: the other type
+    :rtype: type
+    """
+    if type_a is ANY_TYPE:
+        # nothing but None was seen so far
+        return type_b
+    if type_b is ANY_TYPE or issubclass(type_b, type_a):
+        return type_a
+    if issubclass(type_a, type_b):
+        return type_b
+    if issubclass(type_a, numbers.Real) and issubclass(type_b, numbers.Real):
+        return float
+    for base in type_a.__mro__[1:-1]:
+        if issubclass(type_b, base):
+            return base
+    return ANY_TYPE
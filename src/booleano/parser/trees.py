@@ -40,6 +40,8 @@ from __future__ import unicode_literals
 
 import six
 
+from booleano.operations.program import compile_node
+
 __all__ = ("EvaluableParseTree", "ConvertibleParseTree")
 
 
@@ -67,7 +69,7 @@ class ParseTree(object):
                 other.root_node == self.root_node)
 
     def __hash__(self):
-        return id(self)
+        return hash((self.__class__, self.root_node))
 
     def __ne__(self, other):
         """
@@ -95,6 +97,9 @@ class EvaluableParseTree(ParseTree):
 
     """
 
+    #: The program equivalent to this tree, once it's compiled.
+    _program = None
+
     def __init__(self, root_node):
         """
 
@@ -118,6 +123,77 @@ class EvaluableParseTree(ParseTree):
         """
         return self.root_node(context)
 
+    def compile(self):
+        """
+        Lower this tree into a flat program.
+
+        :return: The program equivalent to this tree, which is built the
+            first time it's requested.
+        :rtype: :class:`booleano.operations.program.Program`
+
+        The program evaluates to the same values as the tree, usually faster,
+        and it's the preferred representation to cache trees or to send them
+        to other processes. See :mod:`booleano.operations.program`.
+
+        """
+        if self._program is None:
+            self._program = compile_node(self.root_node)
+        return self._program
+
+    def evaluate_async(self, context):
+        """
+        Check if the parse tree evaluates to True with the context described by
+        the ``context``, awaiting the operands whose values are awaitable.
+
+        :return: An awaitable resolving to whether the parse tree evaluates to
+            True.
+
+        The logical connectives are short-circuited as in synchronous
+        evaluations, while the operands of the other operations are fetched
+        concurrently. See :mod:`booleano.operations.asynchronous`.
+
+        """
+        from booleano.operations.asynchronous import evaluate_async  # isort:skip
+        return evaluate_async(self.root_node, context)
+
+    def evaluate_frame(self, frame, columns=None):
+        """
+        Check if the parse tree evaluates to True with each row of ``frame``.
+
+        :param frame: The rows to be evaluated.
+        :type frame: :class:`pandas.DataFrame`
+        :param columns: The names of the columns, by the names of the context
+            items they hold.
+        :type columns: dict
+        :return: Whether the parse tree evaluates to True with each row.
+        :rtype: :class:`pandas.Series`
+
+        The operations are vectorized where possible. See
+        :mod:`booleano.operations.dataframes`, which requires :mod:`pandas`.
+
+        """
+        from booleano.operations.dataframes import DataFrameEvaluator  # isort:skip
+        return DataFrameEvaluator(frame, columns)(self.root_node)
+
+    def profile(self, grammar=None):
+        """
+        Return a profiler evaluating this tree with instrumentation.
+
+        :param grammar: The grammar used to rebuild the expressions in the
+            reports of the profiler (defaults to the generic grammar).
+        :type grammar: :class:`booleano.parser.Grammar`
+        :rtype: :class:`booleano.operations.profiling.TreeProfiler`
+
+        The profiler is called like the tree, and it records how many times
+        each node is evaluated, its outcomes, its short-circuit skips and the
+        time spent on it. The tree itself is not instrumented, so the
+        evaluations of the tree don't pay for the profiling. See
+        :mod:`booleano.operations.profiling`.
+
+        """
+        from booleano.operations.profiling import TreeProfiler  # isort:skip
+        return TreeProfiler(self.root_node, grammar)
+
     def __str__(self):
         """Return the Unicode representation for this tree."""
         return "Evaluable parse tree (%s)" % six.text_type(self.root_node)
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the asynchronous evaluation of operation nodes.
+
+"""
+from __future__ import unicode_literals
+
+import asyncio
+
+from nose.tools import assert_raises, eq_, ok_
+
+from booleano.operations import (And, BelongsTo, Equal, GreaterEqual, LessThan, Not, NotEqual, Number, Or, Set,
+                                 String, Variable, Xor)
+from booleano.operations.variables import NativeVariable, NumberVariable, StringVariable
+from booleano.parser import Bind, Grammar, SymbolTable
+from booleano.parser.core import EvaluableParseManager
+from booleano.parser.trees import EvaluableParseTree
+
+
+class RemoteStore(object):
+    """Mock asynchronous key-value store which records the concurrent lookups."""
+
+    def __init__(self, values):
+        self.values = values
+        self.fetched = []
+        self.running = 0
+        self.max_running = 0
+
+    def getter(self, key):
+        async def get(context):
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+            await asyncio.sleep(0.01)
+            self.running -= 1
+            self.fetched.append(key)
+            return self.values[key]
+        return get
+
+
+class AsyncBoolVar(Variable):
+    """Variable whose operations are coroutines."""
+
+    operations = {"boolean", "equality"}
+
+    def to_python(self, context):
+        return self._get(context)
+
+    async def _get(self, context):
+        return context["bool"]
+
+    async def equals(self, value, context):
+        return context["bool"] == value
+
+    async def __call__(self, context):
+        return bool(context["bool"])
+
+
+def run(tree, context=None):
+    return asyncio.run(tree.evaluate_async(context or {}))
+
+
+class TestAsynchronousEvaluation(object):
+    """Tests for :meth:`EvaluableParseTree.evaluate_async`."""
+
+    def test_native_variables(self):
+        store = RemoteStore({"age": 20, "name": "katara"})
+        age = NumberVariable(store.getter("age"))
+        name = StringVariable(store.getter("name"))
+        ok_(run(EvaluableParseTree(Equal(age, Number(20)))))
+        ok_(not run(EvaluableParseTree(NotEqual(age, Number(20)))))
+        ok_(run(EvaluableParseTree(LessThan(Number(18), age))))
+        ok_(not run(EvaluableParseTree(LessThan(age, Number(18)))))
+        ok_(run(EvaluableParseTree(GreaterEqual(age, Number(20)))))
+        ok_(run(EvaluableParseTree(BelongsTo(String("t"), name))))
+        ok_(run(EvaluableParseTree(BelongsTo(name, Set(String("aang"), String("katara"))))))
+        ok_(run(EvaluableParseTree(age)))
+
+    def test_operands_fetched_concurrently(self):
+        store = RemoteStore({"a": 1, "b": 1})
+        tree = EvaluableParseTree(Equal(NumberVariable(store.getter("a")), NumberVariable(store.getter("b"))))
+        ok_(run(tree))
+        eq_(store.max_running, 2)
+
+    def test_set_items_fetched_concurrently(self):
+        store = RemoteStore({"a": 1, "b": 2, "c": 3})
+        set_ = Set(*[NumberVariable(store.getter(key)) for key in "abc"])
+        ok_(run(EvaluableParseTree(BelongsTo(Number(2), set_))))
+        ok_(not run(EvaluableParseTree(BelongsTo(Number(4), set_))))
+        ok_(run(EvaluableParseTree(Equal(Set(Number(1), Number(2), Number(3)), set_))))
+        eq_(store.max_running, 3)
+
+    def test_short_circuit(self):
+        store = RemoteStore({"yes": True, "no": False})
+        yes = NativeVariable(store.getter("yes"))
+        no = NativeVariable(store.getter("no"))
+        ok_(not run(EvaluableParseTree(And(no, yes))))
+        eq_(store.fetched, ["no"])
+        del store.fetched[:]
+        ok_(run(EvaluableParseTree(Or(yes, no))))
+        eq_(store.fetched, ["yes"])
+        del store.fetched[:]
+        ok_(run(EvaluableParseTree(Xor(yes, no))))
+        eq_(store.max_running, 2)
+        ok_(run(EvaluableParseTree(Not(no))))
+
+    def test_awaitable_operations(self):
+        """Operations of developer-defined operands may return awaitables."""
+        ok_(run(EvaluableParseTree(AsyncBoolVar()), {"bool": True}))
+        ok_(not run(EvaluableParseTree(Equal(AsyncBoolVar(), Number(0))), {"bool": 1}))
+        ok_(run(EvaluableParseTree(Equal(Number(1), AsyncBoolVar())), {"bool": 1}))
+
+    def test_synchronous_operands(self):
+        """Trees without awaitables evaluate as usual."""
+        tree = EvaluableParseTree(And(Equal(NumberVariable("a"), Number(1)), String("x")))
+        ok_(run(tree, {"a": 1}))
+        ok_(not run(tree, {"a": 2}))
+
+    def test_synchronous_callables_are_called_once(self):
+        calls = []
+        age = NumberVariable(lambda context: calls.append(context) or context["age"])
+        for node in (Equal(age, Number(20)), LessThan(Number(18), age), BelongsTo(age, Set(Number(20))), age):
+            ok_(run(EvaluableParseTree(node), {"age": 20}))
+            eq_(len(calls), 1, node)
+            del calls[:]
+
+    def test_errors_are_propagated(self):
+        tree = EvaluableParseTree(Equal(NumberVariable("a"), Number(1)))
+        assert_raises(KeyError, run, tree, {"b": 1})
+
+    def test_parse_manager(self):
+        store = RemoteStore({"age": 20})
+        table = SymbolTable("root", (Bind("age", NumberVariable(store.getter("age"))), ))
+        manager = EvaluableParseManager(table, Grammar())
+        ok_(asyncio.run(manager.evaluate_async("age > 18 & ~(age > 30)", None, {})))
+        eq_(store.fetched, ["age", "age"])
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the binary decision diagrams of evaluable trees.
+
+"""
+from __future__ import unicode_literals
+
+from nose.tools import assert_false, assert_raises, eq_, ok_
+
+from booleano.operations import And, Equal, GreaterThan, Not, Number, Or
+from booleano.operations.bdd import BDDManager, compile_bdd
+from booleano.operations.variables import BooleanVariable, NumberVariable, StringVariable
+from booleano.parser import Bind, Grammar, SymbolTable
+from booleano.parser.core import EvaluableParseManager
+
+EXPRESSIONS = (
+    'age > 18',
+    'age > 18 & name == "aang" | age <= 18 & ~ banned',
+    '(age > 18 | banned) & (name != "aang" | age > 18) & (age <= 18 | ~ name == "aang") ^ banned',
+    '~ (name ∈ {"aang", "sokka", "toph"} & age < 20) | age >= 20',
+    '"aang" == name ^ name == "aang"',
+    'banned',
+)
+
+CONTEXTS = [
+    {"age": age, "name": name, "banned": banned}
+    for age in (12, 18, 20, 40)
+    for name in ("aang", "katara", "zuko")
+    for banned in (True, False)
+]
+
+
+class _CountingVariable(NumberVariable):
+    """Number variable counting its comparisons."""
+
+    __slots__ = ()
+
+    comparisons = []
+
+    def greater_than(self, value, context):
+        self.comparisons.append(value)
+        return super(_CountingVariable, self).greater_than(value, context)
+
+
+class TestBDD(object):
+
+    def setup(self):
+        symbol_table = SymbolTable("root", (
+            Bind("age", NumberVariable("age")),
+            Bind("name", StringVariable("name")),
+            Bind("banned", BooleanVariable("banned")),
+        ))
+        self.parse = EvaluableParseManager(symbol_table, Grammar()).parse
+        self.manager = BDDManager()
+
+    def compile(self, expression):
+        return compile_bdd(self.parse(expression), self.manager)
+
+    def test_results(self):
+        for expression in EXPRESSIONS:
+            tree = self.parse(expression)
+            function = compile_bdd(tree)
+            for context in CONTEXTS:
+                eq_(function(context), tree(context), (expression, context))
+
+    def test_shared_atoms(self):
+        function = self.compile('(age > 18 | banned) & (name != "aang" | age > 18) & (age <= 18 | ~ banned)')
+        # "age <= 18" and "name != "aang"" are the negations of other atoms:
+        eq_(len(self.manager.atoms), 3)
+        eq_(len(function), 6)
+        eq_(self.manager.get_support(function.root), {0, 1, 2})
+        eq_(self.manager.get_support(self.compile("banned | ~ banned").root), set())
+        eq_(self.compile("age > 18 ^ age > 18").root, 0)
+
+    def test_atoms_evaluated_once(self):
+        variable = _CountingVariable("age")
+        greater_than = GreaterThan(variable, Number(18))
+        equal = Equal(variable, Number(3))
+        node = And(Or(greater_than, Not(greater_than)), Or(GreaterThan(variable, Number(18)), equal))
+        _CountingVariable.comparisons = []
+        compile_bdd(node)({"age": 20})
+        eq_(_CountingVariable.comparisons, [18])
+
+    def test_equivalence(self):
+        function = self.compile('age > 18 & (name == "aang" | banned)')
+        ok_(function.is_equivalent(self.compile('banned & age > 18 | name == "aang" & ~ age <= 18')))
+        assert_false(function.is_equivalent(self.compile('age > 18 & name == "aang"')))
+        eq_(function, self.compile('~ (age <= 18 | ~ banned & name != "aang")'))
+        eq_(len({function, self.compile('(banned | name == "aang") & age > 18')}), 1)
+
+    def test_satisfiability(self):
+        ok_(self.compile("age > 18 & banned").is_satisfiable())
+        assert_false(self.compile("age > 18 & banned & age <= 18").is_satisfiable())
+        ok_(self.compile("age > 18 | ~ age > 18").is_tautology())
+        assert_false(self.compile("age > 18 | banned").is_tautology())
+
+    def test_subsumption(self):
+        narrow = self.compile('age > 18 & name == "aang"')
+        broad = self.compile('age > 18')
+        ok_(narrow.implies(broad))
+        assert_false(broad.implies(narrow))
+        ok_((narrow | broad).is_equivalent(broad))
+        ok_((narrow & ~broad).is_equivalent(self.compile("banned & ~ banned")))
+        ok_((broad ^ broad).is_equivalent(narrow & ~narrow))
+
+    def test_models(self):
+        tree = self.parse('~ age <= 18 & name != "aang"')
+        model = compile_bdd(tree, self.manager).get_model()
+        # The values are those of the nodes found in the tree, even if they
+        # are negated comparisons:
+        eq_(model, {tree.root_node.master_operand.operand: False, tree.root_node.slave_operand: True})
+        eq_(self.compile("banned & ~ banned").get_model(), None)
+
+    def test_different_managers(self):
+        function = self.compile("banned")
+        assert_raises(ValueError, function.is_equivalent, compile_bdd(self.parse("banned")))
+        assert_false(function == compile_bdd(self.parse("banned")))
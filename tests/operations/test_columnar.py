@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the evaluation of parse trees over columnar batches.
+
+"""
+from __future__ import unicode_literals
+
+import datetime
+import os
+import shutil
+import tempfile
+from array import array
+
+from nose import SkipTest
+from nose.tools import eq_, ok_
+
+from booleano.operations.variables import DateVariable, NumberVariable, SetVariable, StringVariable
+from booleano.parser import Bind, Grammar, SymbolTable
+from booleano.parser.core import EvaluableParseManager
+from tests import TrafficLightVar
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+except ImportError:
+    raise SkipTest("pyarrow is not installed")
+
+from booleano.operations.columnar import ColumnarEvaluator, ColumnBinding  # isort:skip
+
+EXPRESSIONS = (
+    'age > 18',
+    'age >= 18 & age <= 65',
+    '18 < age ^ 65 > age',
+    '21 >= age | 60 <= age',
+    'name == "katara" | name != "zuko"',
+    '~ (name ∈ {"aang", "sokka", "toph"} & age < 20)',
+    'age ∈ {12, 40}',
+    'name ∈ {"aang", name}',
+    '"at" ∈ name',
+    'born > "2000-01-01"',
+    'banned',
+    'name',
+    'light == "red" & age > 12',
+)
+
+ROWS = [
+    {"age": age, "name": name, "banned": banned, "born": born, "traffic_light": light}
+    for age in (12, 18, 40, 65, 90)
+    for name in ("aang", "katara", "zuko", "")
+    for banned in (True, False)
+    for (born, light) in ((datetime.date(1990, 5, 1), "red"), (datetime.date(2010, 5, 1), "green"))
+]
+
+
+def make_batch(rows=ROWS):
+    return pyarrow.RecordBatch.from_pylist(rows)
+
+
+def make_manager():
+    symbol_table = SymbolTable("root", (
+        Bind("age", NumberVariable("age")),
+        Bind("name", StringVariable("name")),
+        Bind("banned", NumberVariable("banned")),
+        Bind("born", DateVariable("born")),
+        Bind("light", TrafficLightVar()),
+    ))
+    return EvaluableParseManager(symbol_table, Grammar())
+
+
+class TestColumnarEvaluator(object):
+    """Tests for :class:`ColumnarEvaluator`."""
+
+    def test_same_results_as_trees(self):
+        manager = make_manager()
+        batch = make_batch()
+        table = pyarrow.Table.from_batches([make_batch(ROWS[:30]), make_batch(ROWS[30:])])
+        for expression in EXPRESSIONS:
+            tree = manager.parse(expression)
+            expected = [tree(row) for row in ROWS]
+            evaluator = ColumnarEvaluator(tree)
+            selection = evaluator(batch)
+            ok_(isinstance(selection, pyarrow.BooleanArray), expression)
+            eq_(selection.null_count, 0, expression)
+            eq_(selection.to_pylist(), expected, expression)
+            eq_(evaluator(table).to_pylist(), expected, expression)
+
+    def test_filter(self):
+        evaluator = ColumnarEvaluator(make_manager().parse('age > 60 & name == "zuko"'))
+        eq_(set(evaluator.filter(make_batch()).column("age").to_pylist()), {65, 90})
+
+    def test_buffers(self):
+        ages = array(str("l"), [12, 40, 90])
+        heights = array(str("d"), [1.2, 1.8, 1.6])
+        binding = ColumnBinding({"age": ages, "height": heights})
+        ok_(binding.get("age").buffers()[1].address == ages.buffer_info()[0])
+        eq_(binding.get("age").to_pylist(), [12, 40, 90])
+        eq_(binding.get("weight"), None)
+        evaluator = ColumnarEvaluator(make_manager().parse("age > 18"))
+        eq_(evaluator({"age": ages}).to_pylist(), [False, True, True])
+
+    def test_renamed_columns(self):
+        batch = make_batch().rename_columns(["years", "name", "banned", "born", "colour"])
+        tree = make_manager().parse('age > 18 & light == "red"')
+        evaluator = ColumnarEvaluator(tree, {"age": "years", "traffic_light": "colour"})
+        eq_(evaluator(batch).to_pylist(), [tree(row) for row in ROWS])
+
+    def test_nulls(self):
+        batch = make_batch([{"age": 12, "name": "aang"}, {"age": None, "name": None}, {"age": 40, "name": "zuko"}])
+        manager = make_manager()
+        eq_(ColumnarEvaluator(manager.parse("age > 18"))(batch).to_pylist(), [False, False, True])
+        eq_(ColumnarEvaluator(manager.parse("~ age > 18"))(batch).to_pylist(), [True, True, False])
+        eq_(ColumnarEvaluator(manager.parse('name ∈ {"zuko"}'))(batch).to_pylist(), [False, False, True])
+        eq_(ColumnarEvaluator(manager.parse('name != "zuko"'))(batch).to_pylist(), [True, False, False])
+        eq_(ColumnarEvaluator(manager.parse('age != 12'))(batch).to_pylist(), [False, False, True])
+
+    def test_list_columns(self):
+        symbol_table = SymbolTable("root", (Bind("tags", SetVariable("tags")), Bind("age", NumberVariable("age"))))
+        manager = EvaluableParseManager(symbol_table, Grammar())
+        rows = [{"tags": tags, "age": age} for tags in ([], ["fire"], ["fire", "air"], ["water"]) for age in (12, 40)]
+        batch = make_batch(rows)
+        contexts = [dict(row, tags=set(row["tags"])) for row in rows]
+        expressions = (
+            '"fire" ∈ tags',
+            '{"fire"} ⊂ tags & age > 18',
+            'tags ⊂ {"fire", "air", "water"}',
+            '~ "air" ∈ tags | age < 18',
+            'tags',
+        )
+        for expression in expressions:
+            tree = manager.parse(expression)
+            eq_(ColumnarEvaluator(tree)(batch).to_pylist(), [tree(context) for context in contexts], expression)
+        # The missing sets never satisfy the membership tests:
+        batch = make_batch([{"tags": ["fire"]}, {"tags": None}])
+        eq_(ColumnarEvaluator(manager.parse('"fire" ∈ tags'))(batch).to_pylist(), [True, False])
+
+
+class TestFiles(object):
+    """Tests for the evaluation of Arrow IPC files."""
+
+    def setup(self):
+        self.directory = tempfile.mkdtemp()
+
+    def teardown(self):
+        shutil.rmtree(self.directory)
+
+    def test_file_format(self):
+        path = os.path.join(self.directory, "people.arrow")
+        with pyarrow.OSFile(path, "wb") as sink:
+            with pyarrow.ipc.new_file(sink, make_batch().schema) as writer:
+                writer.write_batch(make_batch(ROWS[:30]))
+                writer.write_batch(make_batch(ROWS[30:]))
+        self._check_file(path)
+
+    def test_stream_format(self):
+        path = os.path.join(self.directory, "people.arrows")
+        with pyarrow.OSFile(path, "wb") as sink:
+            with pyarrow.ipc.new_stream(sink, make_batch().schema) as writer:
+                writer.write_batch(make_batch(ROWS[:30]))
+                writer.write_batch(make_batch(ROWS[30:]))
+        self._check_file(path)
+
+    def _check_file(self, path):
+        tree = make_manager().parse('age > 18 & name ∈ {"aang", "zuko"}')
+        results = list(ColumnarEvaluator(tree).evaluate_file(path))
+        eq_([batch.num_rows for (batch, _) in results], [30, len(ROWS) - 30])
+        selections = [value for (_, selection) in results for value in selection.to_pylist()]
+        eq_(selections, [tree(row) for row in ROWS])
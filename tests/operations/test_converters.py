@@ -31,9 +31,10 @@ Tests for the parse tree converters.
 """
 from __future__ import unicode_literals
 
-from nose.tools import eq_, assert_raises, raises
+from nose.tools import eq_, ok_, assert_raises, raises
 
-from booleano.operations.converters import BaseConverter
+from booleano.operations.converters import (BaseConverter, ConversionCache, ConversionParameter,
+                                            ConversionTemplate)
 from booleano.operations import (Not, And, Or, Xor, Equal, NotEqual, LessThan,
     GreaterThan, LessEqual, GreaterEqual, BelongsTo, IsSubset, String, Number,
     Set, Variable, Function, PlaceholderVariable, PlaceholderFunction)
@@ -180,10 +181,208 @@ class TestActualConverter(object):
         """Only nodes are tried to be converted."""
         ANTI_CONVERTER(12345)
 
+    def test_converting_non_node_in_branch(self):
+        """Unknown nodes inside the tree are reported too."""
+        tree = Not(PlaceholderVariable("foo", None))
+        tree.operand = 12345
+        assert_raises(ConversionError, ANTI_CONVERTER, tree)
+
+    def test_deep_trees(self):
+        """The depth of the trees is not limited by the recursion limit."""
+        parse_tree = Equal(PlaceholderVariable("x", None), Number(0))
+        for number in range(1, 20000):
+            parse_tree = Or(parse_tree, Not(Equal(PlaceholderVariable("x", None), Number(number))))
+        conversion = ANTI_CONVERTER(parse_tree)
+        for number in range(19999, 0, -1):
+            eq_(conversion.slave_operand.operand.slave_operand, Number(number))
+            conversion = conversion.master_operand
+        eq_(conversion, Equal(PlaceholderVariable("x", None), Number(0)))
+
+    def test_subclasses_of_nodes(self):
+        """Subclasses of the nodes are converted like their parents."""
+        class Unequal(NotEqual):
+            __slots__ = ()
+
+        parse_tree = Unequal(PlaceholderVariable("here", None), String("there"))
+        eq_(ANTI_CONVERTER(parse_tree), NotEqual(PlaceholderVariable("here", None), String("there")))
+
+    def test_dispatch_is_cached(self):
+        """The conversion methods are looked up once per node type."""
+        converter = AntiConverter()
+        converter(Set(Number(1), Number(2)))
+        (convert, _) = converter._dispatch_table[Number]
+        eq_(convert, converter.convert_number)
+        ok_(converter._dispatch_table[Number] is converter._get_dispatch(Number(3)))
+
+
+class TestConversionCache(object):
+    """Tests for the bounded cache of conversions."""
+
+    def test_least_recently_used_are_discarded(self):
+        cache = ConversionCache(max_size=2)
+        cache["a"] = 1
+        cache["b"] = 2
+        eq_(cache["a"], 1)
+        cache["c"] = 3
+        eq_(len(cache), 2)
+        ok_("a" in cache)
+        ok_("b" not in cache)
+        ok_("c" in cache)
+
+    def test_counters(self):
+        cache = ConversionCache()
+        cache["a"] = 1
+        eq_(cache["a"], 1)
+        assert_raises(KeyError, cache.__getitem__, "b")
+        eq_((cache.hits, cache.misses), (1, 1))
+        cache.clear()
+        eq_((len(cache), cache.hits, cache.misses), (0, 0, 0))
+
+    def test_disabled(self):
+        cache = ConversionCache(max_size=0)
+        cache["a"] = 1
+        eq_(len(cache), 0)
+
+
+class TestMemoizedConversion(object):
+    """Tests for the conversions with a conversion cache."""
+
+    def test_same_conversions(self):
+        converter = CountingConverter()
+        converter.conversion_cache = ConversionCache()
+        for parse_tree in TestActualConverter.parse_trees:
+            eq_(converter(parse_tree), parse_tree)
+
+    def test_equivalent_branches_are_converted_once(self):
+        converter = CountingConverter()
+        converter.conversion_cache = ConversionCache()
+        rain = PlaceholderFunction("today_is_gonna_rain", None)
+        parse_tree = Or(And(rain, Not(rain)), Xor(And(rain, Not(rain)), rain))
+        eq_(converter(parse_tree), parse_tree)
+        eq_(converter.calls["convert_and"], 1)
+        eq_(converter.calls["convert_not"], 1)
+        eq_(converter.calls["convert_function"], 1)
+
+    def test_conversions_are_reused_across_trees(self):
+        converter = CountingConverter()
+        converter.conversion_cache = ConversionCache()
+        converter(Equal(PlaceholderVariable("age", None), Number(18)))
+        conversion = converter(Equal(PlaceholderVariable("age", None), Number(18)))
+        eq_(conversion, Equal(PlaceholderVariable("age", None), Number(18)))
+        eq_(converter.calls["convert_equal"], 1)
+        eq_(converter.conversion_cache.hits, 1)
+
+    def test_deep_trees(self):
+        """Deep trees are looked up without recursion."""
+        def build_tree():
+            parse_tree = Equal(PlaceholderVariable("x", None), Number(0))
+            for number in range(1, 20000):
+                parse_tree = Or(parse_tree, Not(Equal(PlaceholderVariable("x", None), Number(number))))
+            return parse_tree
+
+        converter = AntiConverter()
+        converter.conversion_cache = ConversionCache(max_size=100000)
+        ok_(converter(build_tree()) is converter(build_tree()))
+
+    def test_small_caches(self):
+        """Conversions are right even if they don't fit in the cache."""
+        converter = AntiConverter()
+        converter.conversion_cache = ConversionCache(max_size=1)
+        for parse_tree in TestActualConverter.parse_trees:
+            eq_(converter(parse_tree), parse_tree)
+
+
+class TestTemplates(object):
+    """Tests for the conversions into templates."""
+
+    def test_default_parameters(self):
+        parse_tree = And(Equal(PlaceholderVariable("name", None), String("Paris")),
+                         LessThan(PlaceholderVariable("age", None), Number(18)))
+        template = TemplateConverter().convert_template(parse_tree)
+        eq_(template, ConversionTemplate(
+            "(name == #0:String & age < #1:Number)",
+            ("Paris", 18),
+        ))
+
+    def test_parameters_in_sets_and_functions(self):
+        parse_tree = PlaceholderFunction("distance", None, PlaceholderVariable("here", None), String("Paris"))
+        (template, parameters) = TemplateConverter().convert_template(parse_tree)
+        eq_(template, "distance(here, #0:String)")
+        eq_(parameters, ("Paris", ))
+        (template, parameters) = TemplateConverter().convert_template(Set(Number(1)))
+        eq_(template, "{#0:Number}")
+        eq_(parameters, (1, ))
+
+    def test_conversion_parameters(self):
+        eq_(BaseConverter().convert_parameter(2, String), ConversionParameter(2, String))
+        ok_(ConversionParameter(2, String) != ConversionParameter(2, Number))
+
+    def test_templates_are_shared(self):
+        converter = TemplateConverter()
+        converter.conversion_cache = ConversionCache()
+        first = converter.convert_template(Equal(PlaceholderVariable("tenant", None), String("acme")))
+        second = converter.convert_template(Equal(PlaceholderVariable("tenant", None), String("globex")))
+        ok_(first.template is second.template)
+        eq_(first.parameters, ("acme", ))
+        eq_(second.parameters, ("globex", ))
+
+    def test_different_shapes(self):
+        converter = TemplateConverter()
+        converter.conversion_cache = ConversionCache()
+        first = converter.convert_template(Equal(PlaceholderVariable("tenant", None), String("acme")))
+        second = converter.convert_template(Equal(PlaceholderVariable("owner", None), String("acme")))
+        third = converter.convert_template(Equal(PlaceholderVariable("tenant", None), Number(3)))
+        eq_(first.template, "tenant == #0:String")
+        eq_(second.template, "owner == #0:String")
+        eq_(third.template, "tenant == #0:Number")
+
 
 # Test utilities
 
 
+class CountingConverter(AntiConverter):
+    """Anti-converter which counts the calls to its conversion methods."""
+
+    def __init__(self):
+        self.calls = {}
+
+    def __getattribute__(self, name):
+        attribute = super(CountingConverter, self).__getattribute__(name)
+        if not name.startswith("convert_"):
+            return attribute
+
+        def count(*args):
+            self.calls[name] = self.calls.get(name, 0) + 1
+            return attribute(*args)
+        return count
+
+
+class TemplateConverter(BaseConverter):
+    """Converter into plain strings, which marks the parameters."""
+
+    def convert_parameter(self, position, constant_type):
+        return "#%s:%s" % (position, constant_type.__name__)
+
+    def convert_and(self, master_operand, slave_operand):
+        return "(%s & %s)" % (master_operand, slave_operand)
+
+    def convert_equal(self, master_operand, slave_operand):
+        return "%s == %s" % (master_operand, slave_operand)
+
+    def convert_less_than(self, master_operand, slave_operand):
+        return "%s < %s" % (master_operand, slave_operand)
+
+    def convert_set(self, *elements):
+        return "{%s}" % ", ".join(elements)
+
+    def convert_variable(self, name, namespace_parts):
+        return name
+
+    def convert_function(self, name, namespace_parts, *arguments):
+        return "%s(%s)" % (name, ", ".join(arguments))
+
+
+
 ANTI_CONVERTER = AntiConverter()
 
 
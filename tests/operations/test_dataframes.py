@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the evaluation of parse trees over data frames.
+
+"""
+from __future__ import unicode_literals
+
+from nose import SkipTest
+from nose.tools import assert_raises, eq_
+
+from booleano.exc import ConversionError
+from booleano.operations import Equal, Number, PlaceholderVariable, Set, String
+from booleano.operations.variables import DateVariable, NumberVariable, SetVariable, StringVariable
+from booleano.parser import Bind, Grammar, SymbolTable
+from booleano.parser.core import ConvertibleParseManager, EvaluableParseManager
+from tests import TrafficLightVar
+
+try:
+    import pandas
+except ImportError:
+    raise SkipTest("pandas is not installed")
+
+from booleano.operations.dataframes import DataFrameConverter, DataFrameEvaluator, evaluate_frame  # isort:skip
+
+EXPRESSIONS = (
+    'age > 18',
+    'age >= 18 & age <= 65',
+    '18 < age ^ 65 > age',
+    '21 >= age | 60 <= age',
+    'name == "katara" | name != "zuko"',
+    '~ (name ∈ {"aang", "sokka", "toph"} & age < 20)',
+    'age ∈ {12, 40}',
+    '{"water", "fire"} ⊂ elements',
+    '"air" ∈ elements & ~ "fire" ∈ elements',
+    'name ∈ {"aang", name}',
+    'born > "2000-01-01"',
+    'banned',
+    'light == "red" & age > 12',
+)
+
+ROWS = [
+    {"age": age, "name": name, "elements": elements, "banned": banned, "born": born, "traffic_light": light}
+    for age in (12, 18, 40, 65, 90)
+    for name in ("aang", "katara", "zuko")
+    for elements in ({"air"}, {"water", "fire", "earth"}, set())
+    for banned in (1, 0)
+    for (born, light) in ((pandas.Timestamp("1990-05-01").date(), "red"),
+                          (pandas.Timestamp("2010-05-01").date(), "green"))
+]
+
+
+def make_frame():
+    return pandas.DataFrame(ROWS)
+
+
+def make_manager():
+    symbol_table = SymbolTable("root", (
+        Bind("age", NumberVariable("age")),
+        Bind("name", StringVariable("name")),
+        Bind("elements", SetVariable("elements")),
+        Bind("banned", NumberVariable("banned")),
+        Bind("born", DateVariable("born")),
+        Bind("light", TrafficLightVar()),
+    ))
+    return EvaluableParseManager(symbol_table, Grammar())
+
+
+def parse(expression):
+    return ConvertibleParseManager(Grammar()).parse(expression)
+
+
+class TestDataFrameEvaluator(object):
+    """Tests for the evaluation of evaluable trees over data frames."""
+
+    def test_same_results_as_trees(self):
+        manager = make_manager()
+        frame = make_frame()
+        for expression in EXPRESSIONS:
+            tree = manager.parse(expression)
+            expected = [tree(row) for row in ROWS]
+            eq_(list(tree.evaluate_frame(frame)), expected, expression)
+            eq_(list(evaluate_frame(tree, frame)), expected, expression)
+
+    def test_index_is_kept(self):
+        frame = make_frame().iloc[::-1]
+        mask = make_manager().parse("age > 18").evaluate_frame(frame)
+        eq_(list(mask.index), list(frame.index))
+        eq_(list(frame[mask]["age"].unique()), [90, 65, 40])
+
+    def test_renamed_columns(self):
+        frame = make_frame().rename(columns={"age": "years", "traffic_light": "colour"})
+        tree = make_manager().parse('age > 18 & light == "red"')
+        mask = DataFrameEvaluator(frame, {"age": "years", "traffic_light": "colour"})(tree.root_node)
+        eq_(list(mask), [tree(row) for row in ROWS])
+
+    def test_missing_values(self):
+        frame = pandas.DataFrame({"age": [12, None, 40], "name": ["aang", None, "zuko"]})
+        manager = make_manager()
+        eq_(list(manager.parse("age > 18").evaluate_frame(frame)), [False, False, True])
+        eq_(list(manager.parse("age <= 18").evaluate_frame(frame)), [True, True, False])
+        eq_(list(manager.parse('name == "zuko"').evaluate_frame(frame)), [False, False, True])
+
+
+class TestDataFrameConverter(object):
+    """Tests for the conversion of convertible trees into masks."""
+
+    def test_comparisons(self):
+        frame = make_frame()
+        eq_(list(evaluate_frame(parse('age > 18 & name != "zuko"'), frame)),
+            [row["age"] > 18 and row["name"] != "zuko" for row in ROWS])
+        eq_(list(evaluate_frame(parse('~ (age <= 18 | banned) ^ age >= 65'), frame)),
+            [(not (row["age"] <= 18 or row["banned"])) != (row["age"] >= 65) for row in ROWS])
+
+    def test_memberships(self):
+        frame = make_frame()
+        eq_(list(evaluate_frame(parse('name ∈ {"aang", "zuko"}'), frame)),
+            [row["name"] in ("aang", "zuko") for row in ROWS])
+        eq_(list(evaluate_frame(parse('"air" ∈ elements'), frame)),
+            ["air" in row["elements"] for row in ROWS])
+        eq_(list(evaluate_frame(parse('{"water", "fire"} ⊂ elements'), frame)),
+            [{"water", "fire"} <= row["elements"] for row in ROWS])
+
+    def test_columns_and_functions(self):
+        frame = make_frame()
+        converter = DataFrameConverter(frame, columns={"person:age": "age"},
+                                       functions={"adult": lambda conv, age: age >= 18})
+        eq_(list(parse("adult(person:age)")(converter)), [row["age"] >= 18 for row in ROWS])
+
+    def test_unknown_names(self):
+        converter = DataFrameConverter(make_frame())
+        assert_raises(ConversionError, converter, Equal(PlaceholderVariable("height", None), Number(2)))
+        assert_raises(ConversionError, parse("tall(name)"), converter)
+
+    def test_sets(self):
+        converter = DataFrameConverter(make_frame())
+        assert_raises(ConversionError, converter, Set(String("a")))
+        assert_raises(ConversionError, converter, Equal(PlaceholderVariable("name", None), Set(String("a"))))
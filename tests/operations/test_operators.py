@@ -31,6 +31,8 @@ Tests for the operators.
 """
 from __future__ import unicode_literals
 
+import pickle
+
 from nose.tools import eq_, ok_, assert_false, assert_raises, raises
 import six
 from booleano.operations import (Not, And, Or, Xor, Equal, NotEqual, LessThan,
@@ -38,6 +40,7 @@ from booleano.operations import (Not, And, Or, Xor, Equal, NotEqual, LessThan,
 from booleano.operations.operators import Operator
 from booleano.operations.operands import String, Number, Set, Variable
 from booleano.exc import InvalidOperationError
+from booleano.operations.variables import BooleanVariable, NumberVariable
 
 from tests import (TrafficLightVar, PedestriansCrossingRoad,
                    DriversAwaitingGreenLightVar, BoolVar)
@@ -863,9 +866,155 @@ class TestIsSubset(object):
         assert_false(operation(context))
 
 
+class TestStructuralHashing(object):
+    """Tests for the structural hashing and equality of the operators."""
+
+    def test_equivalent_operations_share_hash(self):
+        op1 = And(Equal(String("a"), Number(1)), Not(BooleanVariable("bool")))
+        op2 = And(Equal(String("a"), Number(1)), Not(BooleanVariable("bool")))
+        eq_(hash(op1), hash(op2))
+        eq_(op1, op2)
+        eq_(len(set([op1, op2])), 1)
+        eq_({op1: "rule"}[op2], "rule")
+
+    def test_commutative_operations(self):
+        eq_(Or(BoolVar(), TrafficLightVar()), Or(TrafficLightVar(), BoolVar()))
+        (variable1, variable2) = (BooleanVariable("a"), NumberVariable("b"))
+        eq_(hash(Or(variable1, variable2)), hash(Or(variable2, variable1)))
+        eq_(Equal(String("a"), Number(1)), Equal(Number(1), String("a")))
+
+    def test_inequalities(self):
+        """Inequalities are only equivalent if their comparison is the same."""
+        eq_(LessThan(Number(3), NumVar()), LessThan(Number(3), NumVar()))
+        eq_(hash(LessThan(Number(3), NumberVariable("num"))), hash(LessThan(Number(3), NumberVariable("num"))))
+        ok_(LessThan(NumVar(), Number(3)) != LessThan(Number(3), NumVar()))
+        eq_(LessThan(Number(2), Number(3)), LessThan(Number(2), Number(3)))
+        ok_(LessThan(Number(2), Number(3)) != LessThan(Number(3), Number(2)))
+
+    def test_set_operations_are_not_commutative(self):
+        set1 = Set(Number(1), Number(2))
+        set2 = Set(Set(Number(1), Number(2)))
+        ok_(BelongsTo(set1, set2) != BelongsTo(set2, set1))
+
+    def test_subclasses_are_not_equivalent(self):
+        op1 = Equal(String("a"), String("b"))
+        op2 = NotEqual(String("a"), String("b"))
+        ok_(op1 != op2)
+        ok_(op2 != op1)
+
+    def test_comparison_never_raises(self):
+        op = Not(BoolVar())
+        ok_(op != "not a node")
+        ok_(op != None)  # noqa: E711
+
+    def test_equivalent_nodes_share_hash(self):
+        """Nodes compared by their class alone are hashed by their class."""
+        eq_(BoolVar(), BoolVar())
+        eq_(hash(BoolVar()), hash(BoolVar()))
+        op1 = Or(BoolVar(), TrafficLightVar())
+        op2 = Or(BoolVar(), TrafficLightVar())
+        eq_(op1, op2)
+        eq_(hash(op1), hash(op2))
+        eq_({op1: "rule"}[op2], "rule")
+        copy = pickle.loads(pickle.dumps(op1, pickle.HIGHEST_PROTOCOL))
+        eq_(hash(copy), hash(op1))
+
+    def test_variables_told_apart_by_their_state(self):
+        (variable1, variable2) = (_FieldVariable("a"), _FieldVariable("b"))
+        ok_(variable1 != variable2)
+        ok_(GreaterThan(variable1, Number(1)) != GreaterThan(variable2, Number(1)))
+        set_ = Set(variable1, variable2)
+        eq_(len(set_.constant_value), 2)
+        ok_(set_.belongs_to(0, {"a": 5, "b": 0}))
+        eq_(set_, Set(_FieldVariable("b"), _FieldVariable("a")))
+        ok_(set_ != Set(_FieldVariable("a"), _FieldVariable("c")))
+
+    def test_sets_with_variables(self):
+        eq_(Set(BoolVar(), Number(1)), Set(BoolVar(), Number(1)))
+        ok_(Set(BoolVar(), Number(1)) != Set(TrafficLightVar(), Number(1)))
+
+    def test_deep_trees(self):
+        # The hashes are calculated without recursion:
+        op1 = op2 = Equal(String("x"), Number(0))
+        for number in range(1, 5000):
+            op1 = Or(op1, Equal(String("x"), Number(number)))
+            op2 = Not(op2)
+        eq_(hash(op1), hash(op1))
+        eq_(op1._hash, hash(op1))
+        ok_(hash(op2) != hash(op2.operand))
+
+    def test_hash_is_cached(self):
+        op = Not(Equal(String("a"), String("b")))
+        ok_(not hasattr(op, "_hash"))
+        hash_ = hash(op)
+        eq_(op._hash, hash_)
+
+
+class TestCompactNodes(object):
+    """Tests for the memory layout of the operators."""
+
+    def test_builtin_operators_have_no_instance_dict(self):
+        nodes = (
+            Not(BoolVar()),
+            And(BoolVar(), BoolVar()),
+            Equal(String("a"), String("b")),
+            LessThan(NumVar(), Number(3)),
+            BelongsTo(Number(1), Set(Number(1))),
+        )
+        for node in nodes:
+            ok_(not hasattr(node, "__dict__"), "%r has a __dict__" % node)
+
+    def test_subclasses_without_slots_accept_new_attributes(self):
+        class AnnotatedNot(Not):
+            pass
+
+        op = AnnotatedNot(BoolVar())
+        op.annotation = "custom"
+        eq_(op.annotation, "custom")
+
+    def test_inequality_comparison_follows_the_operands(self):
+        op = LessThan(Number(3), NumVar())
+        eq_(op.comparison.__name__, "_greater_than")
+        ok_(op({'num': 4}))
+        ok_(not op({'num': 2}))
+
+    def test_pickling(self):
+        op = And(Not(BoolVar()), LessThan(Number(3), NumVar()))
+        hash(op)
+        unpickled = pickle.loads(pickle.dumps(op, pickle.HIGHEST_PROTOCOL))
+        eq_(unpickled, op)
+        ok_(unpickled({'bool': False, 'num': 4}))
+
+
 # Mock objects
 
 
+class _FieldVariable(Variable):
+    """Mock variable reading the context item ``field``."""
+
+    operations = {"equality", "inequality"}
+
+    def __init__(self, field):
+        self.field = field
+        super(_FieldVariable, self).__init__()
+
+    def check_equivalence(self, node):
+        super(_FieldVariable, self).check_equivalence(node)
+        assert node.field == self.field
+
+    def to_python(self, context):
+        return context[self.field]
+
+    def equals(self, value, context):
+        return context[self.field] == value
+
+    def greater_than(self, value, context):
+        return context[self.field] > value
+
+    def less_than(self, value, context):
+        return context[self.field] < value
+
+
 class NumVar(Variable):
     """
     Mock variable which represents a numeric value stored in a context item
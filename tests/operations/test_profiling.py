@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the instrumented evaluation of trees.
+
+"""
+from __future__ import unicode_literals
+
+from itertools import count
+
+from nose.tools import assert_raises, eq_, ok_
+
+from booleano.operations.profiling import TreeProfiler
+from booleano.operations.variables import NumberVariable, SetVariable, StringVariable
+from booleano.parser import Bind, Grammar, SymbolTable
+from booleano.parser.core import EvaluableParseManager
+from tests import TrafficLightVar
+
+EXPRESSIONS = (
+    'age > 18',
+    'age >= 18 & age <= 65',
+    '18 < age ^ 65 > age',
+    '21 >= age | 60 <= age',
+    'name == "katara" | name != "zuko"',
+    '~ (name ∈ {"aang", "sokka", "toph"} & age < 20)',
+    '{"water", "fire"} ⊂ elements',
+    '"air" ∈ elements & ~ "fire" ∈ elements',
+    'traffic_light == "green" | age > 80',
+)
+
+CONTEXTS = [
+    {"age": age, "name": name, "elements": elements, "traffic_light": light}
+    for age in (12, 18, 40, 65, 90)
+    for name in ("aang", "katara", "zuko")
+    for elements in ({"air"}, {"water", "fire", "earth"}, set())
+    for light in ("red", "green")
+]
+
+
+def make_manager():
+    symbol_table = SymbolTable("root", (
+        Bind("age", NumberVariable("age")),
+        Bind("name", StringVariable("name")),
+        Bind("elements", SetVariable("elements")),
+        Bind("traffic_light", TrafficLightVar()),
+    ))
+    return EvaluableParseManager(symbol_table, Grammar())
+
+
+def fake_clock():
+    """Return a clock which moves forward by one second each time it's read."""
+    return lambda ticks=count(): float(next(ticks))
+
+
+class TestEvaluation(object):
+    """Tests for the results and the figures of the profilers."""
+
+    def test_same_results_as_trees(self):
+        manager = make_manager()
+        for expression in EXPRESSIONS:
+            tree = manager.parse(expression)
+            profiler = tree.profile()
+            for context in CONTEXTS:
+                eq_(profiler(context), tree(context), "%s with %r" % (expression, context))
+            eq_(profiler.profiles[0].evaluations, len(CONTEXTS))
+
+    def test_counters(self):
+        profiler = make_manager().parse('age > 18 & name == "aang"').profile()
+        for context in CONTEXTS:
+            profiler(context)
+        (root, age, name) = profiler.profiles
+        eq_((root.evaluations, root.true, root.false, root.skips), (90, 18, 72, 0))
+        eq_((age.evaluations, age.true, age.false, age.skips), (90, 54, 36, 0))
+        eq_((name.evaluations, name.true, name.false, name.skips), (54, 18, 36, 36))
+        eq_(name.true_ratio, 18.0 / 54)
+
+    def test_short_circuits(self):
+        profiler = make_manager().parse('age > 18 | ~ (name == "aang" ^ age < 10)').profile()
+        profiler({"age": 20, "name": "aang"})
+        eq_([profile.skips for profile in profiler.profiles], [0, 0, 1, 0, 0, 0])
+        eq_([profile.evaluations for profile in profiler.profiles], [1, 1, 0, 0, 0, 0])
+        profiler({"age": 5, "name": "aang"})
+        eq_([profile.evaluations for profile in profiler.profiles], [2, 2, 1, 1, 1, 1])
+
+    def test_timing(self):
+        profiler = TreeProfiler(make_manager().parse('age > 18 & name == "aang"').root_node, clock=fake_clock())
+        profiler({"age": 20, "name": "aang"})
+        # Each node reads the clock twice, including those of its operands:
+        eq_([profile.time for profile in profiler.profiles], [5.0, 1.0, 1.0])
+        eq_(profiler.profiles[0].mean_time, 5.0)
+        hot_nodes = [(profile.expression, time) for (profile, time) in profiler.get_hot_nodes(1)]
+        eq_(hot_nodes, [('age > 18.0 & name == "aang"', 3.0)])
+
+    def test_errors(self):
+        profiler = make_manager().parse('age > 18').profile()
+        assert_raises(KeyError, profiler, {})
+        profile = profiler.profiles[0]
+        eq_((profile.evaluations, profile.true, profile.false), (1, 0, 0))
+
+    def test_reset(self):
+        profiler = make_manager().parse('age > 18 & name == "aang"').profile()
+        profiler({"age": 20, "name": "aang"})
+        profiler.reset()
+        ok_(all(profile.evaluations == profile.time == 0 for profile in profiler.profiles))
+
+
+class TestReport(object):
+    """Tests for the expressions in the reports."""
+
+    def test_expressions(self):
+        manager = make_manager()
+        expressions = {
+            'age > 18 & (name == "aang" | age <= 10)': 'age > 18.0 & (name == "aang" | age <= 10.0)',
+            '18 < age ^ ~ 65 >= age': 'age > 18.0 ^ ~ age <= 65.0',
+            '"air" ∈ elements | {"air"} ⊂ elements': '"air" ∈ elements | {"air"} ⊂ elements',
+            '~ (name != "zuko" & traffic_light)': '~ (TrafficLightVar & name != "zuko")',
+        }
+        for (expression, rendered) in expressions.items():
+            eq_(manager.parse(expression).profile().profiles[0].expression, rendered)
+
+    def test_grammar(self):
+        grammar = Grammar(**{"and": "and", "not": "not"})
+        profiler = make_manager().parse('~ age > 18 & age < 20').profile(grammar)
+        eq_(profiler.profiles[0].expression, "not age > 18.0 and age < 20.0")
+
+    def test_report(self):
+        profiler = make_manager().parse('age > 18 & name == "aang"').profile()
+        profiler({"age": 20, "name": "aang"})
+        lines = profiler.report().splitlines()
+        eq_(len(lines), 4)
+        ok_(lines[0].split() == ["evals", "true", "false", "skips", "total", "ms", "mean", "us", "expression"])
+        ok_(lines[2].endswith("    age > 18.0"), lines[2])
+        eq_(lines[1].split()[:4], ["1", "1", "0", "0"])
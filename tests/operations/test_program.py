@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the flat programs compiled out of evaluable trees.
+
+"""
+from __future__ import unicode_literals
+
+import pickle
+
+from nose.tools import eq_, ok_
+
+from booleano.operations import And, Equal, Not, Or, Set, String, Xor
+from booleano.operations.program import CALL, EQUAL, JUMP_IF_FALSE, Program, compile_node
+from booleano.operations.variables import NumberVariable, SetVariable, StringVariable
+from booleano.parser import Bind, Grammar, SymbolTable
+from booleano.parser.core import EvaluableParseManager
+from booleano.parser.trees import EvaluableParseTree
+from tests import BoolVar, TrafficLightVar
+
+EXPRESSIONS = (
+    'age > 18',
+    'age >= 18 & age <= 65',
+    '18 < age ^ 65 > age',
+    '21 >= age | 60 <= age',
+    'name == "katara" | name != "zuko"',
+    '~ (name ∈ {"aang", "sokka", "toph"} & age < 20)',
+    '{"water", "fire"} ⊂ elements',
+    '"air" ∈ elements & ~ "fire" ∈ elements',
+    'name ∈ {"aang", name}',
+    'banned',
+)
+
+CONTEXTS = [
+    {"age": age, "name": name, "elements": elements, "banned": banned}
+    for age in (12, 18, 40, 65, 90)
+    for name in ("aang", "katara", "zuko")
+    for elements in ({"air"}, {"water", "fire", "earth"}, set())
+    for banned in (True, False)
+]
+
+
+def make_manager():
+    symbol_table = SymbolTable("root", (
+        Bind("age", NumberVariable("age")),
+        Bind("name", StringVariable("name")),
+        Bind("elements", SetVariable("elements")),
+        Bind("banned", NumberVariable("banned")),
+    ))
+    return EvaluableParseManager(symbol_table, Grammar())
+
+
+class TestCompilation(object):
+    """Tests for the programs built by :func:`compile_node`."""
+
+    def test_same_results_as_trees(self):
+        manager = make_manager()
+        for expression in EXPRESSIONS:
+            tree = manager.parse(expression)
+            program = tree.compile()
+            for context in CONTEXTS:
+                eq_(program(context), tree(context), "%s with %r" % (expression, context))
+
+    def test_short_circuit(self):
+        master = BoolVar()
+        slave = BoolVar()
+        program = compile_node(And(master, slave))
+        eq_(program({'bool': False}), False)
+        ok_(master.evaluated)
+        ok_(not slave.evaluated)
+
+        program = compile_node(Or(master, slave))
+        eq_(program({'bool': True}), True)
+        ok_(not slave.evaluated)
+
+    def test_nested_connectives(self):
+        node = Or(Not(And(BoolVar(), Xor(BoolVar(), TrafficLightVar()))), Equal(TrafficLightVar(), String("red")))
+        program = compile_node(node)
+        for value in (True, False):
+            for light in ("red", "green", ""):
+                context = {'bool': value, 'traffic_light': light}
+                eq_(program(context), node(context))
+
+    def test_constants_are_pooled(self):
+        program = compile_node(Equal(TrafficLightVar(), String("red")))
+        eq_(list(program.opcodes), [EQUAL])
+        eq_(program.constants, ("red", ))
+
+    def test_sets_with_variables_are_evaluated_with_the_context(self):
+        program = compile_node(Equal(SetVariable("team"), Set(String("aang"), StringVariable("name"))))
+        eq_(program.constants, ())
+        ok_(program({"team": {"aang", "katara"}, "name": "katara"}))
+        ok_(not program({"team": {"aang", "katara"}, "name": "zuko"}))
+
+    def test_operands_without_operators(self):
+        variable = BoolVar()
+        program = compile_node(variable)
+        eq_(list(program.opcodes), [CALL])
+        eq_(program.operands, (variable, ))
+        ok_(program({'bool': True}))
+
+    def test_disassemble(self):
+        program = compile_node(And(BoolVar(), Equal(TrafficLightVar(), String("red"))))
+        listing = program.disassemble()
+        eq_(len(listing), len(program))
+        ok_(listing[1].startswith("1 JUMP_IF_FALSE to 3"))
+        ok_("EQUAL" in listing[2])
+
+    def test_jump_targets(self):
+        program = compile_node(And(BoolVar(), BoolVar()))
+        eq_(list(program.opcodes), [CALL, JUMP_IF_FALSE, CALL])
+        eq_(program.arguments[2], 3)
+
+
+class TestPrograms(object):
+    """Tests for the usage of :class:`Program` objects."""
+
+    def test_pickling(self):
+        tree = make_manager().parse('age > 18 & name ∈ {"aang", "katara"}')
+        program = pickle.loads(pickle.dumps(tree.compile(), pickle.HIGHEST_PROTOCOL))
+        ok_(isinstance(program, Program))
+        eq_(program, tree.compile())
+        for context in CONTEXTS:
+            eq_(program(context), tree(context))
+
+    def test_compilation_is_memoized(self):
+        tree = EvaluableParseTree(Not(BoolVar()))
+        ok_(tree.compile() is tree.compile())
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the discrimination network of rules.
+
+"""
+from __future__ import unicode_literals
+
+from nose.tools import assert_false, assert_raises, eq_, ok_
+
+from booleano.operations.rete import RuleNetwork
+from booleano.operations.variables import BooleanVariable, NumberVariable, SetVariable, StringVariable
+from booleano.parser import Bind, Grammar, SymbolTable
+from booleano.parser.core import EvaluableParseManager
+
+RULES = {
+    "adult": 'age >= 18',
+    "teenager": 'age > 12 & age < 18',
+    "child": 'age <= 12',
+    "aang": 'name == "aang"',
+    "not aang": 'name != "aang"',
+    "team": 'name ∈ {"aang", "katara", "sokka", 12} & ~ banned',
+    "banned adult": 'banned & age >= 18 | name == "zuko" & banned',
+    "exclusive": 'age > 12 ^ name == "katara"',
+    "not banned": '~ banned',
+    "tags": '"fire" ∈ tags | age == 40',
+}
+
+CONTEXTS = [
+    {"age": age, "name": name, "banned": banned, "tags": tags}
+    for age in (7, 12, 12.5, 18, 40, float("nan"))
+    for name in ("aang", "katara", "zuko", 12, "12.0")
+    for banned in (True, False)
+    for tags in ({"fire"}, set())
+]
+
+
+class TestRuleNetwork(object):
+
+    def setup(self):
+        symbol_table = SymbolTable("root", (
+            Bind("age", NumberVariable("age")),
+            Bind("name", StringVariable("name")),
+            Bind("banned", BooleanVariable("banned")),
+            Bind("tags", SetVariable("tags")),
+        ))
+        self.parse = EvaluableParseManager(symbol_table, Grammar()).parse
+        self.trees = dict((name, self.parse(expression)) for (name, expression) in RULES.items())
+        self.network = RuleNetwork()
+        for (name, tree) in self.trees.items():
+            self.network.add_rule(name, tree)
+
+    def check_matches(self, trees):
+        for context in CONTEXTS:
+            expected_matches = set(name for (name, tree) in trees.items() if tree(context))
+            eq_(self.network.match(context), expected_matches, context)
+
+    def test_matches(self):
+        eq_(len(self.network), len(RULES))
+        self.check_matches(self.trees)
+
+    def test_shared_atoms(self):
+        # "name != "aang"" is the negation of "name == "aang"", and the
+        # repeated atoms are only one alpha node:
+        eq_(self.network.atom_count, 11)
+        self.network.add_rule("repeated", self.parse('name == "aang" & age >= 18 | ~ banned'))
+        eq_(self.network.atom_count, 11)
+
+    def test_removal(self):
+        for name in ("aang", "adult", "banned adult"):
+            self.network.remove_rule(name)
+            del self.trees[name]
+        ok_("aang" not in self.network)
+        ok_("not aang" in self.network)
+        self.check_matches(self.trees)
+        assert_raises(KeyError, self.network.remove_rule, "aang")
+        for name in list(self.trees):
+            self.network.remove_rule(name)
+        eq_(self.network.atom_count, 0)
+        eq_(self.network.match(CONTEXTS[0]), set())
+
+    def test_churn(self):
+        # The nodes of the removed rules are released, so the memory used by
+        # the network doesn't grow when the rules are replaced:
+        sizes = []
+        for number in range(120):
+            self.network.add_rule("churn", self.parse('age == %s & name != "aang" | "%s" ∈ tags' % (number, number)))
+            self.network.add_rule("replaced %s" % (number % 3), self.parse("age > %s" % number))
+            self.trees["replaced %s" % (number % 3)] = self.parse("age > %s" % number)
+            sizes.append((len(self.network._diagrams), len(self.network._diagrams.atoms)))
+        self.trees["churn"] = self.parse('age == 119 & name != "aang" | "119" ∈ tags')
+        ok_(max(sizes[60:]) <= max(sizes[:60]))
+        self.check_matches(self.trees)
+
+    def test_replacement(self):
+        self.network.add_rule("aang", self.parse('name == "zuko"'))
+        self.trees["aang"] = self.parse('name == "zuko"')
+        eq_(len(self.network), len(RULES))
+        self.check_matches(self.trees)
+
+    def test_non_indexed_values(self):
+        # The items which can't be looked up are compared to each constant:
+        self.network.remove_rule("team")
+        del self.trees["team"]
+        context = {"age": 13, "name": ["aang"], "banned": False, "tags": set()}
+        eq_(self.network.match(context), set(name for (name, tree) in self.trees.items() if tree(context)))
+        assert_raises(TypeError, self.network.match, dict(context, age="13"))
+
+    def test_errors(self):
+        context = {"age": 20, "name": "aang", "banned": True}
+        assert_raises(KeyError, self.network.match, context)
+        network = RuleNetwork(ignore_errors=True)
+        for (name, tree) in self.trees.items():
+            network.add_rule(name, tree)
+        matches = network.match(context)
+        assert_false("tags" in matches)
+        eq_(matches, set(name for name in RULES if name != "tags" and self.trees[name](context)))
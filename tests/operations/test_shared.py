@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the programs shared through memory-mapped files.
+
+"""
+from __future__ import unicode_literals
+
+import os
+import pickle
+import shutil
+import tempfile
+
+from nose.tools import assert_false, assert_raises, eq_, ok_
+
+from booleano.operations import Number, Set, String
+from booleano.operations.shared import SharedPrograms, SharedSet, dump_programs, write_programs
+from booleano.operations.variables import NumberVariable, SetVariable, StringVariable
+from booleano.parser import Bind, Grammar, SymbolTable
+from booleano.parser.core import EvaluableParseManager
+
+EXPRESSIONS = {
+    "names": 'name ∈ {"aang", "katara", "sokka", "toph", "zuko"} & age > 12',
+    "ages": 'age ∈ {12, 18.5, 40, -3, 1,000}',
+    "mixed": 'name ∈ {"aang", 12, "ñandú", 40}',
+    "subset": '{"water", "fire"} ⊂ elements | ~ name ∈ {"azula", "ozai", "zhao"}',
+    "small": 'name ∈ {"momo"}',
+}
+
+CONTEXTS = [
+    {"age": age, "name": name, "elements": elements}
+    for age in (12, 18.5, 40, 1000, -3, 7)
+    for name in ("aang", "ñandú", "zuko", "12", "40.0", "ozai", "momo")
+    for elements in ({"water", "fire"}, {"air"})
+]
+
+
+class TestSharedPrograms(object):
+
+    def setup(self):
+        symbol_table = SymbolTable("root", (
+            Bind("age", NumberVariable("age")),
+            Bind("name", StringVariable("name")),
+            Bind("elements", SetVariable("elements")),
+        ))
+        manager = EvaluableParseManager(symbol_table, Grammar())
+        self.trees = dict((name, manager.parse(expression)) for (name, expression) in EXPRESSIONS.items())
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "programs.bin")
+
+    def teardown(self):
+        shutil.rmtree(self.directory)
+
+    def check_results(self, programs):
+        eq_(sorted(programs), sorted(EXPRESSIONS))
+        for context in CONTEXTS:
+            for (name, tree) in self.trees.items():
+                eq_(programs[name](context), tree(context), (name, context))
+
+    def test_file(self):
+        write_programs(self.path, self.trees, min_set_size=3)
+        with SharedPrograms(self.path) as programs:
+            self.check_results(programs)
+            ok_(isinstance(programs["names"].operands[0], SharedSet))
+            # The sets below the minimum size are kept as they are:
+            eq_(programs["small"].operands[0].__class__, Set)
+
+    def test_buffers(self):
+        contents = dump_programs(self.trees, min_set_size=3)
+        self.check_results(SharedPrograms(buffer=contents))
+        self.check_results(SharedPrograms(buffer=memoryview(contents)))
+
+    def test_compiled_programs(self):
+        programs = dict((name, tree.compile()) for (name, tree) in self.trees.items())
+        self.check_results(SharedPrograms(buffer=dump_programs(programs, min_set_size=3)))
+
+    def test_invalid_contents(self):
+        assert_raises(ValueError, SharedPrograms, buffer=b"\0" * 64)
+
+
+class TestSharedSet(object):
+
+    def setup(self):
+        self.set = Set(String("aang"), Number(12), String("zuko"), Number(float("nan")))
+        contents = dump_programs({"set": _ConstantProgram(self.set)}, min_set_size=1)
+        self.shared_set = SharedPrograms(buffer=contents)["set"].node
+
+    def test_operations(self):
+        ok_(isinstance(self.shared_set, SharedSet))
+        ok_(self.shared_set.belongs_to("12.0", None))
+        assert_false(self.shared_set.belongs_to("nan", None))
+        assert_raises(TypeError, self.shared_set.belongs_to, None, None)
+        ok_(self.shared_set.is_subset({"zuko", 12}, None))
+        assert_false(self.shared_set.is_subset({"zuko", "toph"}, None))
+        ok_(self.shared_set.greater_than(3, None))
+        ok_(self.shared_set(None))
+        values = self.shared_set.to_python(None)
+        eq_(len(values), 4)
+        ok_({"aang", "zuko", 12} < values)
+
+    def test_copies(self):
+        copy = pickle.loads(pickle.dumps(self.shared_set))
+        eq_(copy.__class__, Set)
+        eq_(len(copy.constant_value), 4)
+
+
+class _ConstantProgram(object):
+    """Picklable holder of a node, standing for a program."""
+
+    def __init__(self, node):
+        self.node = node
+
+    def compile(self):
+        return self
@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the SQL converter.
+
+"""
+from __future__ import unicode_literals
+
+import sqlite3
+
+from nose.tools import assert_raises, eq_
+
+from booleano.exc import ConversionError
+from booleano.operations import BelongsTo, Equal, Not, Number, PlaceholderVariable, Set, String
+from booleano.operations.sql import (MySQLDialect, PostgreSQLDialect, SQLClause, SQLConverter, SQLDialect, SQLFragment,
+                                     SQLiteDialect)
+from booleano.parser import Grammar
+from booleano.parser.core import ConvertibleParseManager
+
+PEOPLE = (
+    ("aang", 12, "air", 1),
+    ("katara", 14, "water", 0),
+    ("sokka", 15, None, 0),
+    ("toph", 12, "earth", 1),
+    ("zuko", 16, "fire", 0),
+    ("iroh", 60, "fire", 1),
+)
+
+
+def parse(expression):
+    return ConvertibleParseManager(Grammar()).parse(expression)
+
+
+class TestSQLConverter(object):
+    """Tests for :class:`SQLConverter`."""
+
+    def test_parameters_are_not_inlined(self):
+        clause = parse('age > 18 & name == "katara"')(SQLConverter())
+        eq_(clause, SQLClause('("age" > ? AND "name" = ?)', (18.0, "katara")))
+
+    def test_connectives(self):
+        eq_(parse('~ a | b')(SQLConverter()).sql, '(NOT ("a") OR "b")')
+        eq_(parse('a ^ b')(SQLConverter()).sql, '(("a") <> ("b"))')
+        eq_(parse('a ^ b')(SQLConverter(MySQLDialect())).sql, '(`a` XOR `b`)')
+
+    def test_comparisons(self):
+        converter = SQLConverter()
+        for (expression, sql) in (
+            ('a == 1', '"a" = ?'),
+            ('a != 1', '"a" <> ?'),
+            ('a < 1', '"a" < ?'),
+            ('a > 1', '"a" > ?'),
+            ('a <= 1', '"a" <= ?'),
+            ('a >= 1', '"a" >= ?'),
+        ):
+            eq_(parse(expression)(converter).sql, sql)
+
+    def test_paramstyles(self):
+        tree = parse('a == "x" | b == 2')
+        eq_(tuple(tree(SQLConverter(paramstyle="qmark"))), ('("a" = ? OR "b" = ?)', ("x", 2.0)))
+        eq_(tuple(tree(SQLConverter(paramstyle="numeric"))), ('("a" = :1 OR "b" = :2)', ("x", 2.0)))
+        eq_(tuple(tree(SQLConverter(paramstyle="format"))), ('("a" = %s OR "b" = %s)', ("x", 2.0)))
+        eq_(tuple(tree(SQLConverter(paramstyle="named"))), ('("a" = :p1 OR "b" = :p2)', {"p1": "x", "p2": 2.0}))
+        eq_(tuple(tree(SQLConverter(paramstyle="pyformat"))),
+            ('("a" = %(p1)s OR "b" = %(p2)s)', {"p1": "x", "p2": 2.0}))
+        assert_raises(ConversionError, SQLConverter, paramstyle="unknown")
+
+    def test_in_lists_are_bucketed(self):
+        converter = SQLConverter()
+        eq_(tuple(parse('a ∈ {"x"}')(converter)), ('"a" IN (?)', ("x", )))
+        eq_(tuple(parse('a ∈ {"z", "x", "y"}')(converter)), ('"a" IN (?, ?, ?, ?)', ("x", "y", "z", "z")))
+        eq_(parse('a ∈ {1, 2, 3, 4}')(converter).sql, '"a" IN (?, ?, ?, ?)')
+        eq_(parse('a ∈ {1, 2, 3, 4, 5}')(converter).sql, '"a" IN (?, ?, ?, ?, ?, ?, ?, ?)')
+        eq_(parse('a ∈ {}')(converter).sql, '1 = 0')
+
+    def test_in_lists_without_buckets(self):
+        converter = SQLConverter(bucket_in_lists=False)
+        eq_(tuple(parse('a ∈ {"z", "x", "y"}')(converter)), ('"a" IN (?, ?, ?)', ("x", "y", "z")))
+
+    def test_in_lists_with_columns(self):
+        eq_(tuple(parse('a ∈ {"x", b}')(SQLConverter())), ('"a" IN (?, "b")', ("x", )))
+
+    def test_columns(self):
+        converter = SQLConverter(columns={"age": "people.age", "db:name": "lower(name)"})
+        eq_(parse('age > 1 & db:name == "x"')(converter).sql, '(people.age > ? AND lower(name) = ?)')
+        assert_raises(ConversionError, parse('height > 1'), converter)
+        eq_(parse('db:name == "x"')(SQLConverter()).sql, '"db"."name" = ?')
+
+    def test_functions(self):
+        def lower(converter, argument):
+            return SQLFragment("LOWER(", argument, ")")
+
+        converter = SQLConverter(functions={"length": "LENGTH", "lower": lower})
+        eq_(tuple(parse('length(name) > 3 & lower(name) == "aang"')(converter)),
+            ('(LENGTH("name") > ? AND LOWER("name") = ?)', (3.0, "aang")))
+        assert_raises(ConversionError, parse('upper(name)'), converter)
+
+    def test_collections(self):
+        converter = SQLConverter(PostgreSQLDialect())
+        eq_(tuple(parse('"x" ∈ tags')(converter)), ('%s = ANY("tags")', ("x", )))
+        eq_(tuple(parse('{"b", "a"} ⊂ tags')(converter)), ('(ARRAY[%s, %s] <@ "tags")', ("a", "b")))
+        assert_raises(ConversionError, parse('"x" ∈ tags'), SQLConverter())
+        assert_raises(ConversionError, parse('{"b", "a"} ⊂ tags'), SQLConverter())
+
+    def test_sets_without_truth_value(self):
+        converter = SQLConverter()
+        assert_raises(ConversionError, converter, Set(String("a")))
+        assert_raises(ConversionError, converter, Equal(PlaceholderVariable("a"), Set(String("a"))))
+        assert_raises(ConversionError, converter, BelongsTo(Set(Number(1)), Set(Set(Number(1)))))
+
+    def test_cache(self):
+        converter = SQLConverter(cache_size=2)
+        clause = parse('a > 1')(converter)
+        eq_(parse('a > 1')(converter), clause)
+        eq_((converter._cache.hits, converter._cache.misses), (1, 1))
+        parse('b > 1')(converter)
+        parse('c > 1')(converter)
+        eq_(len(converter._cache), 2)
+        eq_(parse('a > 1')(converter), clause)
+        eq_((converter._cache.hits, converter._cache.misses), (1, 4))
+        converter.clear_cache()
+        eq_(len(converter._cache), 0)
+
+    def test_deep_trees(self):
+        expression = " | ".join("x == %s" % number for number in range(1500))
+        tree = parse(expression)
+        for cache_size in (None, 0):
+            clause = tree(SQLConverter(cache_size=cache_size))
+            eq_(clause.sql.count("?"), 1500)
+            eq_(clause.parameters[-1], 1499)
+        deep_node = Equal(PlaceholderVariable("x"), Number(0))
+        for _ in range(5000):
+            deep_node = Not(deep_node)
+        eq_(SQLConverter(cache_size=0)(deep_node).sql.count("NOT"), 5000)
+        eq_(SQLConverter()(deep_node).sql.count("NOT"), 5000)
+
+    def test_cached_named_parameters_are_copied(self):
+        converter = SQLConverter(paramstyle="named")
+        parse('a > 1')(converter).parameters["p1"] = 2
+        eq_(parse('a > 1')(converter).parameters, {"p1": 1.0})
+
+    def test_cached_clauses_are_copied(self):
+        converter = SQLConverter()
+        clause = parse('a > 1')(converter)
+        clause.sql = "1 = 1"
+        clause.parameters = ()
+        eq_(tuple(parse('a > 1')(converter)), ('"a" > ?', (1.0, )))
+
+    def test_dialects(self):
+        eq_(SQLiteDialect().paramstyle, "qmark")
+        eq_(SQLDialect().quote_identifier('we"ird'), '"we""ird"')
+        eq_(MySQLDialect().column("name", ("people", )), "`people`.`name`")
+
+
+class TestSQLite(object):
+    """Run the clauses on an actual database."""
+
+    expressions = (
+        'age > 13',
+        'age <= 14 | element == "fire"',
+        'name ∈ {"aang", "toph", "zuko"} & ~ bender',
+        'element ∈ {"fire", "water", "air", "earth", "lightning"}',
+        'bender ^ age < 15',
+        '~ (name != "sokka")',
+    )
+
+    def test_results(self):
+        connection = sqlite3.connect(":memory:")
+        connection.execute("CREATE TABLE people (name TEXT, age INTEGER, element TEXT, bender INTEGER)")
+        connection.executemany("INSERT INTO people VALUES (?, ?, ?, ?)", PEOPLE)
+        converter = SQLConverter(SQLiteDialect())
+        expected = {
+            'age > 13': {"katara", "sokka", "zuko", "iroh"},
+            'age <= 14 | element == "fire"': {"aang", "katara", "toph", "zuko", "iroh"},
+            'name ∈ {"aang", "toph", "zuko"} & ~ bender': {"zuko"},
+            'element ∈ {"fire", "water", "air", "earth", "lightning"}': {"aang", "katara", "toph", "zuko", "iroh"},
+            'bender ^ age < 15': {"katara", "iroh"},
+            '~ (name != "sokka")': {"sokka"},
+        }
+        for expression in self.expressions:
+            sql, parameters = parse(expression)(converter)
+            rows = connection.execute("SELECT name FROM people WHERE " + sql, parameters)
+            eq_(set(row[0] for row in rows), expected[expression], expression)
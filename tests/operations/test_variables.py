@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
 import datetime
+import pickle
 
 import six
 from nose.tools import ok_, assert_raises, assert_equal
@@ -8,7 +9,8 @@ from nose.tools.trivial import eq_
 
 from booleano.operations.operands.constants import Number, String
 from booleano.operations.variables import NumberVariable, BooleanVariable, StringVariable, DateVariable, \
-    DateTimeVariable, SetVariable, NativeVariable, DurationVariable
+    DateTimeVariable, SetVariable, NativeVariable, DurationVariable, variable_symbol_table_builder, \
+    ContextPath
 from booleano.parser.symbol_table_builder import SymbolTableBuilder
 from booleano.parser import SymbolTable, Bind, Grammar
 from booleano.parser.core import EvaluableParseManager
@@ -253,6 +255,21 @@ class TestVariableLazyResolve(object):
         eq_(calls, [1, 1])
 
 
+class TestNativeVariableEquivalence(object):
+
+    def test_same_context_item(self):
+        eq_(NumberVariable('n'), NumberVariable('n'))
+        eq_(hash(NumberVariable('n')), hash(NumberVariable('n')))
+        ok_(NumberVariable('n') != NumberVariable('m'))
+        ok_(NumberVariable('n') != StringVariable('n'))
+        NumberVariable('n').check_equivalence(NumberVariable('n'))
+        assert_raises(AssertionError, NumberVariable('n').check_equivalence, NumberVariable('m'))
+
+    def test_formats(self):
+        eq_(DateVariable('d'), DateVariable('d'))
+        ok_(DateVariable('d') != DateVariable('d', formats=["%Y"]))
+
+
 class TestVariableSymbolTableBuilder(object):
     FakeVariable = type(str('FakeVariable'), (NativeVariable,), {})
     FakeVariableSub = type(str('FakeVariable'), (FakeVariable,), {})
@@ -320,4 +337,133 @@ class TestVariableSymbolTableBuilder(object):
                       vb, "root", {"name": "katara", "age": 15.}
                       )
 
+    def test_resolution_cache(self):
+        vb = SymbolTableBuilder()
+        vb.register(str, self.FakeVariable)
+        assert_equal(vb.find_for_type(self.MyString), self.FakeVariable)
+        # registering a type invalidates the resolutions
+        vb.register(self.MyString, self.MyStringVariable)
+        assert_equal(vb.find_for_type(self.MyString), self.MyStringVariable)
+        assert_raises(Exception, vb.find_for_type, int)
+
+    def test_infer_widening(self):
+        schema = variable_symbol_table_builder.infer([
+            {"age": 15, "height": None, "name": "katara", "awake": True, "born": datetime.datetime(1985, 1, 1)},
+            {"age": 15.5, "height": 1.5, "name": 14, "awake": 1, "born": datetime.date(1985, 1, 1)},
+            {"age": 16, "height": None, "name": "zuko", "awake": False, "born": None},
+        ])
+        eq_(schema.samples, 3)
+        eq_(dict(schema.types), {
+            "age": float, "height": float, "name": type(None), "awake": int, "born": datetime.date,
+        })
+        eq_(schema.nullable, {"height", "born"})
+
+    def test_infer_missing_fields(self):
+        schema = variable_symbol_table_builder.infer([{"a": 1, "b": "x"}, {"b": "y", "c": 2.0}, {"a": 2, "b": "z"}])
+        eq_(list(schema.types), ["a", "b", "c"])
+        eq_(schema.nullable, {"a", "c"})
+
+    def test_infer_max_samples(self):
+        samples = iter([{"a": 1}, {"a": "x"}, {"a": 2.0}])
+        schema = variable_symbol_table_builder.infer(samples, max_samples=1)
+        ok_(schema.complete)
+        eq_(dict(schema.types), {"a": int})
+        # the rest of the stream is not consumed
+        eq_(next(samples), {"a": "x"})
+        ok_(not schema.update({"a": "x"}))
+        eq_(dict(schema.types), {"a": int})
+
+    def test_from_samples(self):
+        st = variable_symbol_table_builder.from_samples("root", [
+            {"name": None, "age": 15},
+            {"name": "katara", "age": 15.5},
+        ])
+        assert_equal(st, SymbolTable("root", (
+            Bind("name", StringVariable("name")),
+            Bind("age", NumberVariable("age")),
+        )))
 
+    def test_nested_samples(self):
+        st = variable_symbol_table_builder("root", {
+            "name": "katara",
+            "address": {"nation": "water", "city": {"name": "south pole"}},
+        })
+        assert_equal(st, SymbolTable(
+            "root",
+            (Bind("name", StringVariable("name")), ),
+            SymbolTable(
+                "address",
+                (Bind("nation", StringVariable(ContextPath.from_keys(["address", "nation"]))), ),
+                SymbolTable("city", (Bind("name", StringVariable(ContextPath("address.city.name"))), )),
+            ),
+        ))
+        parse_manager = EvaluableParseManager(st, Grammar())
+        context = {"name": "katara", "address": {"nation": "water", "city": {"name": "south pole"}}}
+        ok_(parse_manager.parse('address:nation == "water" & address:city:name == "south pole"')(context))
+        assert_raises(KeyError, parse_manager.parse('address:nation == "water"'), {"address": {}})
+
+    def test_nested_schema(self):
+        st = variable_symbol_table_builder.from_samples("root", [
+            {"address": None},
+            {"address": {"number": 4}},
+            {"address": {"number": 4.5}},
+        ], raise_missing=False)
+        parse_manager = EvaluableParseManager(st, Grammar())
+        ok_(parse_manager.parse('address:number > 4')({"address": {"number": 4.5}}))
+        ok_(not parse_manager.parse('address:number')({"address": None}))
+
+
+class TestContextPath(object):
+    """Tests for the paths to nested context items."""
+
+    class User(object):
+        def __init__(self, **attributes):
+            self.__dict__.update(attributes)
+
+    def test_parsing(self):
+        eq_(ContextPath("user.address.country").steps,
+            ((False, "user"), (False, "address"), (False, "country")))
+        eq_(ContextPath("items[0].sku").steps, ((False, "items"), (True, 0), (False, "sku")))
+        eq_(ContextPath('a["b.c"][\'d\'][-1]').steps, ((False, "a"), (True, "b.c"), (True, "d"), (True, -1)))
+        eq_(ContextPath.from_keys(["a", "b.c"]).steps, ((True, "a"), (True, "b.c")))
+        eq_(ContextPath.from_keys(["a", "b.c"]).path, "a.b.c")
+
+    def test_invalid_paths(self):
+        for path in ("", ".a", "a..b", "a[0]b", "a[b]", "a[0", "a]"):
+            assert_raises(ValueError, ContextPath, path)
+
+    def test_access(self):
+        context = {
+            "user": self.User(address={"country": "fr"}, name="aang"),
+            "items": [{"sku": "x1"}, {"sku": "x2"}],
+        }
+        eq_(ContextPath("user.address.country")(context), "fr")
+        eq_(ContextPath("user.name")(context), "aang")
+        eq_(ContextPath("items[1].sku")(context), "x2")
+        eq_(ContextPath("items[-1]")(context), {"sku": "x2"})
+
+    def test_missing_items(self):
+        context = {"user": self.User(address=None), "items": []}
+        for path in ("user.address.country", "items[0].sku", "user.age", "nothing"):
+            ok_(ContextPath(path, raise_missing=False)(context) is None)
+            eq_(ContextPath(path, default="?", raise_missing=False)(context), "?")
+            assert_raises((LookupError, AttributeError, TypeError), ContextPath(path), context)
+
+    def test_equality(self):
+        eq_(ContextPath("a.b"), ContextPath("a.b"))
+        eq_(hash(ContextPath("a.b")), hash(ContextPath("a.b")))
+        ok_(ContextPath("a.b") != ContextPath("a.c"))
+        ok_(ContextPath("a.b") != ContextPath("a.b", raise_missing=False))
+        ok_(ContextPath("a.b", 1, False) != ContextPath("a.b", 2, False))
+        ok_(NumberVariable(ContextPath("a.b")).is_equivalent(NumberVariable(ContextPath("a.b"))))
+
+    def test_pickling(self):
+        path = pickle.loads(pickle.dumps(ContextPath("items[0].sku", raise_missing=False)))
+        eq_(path, ContextPath("items[0].sku", raise_missing=False))
+        eq_(path({"items": [{"sku": 1}]}), 1)
+        ok_(path({}) is None)
+
+    def test_variable(self):
+        variable = NumberVariable(ContextPath("user.age"))
+        ok_(variable.greater_than(10, {"user": {"age": 12}}))
+        ok_(variable.to_column({}) is None)
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the canonical spelling of expressions.
+
+"""
+from __future__ import unicode_literals
+
+from nose.tools import assert_false, eq_, ok_
+
+from booleano.parser import Grammar
+from booleano.parser.canonical import ExpressionCanonicalizer
+
+
+class TestCanonicalizer(object):
+
+    def setup(self):
+        self.canonicalize = ExpressionCanonicalizer(Grammar())
+
+    def test_spacing(self):
+        ok_(self.canonicalize.is_supported)
+        eq_(self.canonicalize("A&(b|C)"), "a & ( b | c )")
+        eq_(self.canonicalize("  a  &  ( b|c ) "), "a & ( b | c )")
+        eq_(self.canonicalize("x>=3&~y<=-1,000.5"), "x >= 3 & ~ y <= -1,000.5")
+        eq_(self.canonicalize("x ∈ {1,2}"), "x ∈ { 1 , 2 }")
+
+    def test_atomic_tokens(self):
+        eq_(self.canonicalize("Ns1:Ns2:Var_Name == 10"), "ns1:ns2:var_name == 10")
+        eq_(self.canonicalize("x1 == 1x"), "x1 == 1x")
+
+    def test_strings(self):
+        eq_(self.canonicalize('X == "A  &B"'), 'x == "A  &B"')
+        eq_(self.canonicalize("x=='it''s'"), "x == 'it''s'")
+
+    def test_invalid_characters(self):
+        eq_(self.canonicalize("A $ b"), "A $ b")
+        eq_(self.canonicalize('X == "unterminated'), 'X == "unterminated')
+
+    def test_word_operators(self):
+        grammar = Grammar(**{"and": "AND", "or": "or", "namespace_separator": "."})
+        canonicalize = ExpressionCanonicalizer(grammar)
+        eq_(canonicalize("a AND b.C or c"), "a AND b.c or c")
+        # The connectives are case-sensitive, so "OR" and "and" are identifiers:
+        eq_(canonicalize("a AND b OR c"), "a AND b OR c")
+        eq_(canonicalize("A and B"), "a and b")
+        # The relational and membership operators are not:
+        grammar = Grammar(**{"eq": "IS", "belongs_to": "in"})
+        canonicalize = ExpressionCanonicalizer(grammar)
+        eq_(canonicalize("A is 1 & b IN c"), "a IS 1 & b in c")
+
+    def test_word_operators_within_words(self):
+        # Pyparsing reads "notice" as "not ice", but not "NOTICE":
+        canonicalize = ExpressionCanonicalizer(Grammar(**{"not": "not"}))
+        eq_(canonicalize("NOTICE"), "NOTICE")
+        eq_(canonicalize("notice  &  B"), "notice  &  B")
+        eq_(canonicalize("not  ICE"), "not ice")
+        eq_(canonicalize("NOT  ICE"), "NOT  ICE")
+        canonicalize = ExpressionCanonicalizer(Grammar(**{"xor": "XOR", "eq": "is"}))
+        eq_(canonicalize("x>1XORy"), "x>1XORy")
+        eq_(canonicalize("A>1 XOR B"), "a > 1 XOR b")
+        eq_(canonicalize("ISLAND is 1"), "ISLAND is 1")
+
+    def test_unsupported_grammars(self):
+        canonicalize = ExpressionCanonicalizer(Grammar(**{"and": "and also"}))
+        assert_false(canonicalize.is_supported)
+        eq_(canonicalize("A  and also B"), "A  and also B")
+        grammar = Grammar()
+        grammar.set_custom_generator("operation", lambda *args: None)
+        assert_false(ExpressionCanonicalizer(grammar).is_supported)
+
+    def test_memo(self):
+        self.canonicalize.memo_size = 2
+        for expression in ("A", "B", "C"):
+            self.canonicalize(expression)
+        eq_(self.canonicalize._memo, {"C": "c"})
+        canonicalize = ExpressionCanonicalizer(Grammar(), memo_size=0)
+        eq_(canonicalize("A"), "a")
+        eq_(canonicalize._memo, {})
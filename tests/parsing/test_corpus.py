@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the synthetic corpora of expressions and contexts.
+
+"""
+from __future__ import unicode_literals
+
+import json
+import os
+import shutil
+import tempfile
+
+import six
+from nose.tools import assert_raises, eq_, ok_
+
+from booleano.operations.variables import NumberVariable
+from booleano.parser import Bind, Grammar, SymbolTable
+from booleano.parser.core import EvaluableParseManager
+from booleano.parser.corpus import CorpusGenerator, make_symbol_table
+from tests import TrafficLightVar
+
+ALL_KINDS = ("number", "string", "set", "boolean", "date", "datetime", "duration")
+
+
+class TestExpressions(object):
+
+    def setup(self):
+        self.symbol_table = make_symbol_table(14, namespace_depth=2, kinds=ALL_KINDS)
+
+    def test_valid_expressions(self):
+        generator = CorpusGenerator(self.symbol_table, seed=1, max_depth=2, negation=0.3)
+        manager = EvaluableParseManager(self.symbol_table, Grammar())
+        results = set()
+        for (expression, context) in zip(generator.expressions(30), generator.contexts(30)):
+            results.add(manager.parse(expression)(context))
+        eq_(results, {True, False})
+
+    def test_grammar(self):
+        grammar = Grammar(**{"and": "and", "or": "or", "xor": "xor", "not": "not", "namespace_separator": "."})
+        generator = CorpusGenerator(self.symbol_table, grammar, seed=2, max_depth=1, negation=1)
+        manager = EvaluableParseManager(self.symbol_table, grammar)
+        for expression in generator.expressions(10):
+            ok_(expression.startswith("not ("), expression)
+            manager.parse(expression)
+
+    def test_seed(self):
+        generator1 = CorpusGenerator(self.symbol_table, seed=3)
+        generator2 = CorpusGenerator(self.symbol_table, seed=3)
+        # The contexts don't depend on the expressions produced before:
+        generator2.expression()
+        eq_(generator1.context(), generator2.context())
+        generator1.expression()
+        eq_(list(generator1.expressions(5)), list(generator2.expressions(5)))
+
+    def test_shape(self):
+        generator = CorpusGenerator(self.symbol_table, seed=4, max_depth=0, negation=0)
+        ok_(all(" & " not in expression for expression in generator.expressions(20)))
+        generator = CorpusGenerator(self.symbol_table, seed=4, max_depth=1, max_width=4, negation=0,
+                                    weights={"or": 0, "xor": 0})
+        for expression in generator.expressions(20):
+            eq_(expression.count("|"), 0)
+            ok_(1 <= expression.count(" & ") <= 3, expression)
+
+    def test_operators(self):
+        symbol_table = SymbolTable("root", (Bind("age", NumberVariable("age")), ))
+        weights = {"eq": 0, "ne": 0, "lt": 0, "gt": 0, "le": 0, "ge": 0}
+        generator = CorpusGenerator(symbol_table, seed=5, max_depth=0, negation=0, weights=weights, set_size=(3, 3))
+        for expression in generator.expressions(10):
+            ok_(expression.startswith("age ∈ {"), expression)
+            eq_(expression.count(","), 2)
+
+    def test_distributions(self):
+        symbol_table = SymbolTable("root", (Bind("traffic_light", TrafficLightVar()), ))
+        assert_raises(ValueError, CorpusGenerator, symbol_table)
+        symbol_table = SymbolTable("root", (Bind("age", NumberVariable("age")), ))
+        generator = CorpusGenerator(symbol_table, seed=6, max_depth=0, negation=0,
+                                    distributions={"age": lambda random: random.choice((7, 9))})
+        ok_(all(context["age"] in (7, 9) for context in generator.contexts(20)))
+        ok_(all(expression.endswith(("7", "9", "}")) for expression in generator.expressions(20)))
+
+
+class TestSymbolTable(object):
+
+    def test_namespaces(self):
+        symbol_table = make_symbol_table(7, namespace_depth=2, namespace_width=2)
+        namespace = symbol_table.get_namespace()
+        eq_(namespace.get_object("number_0").context_name, "number_0")
+        eq_(namespace.get_object("string_1", ["ns0"]).context_name.path, "ns0.string_1")
+        eq_(namespace.get_object("boolean_3", ["ns0", "ns0"]).context_name.path, "ns0.ns0.boolean_3")
+        generator = CorpusGenerator(symbol_table, seed=7)
+        context = generator.context()
+        ok_(isinstance(context["ns0"]["ns0"]["boolean_3"], bool))
+        eq_(len(generator.variables), 7)
+
+
+class TestFiles(object):
+
+    def setup(self):
+        self.directory = tempfile.mkdtemp()
+        self.generator = CorpusGenerator(make_symbol_table(7, kinds=ALL_KINDS), seed=8)
+
+    def teardown(self):
+        shutil.rmtree(self.directory)
+
+    def read_lines(self, name):
+        with open(os.path.join(self.directory, name), "rb") as output:
+            return output.read().decode("utf-8").splitlines()
+
+    def test_expressions(self):
+        eq_(self.generator.write_expressions(os.path.join(self.directory, "expressions.txt"), 25), 25)
+        eq_(len(self.read_lines("expressions.txt")), 25)
+
+    def test_rules(self):
+        output = six.StringIO()
+        eq_(self.generator.write_rules(output, 3, label="r%d"), 3)
+        eq_([line.split("\t")[0] for line in output.getvalue().splitlines()], ["r0", "r1", "r2"])
+
+    def test_contexts(self):
+        eq_(self.generator.write_contexts(os.path.join(self.directory, "contexts.jsonl"), 10), 10)
+        records = [json.loads(line) for line in self.read_lines("contexts.jsonl")]
+        eq_(len(records), 10)
+        record = records[0]
+        ok_(isinstance(record["set_2"], list))
+        eq_(len(record["date_4"]), 10)
+        ok_(isinstance(record["duration_6"], float))
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the multi-process evaluation of parse trees.
+
+"""
+from __future__ import unicode_literals
+
+import pickle
+
+from nose.tools import assert_raises, eq_, ok_
+from pyparsing import ParseException
+
+from booleano.operations.variables import NumberVariable, StringVariable
+from booleano.parser import Bind, Grammar, SymbolTable
+from booleano.parser.core import EvaluableParseManager
+from booleano.parser.executors import ParallelEvaluator
+
+
+def make_symbol_table():
+    """Build the symbol table used by the workers."""
+    return SymbolTable("root", (
+        Bind("age", NumberVariable("age")),
+        Bind("name", StringVariable("name")),
+    ))
+
+
+def fail_to_load():
+    raise pickle.UnpicklingError("This variable cannot be loaded")
+
+
+class UnloadableVariable(NumberVariable):
+    """A variable which can be pickled but not unpickled."""
+
+    def to_python(self, context):
+        # Not a plain read of the context, so the program keeps the variable:
+        return super(UnloadableVariable, self).to_python(context)
+
+    def __reduce__(self):
+        return (fail_to_load, ())
+
+
+EXPRESSIONS = ('age > 18', 'name == "aang" | age < 14', '"o" ∈ name')
+
+CONTEXTS = [{"age": age, "name": name} for age in range(10, 30)
+            for name in ("aang", "sokka", "katara", "zuko")]
+
+
+def expected_results():
+    manager = EvaluableParseManager(make_symbol_table(), Grammar())
+    trees = [manager.parse(expression) for expression in EXPRESSIONS]
+    return [tuple(tree(context) for tree in trees) for context in CONTEXTS]
+
+
+class TestParallelEvaluator(object):
+    """Tests for :class:`ParallelEvaluator`."""
+
+    def test_from_expressions(self):
+        """Workers can parse the expressions by themselves."""
+        with ParallelEvaluator(expressions=EXPRESSIONS, symbol_table_factory=make_symbol_table,
+                               grammar=Grammar(), processes=2, chunk_size=7) as executor:
+            eq_(list(executor.evaluate(CONTEXTS)), expected_results())
+
+    def test_from_trees(self):
+        """Serialized trees can be sent to the workers."""
+        manager = EvaluableParseManager(make_symbol_table(), Grammar())
+        trees = [manager.parse(expression) for expression in EXPRESSIONS]
+        with ParallelEvaluator(trees=trees, processes=2, max_pending=1) as executor:
+            eq_(list(executor.evaluate(iter(CONTEXTS))), expected_results())
+
+    def test_automatic_chunk_size(self):
+        """Chunks are resized according to the time spent per context."""
+        with ParallelEvaluator(expressions=EXPRESSIONS, symbol_table_factory=make_symbol_table,
+                               grammar=Grammar(), processes=2, max_chunk_size=50) as executor:
+            eq_(executor._get_chunk_size(), ParallelEvaluator.initial_chunk_size)
+            eq_(list(executor.evaluate(CONTEXTS * 3)), expected_results() * 3)
+            ok_(1 <= executor._get_chunk_size() <= 50)
+
+    def test_no_context(self):
+        with ParallelEvaluator(expressions=EXPRESSIONS, symbol_table_factory=make_symbol_table,
+                               grammar=Grammar(), processes=1) as executor:
+            eq_(list(executor.evaluate([])), [])
+
+    def test_errors_are_propagated(self):
+        with ParallelEvaluator(expressions=EXPRESSIONS, symbol_table_factory=make_symbol_table,
+                               grammar=Grammar(), processes=1) as executor:
+            assert_raises(KeyError, list, executor.evaluate([{"age": 3}]))
+
+    def test_nothing_to_evaluate(self):
+        assert_raises(ValueError, ParallelEvaluator, expressions=EXPRESSIONS)
+
+    def test_invalid_expressions(self):
+        """Invalid expressions are reported instead of hanging the pool."""
+        assert_raises(ParseException, ParallelEvaluator, expressions=["age >"],
+                      symbol_table_factory=make_symbol_table, grammar=Grammar(), processes=1)
+
+    def test_worker_setup_errors(self):
+        """Errors setting up the workers are raised by the chunks."""
+        symbol_table = SymbolTable("root", (Bind("age", UnloadableVariable("age")), ))
+        tree = EvaluableParseManager(symbol_table, Grammar()).parse("age > 18")
+        with ParallelEvaluator(trees=[tree], processes=1) as executor:
+            assert_raises(pickle.UnpicklingError, list, executor.evaluate(CONTEXTS))
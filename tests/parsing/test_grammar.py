@@ -104,6 +104,8 @@ class TestDefaultGrammar(object):
         eq_(self.grammar.get_setting("superset_right_in_is_subset"), True)
         eq_(self.grammar.get_setting("set_right_in_contains"), True)
         eq_(self.grammar.get_setting("optional_positive_sign"), True)
+        eq_(self.grammar.get_setting("packrat"), True)
+        eq_(self.grammar.get_setting("packrat_cache_size"), 10000)
 
     def test_setting_existing_setting(self):
         self.grammar.set_setting("set_right_in_contains", False)
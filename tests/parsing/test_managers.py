@@ -32,12 +32,15 @@ Tests for the parsing managers.
 from __future__ import unicode_literals
 
 from nose.tools import eq_, ok_, assert_false, assert_raises
+from pyparsing import ParseException
 
-from booleano.exc import GrammarError
-from booleano.operations import (Equal, LessEqual, String, Number,
-                                 PlaceholderVariable)
+from booleano.exc import GrammarError, ScopeError
+from booleano.operations.core import InternTable
+from booleano.operations import (And, Equal, LessEqual, String, Number,
+                                 PlaceholderVariable, Variable)
 from booleano.parser import (SymbolTable, Bind, Grammar)
 from booleano.parser.core import ParseManager, EvaluableParseManager, ConvertibleParseManager
+from booleano.parser.metrics import ParseMetrics
 from booleano.parser.trees import EvaluableParseTree, ConvertibleParseTree
 from tests import (BoolVar, TrafficLightVar, PedestriansCrossingRoad,
                    DriversAwaitingGreenLightVar, PermissiveFunction, TrafficViolationFunc,
@@ -332,3 +335,274 @@ class TestManagersWithCaching(object):
         eq_(len(manager._cache.cache_by_locale[None]), 5)
         eq_(len(manager._cache.latest_expressions), 5)
 
+
+class TestManagersWithBoundedCaching(object):
+    """
+    Tests for the parse managers whose cache is bounded in memory or time.
+
+    """
+
+    def setUp(self):
+        self.time = 0
+        self.metrics = ParseMetrics(clock=lambda: self.time)
+
+    def test_size_accounting(self):
+        manager = ConvertibleParseManager(Grammar(), cache_limit=None, cache_memory_limit=10 ** 9)
+        manager.parse("x > 1")
+        small_size = manager._cache.size
+        ok_(small_size > 0)
+        manager.parse('x == "%s"' % ("a" * 10000))
+        ok_(manager._cache.size - small_size > 10000)
+        manager.parse('x ∈ {%s}' % ", ".join('"%d"' % number for number in range(100)))
+        manager.parse("x > 1", "es")
+        eq_(manager._cache.size, sum(size for (size, _) in manager._cache._entries.values()))
+        eq_(manager.metrics.get_cache_size(), (4, manager._cache.size))
+        # The trees are only measured when there's a memory limit:
+        manager = ConvertibleParseManager(Grammar(), cache_limit=None)
+        manager.parse("x > 1")
+        eq_(manager._cache.size, 0)
+        eq_(manager.metrics.get_cache_size(), (1, None))
+
+    def test_memory_limit(self):
+        small_expression = "x > 1"
+        large_expression = 'x == "%s"' % ("a" * 8000)
+        sizes = {}
+        for expression in (small_expression, large_expression):
+            manager = ConvertibleParseManager(Grammar(), cache_limit=None, cache_memory_limit=10 ** 9)
+            manager.parse(expression)
+            sizes[expression] = manager._cache.size
+        # Room for the large tree and one of the small ones:
+        memory_limit = sizes[large_expression] + sizes[small_expression] * 3 // 2
+        manager = ConvertibleParseManager(Grammar(), cache_limit=None, cache_memory_limit=memory_limit,
+                                          metrics=self.metrics)
+        manager.parse("x > 1")
+        manager.parse("y > 1")
+        manager.parse("x > 1")
+        # Too large to be cached at all:
+        manager.parse('x == "%s"' % ("a" * 16000))
+        eq_(manager._cache.latest_expressions, [(None, "x > 1"), (None, "y > 1")])
+        # The least recently used trees make room for the new one:
+        manager.parse(large_expression)
+        eq_(manager._cache.latest_expressions, [(None, large_expression), (None, "x > 1")])
+        eq_(dict(self.metrics.cache_evictions), {None: 1})
+        ok_(manager._cache.size <= memory_limit)
+
+    def test_ttl(self):
+        manager = ConvertibleParseManager(Grammar(), cache_limit=None, cache_ttl=60, metrics=self.metrics)
+        tree = manager.parse("x > 1")
+        self.time = 59
+        ok_(manager.parse("x > 1") is tree)
+        self.time = 60
+        ok_(manager.parse("x > 1") is not tree)
+        eq_(dict(self.metrics.cache_expirations), {None: 1})
+        eq_(dict(self.metrics.cache_misses), {None: 2})
+        eq_(manager._cache.counter, 1)
+
+    def test_invalidate(self):
+        manager = ConvertibleParseManager(Grammar(), cache_limit=None, negative_cache_limit=None)
+        for locale in (None, "es"):
+            manager.parse("x > 1", locale)
+            manager.parse("y > 1", locale)
+            assert_raises(ParseException, manager.parse, "x >", locale)
+        eq_(manager.invalidate("es", lambda expression: expression.startswith("x")), 1)
+        eq_(manager._cache.latest_expressions, [("es", "y > 1"), (None, "y > 1"), (None, "x > 1")])
+        eq_(list(manager._negative_cache.errors), [(None, "x >")])
+        eq_(manager.invalidate(), 3)
+        eq_(manager._cache.counter, 0)
+        eq_(manager._cache.size, 0)
+        eq_(manager._cache.cache_by_locale, {})
+        eq_(len(manager._negative_cache.errors), 0)
+
+
+class TestManagersWithNegativeCaching(object):
+    """
+    Tests for the parse managers caching the errors of invalid expressions.
+
+    """
+
+    def setUp(self):
+        self.time = 0
+        symbol_table = SymbolTable("global", [Bind("bool", BoolVar())])
+        metrics = ParseMetrics(clock=lambda: self.time)
+        self.manager = EvaluableParseManager(symbol_table, Grammar(), metrics=metrics, negative_cache_limit=2,
+                                             negative_cache_ttl=60)
+
+    def test_errors_raised_again(self):
+        for _ in range(3):
+            assert_raises(ParseException, self.manager.parse, "bool &")
+            assert_raises(ScopeError, self.manager.parse, "unknown")
+        # Each expression was only parsed once:
+        eq_(self.manager.metrics.cache_misses[None], 2)
+        eq_(self.manager.metrics.negative_cache_hits[None], 4)
+        try:
+            self.manager.parse("unknown")
+        except ScopeError as exc:
+            eq_(exc.args, ('No such object "unknown"', ))
+
+    def test_locales(self):
+        assert_raises(ScopeError, self.manager.parse, "unknown", "es")
+        assert_raises(ScopeError, self.manager.parse, "unknown")
+        eq_(dict(self.manager.metrics.cache_misses), {None: 1, "es": 1})
+
+    def test_limit(self):
+        for expression in ("unknown1", "unknown2", "unknown3", "unknown1"):
+            assert_raises(ScopeError, self.manager.parse, expression)
+        eq_(self.manager.metrics.cache_misses[None], 4)
+        eq_(list(self.manager._negative_cache.errors), [(None, "unknown3"), (None, "unknown1")])
+
+    def test_ttl(self):
+        assert_raises(ScopeError, self.manager.parse, "unknown")
+        self.time = 59
+        assert_raises(ScopeError, self.manager.parse, "unknown")
+        self.time = 60
+        assert_raises(ScopeError, self.manager.parse, "unknown")
+        eq_(self.manager.metrics.cache_misses[None], 2)
+        eq_(self.manager.metrics.negative_cache_hits[None], 1)
+
+    def test_disabled_by_default(self):
+        manager = ConvertibleParseManager(Grammar())
+        assert_raises(ParseException, manager.parse, "a &")
+        assert_raises(ParseException, manager.parse, "a &")
+        eq_(manager.metrics.cache_misses[None], 2)
+        eq_(len(manager._negative_cache.errors), 0)
+
+    def test_other_errors_not_cached(self):
+        self.manager._parsers[None] = _FailingParser()
+        assert_raises(MemoryError, self.manager.parse, "bool")
+        eq_(len(self.manager._negative_cache.errors), 0)
+
+
+class _FailingParser(object):
+    """Parser failing for reasons other than the expressions."""
+
+    is_built = True
+
+    def __call__(self, expression):
+        raise MemoryError()
+
+
+class TestManagersWithCanonicalization(object):
+    """
+    Tests for the parse managers canonicalizing the expressions.
+
+    """
+
+    def setUp(self):
+        symbol_table = SymbolTable("global", [Bind("bool", BoolVar())])
+        self.manager = EvaluableParseManager(symbol_table, Grammar(), cache_limit=None, canonicalize=True,
+                                             es=Grammar(**{"and": "y"}))
+
+    def test_equivalent_spellings_share_the_cache(self):
+        tree = self.manager.parse('bool & "A" == "A"')
+        ok_(self.manager.parse('BOOL&"A"=="A"') is tree)
+        ok_(self.manager.parse('bool & "a" == "A"') is not tree)
+        eq_(self.manager.metrics.cache_hits[None], 1)
+        eq_(self.manager.metrics.cache_misses[None], 2)
+
+    def test_locales(self):
+        tree = self.manager.parse("Bool y bool", "es")
+        ok_(self.manager.parse("bool  y  BOOL", "es") is tree)
+        ok_(tree({"bool": True}))
+        # Locales without their own grammar use the generic one:
+        ok_(self.manager.parse("BOOL&bool", "fr") is self.manager.parse("bool & bool", "fr"))
+
+    def test_invalid_expressions(self):
+        assert_raises(ParseException, self.manager.parse, "bool $ bool")
+        assert_raises(ScopeError, self.manager.parse, "Unknown")
+
+    def test_case_sensitive_operators(self):
+        manager = ConvertibleParseManager(Grammar(), cache_limit=None, canonicalize=True,
+                                          en=Grammar(**{"and": "AND"}))
+        eq_(manager.parse("A AND b", "en").root_node, And(PlaceholderVariable("a"), PlaceholderVariable("b")))
+        assert_raises(ParseException, manager.parse, "a and b", "en")
+        assert_raises(ParseException, manager.parse, "a AND b")
+
+    def test_word_operators_within_words(self):
+        symbol_table = SymbolTable("global", [Bind("ice", BoolVar()), Bind("x", BoolVar()), Bind("y", BoolVar())])
+        for (grammar, expression) in ((Grammar(**{"not": "not"}), "NOTICE"),
+                                      (Grammar(**{"not": "not"}), "notice"),
+                                      (Grammar(**{"xor": "XOR"}), "x XORy"),
+                                      (Grammar(**{"xor": "XOR"}), "X>1XORy")):
+            outcomes = []
+            for canonicalize in (False, True):
+                manager = EvaluableParseManager(symbol_table, grammar, cache_limit=None, canonicalize=canonicalize)
+                try:
+                    outcomes.append(manager.parse(expression).root_node)
+                except Exception as exc:
+                    outcomes.append(exc.__class__)
+            eq_(outcomes[0], outcomes[1])
+
+    def test_canonicalization_disabled_by_default(self):
+        manager = ConvertibleParseManager(Grammar(), cache_limit=None)
+        ok_(manager.parse("a&b") is not manager.parse("a & b"))
+
+
+class TestManagersWithInterning(object):
+    """
+    Tests for the parse managers sharing equivalent sub-trees.
+
+    """
+
+    def test_equivalent_sub_trees_are_shared(self):
+        intern_table = InternTable()
+        manager = ConvertibleParseManager(Grammar(), intern_table=intern_table)
+        tree1 = manager.parse('today == "2009-07-13" & (x > 3 | y)')
+        tree2 = manager.parse('(x > 3 | y) & ~ today == "2009-07-13"')
+        or1 = tree1.root_node.slave_operand
+        or2 = tree2.root_node.master_operand
+        eq_(or1, or2)
+        ok_(or1 is or2)
+        ok_(tree1.root_node.master_operand is tree2.root_node.slave_operand.operand)
+        ok_(or1 in intern_table)
+
+    def test_bound_operands_are_not_interned(self):
+        intern_table = InternTable()
+        symbol_table = SymbolTable("root", (Bind("boolean", BoolVar()), ))
+        manager = EvaluableParseManager(symbol_table, Grammar(), intern_table=intern_table)
+        tree = manager.parse('boolean & "x" == "x"')
+        ok_(tree.root_node.master_operand not in intern_table)
+        ok_(tree.root_node.slave_operand in intern_table)
+        ok_(tree({"bool": True}))
+
+    def test_operations_on_bound_variables_are_not_shared(self):
+        intern_table = InternTable()
+        symbol_table = SymbolTable("root", (
+            Bind("a", _FieldVariable("a")),
+            Bind("b", _FieldVariable("b")),
+        ))
+        manager = EvaluableParseManager(symbol_table, Grammar(), intern_table=intern_table)
+        tree_a = manager.parse("a > 1")
+        tree_b = manager.parse("b > 1")
+        ok_(tree_b.root_node is not tree_a.root_node)
+        ok_(tree_b.root_node not in intern_table)
+        ok_(tree_b({"a": 0, "b": 5}))
+        assert_false(tree_a({"a": 0, "b": 5}))
+
+    def test_interning_disabled_by_default(self):
+        manager = ConvertibleParseManager(Grammar())
+        tree1 = manager.parse('x > 3')
+        tree2 = manager.parse('x > 3')
+        eq_(tree1, tree2)
+        ok_(tree1.root_node is not tree2.root_node)
+
+
+class _FieldVariable(Variable):
+    """Variable reading the context item ``field``, whatever its name."""
+
+    operations = {"equality", "inequality"}
+
+    def __init__(self, field):
+        self.field = field
+        super(_FieldVariable, self).__init__()
+
+    def to_python(self, context):
+        return context[self.field]
+
+    def equals(self, value, context):
+        return context[self.field] == value
+
+    def greater_than(self, value, context):
+        return context[self.field] > value
+
+    def less_than(self, value, context):
+        return context[self.field] < value
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the metrics of the parse managers.
+
+"""
+from __future__ import unicode_literals
+
+from itertools import count
+
+from nose.tools import assert_raises, eq_, ok_
+from pyparsing import ParseException
+
+from booleano.operations.variables import NumberVariable
+from booleano.parser import Bind, Grammar, SymbolTable
+from booleano.parser.core import ConvertibleParseManager, EvaluableParseManager
+from booleano.parser.metrics import Histogram, ParseMetrics, PrometheusSink, format_prometheus, get_tree_size
+
+
+def fake_clock():
+    """Return a clock which moves forward by one millisecond each time it's read."""
+    return lambda ticks=count(): next(ticks) / 1000.0
+
+
+class TestHistogram(object):
+
+    def test_observations(self):
+        histogram = Histogram((1, 2, 5))
+        for value in (0.5, 1, 1.5, 3, 10, 2):
+            histogram.observe(value)
+        eq_(histogram.as_dict(), {"buckets": [(1, 2), (2, 4), (5, 5)], "count": 6, "sum": 18.0})
+
+
+class TestTreeSize(object):
+
+    def test_function_arguments(self):
+        parse = ConvertibleParseManager(Grammar(), cache_limit=0).parse
+        small_size = get_tree_size(parse('f("a") & x'), values=True)
+        large_size = get_tree_size(parse('f("%s") & x' % ("a" * 10000)), values=True)
+        ok_(large_size - small_size > 9000)
+
+
+class TestManagerMetrics(object):
+
+    def setup(self):
+        symbol_table = SymbolTable("root", (Bind("age", NumberVariable("age")), ))
+        self.manager = EvaluableParseManager(symbol_table, Grammar(), cache_limit=2,
+                                             metrics=ParseMetrics(clock=fake_clock()), es=Grammar())
+        self.metrics = self.manager.metrics
+
+    def test_cache_counters(self):
+        for expression in ("age > 1", "age > 1", "age > 2", "age > 3", "age > 1"):
+            self.manager.parse(expression)
+        self.manager.parse("age > 3", "es")
+        eq_(dict(self.metrics.cache_hits), {None: 1})
+        eq_(dict(self.metrics.cache_misses), {None: 4, "es": 1})
+        # The limit is shared by all the locales:
+        eq_(dict(self.metrics.cache_evictions), {None: 3})
+        eq_(self.metrics.hit_ratio, 1 / 6.0)
+        # The trees are only measured when the cache has a memory limit:
+        eq_(self.metrics.get_cache_size(), (2, None))
+
+    def test_default_metrics(self):
+        manager = ConvertibleParseManager(Grammar())
+        manager.parse("a > 1")
+        eq_(dict(manager.metrics.cache_misses), {None: 1})
+        eq_(manager.metrics.get_cache_size(), (0, None))
+
+    def test_parser_builds(self):
+        self.manager.parse("age > 1")
+        self.manager.parse("age > 2")
+        self.manager.parse("age > 2", "es")
+        self.manager.parse("age > 2", "fr")
+        eq_(dict(self.metrics.parser_builds), {None: 1, "es": 1, "fr": 1})
+        eq_([round(self.metrics.parser_build_time[locale], 6) for locale in (None, "es", "fr")], [0.001] * 3)
+
+    def test_latencies(self):
+        self.manager.parse("age > 1")
+        ok_(self.manager.evaluate("age > 1", None, {"age": 3}))
+        # The parse is measured around the parser build:
+        eq_(self.metrics.parse_latency.count, 2)
+        eq_(round(self.metrics.parse_latency.sum, 6), 0.004)
+        eq_(self.metrics.evaluation_latency.count, 1)
+        eq_(round(self.metrics.evaluation_latency.sum, 6), 0.001)
+
+    def test_errors(self):
+        assert_raises(ParseException, self.manager.parse, "age >")
+        eq_(dict(self.metrics.cache_misses), {None: 1})
+        eq_(self.metrics.parse_latency.count, 0)
+
+    def test_reset(self):
+        self.manager.parse("age > 1")
+        self.metrics.reset()
+        eq_(self.metrics.as_dict()["cache"]["misses"], {})
+        eq_(self.metrics.parse_latency.count, 0)
+
+
+class TestExport(object):
+
+    def setup(self):
+        self.manager = ConvertibleParseManager(Grammar(), cache_limit=1, metrics=ParseMetrics(buckets=(0.5, 1)))
+        self.manager.parse("a > 1")
+        self.manager.parse("a > 1")
+        self.manager.parse("b", "es")
+
+    def test_dict(self):
+        metrics = self.manager.metrics.as_dict()
+        eq_(metrics["cache"]["hits"], {None: 1})
+        eq_(metrics["cache"]["misses"], {None: 1, "es": 1})
+        eq_(metrics["cache"]["evictions"], {None: 1})
+        eq_(metrics["cache"]["entries"], 1)
+        eq_(metrics["parsers"]["builds"], {None: 1, "es": 1})
+        eq_(metrics["parse_seconds"]["count"], 3)
+        eq_([bound for (bound, _) in metrics["parse_seconds"]["buckets"]], [0.5, 1])
+
+    def test_no_sink(self):
+        ok_(self.manager.metrics.export() is None)
+
+    def test_prometheus(self):
+        written = []
+        self.manager.metrics.sink = PrometheusSink(written.append, prefix="rules", labels={"app": "web"})
+        text = self.manager.metrics.export()
+        eq_(written, [text])
+        lines = text.splitlines()
+        ok_("# TYPE rules_cache_hits_total counter" in lines)
+        ok_("# TYPE rules_negative_cache_hits_total counter" in lines)
+        ok_("# TYPE rules_cache_expirations_total counter" in lines)
+        ok_('rules_cache_misses_total{app="web",locale=""} 1' in lines)
+        ok_('rules_cache_misses_total{app="web",locale="es"} 1' in lines)
+        # The size of the cache is not measured without a memory limit:
+        ok_("# TYPE rules_cache_bytes gauge" not in lines)
+        ok_('rules_cache_entries{app="web"} 1' in lines)
+        ok_("# TYPE rules_parse_seconds histogram" in lines)
+        ok_('rules_parse_seconds_bucket{app="web",le="+Inf"} 3' in lines)
+        ok_('rules_parse_seconds_count{app="web"} 3' in lines)
+
+    def test_escaping(self):
+        metrics = self.manager.metrics.as_dict()
+        metrics["cache"]["hits"] = {'a"b': 2}
+        ok_('booleano_cache_hits_total{locale="a\\"b"} 2' in format_prometheus(metrics).splitlines())
@@ -31,7 +31,11 @@ Test suite for the built-in parser implementation.
 """
 from __future__ import unicode_literals
 
-from nose.tools import eq_, assert_raises
+import os
+import subprocess
+import sys
+
+from nose.tools import eq_, ok_, assert_raises
 import six
 
 from booleano.parser.grammar import Grammar
@@ -819,6 +823,39 @@ class TestBaseParser(object):
         assert_raises(NotImplementedError, parser.make_variable, None)
         assert_raises(NotImplementedError, parser.make_function, None)
 
+    def test_packrat(self):
+        from pyparsing import ParserElement
+        for packrat in (True, False):
+            parser = ConvertibleParser(Grammar(), packrat=packrat)
+            eq_(parser.packrat, packrat)
+            eq_(parser("a & (b | c)").root_node,
+                And(PlaceholderVariable("a"), Or(PlaceholderVariable("b"), PlaceholderVariable("c"))))
+            # The memo is cleared after each expression (Pyparsing's bounded
+            # memo only defines __len__ on the instance):
+            eq_(ParserElement.packrat_cache.__len__(), 0)
+        eq_(ConvertibleParser(Grammar()).packrat, True)
+        eq_(ConvertibleParser(Grammar({"packrat": False})).packrat, False)
+
+    def test_packrat_cache_size(self):
+        # Pyparsing takes the limit of its memo from the first parser which
+        # enables packrat, so it's checked in a new process:
+        code = ("import sys; from pyparsing import ParserElement; "
+                "from booleano.parser import Grammar; from booleano.parser.parsers import ConvertibleParser; "
+                "sizes = []; parser = ConvertibleParser(Grammar({'packrat_cache_size': 5})); "
+                "parser.make_set = lambda tokens: sizes.append(ParserElement.packrat_cache.__len__()) or "
+                "ConvertibleParser.make_set(parser, tokens); "
+                "parser('a & (b | ~ c) ^ {1, 2} ⊂ d'); "
+                "sys.exit(not (0 < max(sizes) <= 5 and ParserElement.packrat_cache.__len__() == 0))")
+        eq_(subprocess.call([sys.executable, "-c", code], env=dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))),
+            0)
+
+    def test_lazy_pyparsing(self):
+        # Pyparsing is not imported until a parser is built:
+        code = ("import sys, booleano.parser.core, booleano.operations.sql; "
+                "sys.exit('pyparsing' in sys.modules)")
+        eq_(subprocess.call([sys.executable, "-c", code], env=dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))),
+            0)
+
 
 class TestEvaluableParser(object):
     """Tests for the evaluable parser."""
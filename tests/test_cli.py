@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the ``booleano`` command.
+
+"""
+from __future__ import absolute_import, unicode_literals
+
+import io
+import json
+import os
+import shutil
+import tempfile
+
+from nose.tools import eq_, ok_
+
+from booleano.cli import main
+
+RECORDS = [
+    {"name": "katara", "age": 14, "nation": "water"},
+    {"name": "aang", "age": 112, "nation": "air"},
+    {"name": "zuko", "age": 16, "nation": "fire"},
+    {"name": "sokka", "age": 15, "nation": "water"},
+]
+
+JSONL = "".join(json.dumps(record) + "\n" for record in RECORDS).encode("utf-8")
+
+CSV = ("name,age,nation\n" + "".join("%(name)s,%(age)s,%(nation)s\n" % record for record in RECORDS)).encode("utf-8")
+
+
+def run(argv, stdin=b""):
+    stdout = io.BytesIO()
+    stderr = io.StringIO()
+    status = main(argv, io.BytesIO(stdin), stdout, stderr)
+    return (status, stdout.getvalue(), stderr.getvalue())
+
+
+class TestFiltering(object):
+    """Tests for the records written by the command."""
+
+    def test_jsonl(self):
+        (status, output, _) = run(["-e", 'age < 100 & nation == "water"'], JSONL)
+        eq_(status, 0)
+        eq_(output, b"".join(JSONL.splitlines(True)[i] for i in (0, 3)))
+
+    def test_csv(self):
+        (status, output, _) = run(["-e", "age > 15", "--format", "csv"], CSV)
+        eq_(status, 0)
+        eq_(output, b"name,age,nation\naang,112,air\nzuko,16,fire\n")
+
+    def test_no_match(self):
+        eq_(run(["-e", "age > 1000"], JSONL), (1, b"", ""))
+
+    def test_invalid_records(self):
+        (status, output, stderr) = run(["-e", "age > 100", "--stats"], b"{oops\n\n[1]\n" + JSONL)
+        eq_(output, JSONL.splitlines(True)[1])
+        ok_(stderr.startswith("7 records (1 written, 3 invalid, 0 evaluation errors)"), stderr)
+
+    def test_evaluation_errors(self):
+        records = b'{"age": "old"}\n{"age": 20}\n{"name": "appa"}\n'
+        (status, output, stderr) = run(["-e", "age > 18", "--stats"], records)
+        eq_(output, b'{"age": 20}\n')
+        ok_("2 evaluation errors" in stderr, stderr)
+
+    def test_small_chunks(self):
+        (_, output, _) = run(["-e", "age > 15", "--chunk-size", "1", "--format", "csv"], CSV)
+        eq_(output, b"name,age,nation\naang,112,air\nzuko,16,fire\n")
+
+    def test_grammar_tokens(self):
+        (_, output, _) = run(["-e", '"o" in name', "--token", "belongs_to=in"], JSONL)
+        eq_(len(output.splitlines()), 2)
+
+    def test_workers(self):
+        records = JSONL * 50
+        (status, output, _) = run(["-e", 'nation == "water"', "--workers", "2", "--chunk-size", "100"], records)
+        eq_(status, 0)
+        eq_(output, b"".join(line for line in records.splitlines(True) if b"water" in line))
+
+
+class TestRules(object):
+    """Tests for the rules files and labels."""
+
+    def setup(self):
+        self.directory = tempfile.mkdtemp()
+        self.rules = self._write("people.rules", (
+            "# Rules for the people\n"
+            "\n"
+            "young\tage < 16\n"
+            "water\tnation == \"water\"\n"
+        ))
+
+    def teardown(self):
+        shutil.rmtree(self.directory)
+
+    def _write(self, name, contents):
+        path = os.path.join(self.directory, name)
+        with io.open(path, "w", encoding="utf-8") as file_:
+            file_.write(contents)
+        return path
+
+    def test_any_rule(self):
+        (_, output, _) = run(["--rules", self.rules], JSONL)
+        eq_([json.loads(line)["name"] for line in output.splitlines()], ["katara", "sokka"])
+
+    def test_labels_jsonl(self):
+        (status, output, _) = run(["--rules", self.rules, "--labels"], JSONL)
+        eq_(status, 0)
+        eq_([json.loads(line)["labels"] for line in output.splitlines()],
+            [["young", "water"], [], [], ["young", "water"]])
+
+    def test_labels_csv(self):
+        path = self._write("people.csv", CSV.decode("utf-8"))
+        (_, output, _) = run(["--rules", self.rules, "--labels", "--label-field", "tags", path])
+        eq_(output.splitlines()[:3], [b"name,age,nation,tags", b"katara,14,water,young|water", b"aang,112,air,"])
+
+    def test_several_files(self):
+        path = self._write("people.jsonl", JSONL.decode("utf-8"))
+        (_, output, _) = run(["--rules", self.rules, path, "-", path], JSONL)
+        eq_(len(output.splitlines()), 6)
+
+
+class TestErrors(object):
+    """Tests for the errors reported by the command."""
+
+    def test_unknown_variable(self):
+        (status, output, stderr) = run(["-e", "height > 1"], JSONL)
+        eq_(status, 2)
+        eq_(output, b"")
+        ok_(stderr.startswith("booleano: "))
+
+    def test_bad_expression(self):
+        eq_(run(["-e", "age >"], JSONL)[0], 2)
+
+    def test_missing_file(self):
+        eq_(run(["-e", "age > 1", "/non/existing.jsonl"])[0], 2)
+
+    def test_bad_rules_file(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, "bad.rules")
+            with io.open(path, "w", encoding="utf-8") as file_:
+                file_.write("age > 1\n")
+            (status, _, stderr) = run(["--rules", path], JSONL)
+            eq_(status, 2)
+            ok_("bad.rules:1" in stderr, stderr)
+        finally:
+            shutil.rmtree(directory)